@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from core.utils import parse_json, parse_sql_from_string, add_prefix, load_json_file, extract_world_info, is_email, is_valid_date_column
-from func_timeout import func_set_timeout, FunctionTimedOut
+from core.sqlite_exec import SQLTimeoutError, run_sql
+from core.sql_sandbox import SQLSandbox
 
 LLM_API_FUC = None
 # try import core.api, if error then import core.llm
@@ -29,6 +30,9 @@ from pprint import pprint
 import pdb
 import tiktoken
 
+# The BM25 schema index is shared with workflow_v3 (on sys.path through core.sqlite_exec)
+from schema_index import load_schema_index
+
 
 class BaseAgent(metaclass=abc.ABCMeta):
     def __init__(self):
@@ -46,14 +50,20 @@ class Selector(BaseAgent):
     name = SELECTOR_NAME
     description = "Get database description and if need, extract relative tables & columns"
 
-    def __init__(self, data_path: str, tables_json_path: str, model_name: str, dataset_name:str, lazy: bool = False, without_selector: bool = False):
+    def __init__(self, data_path: str, tables_json_path: str, model_name: str, dataset_name:str, lazy: bool = False, without_selector: bool = False, schema_top_k: int = 0):
+        """
+        :param schema_top_k: if > 0, only the schema_top_k tables the BM25 schema index ranks best
+                             for the question are shown to the LLM when pruning
+        """
         super().__init__()
         self.data_path = data_path.strip('/').strip('\\')
         self.tables_json_path = tables_json_path
         self.model_name = model_name
         self.dataset_name = dataset_name
+        self.schema_top_k = schema_top_k
         self.db2infos = {}  # summary of db (stay in the memory during generating prompt)
         self.db2dbjsons = {} # store all db to tables.json dict by tables_json_path
+        self.db2indexes = {}  # db_id -> SchemaIndex of its tables and columns
         self.init_db2jsons()
         if not lazy:
             self._load_all_db_info()
@@ -536,6 +546,33 @@ class Selector(BaseAgent):
         else:
             return True
 
+    def _get_schema_index(self, db_id: str):
+        if db_id not in self.db2indexes:
+            if self.db2infos.get(db_id, {}) == {}:  # lazy load
+                self.db2infos[db_id] = self._load_single_db_info(db_id)
+            db_info = self.db2infos[db_id]
+            db_dict = self.db2dbjsons[db_id]
+            table_full_names = dict(zip(db_dict['table_names_original'], db_dict['table_names']))
+            entries = []
+            for (table_name, columns_desc), (_, columns_val) in zip(db_info['desc_dict'].items(), db_info['value_dict'].items()):
+                entries.append((table_name, None, f"{table_name} {table_full_names.get(table_name, '')}"))
+                for (col_name, full_col_name, col_extra_desc), (_, col_values_str) in zip(columns_desc, columns_val):
+                    parts = [col_name, full_col_name, col_values_str]
+                    if str(col_extra_desc) != 'nan':
+                        parts.append(str(col_extra_desc))
+                    entries.append((table_name, col_name, ' '.join(part for part in parts if part)))
+            self.db2indexes[db_id] = load_schema_index(db_id, entries)
+        return self.db2indexes[db_id]
+
+    def _top_k_schema(self, db_id: str, query: str, evidence: str = None) -> dict:
+        """
+        Keep the tables the schema index ranks best for the question.
+        :return: {table_name: "keep_all"} for at most schema_top_k tables, {} if none matches
+        """
+        search_text = '\n'.join(filter(None, [query, evidence]))
+        candidates = self._get_schema_index(db_id).search(search_text, top_tables=self.schema_top_k)
+        return {table_name: "keep_all" for table_name, _ in candidates.tables}
+
     def _prune(self,
                db_id: str,
                query: str,
@@ -571,6 +608,10 @@ class Selector(BaseAgent):
         if self.without_selector:
             need_prune = False
         if ext_sch == {} and need_prune:
+            # pre-prune with the schema index: the LLM only sees the top-k tables
+            top_k_schema = self._top_k_schema(db_id, query, evidence) if self.schema_top_k > 0 else {}
+            if top_k_schema:
+                db_schema, db_fk, _ = self._get_db_desc_str(db_id=db_id, extracted_schema=top_k_schema, use_gold_schema=True)
             
             try:
                 raw_extracted_schema_dict = self._prune(db_id=db_id, query=query, db_schema=db_schema, db_fk=db_fk, evidence=evidence)
@@ -579,7 +620,11 @@ class Selector(BaseAgent):
                 raw_extracted_schema_dict = {}
             
             print(f"query: {message['query']}\n")
-            db_schema_str, db_fk, chosen_db_schem_dict = self._get_db_desc_str(db_id=db_id, extracted_schema=raw_extracted_schema_dict)
+            if top_k_schema:
+                raw_extracted_schema_dict = {table_name: raw_extracted_schema_dict.get(table_name, "keep_all") for table_name in top_k_schema}
+                db_schema_str, db_fk, chosen_db_schem_dict = self._get_db_desc_str(db_id=db_id, extracted_schema=raw_extracted_schema_dict, use_gold_schema=True)
+            else:
+                db_schema_str, db_fk, chosen_db_schem_dict = self._get_db_desc_str(db_id=db_id, extracted_schema=raw_extracted_schema_dict)
 
             message['extracted_schema'] = raw_extracted_schema_dict
             message['chosen_db_schem_dict'] = chosen_db_schem_dict
@@ -662,28 +707,30 @@ class Refiner(BaseAgent):
     name = REFINER_NAME
     description = "Execute SQL and preform validation"
 
-    def __init__(self, data_path: str, dataset_name: str):
+    def __init__(self, data_path: str, dataset_name: str, sql_sandbox: SQLSandbox = None):
         super().__init__()
         self.data_path = data_path  # path to all databases
         self.dataset_name = dataset_name
+        self.sql_sandbox = sql_sandbox  # if set, execute SQL in isolated worker processes
         self._message = {}
 
-    @func_set_timeout(120)
     def _execute_sql(self, sql: str, db_id: str) -> dict:
         # Get database connection
         db_path = f"{self.data_path}/{db_id}/{db_id}.sqlite"
-        conn = sqlite3.connect(db_path)
-        conn.text_factory = lambda b: b.decode(errors="ignore")
-        cursor = conn.cursor()
         try:
-            cursor.execute(sql)
-            result = cursor.fetchall()
+            # only the first rows are inspected, don't materialize the rest
+            if self.sql_sandbox is not None:
+                run = self.sql_sandbox.execute(db_path, sql, timeout=120, max_rows=5)
+            else:
+                run = run_sql(db_path, sql, timeout=120, max_rows=5)
             return {
                 "sql": str(sql),
-                "data": result[:5],
+                "data": run.rows,
                 "sqlite_error": "",
                 "exception_class": ""
             }
+        except SQLTimeoutError:
+            raise
         except sqlite3.Error as er:
             return {
                 "sql": str(sql),
@@ -766,14 +813,14 @@ class Refiner(BaseAgent):
         is_timeout = False
         try:
             error_info = self._execute_sql(old_sql, db_id)
-        except Exception as e:
+        except SQLTimeoutError as te:
             is_timeout = True
-        except FunctionTimedOut as fto:
+            error_info = {"sql": str(old_sql), "sqlite_error": str(te), "exception_class": "SQLTimeoutError"}
+        except Exception as e:
             is_timeout = True
+            error_info = {"sql": str(old_sql), "sqlite_error": str(e), "exception_class": str(type(e).__name__)}
         
-        is_need = self._is_need_refine(error_info)
-        # is_need = False
-        if not is_need or is_timeout:  # correct in one pass or refine success or timeout
+        if is_timeout or not self._is_need_refine(error_info):  # correct in one pass or refine success or timeout
             message['try_times'] = message.get('try_times', 0) + 1
             message['pred'] = old_sql
             message['send_to'] = SYSTEM_NAME
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+Out-of-process SQL execution sandbox for MAC-SQL's Refiner.
+
+The implementation is shared with workflow_v3 and lives in
+workflow_v3/src/sql_sandbox.py; this module re-exports it.
+"""
+
+import os
+import sys
+
+_WORKFLOW_V3_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "workflow_v3", "src")
+if _WORKFLOW_V3_SRC not in sys.path:
+    sys.path.append(_WORKFLOW_V3_SRC)
+
+from sql_sandbox import SandboxWorkerError, SQLSandbox  # noqa: E402
@@ -0,0 +1,22 @@
+"""
+Deadline-bounded SQLite execution for MAC-SQL's agents.
+
+The implementation is shared with workflow_v3 and the evaluation scripts and
+lives in workflow_v3/src/sqlite_exec.py; this module re-exports it.
+"""
+
+import os
+import sys
+
+_WORKFLOW_V3_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "workflow_v3", "src")
+if _WORKFLOW_V3_SRC not in sys.path:
+    sys.path.append(_WORKFLOW_V3_SRC)
+
+from sqlite_exec import (  # noqa: E402
+    SQLCancelledError,
+    SQLRunResult,
+    SQLTimeoutError,
+    connect,
+    execute_with_deadline,
+    run_sql,
+)
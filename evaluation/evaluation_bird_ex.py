@@ -4,8 +4,13 @@ import sys
 import json
 import argparse
 import sqlite3
+import time
 import multiprocessing as mp
-from func_timeout import func_timeout, FunctionTimedOut
+from results_store import EvalResultStore, split_cached
+
+# sqlite_exec is shared with workflow_v3
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "workflow_v3", "src"))
+from sqlite_exec import SQLTimeoutError, connect, execute_with_deadline
 
 def replace_multiple_spaces(text):
     # 定义正则表达式，匹配多个空字符
@@ -28,14 +33,17 @@ def result_callback(result):
     exec_result.append(result)
 
 
-def execute_sql(predicted_sql,ground_truth, db_path):
-    conn = sqlite3.connect(db_path)
+def execute_sql(predicted_sql,ground_truth, db_path, meta_time_out=None):
     # Connect to the database
-    cursor = conn.cursor()
-    cursor.execute(predicted_sql)
-    predicted_res = cursor.fetchall()
-    cursor.execute(ground_truth)
-    ground_truth_res = cursor.fetchall()
+    conn = connect(db_path, decode_errors=False)
+    try:
+        # both queries share one deadline, enforced inside sqlite
+        start_time = time.monotonic()
+        predicted_res = execute_with_deadline(conn, predicted_sql, meta_time_out).rows
+        remaining = None if meta_time_out is None else max(meta_time_out - (time.monotonic() - start_time), 0)
+        ground_truth_res = execute_with_deadline(conn, ground_truth, remaining).rows
+    finally:
+        conn.close()
     res = 0
     # todo: this should permute column order!
     if set(predicted_res) == set(ground_truth_res):
@@ -46,19 +54,23 @@ def execute_sql(predicted_sql,ground_truth, db_path):
 
 def execute_model(predicted_sql,ground_truth, db_place, idx, meta_time_out):
     try:
-        res = func_timeout(meta_time_out, execute_sql,
-                                  args=(predicted_sql, ground_truth, db_place))
+        res = execute_sql(predicted_sql, ground_truth, db_place, meta_time_out)
     except KeyboardInterrupt:
         sys.exit(0)
-    except FunctionTimedOut:
+    except SQLTimeoutError:
         result = [(f'timeout',)]
+        status = 'timeout'
         res = 0
     except Exception as e:
         result = [(f'error',)]  # possibly len(query) > 512 or not executable
+        status = 'error'
         res = 0
+    else:
+        status = 'ok'
     # print(result)
     # result = str(set([ret[0] for ret in result]))
-    result = {'sql_idx': idx, 'res': res}
+    # timeouts and errors may be transient (load, wrong db path) and are not stored
+    result = {'sql_idx': idx, 'res': res, 'status': status}
     # print(result)
     return result
 
@@ -86,12 +98,13 @@ def package_sqls(sql_path, db_root_path, mode='gpt', data_mode='dev'):
 
     return clean_sqls, db_path_list
 
-def run_sqls_parallel(sqls, db_places, num_cpus=1, meta_time_out=30.0):
+def run_sqls_parallel(sqls, db_places, num_cpus=1, meta_time_out=30.0, sql_idxs=None):
     pool = mp.Pool(processes=num_cpus)
     for i, sql_pair in enumerate(sqls):
 
         predicted_sql, ground_truth = sql_pair
-        pool.apply_async(execute_model, args=(predicted_sql, ground_truth, db_places[i], i, meta_time_out), callback=result_callback)
+        sql_idx = i if sql_idxs is None else sql_idxs[i]
+        pool.apply_async(execute_model, args=(predicted_sql, ground_truth, db_places[i], sql_idx, meta_time_out), callback=result_callback)
     pool.close()
     pool.join()
 
@@ -155,6 +168,7 @@ if __name__ == '__main__':
     args_parser.add_argument('--db_root_path', type=str, required=True)
     args_parser.add_argument('--num_cpus', type=int, default=1)
     args_parser.add_argument('--meta_time_out', type=float, default=30.0)
+    args_parser.add_argument('--results_store', type=str, default='', help='sqlite file of stored per-pair results; only new or changed pairs are executed')
     args_parser.add_argument('--mode_predict', type=str, default='gpt')
     args_parser.add_argument('--difficulty',type=str, default='simple')
     args_parser.add_argument('--diff_json_path',type=str,default='./data/bird/dev.json')
@@ -171,8 +185,18 @@ if __name__ == '__main__':
 
     assert len(pred_queries) == len(gt_queries), "len(pred_queries) != len(gt_queries)"
     query_pairs = list(zip(pred_queries, gt_queries))
-    run_sqls_parallel(query_pairs, db_places=db_paths, num_cpus=args.num_cpus, meta_time_out=args.meta_time_out)
+    # only execute pairs without a stored result
+    store = EvalResultStore(args.results_store, f'bird_ex-v1-timeout{args.meta_time_out}') if args.results_store else None
+    keys = [store.key(p, gt, pred) for (pred, gt), p in zip(query_pairs, db_paths)] if store else [None] * len(query_pairs)
+    cached, pending = split_cached(store, keys)
+    exec_result.extend({'sql_idx': i, 'res': r['res']} for i, r in cached.items())
+    run_sqls_parallel([query_pairs[i] for i in pending], db_places=[db_paths[i] for i in pending], num_cpus=args.num_cpus,
+                      meta_time_out=args.meta_time_out, sql_idxs=pending)
     exec_result = sort_results(exec_result)
+    if store:
+        store.put_many((keys[r['sql_idx']], {'res': r['res']}) for r in exec_result
+                        if r['sql_idx'] not in cached and r['status'] == 'ok')
+        store.close()
 
     # save ex results
     out_dir = os.path.dirname(args.predicted_sql_json_path)
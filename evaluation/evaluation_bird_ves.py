@@ -6,7 +6,11 @@ import numpy as np
 import argparse
 import sqlite3
 import multiprocessing as mp
-from func_timeout import func_timeout, FunctionTimedOut
+from results_store import EvalResultStore, split_cached
+
+# sqlite_exec is shared with workflow_v3
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "workflow_v3", "src"))
+from sqlite_exec import SQLTimeoutError, connect, execute_with_deadline, run_sql
 import time
 import math
 
@@ -26,30 +30,29 @@ def clean_abnormal(input):
     return processed_list
 
 
-def execute_sql(sql, db_path):
-    # Connect to the database
-    conn = sqlite3.connect(db_path)
-    # Create a cursor object
-    cursor = conn.cursor()
-    start_time = time.time()
-    cursor.execute(sql)
-    exec_time = time.time() - start_time
-    return exec_time
+def _remaining(deadline):
+    return None if deadline is None else max(deadline - time.monotonic(), 0)
+
 
+def execute_sql(sql, db_path, deadline=None):
+    # Connect to the database, execute without fetching (as timed by BIRD)
+    run = run_sql(db_path, sql, _remaining(deadline), max_rows=0, decode_errors=False)
+    return run.elapsed
 
-def iterated_execute_sql(predicted_sql, ground_truth, db_path, iterate_num):
-    conn = sqlite3.connect(db_path)
+
+def iterated_execute_sql(predicted_sql, ground_truth, db_path, iterate_num, deadline=None):
+    conn = connect(db_path, decode_errors=False)
     diff_list = []
-    cursor = conn.cursor()
-    cursor.execute(predicted_sql)
-    predicted_res = cursor.fetchall()
-    cursor.execute(ground_truth)
-    ground_truth_res = cursor.fetchall()
+    try:
+        predicted_res = execute_with_deadline(conn, predicted_sql, _remaining(deadline)).rows
+        ground_truth_res = execute_with_deadline(conn, ground_truth, _remaining(deadline)).rows
+    finally:
+        conn.close()
     time_ratio = 0
     if set(predicted_res) == set(ground_truth_res):
         for i in range(iterate_num):
-            predicted_time = execute_sql(predicted_sql, db_path)
-            ground_truth_time = execute_sql(ground_truth, db_path)
+            predicted_time = execute_sql(predicted_sql, db_path, deadline)
+            ground_truth_time = execute_sql(ground_truth, db_path, deadline)
             diff_list.append(ground_truth_time / predicted_time)
         processed_diff_list = clean_abnormal(diff_list)
         time_ratio = sum(processed_diff_list) / len(processed_diff_list)
@@ -63,18 +66,23 @@ def execute_model(predicted_sql, ground_truth, db_place, idx, iterate_num, meta_
         # while it needs more your patience....
         if idx % 500 == 0:
             print(idx, file=sys.stdout, flush=True)
-        time_ratio = func_timeout(meta_time_out * iterate_num, iterated_execute_sql,
-                                  args=(predicted_sql, ground_truth, db_place, iterate_num))
+        deadline = time.monotonic() + meta_time_out * iterate_num
+        time_ratio = iterated_execute_sql(predicted_sql, ground_truth, db_place, iterate_num, deadline)
         # print([idx, math.sqrt(time_ratio)])
     except KeyboardInterrupt:
         sys.exit(0)
-    except FunctionTimedOut:
+    except SQLTimeoutError:
         result = [(f'timeout',)]
+        status = 'timeout'
         time_ratio = 0
     except Exception as e:
         result = [(f'error',)]  # possibly len(query) > 512 or not executable
+        status = 'error'
         time_ratio = 0
-    result = {'sql_idx': idx, 'time_ratio': time_ratio}
+    else:
+        status = 'ok'
+    # timeouts and errors may be transient (load, wrong db path) and are not stored
+    result = {'sql_idx': idx, 'time_ratio': time_ratio, 'status': status}
     return result
 
 
@@ -102,11 +110,12 @@ def package_sqls(sql_path, db_root_path, mode='gpt', data_mode='dev'):
     return clean_sqls, db_path_list
 
 
-def run_sqls_parallel(sqls, db_places, num_cpus=1, iterate_num=100, meta_time_out=30.0):
+def run_sqls_parallel(sqls, db_places, num_cpus=1, iterate_num=100, meta_time_out=30.0, sql_idxs=None):
     pool = mp.Pool(processes=num_cpus)
     for i, sql_pair in enumerate(sqls):
         predicted_sql, ground_truth = sql_pair
-        pool.apply_async(execute_model, args=(predicted_sql, ground_truth, db_places[i], i, iterate_num, meta_time_out),
+        sql_idx = i if sql_idxs is None else sql_idxs[i]
+        pool.apply_async(execute_model, args=(predicted_sql, ground_truth, db_places[i], sql_idx, iterate_num, meta_time_out),
                          callback=result_callback)
     pool.close()
     pool.join()
@@ -173,6 +182,7 @@ if __name__ == '__main__':
     args_parser.add_argument('--db_root_path', type=str, required=True, default='')
     args_parser.add_argument('--num_cpus', type=int, default=1)
     args_parser.add_argument('--meta_time_out', type=float, default=30.0)
+    args_parser.add_argument('--results_store', type=str, default='', help='sqlite file of stored per-pair results; only new or changed pairs are executed')
     args_parser.add_argument('--mode_gt', type=str, default='gt')
     args_parser.add_argument('--mode_predict', type=str, default='gpt')
     args_parser.add_argument('--diff_json_path', type=str, required=True, default='')
@@ -189,8 +199,18 @@ if __name__ == '__main__':
 
     assert len(pred_queries) == len(gt_queries), "len(pred_queries) != len(gt_queries)"
     query_pairs = list(zip(pred_queries, gt_queries))
-    run_sqls_parallel(query_pairs, iterate_num=100, db_places=db_paths, num_cpus=args.num_cpus, meta_time_out=args.meta_time_out)
+    # only execute pairs without a stored result
+    store = EvalResultStore(args.results_store, f'bird_ves-v1-iterate100-timeout{args.meta_time_out}') if args.results_store else None
+    keys = [store.key(p, gt, pred) for (pred, gt), p in zip(query_pairs, db_paths)] if store else [None] * len(query_pairs)
+    cached, pending = split_cached(store, keys)
+    exec_result.extend({'sql_idx': i, 'time_ratio': r['time_ratio']} for i, r in cached.items())
+    run_sqls_parallel([query_pairs[i] for i in pending], iterate_num=100, db_places=[db_paths[i] for i in pending],
+                      num_cpus=args.num_cpus, meta_time_out=args.meta_time_out, sql_idxs=pending)
     exec_result = sort_results(exec_result)
+    if store:
+        store.put_many((keys[r['sql_idx']], {'time_ratio': r['time_ratio']}) for r in exec_result
+                        if r['sql_idx'] not in cached and r['status'] == 'ok')
+        store.close()
     print('start calculate')
     simple_ves, moderate_ves, challenging_ves, ves, count_lists = \
         compute_ves_by_diff(exec_result, args.diff_json_path)
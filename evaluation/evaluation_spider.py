@@ -23,9 +23,12 @@ import os
 import json
 import sqlite3
 import argparse
+import pickle
+import multiprocessing as mp
 
-from process_sql import get_schema, Schema, get_sql
+from process_sql import get_cached_schema, get_sql, ParsedSQLCache
 from exec_eval import eval_exec_match
+from results_store import EvalResultStore, split_cached
 
 # Flag to disable value evaluation
 DISABLE_VALUE = True
@@ -501,7 +504,89 @@ def print_scores(scores, etype, include_turn_acc=True):
             print_formated_s("exact match", exact_scores, '{:<20.3f}')
 
 
-def evaluate(gold, predict, db_dir, etype, kmaps, plug_value, keep_distinct, progress_bar_for_each_datapoint):
+def empty_sql():
+    # If p_sql is not valid, then we will use an empty sql to evaluate with the correct sql
+    return {
+        "except": None,
+        "from": {
+            "conds": [],
+            "table_units": []
+        },
+        "groupBy": [],
+        "having": [],
+        "intersect": None,
+        "limit": None,
+        "orderBy": [],
+        "select": [
+            False,
+            []
+        ],
+        "union": None,
+        "where": []
+    }
+
+
+def eval_example(task):
+    """
+    Evaluate a single (prediction, gold) turn.
+
+    Self-contained so it can run in a worker process; returns a score record
+    that evaluate() folds into the report in the original example order.
+    """
+    session_idx, turn_idx, p_str, g_str, g_sql_blob, db_name, db_dir, etype, kmap, \
+        plug_value, keep_distinct, progress_bar_for_each_datapoint = task
+    p_str = p_str.replace("value", "1")
+    db = os.path.join(db_dir, db_name, db_name + ".sqlite")
+    schema = get_cached_schema(db)
+    # gold parses come from the persistent cache when available
+    gold_parse = None
+    if g_sql_blob is not None:
+        g_sql = pickle.loads(g_sql_blob)
+    else:
+        g_sql = get_sql(schema, g_str)
+        gold_parse = pickle.dumps(g_sql)
+    evaluator = Evaluator()
+    hardness = evaluator.eval_hardness(g_sql)
+
+    try:
+        p_sql = get_sql(schema, p_str)
+    except:
+        p_sql = empty_sql()
+
+    record = {
+        'session': session_idx,
+        'turn': turn_idx,
+        'db_id': db_name,
+        'pred': p_str,
+        'gold': g_str,
+        'hardness': hardness,
+        'gold_parse': gold_parse,
+        'exec': None,
+        'exact': None,
+        'partial': None
+    }
+
+    if etype in ["all", "exec"]:
+        exec_score = eval_exec_match(db=db, p_str=p_str, g_str=g_str, plug_value=plug_value,
+                                     keep_distinct=keep_distinct, progress_bar_for_each_datapoint=progress_bar_for_each_datapoint)
+        record['exec'] = 1 if exec_score else 0
+
+    if etype in ["all", "match"]:
+        # rebuild sql for value evaluation
+        g_valid_col_units = build_valid_col_units(g_sql['from']['table_units'], schema)
+        g_sql = rebuild_sql_val(g_sql)
+        g_sql = rebuild_sql_col(g_valid_col_units, g_sql, kmap)
+        p_valid_col_units = build_valid_col_units(p_sql['from']['table_units'], schema)
+        p_sql = rebuild_sql_val(p_sql)
+        p_sql = rebuild_sql_col(p_valid_col_units, p_sql, kmap)
+        record['exact'] = evaluator.eval_exact_match(p_sql, g_sql)
+        record['partial'] = evaluator.partial_scores
+
+    return record
+
+
+def evaluate(gold, predict, db_dir, etype, kmaps, plug_value, keep_distinct, progress_bar_for_each_datapoint, num_workers=1,
+             gold_cache_path=None, results_store_path=None):
 
     with open(gold) as f:
         glist = []
@@ -539,7 +624,6 @@ def evaluate(gold, predict, db_dir, etype, kmaps, plug_value, keep_distinct, pro
 
     assert len(plist) == len(glist), "number of sessions must equal"
 
-    evaluator = Evaluator()
     turns = ['turn 1', 'turn 2', 'turn 3', 'turn 4', 'turn > 4']
     levels = ['easy', 'medium', 'hard', 'extra', 'all', 'joint_all']
 
@@ -558,7 +642,42 @@ def evaluate(gold, predict, db_dir, etype, kmaps, plug_value, keep_distinct, pro
         for type_ in partial_types:
             scores[level]['partial'][type_] = {'acc': 0., 'rec': 0., 'f1': 0.,'acc_count':0,'rec_count':0}
 
+    # every turn is scored independently (in a process pool if num_workers > 1),
+    # records come back in input order and are reduced below exactly as before
+    gold_cache = ParsedSQLCache(gold_cache_path)
+    tasks = []
+    gold_keys = []
+    for i, (p, g) in enumerate(zip(plist, glist)):
+        for idx, (pp, gg) in enumerate(zip(p, g)):
+            g_str, db_name = gg
+            kmap = kmaps[db_name] if etype in ["all", "match"] else None
+            schema = get_cached_schema(os.path.join(db_dir, db_name, db_name + ".sqlite"))
+            gold_key = ParsedSQLCache.key(schema, g_str)
+            gold_keys.append(gold_key)
+            tasks.append((i, idx, pp[0], g_str, gold_cache.get_blob(gold_key), db_name, db_dir, etype, kmap,
+                          plug_value, keep_distinct, progress_bar_for_each_datapoint))
+
+    # records of unchanged (gold, pred) pairs are served from the results store
+    store = None
+    if results_store_path:
+        version = 'spider-v2-{}-plug{}-distinct{}'.format(etype, int(plug_value), int(keep_distinct))
+        store = EvalResultStore(results_store_path, version)
+    store_keys = [store.key(os.path.join(db_dir, db_name, db_name + ".sqlite"), g_str, p_str)
+                  for (_, _, p_str, g_str, _, db_name, *_) in tasks] if store else [None] * len(tasks)
+    cached, pending = split_cached(store, store_keys)
+    pending_tasks = [tasks[k] for k in pending]
+
+    pool = None
+    if num_workers > 1:
+        pool = mp.Pool(processes=num_workers)
+        chunksize = max(1, len(pending_tasks) // (num_workers * 8))
+        new_records = pool.imap(eval_example, pending_tasks, chunksize=chunksize)
+    else:
+        new_records = map(eval_example, pending_tasks)
+    stored_records = []
+
     gold_pred_map_lst = []
+    task_idx = 0
     
     for i, (p, g) in enumerate(zip(plist, glist)):
         if (i + 1) % 10 == 0:
@@ -567,29 +686,26 @@ def evaluate(gold, predict, db_dir, etype, kmaps, plug_value, keep_distinct, pro
         turn_scores = {"exec": [], "exact": []}
         
         print(f"len(p): {len(p)}; len(g): {len(g)}")
-        for idx, pg in enumerate(zip(p, g)):
+        for idx in range(min(len(p), len(g))):
+            if task_idx in cached:
+                record = cached[task_idx]
+            else:
+                record = next(new_records)
+                if record['gold_parse'] is not None:
+                    gold_cache.put_blob(gold_keys[task_idx], record['gold_parse'])
+                    record['gold_parse'] = None
+                if store:
+                    stored_records.append((store_keys[task_idx], record))
+            task_idx += 1
             gold_pred_map = {
                 'idx': idx,
-                'db_id': '',
+                'db_id': record['db_id'],
                 'question': '',
-                'gold': '',
-                'pred': '',
+                'gold': record['gold'],
+                'pred': record['pred'],
                 'exec_result': 0
             }
-            p, g = pg
-            p_str = p[0]
-            p_str = p_str.replace("value", "1")
-            g_str, db = g
-
-            gold_pred_map['pred'] = p_str
-            gold_pred_map['gold'] = g_str
-            gold_pred_map['db_id'] = db
-
-            db_name = db
-            db = os.path.join(db_dir, db, db + ".sqlite")
-            schema = Schema(get_schema(db))
-            g_sql = get_sql(schema, g_str)
-            hardness = evaluator.eval_hardness(g_sql)
+            p_str, g_str, hardness = record['pred'], record['gold'], record['hardness']
             if idx > 3:
                 idx = "> 4"
             else:
@@ -599,33 +715,8 @@ def evaluate(gold, predict, db_dir, etype, kmaps, plug_value, keep_distinct, pro
             scores[hardness]['count'] += 1
             scores['all']['count'] += 1
 
-            try:
-                p_sql = get_sql(schema, p_str)
-            except:
-                # If p_sql is not valid, then we will use an empty sql to evaluate with the correct sql
-                p_sql = {
-                "except": None,
-                "from": {
-                    "conds": [],
-                    "table_units": []
-                },
-                "groupBy": [],
-                "having": [],
-                "intersect": None,
-                "limit": None,
-                "orderBy": [],
-                "select": [
-                    False,
-                    []
-                ],
-                "union": None,
-                "where": []
-                }
-
             if etype in ["all", "exec"]:
-                exec_score = eval_exec_match(db=db, p_str=p_str, g_str=g_str, plug_value=plug_value,
-                                             keep_distinct=keep_distinct, progress_bar_for_each_datapoint=progress_bar_for_each_datapoint)
-                if exec_score:
+                if record['exec']:
                     scores[hardness]['exec'] += 1
                     scores[turn_id]['exec'] += 1
                     scores['all']['exec'] += 1
@@ -637,16 +728,8 @@ def evaluate(gold, predict, db_dir, etype, kmaps, plug_value, keep_distinct, pro
                 gold_pred_map_lst.append(gold_pred_map)
             
             if etype in ["all", "match"]:
-                # rebuild sql for value evaluation
-                kmap = kmaps[db_name]
-                g_valid_col_units = build_valid_col_units(g_sql['from']['table_units'], schema)
-                g_sql = rebuild_sql_val(g_sql)
-                g_sql = rebuild_sql_col(g_valid_col_units, g_sql, kmap)
-                p_valid_col_units = build_valid_col_units(p_sql['from']['table_units'], schema)
-                p_sql = rebuild_sql_val(p_sql)
-                p_sql = rebuild_sql_col(p_valid_col_units, p_sql, kmap)
-                exact_score = evaluator.eval_exact_match(p_sql, g_sql)
-                partial_scores = evaluator.partial_scores
+                exact_score = record['exact']
+                partial_scores = record['partial']
                 if exact_score == 0:
                     turn_scores['exact'].append(0)
                     print("{} pred: {}".format(hardness, p_str))
@@ -687,6 +770,14 @@ def evaluate(gold, predict, db_dir, etype, kmaps, plug_value, keep_distinct, pro
         if all(v == 1 for v in turn_scores["exact"]):
             scores['joint_all']['exact'] += 1
 
+    if pool is not None:
+        pool.close()
+        pool.join()
+    gold_cache.save()
+    if store:
+        store.put_many(stored_records)
+        store.close()
+
     # export evaluation result
     out_dir = os.path.dirname(predict)
     out_evaluation_json_path = os.path.join(out_dir, "evaluation.json")
@@ -962,6 +1053,14 @@ if __name__ == "__main__":
                         help='whether to keep distinct keyword during evaluation. default is false.')
     parser.add_argument('--progress_bar_for_each_datapoint', default=False, action='store_true',
                         help='whether to print progress bar of running test inputs for each datapoint')
+    parser.add_argument('--num_workers', type=int, default=1,
+                        help='number of processes to evaluate examples in parallel')
+    parser.add_argument('--gold_cache', type=str, default=None,
+                        help='pickle file caching parsed gold SQL across runs; defaults to <gold>.parsed.pkl')
+    parser.add_argument('--no_gold_cache', default=False, action='store_true',
+                        help='do not read or write the parsed gold SQL cache')
+    parser.add_argument('--results_store', type=str, default=None,
+                        help='sqlite file of stored per-example results; only new or changed pairs are evaluated')
     args = parser.parse_args()
 
     # only evaluting exact match needs this argument
@@ -970,4 +1069,9 @@ if __name__ == "__main__":
         assert args.table is not None, 'table argument must be non-None if exact set match is evaluated'
         kmaps = build_foreign_key_map_from_json(args.table)
 
-    evaluate(args.gold, args.pred, args.db, args.etype, kmaps, args.plug_value, args.keep_distinct, args.progress_bar_for_each_datapoint)
+    gold_cache_path = None
+    if not args.no_gold_cache:
+        gold_cache_path = args.gold_cache or args.gold + '.parsed.pkl'
+
+    evaluate(args.gold, args.pred, args.db, args.etype, kmaps, args.plug_value, args.keep_distinct, args.progress_bar_for_each_datapoint,
+             num_workers=args.num_workers, gold_cache_path=gold_cache_path, results_store_path=args.results_store)
@@ -8,7 +8,7 @@ from itertools import product
 from collections import defaultdict
 import tqdm
 import random
-from parse import get_all_preds_for_execution, remove_distinct
+from parse import get_ranked_preds_for_execution, remove_distinct
 import time
 import pickle as pkl
 import subprocess
@@ -204,13 +204,15 @@ def eval_exec_match(db: str, p_str: str, g_str: str, plug_value: bool, keep_dist
     # if plug in value (i.e. we do not consider value prediction correctness)
     # enumerate all ways to plug in values in the gold query to the model predictions
     # otherwise, we only evaluate the predicted query with its own value prediction
+    max_try = 50
     if plug_value:
-        _, preds = get_all_preds_for_execution(g_str, p_str)
+        # candidates are generated lazily, deduplicated, ranked by comparison
+        # column and capped, so the combinatorics are never paid in full
+        _, preds = get_ranked_preds_for_execution(g_str, p_str, budget=max_try - 1)
         # we did not add this line in our EMNLP work
         # this reduces "false negatives" when value is substituted
         preds = chain([p_str], preds)
 
-    max_try = 50
     count = 0
     for pred in preds:
         count += 1
@@ -3,12 +3,14 @@ import sqlparse
 from typing import List, Tuple, Set, Iterator, Dict, Any, Union
 from sqlparse.sql import Comparison, Identifier
 from sqlparse.tokens import Whitespace
+import heapq
 import itertools
 from collections import namedtuple
 
 Token = namedtuple('Token', ['ttype', 'value'])
 VALUE_NUM_SYMBOL = 'VALUERARE'
 QUOTE_CHARS = {'`', '\'', '"'}
+COMPARISON_OPS = {'=', '!=', '<>', '>', '<', '>=', '<=', 'like', 'between', 'in'}
 
 
 def tokenize(query: str) -> List[Token]:
@@ -136,6 +138,97 @@ def get_all_preds_for_execution(gold: str, pred: str) -> Tuple[int, Iterator[str
     return num_alternatives, plugin_all_permutations(pred_query_value_replaced, gold_values)
 
 
+def value_type(v: str) -> str:
+    if len(v) > 0 and v[0] in QUOTE_CHARS:
+        return 'str'
+    try:
+        float(v)
+        return 'num'
+    except ValueError:
+        return 'other'
+
+
+# the column each value slot of a query template is compared with (None if unknown)
+def slot_columns(query_value_replaced: List[str]) -> List[Union[str, None]]:
+    slot = VALUE_NUM_SYMBOL.lower()
+    columns = []
+    for k, tok in enumerate(query_value_replaced):
+        if tok != slot:
+            continue
+        j = k - 1
+        # second value of "col between VALUE and VALUE"
+        if j >= 2 and query_value_replaced[j] == 'and' and query_value_replaced[j - 1] == slot \
+                and query_value_replaced[j - 2] == 'between':
+            j -= 2
+        col = None
+        if j >= 1 and query_value_replaced[j] in COMPARISON_OPS:
+            col = query_value_replaced[j - 1].upper()
+        columns.append(col)
+    return columns
+
+
+# candidate gold values for each slot, most likely first:
+# values the gold compares with the same column, then the rest.
+# values whose type differs from the gold values of that column are pruned
+def rank_slot_values(query_value_replaced: List[str], gold_values: Set[str],
+                     gold_typed_values: List[Tuple[Tuple[Union[str, None], str], str]]) -> List[List[str]]:
+    col2vals = {}
+    for (_, col), val in gold_typed_values:
+        col2vals.setdefault(col, []).append(val)
+    ordered_values = sorted(gold_values)
+
+    ranked = []
+    for col in slot_columns(query_value_replaced):
+        same_col = col2vals.get(col, [])
+        first = [v for v in ordered_values if process_str_value(v) in same_col]
+        rest = [v for v in ordered_values if v not in first]
+        if first:
+            types = {value_type(v) for v in first}
+            rest = [v for v in rest if value_type(v) in types]
+        ranked.append(first + rest)
+    return ranked
+
+
+# a lazy generator of distinct ways to fill gold values into the predicted query,
+# in order of increasing total rank of the plugged values, and at most budget of them
+def plugin_ranked_candidates(query_value_replaced: List[str], ranked_values: List[List[str]],
+                             budget: int) -> Iterator[str]:
+    if any(len(values) == 0 for values in ranked_values):
+        return
+    start = tuple(0 for _ in ranked_values)
+    heap = [(0, start)]
+    visited = {start}
+    seen = set()
+    while heap and len(seen) < budget:
+        _, idxs = heapq.heappop(heap)
+        candidate = plugin(query_value_replaced, [values[i] for values, i in zip(ranked_values, idxs)])
+        if candidate not in seen:
+            seen.add(candidate)
+            yield candidate
+        for slot in range(len(idxs)):
+            if idxs[slot] + 1 < len(ranked_values[slot]):
+                nxt = idxs[:slot] + (idxs[slot] + 1,) + idxs[slot + 1:]
+                if nxt not in visited:
+                    visited.add(nxt)
+                    heapq.heappush(heap, (sum(nxt), nxt))
+
+
+# bounded, deduplicated and ordered alternative to get_all_preds_for_execution:
+# return 1) number of possible ways to plug in gold values and 2) an iterator over at most budget of them
+def get_ranked_preds_for_execution(gold: str, pred: str, budget: int = 50) -> Tuple[int, Iterator[str]]:
+    _, gold_values = extract_query_values(gold)
+    pred_query_value_replaced, _ = extract_query_values(pred)
+    try:
+        gold_typed_values = extract_typed_value_in_comparison_from_query(gold)
+    except Exception:
+        gold_typed_values = []
+    ranked_values = rank_slot_values(pred_query_value_replaced, gold_values, gold_typed_values)
+    num_alternatives = 1
+    for values in ranked_values:
+        num_alternatives *= len(values)
+    return num_alternatives, plugin_ranked_candidates(pred_query_value_replaced, ranked_values, budget)
+
+
 def remove_distinct(s):
     toks = [t.value for t in list(sqlparse.parse(s)[0].flatten())]
     return ''.join([t for t in toks if t.lower() != 'distinct'])
@@ -24,7 +24,10 @@
 # }
 ################################
 
+import os
 import json
+import pickle
+import hashlib
 import sqlite3
 from nltk import word_tokenize
 
@@ -61,6 +64,14 @@ class Schema:
     def idMap(self):
         return self._idMap
 
+    @property
+    def fingerprint(self):
+        """Stable hash of the table/column names, used to key parse caches"""
+        if not hasattr(self, '_fingerprint'):
+            payload = json.dumps(self._schema, sort_keys=True).encode('utf-8')
+            self._fingerprint = hashlib.sha1(payload).hexdigest()
+        return self._fingerprint
+
     def _map(self, schema):
         idMap = {'*': "__all__"}
         id = 1
@@ -97,6 +108,24 @@ def get_schema(db):
         cursor.execute("PRAGMA table_info({})".format(table))
         schema[table] = [str(col[1].lower()) for col in cursor.fetchall()]
 
+    conn.close()
+    return schema
+
+
+# db path -> Schema, filled on first use in each process
+_schema_cache = {}
+
+
+def get_cached_schema(db):
+    """
+    Get the Schema of a database, introspecting it only once per process
+    :param db: database path
+    :return: Schema
+    """
+    key = os.path.abspath(db)
+    schema = _schema_cache.get(key)
+    if schema is None:
+        schema = _schema_cache[key] = Schema(get_schema(db))
     return schema
 
 
@@ -559,6 +588,59 @@ def get_sql(schema, query):
     return sql
 
 
+class ParsedSQLCache:
+    """
+    Persistent cache of get_sql() results, keyed by a hash of the schema and
+    the SQL string. Entries are stored pickled, so every lookup returns a
+    fresh structure that callers may rebuild in place.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    self._entries = pickle.load(f)
+            except Exception as e:
+                print("Ignoring unreadable parse cache {}: {}".format(path, e))
+
+    @staticmethod
+    def key(schema, query):
+        return hashlib.sha1((schema.fingerprint + '\t' + query).encode('utf-8')).hexdigest()
+
+    def get_blob(self, key):
+        return self._entries.get(key)
+
+    def put_blob(self, key, blob):
+        self._entries[key] = blob
+        self._dirty = True
+
+    def get_sql(self, schema, query):
+        key = self.key(schema, query)
+        blob = self._entries.get(key)
+        if blob is None:
+            sql = get_sql(schema, query)
+            self.put_blob(key, pickle.dumps(sql))
+            return sql
+        return pickle.loads(blob)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            print("Could not save parse cache {}: {}".format(self.path, e))
+
+
 def skip_semicolon(toks, start_idx):
     idx = start_idx
     while idx < len(toks) and toks[idx] == ";":
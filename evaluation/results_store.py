@@ -0,0 +1,94 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+
+
+def normalize_sql(sql):
+    # collapse whitespace and drop trailing semicolons, so reformatting alone
+    # does not invalidate a stored result
+    sql = re.sub(r'\s+', ' ', str(sql)).strip()
+    return sql.rstrip(';').strip()
+
+
+class EvalResultStore:
+    """
+    Per-example evaluation results, persisted in a small sqlite file.
+
+    Results are keyed by (database file, normalized gold SQL, normalized
+    predicted SQL, evaluator version), so re-running an evaluation only
+    executes pairs that are new or changed; everything else is served from
+    the store. The database is identified by its resolved path and the name,
+    size and modification time of every .sqlite file in its directory, as
+    Spider's test-suite evaluation runs the queries on all of them; pointing
+    at other or rebuilt databases misses the store. The evaluator version must change whenever the scoring logic or
+    any option that affects a result (timeouts, plug_value, ...) changes.
+    Callers only store results that did not time out or fail to execute, so
+    those pairs are evaluated again on the next run.
+    """
+    def __init__(self, path, evaluator_version):
+        self.path = path
+        self.evaluator_version = evaluator_version
+        out_dir = os.path.dirname(path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL)')
+        self.conn.commit()
+        self._db_ids = {}
+
+    def db_id(self, db_path):
+        # resolved path of the database and name, size and mtime of every .sqlite
+        # file in its directory, computed once per path
+        if db_path not in self._db_ids:
+            real_path = os.path.realpath(db_path)
+            db_dir = os.path.dirname(real_path)
+            parts = [real_path]
+            try:
+                for name in sorted(n for n in os.listdir(db_dir) if n.endswith('.sqlite')):
+                    stat = os.stat(os.path.join(db_dir, name))
+                    parts.append('{}:{}:{}'.format(name, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                parts.append('missing')
+            self._db_ids[db_path] = '|'.join(parts)
+        return self._db_ids[db_path]
+
+    def key(self, db_path, gold_sql, pred_sql):
+        payload = '\t'.join([self.evaluator_version, self.db_id(db_path), normalize_sql(gold_sql), normalize_sql(pred_sql)])
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(
+                'SELECT key, result FROM results WHERE key IN ({})'.format(','.join('?' * len(chunk))), chunk)
+            for key, result in rows:
+                found[key] = json.loads(result)
+        return found
+
+    def put_many(self, items):
+        self.conn.executemany('INSERT OR REPLACE INTO results (key, result) VALUES (?, ?)',
+                              [(key, json.dumps(result)) for key, result in items])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def split_cached(store, keys):
+    """
+    Split examples into those with a stored result and those to evaluate
+    :param store: EvalResultStore or None
+    :param keys: store key of every example, in order
+    :return: ({example index: stored result}, [example indices to evaluate])
+    """
+    if store is None:
+        return {}, list(range(len(keys)))
+    found = store.get_many(keys)
+    cached = {i: found[k] for i, k in enumerate(keys) if k in found}
+    pending = [i for i in range(len(keys)) if i not in cached]
+    print(f"reuse {len(cached)} stored results, evaluate {len(pending)} new or changed pairs")
+    return cached, pending
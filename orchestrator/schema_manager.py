@@ -2,13 +2,19 @@
 """Schema manager for text-to-SQL tasks."""
 
 import os
+import sys
 import sqlite3
-from typing import Dict, List, Any, Tuple
+import threading
+from typing import Dict, List, Any, Optional, Tuple
 
 from utils import (
     load_json_file, is_email, is_valid_date_column
 )
 
+# DBInfoCache is shared with workflow_v3
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "workflow_v3", "src"))
+from db_info_cache import DBInfoCache
+
 
 class SchemaManager:
     """
@@ -22,7 +28,8 @@ class SchemaManager:
                  data_path: str, 
                  tables_json_path: str, 
                  dataset_name: str,
-                 lazy: bool = False):
+                 lazy: bool = False,
+                 max_cached_dbs: Optional[int] = None):
         """Initialize the schema manager.
         
         Args:
@@ -30,13 +37,16 @@ class SchemaManager:
             tables_json_path: Path to the tables.json file
             dataset_name: Name of the dataset (e.g., 'bird', 'spider')
             lazy: Whether to load database info lazily
+            max_cached_dbs: Maximum number of databases whose info is kept in
+                memory, least recently used are evicted (None: no limit)
         """
         self.data_path = data_path
         self.tables_json_path = tables_json_path
         self.dataset_name = dataset_name
         
         # Database information storage
-        self.db2infos = {}  # Summary of database info
+        self.db2infos = DBInfoCache(max_cached_dbs)  # Summary of database info
+        self._load_locks: Dict[str, threading.Lock] = {}  # db_id -> lock of its first load
         self.db2dbjsons = {}  # Store all db to tables.json dict
         
         # Initialize the database JSON information
@@ -209,6 +219,17 @@ class SchemaManager:
         val_str = str(vals)
         return val_str
     
+    def get_db_info(self, db_id: str) -> dict:
+        """Get the info of a database, loading it on first use."""
+        db_info = self.db2infos.get(db_id)
+        if db_info is None:
+            with self._load_locks.setdefault(db_id, threading.Lock()):
+                db_info = self.db2infos.get(db_id)
+                if db_info is None:
+                    db_info = self._load_single_db_info(db_id)
+                    self.db2infos[db_id] = db_info
+        return db_info
+    
     def _load_single_db_info(self, db_id: str) -> dict:
         """Load information for a single database."""
         table2coldescription = {}  # {table_name: [(column_name, full_column_name, column_description), ...]}
@@ -401,10 +422,7 @@ class SchemaManager:
     
     def generate_schema_description(self, db_id: str, selected_schema: dict, use_gold_schema: bool = False) -> Tuple[str, List[str], Dict]:
         """Generate database description in XML format based on the selected schema."""
-        if self.db2infos.get(db_id, {}) == {}:  # lazy load
-            self.db2infos[db_id] = self._load_single_db_info(db_id)
-            
-        db_info = self.db2infos[db_id]
+        db_info = self.get_db_info(db_id)  # lazy load
         desc_info = db_info['desc_dict']    # table -> columns[(column_name, full_column_name, extra_column_desc)]
         value_info = db_info['value_dict']  # table -> columns[(column_name, value_examples_str)]
         pk_info = db_info['pk_dict']        # table -> primary keys[column_name]
@@ -501,3 +519,29 @@ class SchemaManager:
         
         return schema_xml, db_fk_infos, chosen_db_schem_dict
     
+
+
+# Process-wide schema managers, one per dataset
+_registry: Dict[Tuple[str, str, str], SchemaManager] = {}
+_registry_lock = threading.Lock()
+
+
+def get_schema_manager(data_path: str,
+                       tables_json_path: str,
+                       dataset_name: str,
+                       max_cached_dbs: Optional[int] = 32) -> SchemaManager:
+    """
+    Get the process-wide SchemaManager of a dataset.
+    
+    Created on the first call (reading only tables.json) and shared afterwards;
+    database infos are loaded on first use and at most max_cached_dbs of them
+    are kept in memory.
+    """
+    key = (os.path.abspath(data_path), os.path.abspath(tables_json_path), dataset_name)
+    with _registry_lock:
+        manager = _registry.get(key)
+        if manager is None:
+            manager = SchemaManager(data_path, tables_json_path, dataset_name,
+                                    lazy=True, max_cached_dbs=max_cached_dbs)
+            _registry[key] = manager
+        return manager
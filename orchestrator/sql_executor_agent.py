@@ -6,10 +6,11 @@ SQL Executor Agent - An AI agent that executes and analyzes SQL queries using SQ
 import asyncio
 import json
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 
 from autogen_agentchat.agents import AssistantAgent
+from autogen_core import CancellationToken
 from autogen_agentchat.ui import Console
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 
@@ -27,10 +28,11 @@ class SQLExecutorAgent:
     def _create_agent(self) -> AssistantAgent:
         """Create the SQL execution agent with tools."""
         
-        # Define SQL execution and analysis tools
-        async def execute_query(sql: str, db_id: str) -> str:
+        # Define SQL execution and analysis tools. Queries run in the executor's
+        # thread pool so a slow one does not stall the event loop
+        async def execute_query(sql: str, db_id: str, cancellation_token: Optional[CancellationToken] = None) -> str:
             """Execute a SQL query against a database."""
-            result = self.sql_executor.safe_execute(sql, db_id)
+            result = await self.sql_executor.safe_execute_async(sql, db_id, cancellation_token)
             
             if result['success']:
                 # Format successful result
@@ -55,9 +57,9 @@ class SQLExecutorAgent:
             
             return json.dumps(response, indent=2)
         
-        async def validate_query_result(sql: str, db_id: str) -> str:
+        async def validate_query_result(sql: str, db_id: str, cancellation_token: Optional[CancellationToken] = None) -> str:
             """Execute a query and validate its results."""
-            result = self.sql_executor.safe_execute(sql, db_id)
+            result = await self.sql_executor.safe_execute_async(sql, db_id, cancellation_token)
             
             response = {
                 "sql": result['sql'],
@@ -80,7 +82,7 @@ class SQLExecutorAgent:
             
             return json.dumps(response, indent=2)
         
-        async def analyze_table_statistics(table_name: str, db_id: str) -> str:
+        async def analyze_table_statistics(table_name: str, db_id: str, cancellation_token: Optional[CancellationToken] = None) -> str:
             """Analyze statistics for a specific table."""
             queries = {
                 "row_count": f"SELECT COUNT(*) as count FROM {table_name}",
@@ -90,12 +92,12 @@ class SQLExecutorAgent:
             stats = {"table": table_name}
             
             # Get row count
-            count_result = self.sql_executor.safe_execute(queries["row_count"], db_id)
+            count_result = await self.sql_executor.safe_execute_async(queries["row_count"], db_id, cancellation_token)
             if count_result['success']:
                 stats["total_rows"] = count_result['data'][0][0]
             
             # Get column information
-            col_result = self.sql_executor.safe_execute(queries["null_analysis"], db_id)
+            col_result = await self.sql_executor.safe_execute_async(queries["null_analysis"], db_id, cancellation_token)
             if col_result['success']:
                 columns = col_result['column_names']
                 stats["column_count"] = len(columns)
@@ -105,7 +107,7 @@ class SQLExecutorAgent:
                 null_counts = {}
                 for col in columns[:5]:  # Limit to first 5 columns for performance
                     null_query = f"SELECT COUNT(*) FROM {table_name} WHERE {col} IS NULL"
-                    null_result = self.sql_executor.safe_execute(null_query, db_id)
+                    null_result = await self.sql_executor.safe_execute_async(null_query, db_id, cancellation_token)
                     if null_result['success']:
                         null_counts[col] = null_result['data'][0][0]
                 
@@ -113,12 +115,12 @@ class SQLExecutorAgent:
             
             return json.dumps(stats, indent=2)
         
-        async def compare_query_performance(queries: list, db_id: str) -> str:
+        async def compare_query_performance(queries: list, db_id: str, cancellation_token: Optional[CancellationToken] = None) -> str:
             """Compare performance of multiple queries."""
             results = []
             for sql in queries:
                 start_time = time.time()
-                result = self.sql_executor.safe_execute(sql, db_id)
+                result = await self.sql_executor.safe_execute_async(sql, db_id, cancellation_token)
                 execution_time = time.time() - start_time
                 
                 perf_info = {
@@ -139,11 +141,11 @@ class SQLExecutorAgent:
                 "slowest_query": results[-1]['query'] if results else None
             }, indent=2)
         
-        async def explain_query_plan(sql: str, db_id: str) -> str:
+        async def explain_query_plan(sql: str, db_id: str, cancellation_token: Optional[CancellationToken] = None) -> str:
             """Get the query execution plan for a SQL query."""
             # First try to get the query plan
             explain_sql = f"EXPLAIN QUERY PLAN {sql}"
-            result = self.sql_executor.safe_execute(explain_sql, db_id)
+            result = await self.sql_executor.safe_execute_async(explain_sql, db_id, cancellation_token)
             
             if result['success']:
                 plan_info = {
@@ -153,7 +155,7 @@ class SQLExecutorAgent:
                 }
             else:
                 # If EXPLAIN fails, just execute the query normally
-                normal_result = self.sql_executor.safe_execute(sql, db_id)
+                normal_result = await self.sql_executor.safe_execute_async(sql, db_id, cancellation_token)
                 if normal_result['success']:
                     plan_info = {
                         "sql": sql,
@@ -168,11 +170,11 @@ class SQLExecutorAgent:
             
             return json.dumps(plan_info, indent=2)
         
-        async def suggest_indexes(table_name: str, db_id: str) -> str:
+        async def suggest_indexes(table_name: str, db_id: str, cancellation_token: Optional[CancellationToken] = None) -> str:
             """Suggest potential indexes for a table based on its structure."""
             # Get table structure
             pragma_query = f"PRAGMA table_info({table_name})"
-            result = self.sql_executor.safe_execute(pragma_query, db_id)
+            result = await self.sql_executor.safe_execute_async(pragma_query, db_id, cancellation_token)
             
             suggestions = []
             if result['success']:
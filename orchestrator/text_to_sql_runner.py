@@ -37,7 +37,7 @@ from const import (
     SELECTOR_NAME, DECOMPOSER_NAME, REFINER_NAME,
     selector_template, decompose_template_bird, decompose_template_spider, refiner_template
 )
-from schema_manager import SchemaManager
+from schema_manager import get_schema_manager
 from sql_executor import SQLExecutor
 from text_to_sql_processor import TextToSQLProcessor
 
@@ -103,12 +103,11 @@ def setup_agents(dataset_name: str):
     data_path = DATASETS[dataset_name]["path"]
     tables_json_path = DATASETS[dataset_name]["tables_json"]
     
-    # Initialize schema manager and SQL executor
-    schema_manager = SchemaManager(
+    # Shared schema manager (loads databases on first use) and SQL executor
+    schema_manager = get_schema_manager(
         data_path=data_path,
         tables_json_path=tables_json_path,
-        dataset_name=dataset_name,
-        lazy=False
+        dataset_name=dataset_name
     )
     
     sql_executor = SQLExecutor(
@@ -122,8 +121,7 @@ def setup_agents(dataset_name: str):
         logger.info(f"[Tool] Loading schema for database: {db_id}")
         
         # Load database information using SchemaManager
-        if db_id not in schema_manager.db2infos:
-            schema_manager.db2infos[db_id] = schema_manager._load_single_db_info(db_id)
+        schema_manager.get_db_info(db_id)
         
         # Get database information
         db_info = schema_manager.db2dbjsons.get(db_id, {})
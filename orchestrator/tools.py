@@ -4,7 +4,7 @@ import sqlite3
 import traceback
 from typing import Dict, List, Any, Optional, Tuple, Union
 
-from .schema_manager import SchemaManager
+from .schema_manager import SchemaManager, get_schema_manager
 from .sql_executor import SQLExecutor
 
 # Configuration for database access
@@ -17,31 +17,36 @@ SPIDER_DATA_PATH = os.path.join(DATA_PATH, "spider")
 SPIDER_DB_DIRECTORY = os.path.join(SPIDER_DATA_PATH, "database")
 SPIDER_TABLES_JSON = os.path.join(SPIDER_DATA_PATH, "tables.json")
 
-# Initialize schema managers for different datasets
-bird_schema_manager = SchemaManager(
-    data_path=BIRD_DATA_PATH,
-    tables_json_path=BIRD_TABLES_JSON,
-    dataset_name="bird",
-    lazy=True
-)
 
-# Initialize Spider schema manager if it exists
-spider_schema_manager = None
-if os.path.exists(SPIDER_DATA_PATH) and os.path.exists(SPIDER_TABLES_JSON):
-    spider_schema_manager = SchemaManager(
-        data_path=SPIDER_DATA_PATH,
-        tables_json_path=SPIDER_TABLES_JSON,
-        dataset_name="spider",
-        lazy=True
-    )
+def get_dataset_schema_manager(dataset_name: str = "bird") -> Optional[SchemaManager]:
+    """
+    Get the process-wide schema manager of a dataset, created on first use.
+    
+    Returns None for Spider if the Spider data is not available.
+    """
+    if dataset_name.lower() == "spider":
+        if not (os.path.exists(SPIDER_DATA_PATH) and os.path.exists(SPIDER_TABLES_JSON)):
+            return None
+        return get_schema_manager(SPIDER_DATA_PATH, SPIDER_TABLES_JSON, "spider")
+    return get_schema_manager(BIRD_DATA_PATH, BIRD_TABLES_JSON, "bird")
+
+
+def __getattr__(name: str):
+    # The schema managers used to be created at import time; they are now
+    # created on first access and shared through the schema manager registry
+    if name in ("bird_schema_manager", "default_schema_manager"):
+        return get_dataset_schema_manager("bird")
+    if name == "spider_schema_manager":
+        return get_dataset_schema_manager("spider")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Initialize SQL executors
 # For Bird dataset, databases are in BIRD_DB_DIRECTORY, not directly in BIRD_DATA_PATH
 bird_sql_executor = SQLExecutor(BIRD_DB_DIRECTORY, "bird")
 spider_sql_executor = SQLExecutor(SPIDER_DB_DIRECTORY, "spider") if os.path.exists(SPIDER_DATA_PATH) else None
 
-# Default schema manager and executor (using Bird)
-default_schema_manager = bird_schema_manager
+# Default executor (using Bird)
 default_sql_executor = bird_sql_executor
 
 # Tool for QueryUnderstandingAgent
@@ -64,9 +69,7 @@ def read_database_schema_and_records(
         Dictionary with schema information
     """
     # Select the appropriate schema manager
-    schema_manager = default_schema_manager
-    if dataset_name.lower() == "spider" and spider_schema_manager:
-        schema_manager = spider_schema_manager
+    schema_manager = get_dataset_schema_manager(dataset_name) or get_dataset_schema_manager("bird")
 
     # Check if the database ID exists in the schema manager
     if db_id not in schema_manager.db2dbjsons:
@@ -97,16 +100,15 @@ def read_database_schema_and_records(
         column_types = {}
         
         # Load the database info if needed
-        if db_id not in schema_manager.db2infos:
-            schema_manager.db2infos[db_id] = schema_manager._load_single_db_info(db_id)
+        db_info = schema_manager.get_db_info(db_id)
         
         # Extract column descriptions and types
-        table_descriptions = schema_manager.db2infos[db_id]["desc_dict"].get(table, [])
+        table_descriptions = db_info["desc_dict"].get(table, [])
         for col_name, full_col_name, _ in table_descriptions:
             column_types[col_name] = full_col_name
         
         # Get foreign keys
-        table_fk_info = schema_manager.db2infos[db_id]["fk_dict"].get(table, [])
+        table_fk_info = db_info["fk_dict"].get(table, [])
         foreign_keys = [(from_col, to_table, to_col) for from_col, to_table, to_col in table_fk_info]
         
         # Build output for this table
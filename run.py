@@ -3,6 +3,7 @@ from core.utils import *
 from core.chat_manager import ChatManager
 from core.utils import get_gold_columns
 from core.const import SYSTEM_NAME
+from core.sql_sandbox import SQLSandbox
 from tqdm import tqdm
 import time
 import argparse
@@ -72,83 +73,91 @@ def init_bird_message(idx: int, item: dict, db_path: str=None, use_gold_schema:
     return user_message
 
 
-def run_batch(dataset_name, input_file, output_file, db_path, tables_json_path, start_pos=0, log_file=None, dataset_mode='dev', use_gold_schema=False, without_selector=False):
-    chat_manager = ChatManager(data_path=db_path,
-                               tables_json_path=tables_json_path,
-                               log_path=log_file,
-                               dataset_name=dataset_name,
-                               model_name='gpt-4',
-                               lazy=True,
-                               without_selector=without_selector)
-    # load dataset
-    batch = load_json_file(input_file)
-    # resume from last checkpoint
-    finished_ids = set()
-    if os.path.exists(output_file):
-        output_data_lst = load_jsonl_file(output_file)
-        for o in output_data_lst:
-            finished_ids.add(o['idx'])
-    unfinished_ids = [n for n in range(len(batch)) if n not in finished_ids and n >= start_pos]
-    print(f"len(unfinished_data) = {len(unfinished_ids)}")
-
-    # add question_id if needed
-    for k, item in enumerate(batch):
-        if 'question_id' not in item:
-            item['question_id'] = k
-
-    # skip some json data
-    excluded_db_ids = []
-    if dataset_mode == 'train':
-        exclude_txt = './data/bird_train/excluded_db_ids.txt'
-        excluded_db_ids = read_txt_file(exclude_txt)
-    new_batch = []
-    exclude_db_json_cnt = 0 # for exclude some dbs in bird train set
-    for k, item in enumerate(batch):
-        q_id = item['question_id']
-        if q_id not in unfinished_ids:
-            continue
+def run_batch(dataset_name, input_file, output_file, db_path, tables_json_path, start_pos=0, log_file=None, dataset_mode='dev', use_gold_schema=False, without_selector=False, sandbox_workers=0, schema_top_k=0):
+    # execute Refiner SQL in isolated worker processes if requested
+    sql_sandbox = SQLSandbox(num_workers=sandbox_workers) if sandbox_workers > 0 else None
+    try:
+        chat_manager = ChatManager(data_path=db_path,
+                                   tables_json_path=tables_json_path,
+                                   log_path=log_file,
+                                   dataset_name=dataset_name,
+                                   model_name='gpt-4',
+                                   lazy=True,
+                                   without_selector=without_selector,
+                                   sql_sandbox=sql_sandbox,
+                                   schema_top_k=schema_top_k)
+        # load dataset
+        batch = load_json_file(input_file)
+        # resume from last checkpoint
+        finished_ids = set()
+        if os.path.exists(output_file):
+            output_data_lst = load_jsonl_file(output_file)
+            for o in output_data_lst:
+                finished_ids.add(o['idx'])
+        unfinished_ids = [n for n in range(len(batch)) if n not in finished_ids and n >= start_pos]
+        print(f"len(unfinished_data) = {len(unfinished_ids)}")
+
+        # add question_id if needed
+        for k, item in enumerate(batch):
+            if 'question_id' not in item:
+                item['question_id'] = k
+
+        # skip some json data
+        excluded_db_ids = []
         if dataset_mode == 'train':
-            # skip excluded db_id
-            if item['db_id'] in excluded_db_ids:
-                exclude_db_json_cnt += 1
+            exclude_txt = './data/bird_train/excluded_db_ids.txt'
+            excluded_db_ids = read_txt_file(exclude_txt)
+        new_batch = []
+        exclude_db_json_cnt = 0 # for exclude some dbs in bird train set
+        for k, item in enumerate(batch):
+            q_id = item['question_id']
+            if q_id not in unfinished_ids:
                 continue
-        new_batch.append(item)
+            if dataset_mode == 'train':
+                # skip excluded db_id
+                if item['db_id'] in excluded_db_ids:
+                    exclude_db_json_cnt += 1
+                    continue
+            new_batch.append(item)
     
-    if exclude_db_json_cnt:
-        print(f"excluded {exclude_db_json_cnt} excluded db json data")
-    time.sleep(2)
-    batch = new_batch
-
-
-    # generate SQL one by one, and save result one by one
-    with open(output_file, 'a+', encoding='utf-8') as fp:
-        total_num = len(batch)
-        for cur_idx, item in tqdm(enumerate(batch), total=total_num):
-            idx = item['question_id']
-            db_id = item['db_id']
-            print(f"\n\nprocessing: {cur_idx}/{total_num}\n\n", flush=True)
-            if idx not in unfinished_ids: continue
-            if dataset_name == "spider":
-                user_message = init_spider_message(idx, item)  # imitate user send a question to system
-            elif dataset_name == "bird":
-                user_message = init_bird_message(idx, item, db_path=db_path, use_gold_schema=use_gold_schema)  # imitate user send a question to system
-            try:
-                chat_manager.start(user_message)
+        if exclude_db_json_cnt:
+            print(f"excluded {exclude_db_json_cnt} excluded db json data")
+        time.sleep(2)
+        batch = new_batch
+
+
+        # generate SQL one by one, and save result one by one
+        with open(output_file, 'a+', encoding='utf-8') as fp:
+            total_num = len(batch)
+            for cur_idx, item in tqdm(enumerate(batch), total=total_num):
+                idx = item['question_id']
+                db_id = item['db_id']
+                print(f"\n\nprocessing: {cur_idx}/{total_num}\n\n", flush=True)
+                if idx not in unfinished_ids: continue
+                if dataset_name == "spider":
+                    user_message = init_spider_message(idx, item)  # imitate user send a question to system
+                elif dataset_name == "bird":
+                    user_message = init_bird_message(idx, item, db_path=db_path, use_gold_schema=use_gold_schema)  # imitate user send a question to system
                 try:
-                    del user_message['desc_str']
-                    del user_message['fk_str']
-                    del user_message['send_to']
-                except:
-                    pass
-                print(json.dumps(user_message, ensure_ascii=False), file=fp, flush=True)
-            except Exception as e:
-                # for debug
-                traceback.print_exc()
-                print(f"Exception: {e}, sleep 20 seconds.", flush=True)
-                time.sleep(20)
-                # raise Exception(str(e))
-            print(f"\n\ndeal {cur_idx+1}/{total_num} done!\n\n")
-        print(f"Result dump into {output_file}", file=sys.stdout, flush=True)
+                    chat_manager.start(user_message)
+                    try:
+                        del user_message['desc_str']
+                        del user_message['fk_str']
+                        del user_message['send_to']
+                    except:
+                        pass
+                    print(json.dumps(user_message, ensure_ascii=False), file=fp, flush=True)
+                except Exception as e:
+                    # for debug
+                    traceback.print_exc()
+                    print(f"Exception: {e}, sleep 20 seconds.", flush=True)
+                    time.sleep(20)
+                    # raise Exception(str(e))
+                print(f"\n\ndeal {cur_idx+1}/{total_num} done!\n\n")
+            print(f"Result dump into {output_file}", file=sys.stdout, flush=True)
+    finally:
+        if sql_sandbox is not None:
+            sql_sandbox.close()
 
     # export evaluation results
     out_dir = os.path.dirname(output_file)
@@ -203,6 +212,8 @@ if __name__ == "__main__":
     parser.add_argument('--start_pos', type=int, default=0, help='start position of a batch')
     parser.add_argument('--use_gold_schema', action='store_true', default=False)
     parser.add_argument('--without_selector', action='store_true', default=False)
+    parser.add_argument('--sandbox_workers', type=int, default=0, help='run SQL in this many sandboxed worker processes (0: in-process)')
+    parser.add_argument('--schema_top_k', type=int, default=0, help='Selector only prunes the top-k tables of the BM25 schema index (0: all tables)')
     args = parser.parse_args()
     # 打印args中的键值对
     for key, value in vars(args).items():
@@ -225,5 +236,7 @@ if __name__ == "__main__":
         log_file=args.log_file,
         start_pos=args.start_pos,
         use_gold_schema=args.use_gold_schema,
-        without_selector=args.without_selector
+        without_selector=args.without_selector,
+        sandbox_workers=args.sandbox_workers,
+        schema_top_k=args.schema_top_k
     )
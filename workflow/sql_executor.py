@@ -1,16 +1,26 @@
 # -*- coding: utf-8 -*-
 """SQL execution utilities for text-to-SQL tasks."""
 
+import asyncio
+import functools
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Tuple
 from func_timeout import func_set_timeout, FunctionTimedOut
 
+from autogen_core import CancellationToken
+
+
+# Threads running SQL for async callers, so queries never block the event loop
+_sql_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="sql")
+
 
 class SQLExecutor:
     """
     A utility class for executing SQL queries against SQLite databases.
     
     This class handles SQL execution, error handling, and timeout management.
+    Async callers use safe_execute_async, which runs the query in a thread pool.
     """
     
     def __init__(self, data_path: str, dataset_name: str):
@@ -150,4 +160,25 @@ class SQLExecutor:
                 "success": False,
                 "is_valid_result": False,
                 "validation_message": f"Unexpected error: {str(e)}"
-            }
\ No newline at end of file
+            }
+    
+    async def safe_execute_async(self, sql: str, db_id: str,
+                                 cancellation_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        Safely execute SQL in a worker thread, without blocking the event loop.
+        
+        Args:
+            sql: The SQL query to execute
+            db_id: Database identifier
+            cancellation_token: Optional token; cancelling it stops waiting for the
+                query (which still ends at the 120 second timeout)
+            
+        Returns:
+            Execution result as from safe_execute
+        """
+        future = asyncio.get_running_loop().run_in_executor(
+            _sql_pool, functools.partial(self.safe_execute, sql, db_id)
+        )
+        if cancellation_token is not None:
+            cancellation_token.link_future(future)
+        return await future
@@ -6,7 +6,9 @@ These tools are used by the agents to interact with the database schema and exec
 """
 
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+from autogen_core import CancellationToken
 
 # Function to configure the agent tools based on schema_manager and sql_executor
 def configure_agent_tools(schema_manager, sql_executor):
@@ -91,21 +93,22 @@ def configure_agent_tools(schema_manager, sql_executor):
         })
 
     # Tool implementation for SQL execution
-    async def execute_sql(sql: str, db_id: str) -> str:
+    async def execute_sql(sql: str, db_id: str, cancellation_token: Optional[CancellationToken] = None) -> str:
         """
         Executes a SQL query on the specified database.
         
         Args:
             sql: The SQL query to execute
             db_id: The database identifier
+            cancellation_token: Passed by AutoGen; cancelling it stops waiting for the query
             
         Returns:
             JSON string with execution results
         """
         print(f"[Tool] Executing SQL on database {db_id}: {sql[:100]}...")
         
-        # Execute SQL with timeout protection
-        result = sql_executor.safe_execute(sql, db_id)
+        # Execute SQL with timeout protection, in a worker thread off the event loop
+        result = await sql_executor.safe_execute_async(sql, db_id, cancellation_token)
         
         # Add validation information
         is_valid, reason = sql_executor.is_valid_result(result)
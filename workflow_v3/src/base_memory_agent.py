@@ -11,10 +11,11 @@ from typing import Dict, Any, Optional
 from autogen_core import CancellationToken
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.base import TaskResult
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from autogen_core.models import ChatCompletionClient
 
 from keyvalue_memory import KeyValueMemory
 from memory_agent_tool import MemoryAgentTool
+from model_client_pool import get_model_client_pool
 
 
 class BaseMemoryAgent(ABC):
@@ -34,7 +35,8 @@ class BaseMemoryAgent(ABC):
         self, 
         memory: KeyValueMemory,
         llm_config: Optional[Dict[str, Any]] = None,
-        debug: bool = False
+        debug: bool = False,
+        model_client: Optional[ChatCompletionClient] = None
     ):
         """
         Initialize the memory-enabled agent.
@@ -49,10 +51,20 @@ class BaseMemoryAgent(ABC):
                 - top_p: Nucleus sampling parameter (optional)
                 - frequency_penalty: Frequency penalty (optional)
                 - presence_penalty: Presence penalty (optional)
+                - schema_token_budget: Token budget of the schema XML in
+                  prompts (optional, default: no limit)
+                - schema_top_tables: Only show the schema linker this many
+                  tables, best matches of the schema index first (optional)
+                - schema_embedding_model: sentence-transformers model adding
+                  vector matching to the schema index, run on the CPU
+                  (optional, default: BM25 only; see schema_index)
             debug: Whether to enable debug logging
+            model_client: Optional model client to use instead of the one from
+                the process-wide ModelClientPool (see _create_model_client)
         """
         self.memory = memory
         self.debug = debug
+        self.model_client = model_client
         
         # Default LLM configuration
         default_llm_config = {
@@ -79,7 +91,16 @@ class BaseMemoryAgent(ABC):
         self.logger.info(f"Initialized {self.agent_name} with model {self.llm_config['model_name']}")
     
     def _create_model_client(self):
-        """Create the OpenAI model client"""
+        """
+        Get the model client from the process-wide pool, unless one was given.
+        
+        Agents with the same name and llm_config share one client, which runs
+        on the pool's shared HTTP connections under its global request and
+        token limits and records this agent's token usage.
+        """
+        if self.model_client is not None:
+            return
+        
         # Build client config from llm_config
         client_config = {
             "model": self.llm_config["model_name"],
@@ -93,7 +114,7 @@ class BaseMemoryAgent(ABC):
             if param in self.llm_config:
                 client_config[param] = self.llm_config[param]
         
-        self.model_client = OpenAIChatCompletionClient(**client_config)
+        self.model_client = get_model_client_pool().get_client(self.agent_name, client_config)
     
     def _create_agent(self):
         """Create the AutoGen AssistantAgent"""
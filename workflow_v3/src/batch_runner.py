@@ -0,0 +1,418 @@
+"""
+Dataset batch runner for the text-to-SQL tree orchestrator.
+
+The workflow_v3 counterpart of run.py:run_batch. A BIRD or Spider dataset file
+is streamed item by item and every question is processed by its own
+orchestrator from TextToSQLTreeOrchestrator.for_task(), so tasks are isolated
+while the SchemaReader and the model clients are shared. A fixed pool of
+workers bounds the number of tasks in flight, and task starts can be rate
+limited as well. Model requests of all tasks go through the process-wide
+ModelClientPool, which bounds the requests in flight and the tokens used
+per minute.
+
+Each finished task is appended to a JSONL output file right away, together
+with its wall time, coordinator steps and token usage; a task that raised is
+written with an empty prediction and its error. Re-running with the same
+output file skips the questions that finished without error. At the end the
+BIRD (predict_<mode>.json) or Spider (pred_<mode>.sql) prediction file is
+written next to the output file, with one entry per dataset question (an
+empty SQL for questions without a result), so it lines up with the gold file.
+
+Usage:
+    python batch_runner.py --dataset_name bird --input_file data/bird/dev.json \\
+        --db_path data/bird --tables_json_path data/bird/dev_tables.json \\
+        --output_file outputs/bird/output.jsonl --max_concurrency 8
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from text_to_sql_tree_orchestrator import TextToSQLTreeOrchestrator
+from model_client_pool import MODEL_MAX_CONCURRENCY, get_model_client_pool
+from value_index import set_index_dir
+from utils import replace_multiple_spaces, eval_hardness
+
+
+logger = logging.getLogger("BatchRunner")
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Yield the items of a JSON array file one at a time, without loading the whole file.
+
+    Args:
+        path: Path to a file containing a JSON array
+        chunk_size: Number of characters read at a time
+
+    Yields:
+        The decoded array items, in order
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size).lstrip()
+        if not buf.startswith('['):
+            raise ValueError(f"{path} does not contain a JSON array")
+        buf = buf[1:]
+        eof = False
+        while True:
+            buf = buf.lstrip()
+            if buf.startswith(','):
+                buf = buf[1:].lstrip()
+            if buf.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                item, end = None, None
+            # An item that ends exactly at the end of the buffer may be cut off (e.g. a number)
+            if end is None or (end == len(buf) and not eof):
+                if eof:
+                    raise ValueError(f"{path} ends inside the JSON array")
+                more = f.read(chunk_size)
+                eof = not more
+                buf += more
+                continue
+            yield item
+            buf = buf[end:]
+
+
+def load_finished_ids(output_file: str) -> Set[Any]:
+    """
+    Get the idx of every result already in a JSONL output file.
+
+    A partially written last line (e.g. after a crash) and results of failed
+    tasks are ignored, so those questions are processed again.
+    """
+    finished = set()
+    if not os.path.exists(output_file):
+        return finished
+    with open(output_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+                if not result.get('failed'):
+                    finished.add(result['idx'])
+            except (json.JSONDecodeError, KeyError):
+                logger.warning(f"Skipping unreadable line in {output_file}")
+    return finished
+
+
+def load_results(output_file: str) -> List[Dict[str, Any]]:
+    """Read the results of a JSONL output file, sorted by idx; the last result of an idx wins."""
+    results = {}
+    with open(output_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[result['idx']] = result
+    return [results[idx] for idx in sorted(results)]
+
+
+def init_task(idx: int, item: Dict[str, Any], dataset_name: str) -> Dict[str, Any]:
+    """Build the result record of a dataset item (as run.py's init_*_message)."""
+    if dataset_name == "spider":
+        ground_truth = item.get('query', '')
+        evidence = ""
+        difficulty = eval_hardness(item['sql']) if 'sql' in item else ""
+    else:
+        ground_truth = item.get('SQL', '')
+        evidence = item.get('evidence', '')
+        difficulty = item.get('difficulty', 'simple')
+    return {
+        "idx": idx,
+        "db_id": item['db_id'],
+        "query": item['question'],
+        "evidence": evidence,
+        "ground_truth": ground_truth,
+        "difficulty": difficulty
+    }
+
+
+class RateLimiter:
+    """Spaces out task starts so that at most tasks_per_minute tasks start per minute."""
+
+    def __init__(self, tasks_per_minute: Optional[float] = None):
+        self._interval = 60.0 / tasks_per_minute if tasks_per_minute else 0.0
+        self._next_start = 0.0
+
+    async def wait(self) -> None:
+        if not self._interval:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def run_task(orchestrator: TextToSQLTreeOrchestrator,
+                   task: Dict[str, Any],
+                   dataset_name: str) -> Dict[str, Any]:
+    """
+    Process one question in its own per-task orchestrator.
+
+    Returns:
+        The task record with "pred", "tree_complete", "steps", "wall_time" and "usage" added
+    """
+    task_orchestrator = orchestrator.for_task()
+    start = time.monotonic()
+    results = await task_orchestrator.process_query(
+        query=task['query'],
+        db_name=task['db_id'],
+        task_id=f"{dataset_name}_{task['idx']}",
+        evidence=task['evidence'] or None
+    )
+    record = dict(task)
+    record["pred"] = results.get("final_result") or ""
+    record["tree_complete"] = bool(results.get("tree_complete"))
+    record["steps"] = results.get("steps", task_orchestrator.step_count)
+    record["wall_time"] = round(time.monotonic() - start, 3)
+    record["usage"] = task_orchestrator.get_usage()
+    return record
+
+
+def failed_record(task: Dict[str, Any], error: Exception, wall_time: float) -> Dict[str, Any]:
+    """The record of a task that raised: an empty prediction, marked for a retry on resume."""
+    record = dict(task)
+    record["pred"] = ""
+    record["tree_complete"] = False
+    record["steps"] = 0
+    record["wall_time"] = round(wall_time, 3)
+    record["failed"] = True
+    record["error"] = f"{type(error).__name__}: {error}"
+    return record
+
+
+async def run_batch(dataset_name: str,
+                    input_file: str,
+                    output_file: str,
+                    db_path: str,
+                    tables_json_path: str,
+                    dataset_mode: str = 'dev',
+                    start_pos: int = 0,
+                    max_concurrency: int = 4,
+                    tasks_per_minute: Optional[float] = None,
+                    llm_config: Optional[Dict[str, Any]] = None,
+                    max_steps: int = 100,
+                    parallel_siblings: bool = False,
+                    scheduler: str = "coordinator",
+                    max_model_requests: int = MODEL_MAX_CONCURRENCY,
+                    tokens_per_minute: Optional[int] = None,
+                    orchestrator: Optional[TextToSQLTreeOrchestrator] = None) -> str:
+    """
+    Run a dataset through the tree orchestrator and write the prediction file.
+
+    Args:
+        dataset_name: "bird" or "spider"
+        input_file: Dataset JSON file (a JSON array of questions)
+        output_file: JSONL file results are appended to; existing results are kept
+        db_path: Path to the dataset's databases
+        tables_json_path: Path to the tables JSON file
+        dataset_mode: dev, train or test; used in the prediction file name
+        start_pos: Skip questions with a smaller position in the dataset
+        max_concurrency: Maximum number of questions processed at the same time
+        tasks_per_minute: Maximum number of questions started per minute (None: no limit)
+        llm_config: LLM configuration for the agents
+        max_steps: Maximum coordinator steps per question
+        parallel_siblings: Process independent sibling nodes concurrently
+        scheduler: "coordinator" (the LLM chooses every step) or "rules" (routine
+            steps are chosen from the node status)
+        max_model_requests: Maximum number of model requests in flight, over all questions
+        tokens_per_minute: Maximum model tokens used per minute, over all questions (None: no limit)
+        orchestrator: Orchestrator to create the per-task orchestrators from
+            (default: one built from the arguments above)
+
+    Returns:
+        Path of the prediction file
+    """
+    if dataset_name not in ("bird", "spider"):
+        raise NotImplementedError(f"Unsupported dataset: {dataset_name}")
+    get_model_client_pool().configure(max_model_requests, tokens_per_minute)
+    if orchestrator is None:
+        orchestrator = TextToSQLTreeOrchestrator(
+            data_path=db_path,
+            tables_json_path=tables_json_path,
+            dataset_name=dataset_name,
+            llm_config=llm_config,
+            max_steps=max_steps,
+            parallel_siblings=parallel_siblings,
+            scheduler=scheduler
+        )
+
+    out_dir = os.path.dirname(output_file)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    # Resume from the results already written
+    finished_ids = load_finished_ids(output_file)
+    logger.info(f"{len(finished_ids)} questions already finished")
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * max_concurrency)
+    rate_limiter = RateLimiter(tasks_per_minute)
+    counts = {"done": 0, "failed": 0}
+    batch_start = time.monotonic()
+
+    async def produce():
+        for k, item in enumerate(iter_json_array(input_file)):
+            idx = item.get('question_id', k)
+            if k < start_pos or idx in finished_ids:
+                continue
+            await queue.put(init_task(idx, item, dataset_name))
+        for _ in range(max_concurrency):
+            await queue.put(None)
+
+    async def work(fp):
+        while True:
+            task = await queue.get()
+            if task is None:
+                return
+            await rate_limiter.wait()
+            start = time.monotonic()
+            try:
+                record = await run_task(orchestrator, task, dataset_name)
+            except Exception as e:
+                # Written with an empty prediction, and retried when the batch is resumed
+                counts["failed"] += 1
+                logger.error(f"Question {task['idx']} failed: {e}", exc_info=True)
+                print(json.dumps(failed_record(task, e, time.monotonic() - start), ensure_ascii=False),
+                      file=fp, flush=True)
+                continue
+            print(json.dumps(record, ensure_ascii=False), file=fp, flush=True)
+            counts["done"] += 1
+            logger.info(f"Question {task['idx']} done in {record['wall_time']:.1f}s, "
+                        f"{record['steps']} steps, {record['usage']['total']} tokens "
+                        f"({counts['done']} done, {counts['failed']} failed)")
+
+    with open(output_file, 'a+', encoding='utf-8') as fp:
+        # Terminate a line cut off by a crash, so the next result starts on its own line
+        if fp.tell() > 0:
+            fp.seek(fp.tell() - 1)
+            if fp.read(1) != '\n':
+                fp.write('\n')
+        await asyncio.gather(produce(), *(work(fp) for _ in range(max_concurrency)))
+
+    logger.info(f"Batch finished in {time.monotonic() - batch_start:.1f}s: "
+                f"{counts['done']} done, {counts['failed']} failed")
+    logger.info(f"Model usage by agent: {get_model_client_pool().get_usage()}")
+    return write_predictions(dataset_name, output_file, dataset_mode, input_file)
+
+
+def write_predictions(dataset_name: str, output_file: str, dataset_mode: str = 'dev',
+                      input_file: Optional[str] = None) -> str:
+    """
+    Convert a JSONL output file to the dataset's prediction format.
+
+    BIRD: predict_<mode>.json, a list of [question, "<sql>\\t----- bird -----\\t<db_id>"].
+    Spider: pred_<mode>.sql, one SQL per line.
+    Both are ordered by idx and written next to the output file.
+
+    Args:
+        dataset_name: "bird" or "spider"
+        output_file: The JSONL output file
+        dataset_mode: dev, train or test; used in the prediction file name
+        input_file: The dataset JSON file; when given, every question of the
+            dataset gets an entry, with an empty SQL if it has no result
+
+    Returns:
+        Path of the prediction file
+    """
+    out_dir = os.path.dirname(output_file) or '.'
+    results = load_results(output_file)
+    if input_file is not None:
+        by_idx = {result['idx']: result for result in results}
+        results = []
+        for k, item in enumerate(iter_json_array(input_file)):
+            idx = item.get('question_id', k)
+            results.append(by_idx.get(idx) or {**init_task(idx, item, dataset_name), "pred": ""})
+    if dataset_name == "bird":
+        prediction_file = os.path.join(out_dir, f"predict_{dataset_mode}.json")
+        predictions = []
+        for result in results:
+            pred_sql = replace_multiple_spaces(result['pred'].strip())
+            predictions.append([result['query'], pred_sql + '\t----- bird -----\t' + result['db_id']])
+        with open(prediction_file, 'w', encoding='utf-8') as f:
+            json.dump(predictions, f, ensure_ascii=False, indent=2)
+    elif dataset_name == "spider":
+        prediction_file = os.path.join(out_dir, f"pred_{dataset_mode}.sql")
+        with open(prediction_file, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(replace_multiple_spaces(result['pred']).strip() + '\n')
+    else:
+        raise NotImplementedError(f"Unsupported dataset: {dataset_name}")
+    logger.info(f"{dataset_name} prediction file written to {prediction_file}")
+    return prediction_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a dataset through the text-to-SQL tree orchestrator")
+    parser.add_argument('--dataset_name', type=str, default='bird', choices=['spider', 'bird'], help='dataset name')
+    parser.add_argument('--dataset_mode', type=str, default='dev', choices=['train', 'dev', 'test'], help='dataset mode')
+    parser.add_argument('--input_file', type=str, required=True, help='path to dataset input')
+    parser.add_argument('--db_path', type=str, required=True, help='path to databases in dataset')
+    parser.add_argument('--tables_json_path', type=str, required=True, help='path to tables.json')
+    parser.add_argument('--output_file', type=str, required=True, help='path to JSONL output (appended, resumable)')
+    parser.add_argument('--start_pos', type=int, default=0, help='start position of a batch')
+    parser.add_argument('--max_concurrency', type=int, default=4, help='questions processed at the same time')
+    parser.add_argument('--tasks_per_minute', type=float, default=None, help='maximum questions started per minute')
+    parser.add_argument('--max_model_requests', type=int, default=MODEL_MAX_CONCURRENCY,
+                        help='model requests in flight, over all questions')
+    parser.add_argument('--tokens_per_minute', type=int, default=None,
+                        help='maximum model tokens used per minute, over all questions')
+    parser.add_argument('--model_name', type=str, default='gpt-4.1', help='LLM used by the agents')
+    parser.add_argument('--max_steps', type=int, default=100, help='maximum coordinator steps per question')
+    parser.add_argument('--parallel_siblings', action='store_true', default=False,
+                        help='process independent sub-queries concurrently')
+    parser.add_argument('--scheduler', type=str, default='coordinator', choices=['coordinator', 'rules'],
+                        help='let the coordinator LLM choose every step, or only the ones rules cannot decide')
+    parser.add_argument('--value_index_dir', type=str, default=None,
+                        help='directory of the cell value indexes (default: $VALUE_INDEX_DIR or ~/.cache/text2sql/value_index)')
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.WARNING, format='%(name)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+
+    for path in (args.input_file, args.db_path, args.tables_json_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found")
+    if args.value_index_dir:
+        set_index_dir(args.value_index_dir)
+
+    prediction_file = asyncio.run(run_batch(
+        dataset_name=args.dataset_name,
+        input_file=args.input_file,
+        output_file=args.output_file,
+        db_path=args.db_path,
+        tables_json_path=args.tables_json_path,
+        dataset_mode=args.dataset_mode,
+        start_pos=args.start_pos,
+        max_concurrency=args.max_concurrency,
+        tasks_per_minute=args.tasks_per_minute,
+        llm_config={"model_name": args.model_name, "temperature": 0.1, "timeout": 300},
+        max_steps=args.max_steps,
+        parallel_siblings=args.parallel_siblings,
+        scheduler=args.scheduler,
+        max_model_requests=args.max_model_requests,
+        tokens_per_minute=args.tokens_per_minute
+    ))
+    print(f"Predictions written to {prediction_file}", file=sys.stdout, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,37 @@ This module provides easy access to database schema data stored in KeyValueMemor
 import logging
 from typing import Dict, List, Optional, Any
 
+from autogen_core.memory import MemoryMimeType
+
 from keyvalue_memory import KeyValueMemory
 from memory_content_types import TableSchema, ColumnInfo
 from schema_reader import SchemaReader
+from join_graph import get_join_graph
+from schema_catalog import (
+    SchemaCatalog, compute_column_stats, find_catalog, get_schema_catalog, load_database_description
+)
+
+
+def _find_name(names, name: str) -> Optional[str]:
+    """Find a name, matching case-insensitively if there is no exact match."""
+    if name in names:
+        return name
+    lower_name = name.lower()
+    for candidate in names:
+        if candidate.lower() == lower_name:
+            return candidate
+    return None
 
 
 class DatabaseSchemaManager:
-    """Manages database schema data in memory."""
+    """
+    Manages database schema data in memory.
+    
+    A schema loaded with load_from_schema_reader is served from the shared
+    SchemaCatalog of the database, as long as "databaseSchema" still holds
+    the catalog's value; schemas built or changed through this manager are
+    read from memory. Table and column names match case-insensitively.
+    """
     
     def __init__(self, memory: KeyValueMemory):
         """
@@ -25,6 +49,11 @@ class DatabaseSchemaManager:
         self.memory = memory
         self.logger = logging.getLogger(self.__class__.__name__)
     
+    async def get_catalog(self) -> Optional[SchemaCatalog]:
+        """Get the catalog behind the stored schema, if it has not been changed since loading."""
+        item = await self.memory.get_with_details("databaseSchema")
+        return find_catalog(item.content) if item is not None else None
+    
     async def initialize(self, metadata: Optional[Dict[str, Any]] = None) -> None:
         """Initialize an empty database schema.
         
@@ -63,9 +92,15 @@ class DatabaseSchemaManager:
         Returns:
             TableSchema if found, None otherwise
         """
+        catalog = await self.get_catalog()
+        if catalog is not None:
+            return catalog.get_table(table_name)
+        
         schema = await self.memory.get("databaseSchema")
-        if schema and "tables" in schema and table_name in schema["tables"]:
-            return TableSchema.from_dict(table_name, schema["tables"][table_name])
+        if schema and "tables" in schema:
+            stored_name = _find_name(schema["tables"], table_name)
+            if stored_name is not None:
+                return TableSchema.from_dict(stored_name, schema["tables"][stored_name])
         return None
     
     async def get_all_tables(self) -> Dict[str, TableSchema]:
@@ -75,6 +110,10 @@ class DatabaseSchemaManager:
         Returns:
             Dictionary mapping table names to TableSchema objects
         """
+        catalog = await self.get_catalog()
+        if catalog is not None:
+            return dict(catalog.tables)
+        
         schema = await self.memory.get("databaseSchema")
         if not schema or "tables" not in schema:
             return {}
@@ -91,8 +130,14 @@ class DatabaseSchemaManager:
         Returns:
             List of table names
         """
-        tables = await self.get_all_tables()
-        return list(tables.keys())
+        catalog = await self.get_catalog()
+        if catalog is not None:
+            return list(catalog.tables)
+        
+        schema = await self.memory.get_view("databaseSchema")
+        if not schema or "tables" not in schema:
+            return []
+        return list(schema["tables"])
     
     async def get_column(self, table_name: str, column_name: str) -> Optional[ColumnInfo]:
         """
@@ -105,9 +150,36 @@ class DatabaseSchemaManager:
         Returns:
             ColumnInfo if found, None otherwise
         """
+        catalog = await self.get_catalog()
+        if catalog is not None:
+            return catalog.get_column(table_name, column_name)
+        
         table = await self.get_table(table_name)
-        if table and column_name in table.columns:
-            return table.columns[column_name]
+        if table:
+            stored_name = _find_name(table.columns, column_name)
+            if stored_name is not None:
+                return table.columns[stored_name]
+        return None
+    
+    async def get_column_stats(self, table_name: str, column_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get typed statistics of a column, computed from its typical values.
+        
+        Args:
+            table_name: Name of the table
+            column_name: Name of the column
+            
+        Returns:
+            Statistics dictionary (see schema_catalog.compute_column_stats) if found, None otherwise
+        """
+        catalog = await self.get_catalog()
+        if catalog is not None:
+            stats = catalog.get_column_stats(table_name, column_name)
+            return dict(stats) if stats is not None else None
+        
+        column = await self.get_column(table_name, column_name)
+        if column:
+            return compute_column_stats(column.dataType, column.typicalValues)
         return None
     
     async def get_columns(self, table_name: str) -> Dict[str, ColumnInfo]:
@@ -148,6 +220,13 @@ class DatabaseSchemaManager:
         Returns:
             List of foreign key relationships
         """
+        catalog = await self.get_catalog()
+        if catalog is not None:
+            stored_name = catalog.resolve_table(table_name)
+            if stored_name is None:
+                return []
+            return [dict(fk) for fk in catalog.foreign_keys[stored_name]]
+        
         columns = await self.get_columns(table_name)
         foreign_keys = []
         
@@ -172,33 +251,27 @@ class DatabaseSchemaManager:
         Returns:
             List of relationships (foreign key connections)
         """
-        relationships = []
-        
-        # Check table1 -> table2
-        fks1 = await self.get_foreign_keys(table1)
-        for fk in fks1:
-            if fk['references_table'] == table2:
-                relationships.append({
-                    'from_table': table1,
-                    'from_column': fk['column'],
-                    'to_table': table2,
-                    'to_column': fk['references_column'],
-                    'type': 'foreign_key'
-                })
-        
-        # Check table2 -> table1
-        fks2 = await self.get_foreign_keys(table2)
-        for fk in fks2:
-            if fk['references_table'] == table1:
-                relationships.append({
-                    'from_table': table2,
-                    'from_column': fk['column'],
-                    'to_table': table1,
-                    'to_column': fk['references_column'],
-                    'type': 'foreign_key'
-                })
+        graph = await get_join_graph(self)
+        stored1 = graph.resolve_table(table1)
+        stored2 = graph.resolve_table(table2)
+        if stored1 is None or stored2 is None:
+            return []
+        return [edge.to_dict() for edge in graph.edges_between(stored1, stored2)]
+    
+    async def find_join_path(self, tables: List[str]) -> Dict[str, Any]:
+        """
+        Find the joins connecting a set of tables, through other tables if needed.
         
-        return relationships
+        Args:
+            tables: Table names; the first one starts the FROM clause
+            
+        Returns:
+            Dictionary with the tables used, the joins (as in find_relationships),
+            the FROM clause as 'sql', and the given tables that cannot be joined
+            as 'unreachable'
+        """
+        graph = await get_join_graph(self)
+        return graph.connect(tables).to_dict()
     
     async def get_sample_data(self, table_name: str) -> Optional[List[Dict[str, Any]]]:
         """
@@ -240,8 +313,8 @@ class DatabaseSchemaManager:
             Metadata dictionary if available
         """
         table = await self.get_table(table_name)
-        if table:
-            return table.metadata
+        if table and table.metadata is not None:
+            return dict(table.metadata)
         return None
     
     async def set_table_metadata(self, table_name: str, metadata: Dict[str, Any]) -> None:
@@ -273,6 +346,20 @@ class DatabaseSchemaManager:
         await self.memory.set("databaseSchema", schema)
         self.logger.info("Set database description")
     
+    async def get_metadata(self) -> Dict[str, Any]:
+        """
+        Get the schema metadata (data_path, dataset_name, database_id).
+        
+        Returns:
+            Metadata dictionary, empty if none is set
+        """
+        catalog = await self.get_catalog()
+        if catalog is not None:
+            return dict(catalog.metadata)
+        
+        schema = await self.memory.get("databaseSchema")
+        return (schema or {}).get("metadata") or {}
+    
     async def get_database_description(self) -> Optional[str]:
         """
         Get the high-level description for the database.
@@ -280,6 +367,10 @@ class DatabaseSchemaManager:
         Returns:
             Database description if available, None otherwise
         """
+        catalog = await self.get_catalog()
+        if catalog is not None:
+            return catalog.description
+        
         schema = await self.memory.get("databaseSchema")
         if schema and "description" in schema:
             return schema["description"]
@@ -330,9 +421,14 @@ class DatabaseSchemaManager:
                 if col.isForeignKey:
                     total_foreign_keys += 1
         
-        schema = await self.memory.get("databaseSchema", {})
-        description = schema.get("description", "")
-        metadata = schema.get("metadata", {})
+        catalog = await self.get_catalog()
+        if catalog is not None:
+            description = catalog.description or ""
+            metadata = dict(catalog.metadata)
+        else:
+            schema = await self.memory.get("databaseSchema", {})
+            description = schema.get("description", "")
+            metadata = schema.get("metadata", {})
         
         return {
             'table_count': len(tables),
@@ -348,128 +444,23 @@ class DatabaseSchemaManager:
         """
         Load database schema from SchemaReader and populate it into memory.
         
+        The schema comes from the database's shared SchemaCatalog, which is
+        built once per SchemaReader and database, and is stored in memory in
+        a single write.
+        
         Args:
             schema_reader: The SchemaReader instance with loaded database information
             db_id: The database ID to load
         """
-        # Initialize schema with metadata
-        metadata = {
-            "data_path": schema_reader.data_path,
-            "dataset_name": schema_reader.dataset_name,
-            "database_id": db_id
-        }
-        await self.initialize(metadata)
-        
-        # Load database info if not already loaded
-        if db_id not in schema_reader.db2infos:
-            db_info = schema_reader._load_single_db_info(db_id)
-            schema_reader.db2infos[db_id] = db_info
+        catalog = get_schema_catalog(schema_reader, db_id)
+        native = getattr(self.memory, "native", False)
+        if native:
+            # The catalog's value is shared and never modified
+            await self.memory.set("databaseSchema", catalog.memory_value(native), copy=False)
         else:
-            db_info = schema_reader.db2infos[db_id]
-        
-        # Get the database JSON info for column types
-        db_json = schema_reader.db2dbjsons.get(db_id, {})
-        
-        # Extract information from schema_reader
-        desc_dict = db_info['desc_dict']    # table -> [(column_name, full_column_name, extra_desc)]
-        value_dict = db_info['value_dict']  # table -> [(column_name, value_examples_str)]
-        pk_dict = db_info['pk_dict']        # table -> [primary_key_column_names]
-        fk_dict = db_info['fk_dict']        # table -> [(from_col, to_table, to_col)]
-        
-        # Get column types from the JSON data
-        column_types = {}  # {(table_idx, col_name): type}
-        if 'column_types' in db_json:
-            for col_idx, col_type in enumerate(db_json['column_types']):
-                if col_idx < len(db_json['column_names_original']):
-                    table_idx, col_name = db_json['column_names_original'][col_idx]
-                    if table_idx >= 0:  # -1 means special columns like *
-                        column_types[(table_idx, col_name)] = col_type
-        
-        # Get table names mapping
-        table_names = db_json.get('table_names_original', [])
-        
-        # Process each table
-        for table_idx, table_name in enumerate(table_names):
-            if table_name not in desc_dict:
-                continue
-                
-            # Get column descriptions
-            columns_desc = desc_dict[table_name]
-            columns_val = value_dict.get(table_name, [])
-            primary_keys = pk_dict.get(table_name, [])
-            foreign_keys = fk_dict.get(table_name, [])
-            
-            # Build columns dictionary
-            columns = {}
-            
-            # Create a mapping of column names to their typical values
-            column_values_map = {}
-            for col_name, values_str in columns_val:
-                if values_str and values_str != '[]':
-                    try:
-                        import ast
-                        values = ast.literal_eval(values_str)
-                        if isinstance(values, list):
-                            column_values_map[col_name] = values
-                    except:
-                        pass
-            
-            # Process each column
-            for col_idx, (col_name, full_col_name, extra_desc) in enumerate(columns_desc):
-                # Get column type
-                col_type = column_types.get((table_idx, col_name), "TEXT")
-                
-                # Determine if it's a primary key
-                is_primary_key = col_name in primary_keys
-                
-                # Determine if it's a foreign key and get references
-                is_foreign_key = False
-                references = None
-                for fk_col, to_table, to_col in foreign_keys:
-                    if fk_col == col_name:
-                        is_foreign_key = True
-                        references = {
-                            "table": to_table,
-                            "column": to_col
-                        }
-                        break
-                
-                # Get typical values for this column
-                typical_values = column_values_map.get(col_name)
-                
-                # Create ColumnInfo
-                column_info = ColumnInfo(
-                    dataType=col_type,
-                    nullable=True,  # Default to nullable, can be refined later
-                    isPrimaryKey=is_primary_key,
-                    isForeignKey=is_foreign_key,
-                    references=references,
-                    typicalValues=typical_values
-                )
-                
-                columns[col_name] = column_info
-            
-            # Create TableSchema without sample data (we use typicalValues instead)
-            table_schema = TableSchema(
-                name=table_name,
-                columns=columns,
-                sampleData=None,  # We use typicalValues in columns instead
-                metadata={
-                    "description": f"Table {table_name} from {db_id} database",
-                    "column_count": len(columns)
-                }
-            )
-            
-            # Add table to schema
-            await self.add_table(table_schema)
-        
-        self.logger.info(f"Loaded schema for database '{db_id}' with {len(table_names)} tables")
+            await self.memory.set("databaseSchema", catalog.memory_value(native), mime_type=MemoryMimeType.JSON)
         
-        # Load database-specific descriptions if available
-        try:
-            await self._load_database_description(db_id)
-        except Exception as e:
-            self.logger.debug(f"Could not load database description for {db_id}: {e}")
+        self.logger.info(f"Loaded schema for database '{db_id}' with {len(catalog.tables)} tables")
     
     async def _load_database_description(self, db_id: str) -> None:
         """
@@ -478,32 +469,4 @@ class DatabaseSchemaManager:
         Args:
             db_id: Database ID to load description for
         """
-        import os
-        
-        # Define paths to description files
-        description_files = {
-            "california_schools": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/california_schools_schema_summary.md",
-            "financial": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/financial_schema_summary.md",
-            "european_football_2": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/european_football_2_schema_summary.md",
-            "superhero": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/superhero_schema_summary.md",
-            "student_club": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/student_club_schema_summary.md",
-            "card_games": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/card_games_schema_summary.md"
-        }
-        
-        if db_id in description_files:
-            description_path = description_files[db_id]
-            if os.path.exists(description_path):
-                try:
-                    with open(description_path, 'r', encoding='utf-8') as f:
-                        description = f.read()
-                    await self.set_database_description(description)
-                    self.logger.info(f"Loaded description for database '{db_id}' from {description_path}")
-                    return
-                except Exception as e:
-                    self.logger.warning(f"Failed to load description for database '{db_id}': {e}")
-            else:
-                self.logger.warning(f"Description file not found for database '{db_id}': {description_path}")
-        
-        # Fallback to generic description
-        description = f"Database '{db_id}' with tables for various data analysis tasks"
-        await self.set_database_description(description)
\ No newline at end of file
+        await self.set_database_description(load_database_description(db_id))
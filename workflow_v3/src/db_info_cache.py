@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded LRU cache of per-database infos.
+
+Shared by workflow_v3's SchemaReader and SchemaCatalog registry and by the
+orchestrator's SchemaManager, which run lookups from several threads.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class DBInfoCache(OrderedDict):
+    """
+    db_id -> database info, evicting the least recently used databases.
+
+    A plain dict replacement: reads through [] or get() mark a database as
+    recently used, and storing one more than max_size databases evicts the
+    least recently used one. max_size=None keeps everything.
+
+    Reads and writes are thread-safe: each one updates the LRU order under a
+    lock, so a concurrent eviction can neither make get() raise KeyError nor
+    interleave with a move_to_end().
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        super().__init__()
+        self.max_size = max_size
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while self.max_size is not None and len(self) > self.max_size:
+                self.popitem(last=False)
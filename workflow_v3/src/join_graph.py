@@ -0,0 +1,330 @@
+"""
+Foreign-key join graph of a database schema.
+
+Tables are nodes and foreign keys are (undirected) edges, so the joins
+needed to bring a set of tables together can be computed instead of being
+worked out in the prompt: the shortest join path between two tables, the k
+shortest alternatives (Yen's algorithm) and, for more tables, an approximate
+Steiner tree that grows from one table by repeatedly adding the nearest
+remaining one. The graph is built once per SchemaCatalog and caches every
+path it computes.
+"""
+
+import threading
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from memory_content_types import TableSchema
+from schema_catalog import SchemaCatalog
+
+
+@dataclass(frozen=True)
+class JoinEdge:
+    """A foreign key, from the referencing column to the referenced one."""
+    from_table: str
+    from_column: str
+    to_table: str
+    to_column: str
+
+    def other(self, table: str) -> str:
+        """The table at the other end of the edge."""
+        return self.to_table if table == self.from_table else self.from_table
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            'from_table': self.from_table,
+            'from_column': self.from_column,
+            'to_table': self.to_table,
+            'to_column': self.to_column,
+            'type': 'foreign_key'
+        }
+
+    def condition(self) -> str:
+        """The join condition in SQL."""
+        return (f"{_sql_name(self.from_table)}.{_sql_name(self.from_column)} = "
+                f"{_sql_name(self.to_table)}.{_sql_name(self.to_column)}")
+
+
+def _sql_name(name: str) -> str:
+    return name if name.isidentifier() else f"`{name}`"
+
+
+@dataclass
+class JoinPlan:
+    """The joins connecting a set of tables."""
+    tables: List[str] = field(default_factory=list)
+    joins: List[JoinEdge] = field(default_factory=list)
+    unreachable: List[str] = field(default_factory=list)
+
+    def to_sql(self) -> str:
+        """A FROM clause joining the tables in order, e.g. 'a JOIN b ON a.x = b.y'."""
+        if not self.tables:
+            return ""
+        parts = [_sql_name(self.tables[0])]
+        joined = {self.tables[0]}
+        pending = list(self.joins)
+        while pending:
+            # Each join adds one table next to the ones already joined
+            for edge in pending:
+                if edge.from_table in joined or edge.to_table in joined:
+                    table = edge.to_table if edge.from_table in joined else edge.from_table
+                    parts.append(f"JOIN {_sql_name(table)} ON {edge.condition()}")
+                    joined.add(table)
+                    pending.remove(edge)
+                    break
+            else:
+                break
+        return " ".join(parts)
+
+    def to_dict(self) -> Dict[str, object]:
+        result = {
+            "tables": list(self.tables),
+            "joins": [edge.to_dict() for edge in self.joins],
+            "sql": self.to_sql()
+        }
+        if self.unreachable:
+            result["unreachable"] = list(self.unreachable)
+        return result
+
+
+class JoinGraph:
+    """
+    Undirected multigraph of the foreign keys between tables.
+    """
+
+    def __init__(self, tables: Iterable[str], edges: Iterable[JoinEdge]):
+        """
+        Build the graph.
+
+        Args:
+            tables: All table names, in database order
+            edges: The foreign keys; edges to unknown tables are ignored
+        """
+        self.tables = list(tables)
+        self._table_index = {}
+        for table in self.tables:
+            self._table_index.setdefault(table.lower(), table)
+        self.edges: List[JoinEdge] = []
+        self._adjacency: Dict[str, List[JoinEdge]] = {table: [] for table in self.tables}
+        seen = set()
+        for edge in edges:
+            if edge.from_table not in self._adjacency or edge.to_table not in self._adjacency:
+                continue
+            if edge in seen or edge.from_table == edge.to_table:
+                continue
+            seen.add(edge)
+            self.edges.append(edge)
+            self._adjacency[edge.from_table].append(edge)
+            self._adjacency[edge.to_table].append(edge)
+
+        self._lock = threading.Lock()
+        self._path_cache: Dict[Tuple[str, str, int], List[List[JoinEdge]]] = {}
+        self._plan_cache: Dict[FrozenSet[str], JoinPlan] = {}
+
+    @classmethod
+    def from_tables(cls, tables: Dict[str, TableSchema]) -> 'JoinGraph':
+        """Build the graph from the references of the tables' columns."""
+        edges = [
+            JoinEdge(table_name, column_name, col.references['table'], col.references['column'])
+            for table_name, table in tables.items()
+            for column_name, col in table.columns.items()
+            if col.isForeignKey and col.references
+        ]
+        return cls(tables.keys(), edges)
+
+    @classmethod
+    def from_catalog(cls, catalog: SchemaCatalog) -> 'JoinGraph':
+        """Build the graph from a catalog's foreign keys."""
+        edges = [
+            JoinEdge(table_name, fk['column'], fk['references_table'], fk['references_column'])
+            for table_name, fks in catalog.foreign_keys.items()
+            for fk in fks
+        ]
+        return cls(catalog.tables.keys(), edges)
+
+    def resolve_table(self, name: str) -> Optional[str]:
+        """The stored name of a table, matched case-insensitively."""
+        if name in self._adjacency:
+            return name
+        return self._table_index.get(name.lower())
+
+    def neighbors(self, table: str) -> List[JoinEdge]:
+        """The foreign keys from or to a table."""
+        return list(self._adjacency.get(table, []))
+
+    def edges_between(self, table1: str, table2: str) -> List[JoinEdge]:
+        """The direct foreign keys between two tables."""
+        return [edge for edge in self._adjacency.get(table1, []) if edge.other(table1) == table2]
+
+    def _bfs(self, sources: Iterable[str], target: str,
+             removed_tables: Set[str] = frozenset(),
+             removed_edges: Set[JoinEdge] = frozenset()) -> Optional[List[JoinEdge]]:
+        """Fewest-joins path from any source to the target, avoiding some tables and edges."""
+        parents: Dict[str, Optional[JoinEdge]] = {}
+        queue = deque()
+        for source in sources:
+            if source not in parents:
+                parents[source] = None
+                queue.append(source)
+        while queue:
+            table = queue.popleft()
+            if table == target:
+                path = []
+                while parents[table] is not None:
+                    edge = parents[table]
+                    path.append(edge)
+                    table = edge.other(table)
+                return path[::-1]
+            for edge in self._adjacency[table]:
+                neighbor = edge.other(table)
+                if neighbor in parents or neighbor in removed_tables or edge in removed_edges:
+                    continue
+                parents[neighbor] = edge
+                queue.append(neighbor)
+        return None
+
+    def k_shortest_paths(self, source: str, target: str, k: int = 3) -> List[List[JoinEdge]]:
+        """
+        The k join paths with the fewest joins between two tables (Yen's algorithm).
+
+        Parallel foreign keys between the same tables give different paths.
+
+        Args:
+            source: First table
+            target: Second table
+            k: Maximum number of paths
+
+        Returns:
+            Paths as lists of edges in order from source to target, shortest first;
+            [[]] when source and target are the same table, [] when they are not connected
+        """
+        source = self.resolve_table(source) or source
+        target = self.resolve_table(target) or target
+        if source not in self._adjacency or target not in self._adjacency:
+            return []
+        key = (source, target, k)
+        with self._lock:
+            cached = self._path_cache.get(key)
+        if cached is not None:
+            return [list(path) for path in cached]
+
+        first = self._bfs([source], target)
+        paths = [first] if first is not None else []
+        candidates: List[List[JoinEdge]] = []
+        while paths and len(paths) < k:
+            last = paths[-1]
+            # Deviate from the last path at every table along it
+            spur_table = source
+            for i in range(len(last)):
+                root = last[:i]
+                removed_edges = {path[i] for path in paths if path[:i] == root}
+                root_tables = {source}
+                table = source
+                for edge in root:
+                    table = edge.other(table)
+                    root_tables.add(table)
+                spur = self._bfs([spur_table], target, root_tables - {spur_table}, removed_edges)
+                if spur is not None:
+                    candidate = root + spur
+                    if candidate not in paths and candidate not in candidates:
+                        candidates.append(candidate)
+                spur_table = last[i].other(spur_table)
+            if not candidates:
+                break
+            candidates.sort(key=len)
+            paths.append(candidates.pop(0))
+
+        with self._lock:
+            self._path_cache[key] = paths
+        return [list(path) for path in paths]
+
+    def shortest_path(self, source: str, target: str) -> Optional[List[JoinEdge]]:
+        """The join path with the fewest joins between two tables, or None if they are not connected."""
+        paths = self.k_shortest_paths(source, target, 1)
+        return paths[0] if paths else None
+
+    def connect(self, tables: Iterable[str]) -> JoinPlan:
+        """
+        Find the joins connecting a set of tables.
+
+        Two tables are joined along their shortest path. For more tables the
+        tree is grown from the first table by repeatedly adding the table
+        closest to it, with the tables its path passes through (a Steiner tree
+        approximation within twice the fewest joins).
+
+        Args:
+            tables: The tables to connect; unknown tables are ignored
+
+        Returns:
+            The JoinPlan: all tables used (the given ones first), the joins,
+            and the given tables that cannot be reached from the first one
+        """
+        terminals = []
+        for name in tables:
+            table = self.resolve_table(name)
+            if table is not None and table not in terminals:
+                terminals.append(table)
+        key = frozenset(terminals)
+        with self._lock:
+            cached = self._plan_cache.get(key)
+        if cached is not None and cached.tables[:len(terminals)] == terminals:
+            return JoinPlan(list(cached.tables), list(cached.joins), list(cached.unreachable))
+
+        plan = JoinPlan(tables=terminals[:1])
+        in_tree = set(plan.tables)
+        remaining = terminals[1:]
+        while remaining:
+            best = None
+            for table in remaining:
+                path = self._bfs([t for t in self.tables if t in in_tree], table)
+                if path is not None and (best is None or len(path) < len(best[1])):
+                    best = (table, path)
+            if best is None:
+                plan.unreachable = remaining
+                break
+            table, path = best
+            remaining.remove(table)
+            for edge in path:
+                plan.joins.append(edge)
+                in_tree.update((edge.from_table, edge.to_table))
+            remaining = [t for t in remaining if t not in in_tree]
+        plan.tables = terminals[:1] + [t for t in terminals[1:] if t in in_tree] + \
+            sorted(in_tree - set(terminals))
+
+        with self._lock:
+            self._plan_cache[key] = plan
+        return JoinPlan(list(plan.tables), list(plan.joins), list(plan.unreachable))
+
+
+# SchemaCatalog -> its join graph
+_graphs: "weakref.WeakKeyDictionary[SchemaCatalog, JoinGraph]" = weakref.WeakKeyDictionary()
+
+
+def get_catalog_join_graph(catalog: SchemaCatalog) -> JoinGraph:
+    """Get the shared join graph of a catalog, building it on first use."""
+    graph = _graphs.get(catalog)
+    if graph is None:
+        graph = JoinGraph.from_catalog(catalog)
+        _graphs[catalog] = graph
+    return graph
+
+
+async def get_join_graph(schema_manager) -> JoinGraph:
+    """
+    Get the join graph of the schema held by a DatabaseSchemaManager.
+
+    A schema loaded from a SchemaReader uses its catalog's shared graph; for
+    any other schema a new graph is built.
+
+    Args:
+        schema_manager: The DatabaseSchemaManager of the task
+
+    Returns:
+        The JoinGraph (empty if no tables are loaded)
+    """
+    catalog = await schema_manager.get_catalog()
+    if catalog is not None:
+        return get_catalog_join_graph(catalog)
+    return JoinGraph.from_tables(await schema_manager.get_all_tables())
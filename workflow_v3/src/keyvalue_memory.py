@@ -5,8 +5,10 @@ This module contains memory implementations for the text-to-SQL tree orchestrati
 including a key-value store memory implementation for the TaskOrchestrator.
 """
 
+import copy
 import json
 import logging
+from collections.abc import Mapping, Sequence
 from typing import Dict, List, Optional, Any, Union
 
 from autogen_core import CancellationToken
@@ -19,18 +21,185 @@ from autogen_core.model_context import ChatCompletionContext
 # Type definition for content
 ContentType = Union[str, dict, bytes, Any]
 
+_ATOMIC_TYPES = (str, int, float, bool, bytes, type(None))
+
+
+def _copy_value(value: Any) -> Any:
+    """Copy the containers of a JSON-like value; immutable leaves are shared."""
+    cls = type(value)
+    if cls is dict:
+        return {k: _copy_value(v) for k, v in value.items()}
+    if cls is list:
+        return [_copy_value(v) for v in value]
+    if cls in _ATOMIC_TYPES:
+        return value
+    if cls is ReadOnlyDict or cls is ReadOnlyList:
+        return _copy_value(value._data)
+    if cls is tuple:
+        return tuple(_copy_value(v) for v in value)
+    return copy.deepcopy(value)
+
+
+def _read_only(value: Any) -> Any:
+    cls = type(value)
+    if cls is dict:
+        return ReadOnlyDict(value)
+    if cls is list:
+        return ReadOnlyList(value)
+    return value
+
+
+class ReadOnlyDict(Mapping):
+    """Read-only view of a stored dict; nested containers are wrapped on access."""
+    __slots__ = ("_data",)
+
+    def __init__(self, data: dict):
+        self._data = data
+
+    def __getitem__(self, key):
+        return _read_only(self._data[key])
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __repr__(self):
+        return f"ReadOnlyDict({self._data!r})"
+
+
+class ReadOnlyList(Sequence):
+    """Read-only view of a stored list; nested containers are wrapped on access."""
+    __slots__ = ("_data",)
+
+    def __init__(self, data: list):
+        self._data = data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ReadOnlyList(self._data[index])
+        return _read_only(self._data[index])
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, ReadOnlyList):
+            other = other._data
+        return self._data == other
+
+    def __repr__(self):
+        return f"ReadOnlyList({self._data!r})"
+
+
+def thaw(value: Any, deep: bool = True) -> Any:
+    """
+    Get a mutable copy of a value returned by KeyValueMemory.get_view.
+    
+    Args:
+        value: A read-only view, or any JSON-like value
+        deep: Copy nested containers too. With deep=False only the outer
+            dict or list is copied; its values are shared with the stored
+            value and must be replaced, never modified in place.
+        
+    Returns:
+        A private copy built from plain dicts and lists
+    """
+    if deep:
+        return _copy_value(value)
+    if type(value) is ReadOnlyDict or type(value) is ReadOnlyList:
+        value = value._data
+    if type(value) is dict:
+        return dict(value)
+    if type(value) is list:
+        return list(value)
+    return _copy_value(value)
+
+
 # --- New KeyValueMemory Implementation ---
 class KeyValueMemory(Memory):
     """
     An in-memory implementation of the autogen_core.Memory protocol,
     acting like a key-value store for the TaskOrchestrator's needs.
     Variables are stored as MemoryContent items with a 'variable_name' in metadata.
+    
+    The latest item of every variable is indexed, so lookups by name are O(1)
+    no matter how often a variable was rewritten. Only the newest
+    `max_versions` items of each variable are retained; superseded items are
+    dropped by an amortized compaction of the store.
+    
+    By default dicts, lists and scalars are stored as JSON strings. With
+    `native=True` they are kept as Python objects instead: get() returns a
+    private copy, get_view() a read-only view without any copy, and values are
+    only serialized by export_json() and show_all().
     """
-    def __init__(self, name: str = "kv_memory", **kwargs):
+    def __init__(self, name: str = "kv_memory", max_versions: Optional[int] = 10,
+                 native: bool = False, **kwargs):
+        """
+        Args:
+            name: Name of the memory
+            max_versions: Items kept per variable (None keeps every version)
+            native: Store structured values as Python objects instead of JSON
+        """
+        if max_versions is not None and max_versions < 1:
+            raise ValueError("max_versions must be at least 1")
         self.name = name
+        self.max_versions = max_versions
+        self.native = native
         self._store: List[MemoryContent] = []
+        # variable_name -> latest item, ordered by last write
+        self._latest: Dict[str, MemoryContent] = {}
+        # variable_name -> number of its items in _store
+        self._version_counts: Dict[str, int] = {}
+        # items in _store beyond the retention limit, dropped by compact()
+        self._superseded = 0
         logging.debug(f"[{self.__class__.__name__}] Initialized.")
 
+    def _index(self, content: MemoryContent) -> None:
+        key = content.metadata.get("variable_name") if content.metadata else None
+        if key is None:
+            return
+        self._latest.pop(key, None)
+        self._latest[key] = content
+        count = self._version_counts.get(key, 0) + 1
+        self._version_counts[key] = count
+        if self.max_versions is not None and count > self.max_versions:
+            self._superseded += 1
+            # compact once half of the store is superseded: amortized O(1) per write
+            if self._superseded * 2 > len(self._store):
+                self.compact()
+
+    def compact(self) -> int:
+        """
+        Drop items that are older than the newest `max_versions` of their variable.
+        
+        Returns:
+            Number of items removed from the store
+        """
+        if self.max_versions is None:
+            return 0
+        kept: List[MemoryContent] = []
+        counts: Dict[str, int] = {}
+        for item in reversed(self._store):
+            key = item.metadata.get("variable_name") if item.metadata else None
+            if key is not None:
+                if counts.get(key, 0) >= self.max_versions:
+                    continue
+                counts[key] = counts.get(key, 0) + 1
+            kept.append(item)
+        removed = len(self._store) - len(kept)
+        kept.reverse()
+        self._store = kept
+        self._version_counts = counts
+        self._superseded = 0
+        if removed:
+            logging.debug(f"[{self.__class__.__name__}] Compacted {removed} superseded item(s). Store size: {len(self._store)}")
+        return removed
+
     async def add(self, content: MemoryContent, cancellation_token: Optional[CancellationToken] = None) -> None:
         """
         Add a new content item to the memory store.
@@ -43,6 +212,7 @@ class KeyValueMemory(Memory):
             logging.warning(f"[{self.__class__.__name__}] Add operation cancelled.")
             return
         self._store.append(content)
+        self._index(content)
         logging.debug(f"[{self.__class__.__name__}] Added content with metadata: {content.metadata}. Store size: {len(self._store)}")
 
     async def query(
@@ -68,12 +238,10 @@ class KeyValueMemory(Memory):
         results: List[MemoryContent] = []
         if isinstance(query_input, str):
             key_to_find = query_input
-            # Iterate in reverse to find the latest entry for a variable_name
-            for item in reversed(self._store):
-                if item.metadata and item.metadata.get("variable_name") == key_to_find:
-                    results.append(item)
-                    # For variable lookup, we typically want only the most recent one.
-                    break
+            # For variable lookup, we only want the most recent entry
+            item = self._latest.get(key_to_find)
+            if item is not None:
+                results.append(item)
             logging.debug(f"[{self.__class__.__name__}] Querying for variable_name='{key_to_find}', found {len(results)} item(s) (returning latest).")
 
         elif isinstance(query_input, MemoryContent):
@@ -109,6 +277,9 @@ class KeyValueMemory(Memory):
     async def clear(self) -> None:
         """Clear all entries from the memory store."""
         self._store.clear()
+        self._latest.clear()
+        self._version_counts.clear()
+        self._superseded = 0
         logging.info(f"[{self.__class__.__name__}] Memory cleared.")
 
     async def close(self) -> None:
@@ -121,7 +292,8 @@ class KeyValueMemory(Memory):
         key: str,
         value: ContentType,
         mime_type: Optional[Union[MemoryMimeType, str]] = None,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        copy: bool = True
     ) -> None:
         """
         Set a key-value pair in the memory store.
@@ -131,7 +303,23 @@ class KeyValueMemory(Memory):
             value: The value to store
             mime_type: Optional MIME type for the content
             metadata: Optional additional metadata to store with the content
+            copy: In native mode, store a copy of the value. Pass False to hand
+                the value over to the memory; it must not be mutated afterwards.
         """
+        if self.native and mime_type is None and isinstance(value, (dict, list, int, float, bool)):
+            item_metadata = {"variable_name": key}
+            if metadata:
+                item_metadata.update(metadata)
+            # Skip pydantic validation, which rejects lists and scalars as content
+            content_item = MemoryContent.model_construct(
+                content=_copy_value(value) if copy else value,
+                mime_type=MemoryMimeType.JSON,
+                metadata=item_metadata
+            )
+            await self.add(content_item)
+            logging.debug(f"[{self.__class__.__name__}] Set key '{key}' (native).")
+            return
+
         if mime_type is None:
             if isinstance(value, str): 
                 mime_type = MemoryMimeType.TEXT
@@ -159,6 +347,37 @@ class KeyValueMemory(Memory):
         await self.add(content_item)
         logging.debug(f"[{self.__class__.__name__}] Set key '{key}'.")
 
+    async def append(self, key: str, value: Any, copy: bool = True) -> None:
+        """
+        Append a value to a list variable, creating it if needed.
+
+        In native mode the variable gets a new item holding a new list that
+        shares the old entries, so only references are copied and, as with
+        set(), values read before (get_view(), get_with_details()) are never
+        modified. In JSON mode the list is read, extended and written back.
+
+        Args:
+            key: The list variable
+            value: The value to append
+            copy: In native mode, append a copy of the value. Pass False to hand
+                the value over to the memory; it must not be mutated afterwards.
+
+        Raises:
+            TypeError: If the variable holds something other than a list
+        """
+        item = self._latest.get(key)
+        if self.native and item is not None and type(item.content) is list:
+            values = item.content + [_copy_value(value) if copy else value]
+            await self.set(key, values, metadata=item.metadata, copy=False)
+            return
+        values = await self.get(key)
+        if values is None:
+            values = []
+        elif not isinstance(values, list):
+            raise TypeError(f"Cannot append to '{key}': it holds a {type(values).__name__}, not a list")
+        values.append(value)
+        await self.set(key, values, copy=False)
+
     async def get(self, key: str, default: Optional[ContentType] = None) -> Optional[ContentType]:
         """
         Get a value by key from the memory store.
@@ -182,10 +401,61 @@ class KeyValueMemory(Memory):
                 except json.JSONDecodeError:
                     logging.warning(f"Failed to decode JSON for key '{key}'")
                     return content
+            if self.native and mime_type == MemoryMimeType.JSON:
+                return _copy_value(content)
             
             return content
         return default
 
+    async def get_view(self, key: str, default: Optional[ContentType] = None) -> Optional[ContentType]:
+        """
+        Get a read-only view of a value, for callers that do not modify it.
+        
+        In native mode dicts and lists are wrapped in ReadOnlyDict/ReadOnlyList
+        views of the stored object, so nothing is copied; use thaw() on (part
+        of) a view to get a mutable copy. In JSON mode this is the same as get().
+        
+        Args:
+            key: The key to retrieve the value for
+            default: Default value to return if key is not found
+            
+        Returns:
+            The value associated with the key, or default if not found
+        """
+        if not self.native:
+            return await self.get(key, default)
+        item = self._latest.get(key)
+        if item is None:
+            return default
+        if item.mime_type == MemoryMimeType.JSON:
+            if isinstance(item.content, str):
+                return await self.get(key, default)
+            return _read_only(item.content)
+        return item.content
+
+    async def export_json(self, indent: Optional[int] = None) -> str:
+        """
+        Serialize the latest value of every key.
+        
+        Args:
+            indent: Optional JSON indentation
+            
+        Returns:
+            JSON object mapping each key to its value
+        """
+        values = {}
+        for key, item in self._latest.items():
+            content = item.content
+            if item.mime_type == MemoryMimeType.JSON and isinstance(content, str):
+                try:
+                    content = json.loads(content)
+                except json.JSONDecodeError:
+                    pass
+            elif isinstance(content, bytes):
+                content = content.decode(errors="replace")
+            values[key] = content
+        return json.dumps(values, indent=indent, default=str)
+
     async def get_with_details(self, key: str) -> Optional[MemoryContent]:
         """
         Get a value with its full details by key.
@@ -201,6 +471,23 @@ class KeyValueMemory(Memory):
             return query_result.results[0]
         return None
     
+    async def get_versions(self, key: str) -> List[MemoryContent]:
+        """
+        Get the retained versions of a variable.
+        
+        Args:
+            key: The key to retrieve
+            
+        Returns:
+            MemoryContent items of the key, oldest first (at most max_versions)
+        """
+        versions = [item for item in self._store
+                    if item.metadata and item.metadata.get("variable_name") == key]
+        # superseded items may linger until the next compaction
+        if self.max_versions is not None:
+            versions = versions[-self.max_versions:]
+        return versions
+    
     async def show_all(self, format: str = "detailed") -> Union[str, Dict[str, Any], List[Dict[str, Any]]]:
         """
         Show all content in the memory store.
@@ -233,7 +520,7 @@ class KeyValueMemory(Memory):
                                 pass
                         
                         all_content[key] = {
-                            "value": content,
+                            "value": _copy_value(content),
                             "mime_type": str(item.mime_type),
                             "metadata": item.metadata
                         }
@@ -325,7 +612,9 @@ class KeyValueMemory(Memory):
                         lines.append(f"  Metadata: {item.metadata}")
                         
                         content = item.content
-                        if item.mime_type == MemoryMimeType.JSON and isinstance(content, str):
+                        if item.mime_type == MemoryMimeType.JSON and not isinstance(content, str):
+                            lines.append(f"  Value: {json.dumps(content, indent=2, default=str)}")
+                        elif item.mime_type == MemoryMimeType.JSON:
                             try:
                                 content = json.loads(content)
                                 lines.append(f"  Value: {json.dumps(content, indent=2)}")
@@ -349,15 +638,5 @@ class KeyValueMemory(Memory):
         Returns:
             List of all unique keys (most recent values only)
         """
-        seen_keys = []
-        seen_set = set()
-        
-        # Iterate in reverse to maintain order of most recent
-        for item in reversed(self._store):
-            if item.metadata and "variable_name" in item.metadata:
-                key = item.metadata["variable_name"]
-                if key not in seen_set:
-                    seen_set.add(key)
-                    seen_keys.append(key)
-        
-        return list(reversed(seen_keys))  # Return in original order
\ No newline at end of file
+        # The index is ordered by last write, like the store
+        return list(self._latest)
\ No newline at end of file
@@ -12,6 +12,7 @@ from typing import Any, Callable, Dict, List, Mapping, Optional, Type, Union
 
 from autogen_core import CancellationToken, Component, ComponentModel
 from autogen_core.memory import Memory, MemoryContent
+from autogen_core.models import RequestUsage
 from autogen_core.tools import BaseTool
 from autogen_agentchat.agents import BaseChatAgent
 from autogen_agentchat.base import TaskResult
@@ -102,6 +103,8 @@ class MemoryAgentTool(BaseTool[MemoryAgentToolArgs, TaskResult], Component[Memor
         self._memory = memory
         self._reader_callback = reader_callback
         self._parser_callback = parser_callback
+        # Tokens used by all runs of this tool
+        self.usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
         
         # Initialize the parent class
         super().__init__(
@@ -156,6 +159,7 @@ class MemoryAgentTool(BaseTool[MemoryAgentToolArgs, TaskResult], Component[Memor
         
         # Step 3: Run the agent with enhanced goal and continue until completion
         result = await self._agent.run(task=enhanced_goal, cancellation_token=cancellation_token)
+        self._add_usage(result)
         
         # Continue conversation until no more tool calls (agent produces final response)
         max_iterations = 10  # Safety limit
@@ -165,6 +169,7 @@ class MemoryAgentTool(BaseTool[MemoryAgentToolArgs, TaskResult], Component[Memor
             logging.debug(f"[{self.__class__.__name__}] Continuing conversation - iteration {iteration}")
             # Continue the conversation with empty task (let agent process tool results)
             result = await self._agent.run(task="", cancellation_token=cancellation_token)
+            self._add_usage(result)
             
         if iteration >= max_iterations:
             logging.warning(f"[{self.__class__.__name__}] Reached maximum iterations ({max_iterations}) - stopping")
@@ -179,6 +184,17 @@ class MemoryAgentTool(BaseTool[MemoryAgentToolArgs, TaskResult], Component[Memor
         
         return result
     
+    def _add_usage(self, result: TaskResult) -> None:
+        """Add the model usage reported on the result's messages to self.usage."""
+        prompt_tokens = self.usage.prompt_tokens
+        completion_tokens = self.usage.completion_tokens
+        for message in result.messages if result else []:
+            usage = getattr(message, "models_usage", None)
+            if usage:
+                prompt_tokens += usage.prompt_tokens
+                completion_tokens += usage.completion_tokens
+        self.usage = RequestUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    
     def _has_tool_calls(self, result: TaskResult) -> bool:
         """
         Check if the TaskResult contains tool calls, indicating the conversation should continue.
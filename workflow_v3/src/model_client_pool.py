@@ -0,0 +1,376 @@
+"""
+Process-wide pool of model clients.
+
+Every agent used to create its own OpenAIChatCompletionClient, so each
+orchestrator opened its own HTTP connections and nothing bounded the load on
+the provider across tasks. Agents now get their clients from the pool:
+
+- One keep-alive HTTP connection pool per endpoint, and one underlying
+  client per endpoint, model and settings, shared by all agents and tasks.
+  Connections belong to the event loop that opened them, so these are kept
+  per event loop and created on first use in each loop.
+- A global limit on the number of model requests in flight, and an optional
+  token rate limit (tokens per minute over a sliding one-minute window).
+- Token usage per agent name, for all tasks together.
+
+The client an agent gets is a PooledModelClient: a thin ChatCompletionClient
+wrapper that looks up the shared client of the running loop, applies the
+limits and records the usage of that agent.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, AsyncGenerator, Dict, Mapping, Optional, Sequence, Tuple, Union
+
+import openai
+from pydantic import BaseModel
+from autogen_core import CancellationToken
+from autogen_core.models import (
+    ChatCompletionClient, CreateResult, LLMMessage, ModelCapabilities, ModelInfo, RequestUsage
+)
+from autogen_core.tools import Tool, ToolSchema
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+
+# Model requests in flight at the same time, over all agents and tasks
+MODEL_MAX_CONCURRENCY = 16
+
+# Window of the token rate limit, in seconds
+RATE_WINDOW = 60.0
+
+
+class TokenRateLimiter:
+    """
+    Keeps the tokens used in any one-minute window under tokens_per_minute.
+
+    A request reserves its estimated tokens before it is sent and the
+    reservation is corrected to the tokens actually used afterwards. A request
+    larger than the whole limit waits for an otherwise empty window.
+    """
+
+    def __init__(self, tokens_per_minute: Optional[int] = None):
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()  # shared by the event loops of all threads
+        self._window: deque = deque()  # [start time, tokens, live] per request, oldest first
+        self._used = 0
+
+    def _expire(self, now: float) -> None:
+        while self._window and self._window[0][0] <= now - RATE_WINDOW:
+            entry = self._window.popleft()
+            self._used -= entry[1]
+            entry[2] = False
+
+    async def acquire(self, tokens: int) -> Optional[list]:
+        """
+        Wait until the tokens fit in the window and reserve them.
+
+        Returns:
+            The reservation to pass to settle(), or None without a limit
+        """
+        if not self.tokens_per_minute:
+            return None
+        tokens = min(max(tokens, 0), self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                if self._used + tokens <= self.tokens_per_minute:
+                    entry = [now, tokens, True]
+                    self._window.append(entry)
+                    self._used += tokens
+                    return entry
+                wait = self._window[0][0] + RATE_WINDOW - now
+            await asyncio.sleep(max(wait, 0.05))
+
+    def settle(self, entry: Optional[list], tokens: int) -> None:
+        """Replace a reservation's estimate by the tokens actually used."""
+        if entry is None:
+            return
+        with self._lock:
+            if entry[2]:
+                self._used += tokens - entry[1]
+                entry[1] = tokens
+
+
+class PooledModelClient(ChatCompletionClient):
+    """
+    Model client of one agent, running its requests on a shared client under the pool's limits.
+    """
+
+    def __init__(self, pool: "ModelClientPool", agent_name: str, config: Mapping[str, Any]):
+        self._pool = pool
+        self.agent_name = agent_name
+        self._config = dict(config)
+        self._usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    @property
+    def _client(self) -> ChatCompletionClient:
+        """The shared client of the running event loop."""
+        return self._pool.shared_client(self._config)
+
+    async def _reserve(self, messages: Sequence[LLMMessage], tools: Sequence[Union[Tool, ToolSchema]]) -> Optional[list]:
+        if not self._pool.rate_limiter.tokens_per_minute:
+            return None
+        try:
+            estimate = self._client.count_tokens(messages, tools=tools)
+        except Exception:
+            estimate = 0  # unknown model: only the actual usage is counted
+        return await self._pool.rate_limiter.acquire(estimate)
+
+    def _record(self, reservation: Optional[list], usage: Optional[RequestUsage]) -> None:
+        usage = usage or RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._pool.rate_limiter.settle(reservation, usage.prompt_tokens + usage.completion_tokens)
+        self._usage = RequestUsage(prompt_tokens=self._usage.prompt_tokens + usage.prompt_tokens,
+                                   completion_tokens=self._usage.completion_tokens + usage.completion_tokens)
+        self._pool.add_usage(self.agent_name, usage)
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Union[Tool, ToolSchema]] = [],
+        tool_choice: Any = "auto",
+        json_output: Optional[Union[bool, type[BaseModel]]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        # Wait for the token budget first, so waiting requests do not hold a slot
+        reservation = await self._reserve(messages, tools)
+        result = None
+        try:
+            async with self._pool.request_slot():
+                result = await self._client.create(
+                    messages, tools=tools, tool_choice=tool_choice, json_output=json_output,
+                    extra_create_args=extra_create_args, cancellation_token=cancellation_token
+                )
+                return result
+        finally:
+            self._record(reservation, result.usage if result is not None else None)
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Union[Tool, ToolSchema]] = [],
+        tool_choice: Any = "auto",
+        json_output: Optional[Union[bool, type[BaseModel]]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        reservation = await self._reserve(messages, tools)
+        usage = None
+        try:
+            async with self._pool.request_slot():
+                async for chunk in self._client.create_stream(
+                    messages, tools=tools, tool_choice=tool_choice, json_output=json_output,
+                    extra_create_args=extra_create_args, cancellation_token=cancellation_token
+                ):
+                    if isinstance(chunk, CreateResult):
+                        usage = chunk.usage
+                    yield chunk
+        finally:
+            self._record(reservation, usage)
+
+    async def close(self) -> None:
+        """Nothing to close: the shared client is closed by the pool."""
+
+    def actual_usage(self) -> RequestUsage:
+        return self._usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._usage
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Union[Tool, ToolSchema]] = []) -> int:
+        return self._client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Union[Tool, ToolSchema]] = []) -> int:
+        return self._client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
+
+
+class ModelClientPool:
+    """
+    Shared model clients with global request and token limits.
+    """
+
+    def __init__(self, max_concurrency: int = MODEL_MAX_CONCURRENCY, tokens_per_minute: Optional[int] = None):
+        """
+        Create a pool.
+
+        Args:
+            max_concurrency: Maximum number of model requests in flight
+            tokens_per_minute: Maximum tokens (prompt and completion) used per minute (None: no limit)
+        """
+        self._lock = threading.Lock()
+        # Semaphores and HTTP connections belong to one event loop, so there is
+        # a semaphore, and a set of clients, per loop. None holds the clients
+        # used outside a loop, which only answer model_info and count_tokens.
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self._http_clients: Dict[Tuple[Optional[asyncio.AbstractEventLoop], str], Any] = {}  # (loop, endpoint) -> HTTP client
+        self._clients: Dict[Tuple[Optional[asyncio.AbstractEventLoop], str, str], ChatCompletionClient] = {}  # (loop, endpoint, settings) -> client
+        self._agent_clients: Dict[Tuple[str, str, str], PooledModelClient] = {}
+        self._usage: Dict[str, RequestUsage] = {}  # agent name -> tokens used
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = TokenRateLimiter(tokens_per_minute)
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def configure(self, max_concurrency: int = MODEL_MAX_CONCURRENCY, tokens_per_minute: Optional[int] = None) -> None:
+        """
+        Change the limits; requests already waiting keep the old concurrency limit.
+
+        Args:
+            max_concurrency: Maximum number of model requests in flight
+            tokens_per_minute: Maximum tokens used per minute (None: no limit)
+        """
+        with self._lock:
+            self.max_concurrency = max(1, max_concurrency)
+            self._semaphores = weakref.WeakKeyDictionary()
+            self.rate_limiter.tokens_per_minute = tokens_per_minute
+
+    def request_slot(self) -> asyncio.Semaphore:
+        """The semaphore bounding the requests in flight, for the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._drop_closed_loops()
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    @staticmethod
+    def _endpoint(config: Mapping[str, Any]) -> str:
+        return config.get("base_url") or os.getenv("OPENAI_BASE_URL") or "default"
+
+    def _drop_closed_loops(self) -> None:
+        """Forget the clients of closed event loops; their connections can no longer be used or closed."""
+        for key in [key for key in self._clients if key[0] is not None and key[0].is_closed()]:
+            del self._clients[key]
+        for key in [key for key in self._http_clients if key[0] is not None and key[0].is_closed()]:
+            del self._http_clients[key]
+        for loop in [loop for loop in self._semaphores.keys() if loop.is_closed()]:
+            del self._semaphores[loop]
+
+    def shared_client(self, config: Mapping[str, Any]) -> ChatCompletionClient:
+        """
+        Get the underlying client for an endpoint and settings, in the running event loop.
+
+        Args:
+            config: OpenAIChatCompletionClient arguments ("model", "temperature", ...)
+
+        Returns:
+            The OpenAIChatCompletionClient of the running loop, created on first use
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        endpoint = self._endpoint(config)
+        settings = json.dumps(dict(config), sort_keys=True, default=str)
+        with self._lock:
+            client = self._clients.get((loop, endpoint, settings))
+            if client is not None:
+                return client
+            self._drop_closed_loops()
+            client_config = dict(config)
+            if "http_client" not in client_config:
+                http_client = self._http_clients.get((loop, endpoint))
+                if http_client is None:
+                    http_client = openai.DefaultAsyncHttpxClient()
+                    self._http_clients[(loop, endpoint)] = http_client
+                client_config["http_client"] = http_client
+            client = OpenAIChatCompletionClient(**client_config)
+            self._clients[(loop, endpoint, settings)] = client
+            return client
+
+    def get_client(self, agent_name: str, config: Mapping[str, Any]) -> PooledModelClient:
+        """
+        Get the model client of an agent.
+
+        Agents with the same name and configuration get the same client, and
+        all clients with the same endpoint and settings share one underlying
+        OpenAIChatCompletionClient in each event loop.
+
+        Args:
+            agent_name: Name the usage is recorded under
+            config: OpenAIChatCompletionClient arguments ("model", "temperature", ...)
+
+        Returns:
+            The PooledModelClient
+        """
+        endpoint = self._endpoint(config)
+        settings = json.dumps(dict(config), sort_keys=True, default=str)
+        with self._lock:
+            agent_client = self._agent_clients.get((agent_name, endpoint, settings))
+            if agent_client is not None:
+                return agent_client
+            agent_client = PooledModelClient(self, agent_name, config)
+            self._agent_clients[(agent_name, endpoint, settings)] = agent_client
+            return agent_client
+
+    def add_usage(self, agent_name: str, usage: RequestUsage) -> None:
+        with self._lock:
+            total = self._usage.get(agent_name, RequestUsage(prompt_tokens=0, completion_tokens=0))
+            self._usage[agent_name] = RequestUsage(prompt_tokens=total.prompt_tokens + usage.prompt_tokens,
+                                                   completion_tokens=total.completion_tokens + usage.completion_tokens)
+
+    def get_usage(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the tokens used through the pool, over all tasks.
+
+        Returns:
+            Dictionary mapping agent name and "total" to
+            {"prompt_tokens": ..., "completion_tokens": ...}
+        """
+        with self._lock:
+            usage = {name: {"prompt_tokens": u.prompt_tokens, "completion_tokens": u.completion_tokens}
+                     for name, u in self._usage.items()}
+        usage["total"] = {
+            "prompt_tokens": sum(u["prompt_tokens"] for u in usage.values()),
+            "completion_tokens": sum(u["completion_tokens"] for u in usage.values())
+        }
+        return usage
+
+    def reset_usage(self) -> None:
+        with self._lock:
+            self._usage.clear()
+
+    async def close(self) -> None:
+        """Close the shared clients and HTTP connections of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = [self._clients.pop(key) for key in list(self._clients) if key[0] in (loop, None)]
+            http_clients = [self._http_clients.pop(key) for key in list(self._http_clients) if key[0] in (loop, None)]
+            self._drop_closed_loops()
+        for client in clients:
+            await client.close()
+        for http_client in http_clients:
+            await http_client.aclose()
+
+
+# The process-wide pool
+_pool: Optional[ModelClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_model_client_pool() -> ModelClientPool:
+    """Get the process-wide model client pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelClientPool()
+        return _pool
@@ -0,0 +1,195 @@
+"""
+Fuzzy name index of a database schema.
+
+Misspelled or half-remembered table and column names ("satscore",
+"FreeMealCount", "county") are matched against the schema with trigram
+postings: every name is normalized (lower-cased, separators dropped) and
+indexed by its character trigrams, together with its expanded English name
+from tables.json. A lookup only scores the names sharing a trigram with the
+query, and only the best of those are rescored by edit similarity, so
+ranked corrections take well under a millisecond.
+"""
+
+import re
+import weakref
+from difflib import SequenceMatcher
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from memory_content_types import TableSchema
+from schema_catalog import SchemaCatalog
+
+# Trigram matches rescored by edit similarity per lookup
+RERANK_CANDIDATES = 10
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case a name and drop everything but letters and digits ("Free Meal_Count" -> "freemealcount")."""
+    return re.sub(r"[^0-9a-z]", "", name.lower())
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Trigram index over names, each with optional alternative spellings.
+    """
+
+    def __init__(self, items: Iterable[Tuple[Hashable, Iterable[str]]]):
+        """
+        Index names.
+
+        Args:
+            items: (key, texts) per name; texts are the name itself and its
+                expanded names, all of which are matched
+        """
+        self._keys: List[Hashable] = []
+        self._texts: List[Tuple[int, str, set]] = []  # (key index, normalized text, trigrams)
+        self._postings: Dict[str, List[int]] = {}
+        for key, texts in items:
+            key_idx = len(self._keys)
+            self._keys.append(key)
+            for text in dict.fromkeys(normalize_name(str(t)) for t in texts if t and str(t) != 'nan'):
+                if not text:
+                    continue
+                text_idx = len(self._texts)
+                grams = _trigrams(text)
+                self._texts.append((key_idx, text, grams))
+                for gram in grams:
+                    self._postings.setdefault(gram, []).append(text_idx)
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.4,
+               accept: Optional[Callable[[Hashable], bool]] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Rank the names closest to a query.
+
+        Names sharing trigrams with the query are shortlisted by the Jaccard
+        similarity of their trigrams; the best RERANK_CANDIDATES of them are
+        then scored by the better of that and their edit similarity, which
+        also catches swapped letters ("usres"). A normalized exact match
+        scores 1.0, and a name containing the query (or the other way
+        around, e.g. "user" and "users") at least 0.7.
+
+        Args:
+            query: The (possibly misspelled) name
+            limit: Maximum number of names
+            min_score: Minimum score to return a name
+            accept: Optional filter on the keys to return
+
+        Returns:
+            (key, score) pairs, best first
+        """
+        text = normalize_name(query)
+        if not text:
+            return []
+        grams = _trigrams(text)
+        shared: Dict[int, int] = {}  # text index -> trigrams shared with the query
+        for gram in grams:
+            for text_idx in self._postings.get(gram, ()):
+                shared[text_idx] = shared.get(text_idx, 0) + 1
+        candidates = []
+        for text_idx, count in shared.items():
+            key_idx = self._texts[text_idx][0]
+            if accept is None or accept(self._keys[key_idx]):
+                candidates.append((count / (len(grams) + len(self._texts[text_idx][2]) - count), text_idx))
+        candidates.sort(key=lambda item: -item[0])
+
+        best: Dict[int, float] = {}
+        for score, text_idx in candidates[:RERANK_CANDIDATES]:
+            key_idx, name, _ = self._texts[text_idx]
+            if name == text:
+                score = 1.0
+            else:
+                score = max(score, SequenceMatcher(None, text, name).ratio())
+                if len(text) >= 3 and len(name) >= 3 and (text in name or name in text):
+                    score = max(score, 0.7)
+            if score > best.get(key_idx, 0.0):
+                best[key_idx] = score
+        ranked = sorted(((idx, score) for idx, score in best.items() if score >= min_score),
+                        key=lambda item: (-item[1], item[0]))
+        return [(self._keys[idx], round(score, 3)) for idx, score in ranked[:limit]]
+
+
+class SchemaNameIndex:
+    """
+    Fuzzy lookup of the tables and columns of one database.
+    """
+
+    def __init__(self, tables: Dict[str, TableSchema],
+                 table_full_names: Optional[Dict[str, str]] = None,
+                 column_descriptions: Optional[Dict[str, Dict[str, Tuple[str, str]]]] = None):
+        """
+        Index the names of a schema.
+
+        Args:
+            tables: Table name -> TableSchema
+            table_full_names: Table name -> expanded name from tables.json
+            column_descriptions: Table -> column -> (expanded name, description)
+        """
+        table_full_names = table_full_names or {}
+        column_descriptions = column_descriptions or {}
+        self.tables = NameIndex(
+            (table_name, [table_name, table_full_names.get(table_name)]) for table_name in tables
+        )
+        self.columns: Dict[str, NameIndex] = {}
+        all_columns = []
+        for table_name, table in tables.items():
+            descriptions = column_descriptions.get(table_name, {})
+            items = [(column_name, [column_name, descriptions.get(column_name, ("", ""))[0]])
+                     for column_name in table.columns]
+            self.columns[table_name] = NameIndex(items)
+            all_columns.extend(((table_name, column_name), texts) for column_name, texts in items)
+        self.all_columns = NameIndex(all_columns)
+
+    @classmethod
+    def from_catalog(cls, catalog: SchemaCatalog) -> 'SchemaNameIndex':
+        """Index the names of a catalog."""
+        return cls(catalog.tables, catalog.table_full_names, catalog.column_descriptions)
+
+    def similar_tables(self, name: str, limit: int = 5) -> List[str]:
+        """The tables whose names are closest to a name, best first."""
+        return [table for table, _ in self.tables.search(name, limit)]
+
+    def similar_columns(self, table_name: str, name: str, limit: int = 5) -> List[str]:
+        """The columns of a table whose names are closest to a name, best first."""
+        index = self.columns.get(table_name)
+        return [column for column, _ in index.search(name, limit)] if index is not None else []
+
+    def similar_columns_elsewhere(self, table_name: str, name: str, limit: int = 3) -> List[Dict[str, object]]:
+        """The closest columns of the other tables, as {"table", "column", "score"}."""
+        matches = self.all_columns.search(name, limit, accept=lambda key: key[0] != table_name)
+        return [{"table": table, "column": column, "score": score} for (table, column), score in matches]
+
+
+# SchemaCatalog -> its name index
+_indexes: "weakref.WeakKeyDictionary[SchemaCatalog, SchemaNameIndex]" = weakref.WeakKeyDictionary()
+
+
+def get_catalog_name_index(catalog: SchemaCatalog) -> SchemaNameIndex:
+    """Get the shared name index of a catalog, building it on first use."""
+    index = _indexes.get(catalog)
+    if index is None:
+        index = SchemaNameIndex.from_catalog(catalog)
+        _indexes[catalog] = index
+    return index
+
+
+async def get_name_index(schema_manager) -> SchemaNameIndex:
+    """
+    Get the name index of the schema held by a DatabaseSchemaManager.
+
+    A schema loaded from a SchemaReader uses its catalog's shared index; for
+    any other schema a new index is built.
+
+    Args:
+        schema_manager: The DatabaseSchemaManager of the task
+
+    Returns:
+        The SchemaNameIndex
+    """
+    catalog = await schema_manager.get_catalog()
+    if catalog is not None:
+        return get_catalog_name_index(catalog)
+    return SchemaNameIndex(await schema_manager.get_all_tables())
@@ -3,15 +3,26 @@ Node history manager for text-to-SQL tree orchestration.
 
 This module provides node operation history stored in KeyValueMemory.
 All nodes share QueryNode structure for consistency and essential information storage.
+
+The history is an append-only log. Each manager keeps the log in process with
+indexes by node and by operation type and the materialized latest state of
+every node, so lookups never rescan or replay the whole history. Operations
+are appended with KeyValueMemory.append, which shares the logged operations
+with the new list, so recording one does not copy or re-serialize them. Payloads that did not change since a
+node's previous operation are shared with that operation instead of being
+stored again.
 """
 
 import logging
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
-from keyvalue_memory import KeyValueMemory
+from keyvalue_memory import KeyValueMemory, thaw
 from memory_content_types import NodeOperation, NodeOperationType, QueryNode, NodeStatus
 
+# Top-level payloads shared with the node's previous operation when unchanged
+_SHARED_PAYLOADS = ("intent", "evidence", "schema_linking", "generation", "evaluation", "decomposition")
+
 
 class NodeHistoryManager:
     """Manages node operation history with QueryNode structure consistency."""
@@ -25,12 +36,103 @@ class NodeHistoryManager:
         """
         self.memory = memory
         self.logger = logging.getLogger(self.__class__.__name__)
+        self._reset()
+    
+    def _reset(self) -> None:
+        self._log: List[Dict[str, Any]] = []  # operation dicts, never modified once logged
+        self._by_node: Dict[str, List[int]] = {}
+        self._by_type: Dict[str, List[int]] = {}
+        self._state: Dict[str, Dict[str, Any]] = {}  # nodeId -> materialized node data
+        self._synced = None  # memory item the log was last synced with
     
     async def initialize(self) -> None:
         """Initialize an empty node history."""
         await self.memory.set("nodeHistory", [])
+        self._reset()
+        self._mark_synced(await self.memory.get_with_details("nodeHistory"))
         self.logger.info("Initialized empty node history")
     
+    def _mark_synced(self, item) -> None:
+        self._synced = item
+    
+    async def _sync(self) -> None:
+        """Catch up with history written by other managers sharing the memory."""
+        item = await self.memory.get_with_details("nodeHistory")
+        if item is self._synced:
+            return
+        history = await self.memory.get_view("nodeHistory") or []
+        n = len(self._log)
+        last = thaw(history[n - 1:n], deep=False) if n and len(history) >= n else None
+        if last and (last[0] is self._log[n - 1] or last[0] == self._log[n - 1]):
+            # Appended to our log: index only the new operations
+            new_operations = thaw(history[n:], deep=False)
+        else:
+            self._reset()
+            new_operations = thaw(history, deep=False)
+        for op in new_operations:
+            self._index_operation(op)
+        self._mark_synced(item)
+    
+    def _index_operation(self, op: Dict[str, Any]) -> None:
+        """Append an operation to the log and update the indexes and node state."""
+        position = len(self._log)
+        self._log.append(op)
+        node_id = op["nodeId"]
+        self._by_node.setdefault(node_id, []).append(position)
+        self._by_type.setdefault(op["operation"], []).append(position)
+        
+        # Latest CREATE or REVISE operation with full node data is the new base state
+        data = op["data"]
+        if (op["operation"] in (NodeOperationType.CREATE.value, NodeOperationType.REVISE.value) and
+                "nodeId" in data and "status" in data and "intent" in data):
+            self._state[node_id] = thaw(data)
+        elif node_id in self._state:
+            self._apply_operation(self._state[node_id], op)
+    
+    def _apply_operation(self, data: Dict[str, Any], op: Dict[str, Any]) -> None:
+        """Apply a GENERATE_SQL or EXECUTE operation to materialized node data."""
+        op_data = op["data"]
+        if op["operation"] == NodeOperationType.GENERATE_SQL.value:
+            if "generation" not in data:
+                data["generation"] = {}
+            # Get SQL from the operation data (it's stored in the generation field)
+            if "generation" in op_data and "sql" in op_data["generation"]:
+                data["generation"]["sql"] = op_data["generation"]["sql"]
+            elif "sql" in op_data:
+                data["generation"]["sql"] = op_data["sql"]
+            
+            if "generation" in op_data:
+                if "sql_type" in op_data["generation"]:
+                    data["generation"]["sql_type"] = op_data["generation"]["sql_type"]
+                if "confidence" in op_data["generation"]:
+                    data["generation"]["confidence"] = op_data["generation"]["confidence"]
+            elif "sql_type" in op_data:
+                data["generation"]["sql_type"] = op_data["sql_type"]
+            elif "confidence" in op_data:
+                data["generation"]["confidence"] = op_data["confidence"]
+            
+            data["status"] = NodeStatus.SQL_GENERATED.value
+        
+        elif op["operation"] == NodeOperationType.EXECUTE.value:
+            # Check for execution result in generation field first (SQL Generator now executes)
+            if "generation" in op_data and "execution_result" in op_data["generation"]:
+                data.setdefault("generation", {})["execution_result"] = op_data["generation"]["execution_result"]
+            elif "evaluation" in op_data and "execution_result" in op_data["evaluation"]:
+                data.setdefault("evaluation", {})["execution_result"] = op_data["evaluation"]["execution_result"]
+            elif "result" in op_data:
+                # Store in generation field by default for new executions
+                data.setdefault("generation", {})["execution_result"] = op_data["result"]
+            
+            if op_data.get("error"):
+                data["status"] = NodeStatus.EXECUTED_FAILED.value
+                data.setdefault("evaluation", {})["error"] = op_data["error"]
+            else:
+                data["status"] = NodeStatus.EXECUTED_SUCCESS.value
+                data.setdefault("evaluation", {})["success"] = True
+    
+    def _operations(self, positions: List[int]) -> List[NodeOperation]:
+        return [NodeOperation.from_dict(thaw(self._log[i])) for i in positions]
+    
     def _extract_essential_node_info(self, node: QueryNode) -> Dict[str, Any]:
         """
         Extract essential information from a QueryNode, removing verbose content.
@@ -128,11 +230,22 @@ class NodeHistoryManager:
             operation_type: The type of operation being performed
             additional_data: Optional additional data to include
         """
+        await self._sync()
         essential_info = self._extract_essential_node_info(node)
         
         # Add any additional data
         if additional_data:
             essential_info.update(additional_data)
+        # Logged operations are never modified, so detach them from the node
+        essential_info = thaw(essential_info)
+        
+        # Share payloads that did not change since the node's previous operation
+        positions = self._by_node.get(node.nodeId)
+        if positions:
+            previous = self._log[positions[-1]]["data"]
+            for key in _SHARED_PAYLOADS:
+                if key in essential_info and key in previous and previous[key] == essential_info[key]:
+                    essential_info[key] = previous[key]
         
         operation = NodeOperation(
             timestamp=datetime.now().isoformat(),
@@ -141,12 +254,10 @@ class NodeHistoryManager:
             data=essential_info
         )
         
-        history = await self.memory.get("nodeHistory")
-        if history is None:
-            history = []
-        
-        history.append(operation.to_dict())
-        await self.memory.set("nodeHistory", history)
+        op = operation.to_dict()
+        await self.memory.append("nodeHistory", op, copy=False)
+        self._index_operation(op)
+        self._mark_synced(await self.memory.get_with_details("nodeHistory"))
         self.logger.info(f"Recorded {operation_type.value} operation for node {node.nodeId}")
     
     async def record_create(self, node: QueryNode) -> None:
@@ -207,11 +318,8 @@ class NodeHistoryManager:
         Returns:
             List of all operations
         """
-        history = await self.memory.get("nodeHistory")
-        if not history:
-            return []
-        
-        return [NodeOperation.from_dict(op) for op in history]
+        await self._sync()
+        return self._operations(range(len(self._log)))
     
     async def get_node_operations(self, node_id: str) -> List[NodeOperation]:
         """
@@ -223,8 +331,8 @@ class NodeHistoryManager:
         Returns:
             List of operations for the node
         """
-        all_operations = await self.get_all_operations()
-        return [op for op in all_operations if op.nodeId == node_id]
+        await self._sync()
+        return self._operations(self._by_node.get(node_id, []))
     
     async def get_operations_by_type(self, operation_type: NodeOperationType) -> List[NodeOperation]:
         """
@@ -236,12 +344,12 @@ class NodeHistoryManager:
         Returns:
             List of operations of the specified type
         """
-        all_operations = await self.get_all_operations()
-        return [op for op in all_operations if op.operation == operation_type]
+        await self._sync()
+        return self._operations(self._by_type.get(operation_type.value, []))
     
     async def get_current_node_state(self, node_id: str) -> Optional[QueryNode]:
         """
-        Reconstruct the current QueryNode state from operation history.
+        Get the current QueryNode state, as materialized from the operation history.
         
         Args:
             node_id: The node ID
@@ -249,79 +357,14 @@ class NodeHistoryManager:
         Returns:
             Current QueryNode state or None if not found
         """
-        operations = await self.get_node_operations(node_id)
-        if not operations:
-            return None
-        
-        # Start with the latest CREATE or REVISE operation that has full node data
-        base_operation = None
-        for op in reversed(operations):
-            if (op.operation in [NodeOperationType.CREATE, NodeOperationType.REVISE] and 
-                "nodeId" in op.data and "status" in op.data and "intent" in op.data):
-                base_operation = op
-                break
-        
-        if not base_operation:
+        await self._sync()
+        data = self._state.get(node_id)
+        if data is None:
             return None
         
-        # Build QueryNode from base operation data
-        data = base_operation.data.copy()
-        
-        # Apply subsequent operations in chronological order
-        base_time = base_operation.timestamp
-        for op in operations:
-            if op.timestamp > base_time:
-                if op.operation == NodeOperationType.GENERATE_SQL:
-                    if "generation" not in data:
-                        data["generation"] = {}
-                    # Get SQL from the operation data (it's stored in the generation field)
-                    if "generation" in op.data and "sql" in op.data["generation"]:
-                        data["generation"]["sql"] = op.data["generation"]["sql"]
-                    elif "sql" in op.data:
-                        data["generation"]["sql"] = op.data["sql"]
-                    
-                    if "generation" in op.data:
-                        if "sql_type" in op.data["generation"]:
-                            data["generation"]["sql_type"] = op.data["generation"]["sql_type"]
-                        if "confidence" in op.data["generation"]:
-                            data["generation"]["confidence"] = op.data["generation"]["confidence"]
-                    elif "sql_type" in op.data:
-                        data["generation"]["sql_type"] = op.data["sql_type"]
-                    elif "confidence" in op.data:
-                        data["generation"]["confidence"] = op.data["confidence"]
-                    
-                    data["status"] = NodeStatus.SQL_GENERATED.value
-                
-                elif op.operation == NodeOperationType.EXECUTE:
-                    # Check for execution result in generation field first (SQL Generator now executes)
-                    exec_result = None
-                    if "generation" in op.data and "execution_result" in op.data["generation"]:
-                        exec_result = op.data["generation"]["execution_result"]
-                        if "generation" not in data:
-                            data["generation"] = {}
-                        data["generation"]["execution_result"] = exec_result
-                    elif "evaluation" in op.data and "execution_result" in op.data["evaluation"]:
-                        exec_result = op.data["evaluation"]["execution_result"]
-                        if "evaluation" not in data:
-                            data["evaluation"] = {}
-                        data["evaluation"]["execution_result"] = exec_result
-                    elif "result" in op.data:
-                        exec_result = op.data["result"]
-                        # Store in generation field by default for new executions
-                        if "generation" not in data:
-                            data["generation"] = {}
-                        data["generation"]["execution_result"] = exec_result
-                    
-                    if op.data.get("error"):
-                        data["status"] = NodeStatus.EXECUTED_FAILED.value
-                        data["evaluation"]["error"] = op.data["error"]
-                    else:
-                        data["status"] = NodeStatus.EXECUTED_SUCCESS.value
-                        data["evaluation"]["success"] = True
-        
         # Convert back to QueryNode
         try:
-            return QueryNode.from_dict(data)
+            return QueryNode.from_dict(thaw(data))
         except Exception as e:
             self.logger.error(f"Failed to reconstruct QueryNode from history: {e}")
             return None
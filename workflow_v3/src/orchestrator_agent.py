@@ -29,6 +29,7 @@ from schema_linker_agent import SchemaLinkerAgent
 from sql_generator_agent import SQLGeneratorAgent
 from sql_evaluator_agent import SQLEvaluatorAgent
 from sql_executor import SQLExecutor
+from model_client_pool import get_model_client_pool
 
 from memory_content_types import TaskStatus, NodeStatus
 
@@ -137,11 +138,8 @@ class OrchestratorAgent:
         )
     
     def _create_model_client(self):
-        """Create the model client for the agent."""
-        # This is a placeholder - implement based on your autogen setup
-        # You'll need to configure the appropriate model client here
-        from autogen_ext.models import OpenAIChatCompletionClient
-        return OpenAIChatCompletionClient(model=self.model_name)
+        """Get the model client for the agent from the process-wide pool."""
+        return get_model_client_pool().get_client("orchestrator", {"model": self.model_name})
     
     async def _analyze_query(self, query: str) -> Dict[str, Any]:
         """
@@ -12,6 +12,7 @@ Find all required table names and column names to answer the user query. Use EXA
 - DO show all potentially relevant columns with their sample data
 - DO select minimal essential columns for precise SQL output
 - DO check typical_values for exact matches when linking query terms
+- DO take join conditions from join_paths when provided - they follow the foreign keys
 
 ## DON'T RULES
 - DON'T use tables/columns that don't exist in the schema
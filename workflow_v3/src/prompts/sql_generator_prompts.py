@@ -210,6 +210,8 @@ When retrying failed SQL generation:
 - `list_all_tables()` - Get all available tables when schema mapping unclear
 - `check_table_columns(table_name)` - Verify table exists and get column details
 - `check_column_exists(table_name, column_name)` - Verify specific column exists
+- `find_values(value)` - Find which columns store a literal value from the question, and its exact stored form
+- `find_join_path(tables)` - Get the foreign key joins connecting tables, including tables in between
 
 **SQL Execution Tool (ALWAYS required):**
 - `execute_sql(sql)` - **MANDATORY after every SQL generation**
@@ -21,6 +21,7 @@ from memory_content_types import (
     QueryNode, NodeStatus
 )
 from prompts import SUBQ_PATTERN, SQL_CONSTRAINTS
+from schema_xml import render_schema_xml
 from utils import parse_xml_hybrid
 
 
@@ -128,7 +129,7 @@ class QueryAnalyzerAgent(BaseMemoryAgent):
             self.logger.info("Found schema information in parent node")
         # QueryAnalyzer can read directly from database if no schema info in nodes
         else:
-            schema_xml = await self._get_schema_xml()
+            schema_xml = await self._get_schema_xml("\n".join(filter(None, [query, evidence])))
             context["schema"] = schema_xml
             self.logger.info("Reading schema directly from database (QueryAnalyzer privilege)")
         
@@ -259,39 +260,21 @@ class QueryAnalyzerAgent(BaseMemoryAgent):
         except Exception as e:
             self.logger.error(f"Error parsing analysis results: {str(e)}", exc_info=True)
     
-    async def _get_schema_xml(self) -> str:
-        """Get database schema in XML format"""
-        tables = await self.schema_manager.get_all_tables()
-        
-        if not tables:
+    async def _get_schema_xml(self, query: Optional[str] = None) -> str:
+        """
+        Get database schema in XML format, without typical values.
+        
+        With llm_config["schema_token_budget"] set, the columns least relevant
+        to the query are left out to fit the budget.
+        """
+        rendered = await render_schema_xml(self.schema_manager, query,
+                                           max_tokens=self.llm_config.get("schema_token_budget"),
+                                           include_values=False, include_description=False)
+        if rendered is None:
             return "<database_schema>No schema loaded</database_schema>"
         
-        xml_parts = ["<database_schema>"]
-        
-        for table_name, table in tables.items():
-            xml_parts.append(f'  <table name="{table_name}">')
-            
-            for col_name, col_info in table.columns.items():
-                xml_parts.append(f'    <column name="{col_name}">')
-                xml_parts.append(f'      <type>{col_info.dataType}</type>')
-                xml_parts.append(f'      <nullable>{col_info.nullable}</nullable>')
-                
-                if col_info.isPrimaryKey:
-                    xml_parts.append('      <primary_key>true</primary_key>')
-                
-                if col_info.isForeignKey and col_info.references:
-                    xml_parts.append(f'      <foreign_key>')
-                    xml_parts.append(f'        <references_table>{col_info.references["table"]}</references_table>')
-                    xml_parts.append(f'        <references_column>{col_info.references["column"]}</references_column>')
-                    xml_parts.append(f'      </foreign_key>')
-                
-                xml_parts.append('    </column>')
-            
-            xml_parts.append('  </table>')
-        
-        xml_parts.append('</database_schema>')
-        
-        return '\n'.join(xml_parts)
+        self.logger.info(f"Schema XML: {rendered.tokens} tokens, {rendered.omitted_columns} columns omitted")
+        return rendered.xml
     
     def _parse_analysis_xml(self, output: str) -> Optional[Dict[str, Any]]:
         """Parse the analysis XML output using hybrid approach with robust fallback"""
@@ -485,51 +468,52 @@ class QueryAnalyzerAgent(BaseMemoryAgent):
             if parent_data and "nodes" in parent_data and parent_id in parent_data["nodes"]:
                 parent_schema_linking = parent_data["nodes"][parent_id].get("schema_linking")
         
-        # Create nodes for each subquery
+        # Create nodes for each subquery, writing the tree once
         created_nodes = []
-        for sq in subqueries:
-            # Generate node ID
-            node_id = f"node_{datetime.now().timestamp()}_{sq['id']}"
-            
-            # Create the node with just the basic info
-            # Other agent outputs will be populated later by respective agents
-            node = QueryNode(
-                nodeId=node_id,
-                intent=sq["intent"],
-                parentId=parent_id
-            )
-            
-            # Add to tree
-            await self.tree_manager.add_node(node, parent_id)
-            
-            # Store the subquery info directly in the node
-            await self.tree_manager.update_node(node_id, {"subqueryInfo": sq})
-            
-            # Inherit schema linking information from parent if available
-            if parent_schema_linking:
-                await self.tree_manager.update_node(node_id, {"schema_linking": parent_schema_linking})
-                self.logger.info(f"Inherited schema linking from parent {parent_id} to child {node_id}")
+        async with self.tree_manager.batch():
+            for sq in subqueries:
+                # Generate node ID
+                node_id = f"node_{datetime.now().timestamp()}_{sq['id']}"
                 
-                # Log inherited schema information for debugging
-                if isinstance(parent_schema_linking, dict) and "selected_tables" in parent_schema_linking:
-                    selected_tables = parent_schema_linking["selected_tables"]
-                    if isinstance(selected_tables, dict) and "table" in selected_tables:
-                        tables = selected_tables["table"]
-                        if isinstance(tables, list):
-                            table_names = [t.get("name", "unknown") for t in tables if isinstance(t, dict)]
-                            self.logger.info(f"  Inherited tables: {', '.join(table_names)}")
-                        elif isinstance(tables, dict):
-                            self.logger.info(f"  Inherited table: {tables.get('name', 'unknown')}")
-            else:
-                self.logger.warning(f"No schema linking found in parent {parent_id} to inherit")
-            
-            # Record in history
-            node = await self.tree_manager.get_node(node_id)
-            if node:
-                await self.history_manager.record_create(node)
-            
-            created_nodes.append(node_id)
-            self.logger.debug(f"Created subquery node: {node_id}")
+                # Create the node with just the basic info
+                # Other agent outputs will be populated later by respective agents
+                node = QueryNode(
+                    nodeId=node_id,
+                    intent=sq["intent"],
+                    parentId=parent_id
+                )
+                
+                # Add to tree
+                await self.tree_manager.add_node(node, parent_id)
+                
+                # Store the subquery info directly in the node
+                await self.tree_manager.update_node(node_id, {"subqueryInfo": sq})
+                
+                # Inherit schema linking information from parent if available
+                if parent_schema_linking:
+                    await self.tree_manager.update_node(node_id, {"schema_linking": parent_schema_linking})
+                    self.logger.info(f"Inherited schema linking from parent {parent_id} to child {node_id}")
+                
+                    # Log inherited schema information for debugging
+                    if isinstance(parent_schema_linking, dict) and "selected_tables" in parent_schema_linking:
+                        selected_tables = parent_schema_linking["selected_tables"]
+                        if isinstance(selected_tables, dict) and "table" in selected_tables:
+                            tables = selected_tables["table"]
+                            if isinstance(tables, list):
+                                table_names = [t.get("name", "unknown") for t in tables if isinstance(t, dict)]
+                                self.logger.info(f"  Inherited tables: {', '.join(table_names)}")
+                            elif isinstance(tables, dict):
+                                self.logger.info(f"  Inherited table: {tables.get('name', 'unknown')}")
+                else:
+                    self.logger.warning(f"No schema linking found in parent {parent_id} to inherit")
+                
+                # Record in history
+                node = await self.tree_manager.get_node(node_id)
+                if node:
+                    await self.history_manager.record_create(node)
+                
+                created_nodes.append(node_id)
+                self.logger.debug(f"Created subquery node: {node_id}")
         
         # Log summary of created nodes
         if created_nodes:
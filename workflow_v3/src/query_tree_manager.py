@@ -5,13 +5,146 @@ This module provides easy access to query tree data stored in KeyValueMemory.
 """
 
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Any, Set, Tuple
 from datetime import datetime
 
-from keyvalue_memory import KeyValueMemory
+from keyvalue_memory import KeyValueMemory, thaw
 from memory_content_types import QueryNode, ExecutionResult, NodeStatus
 
 
+# Node the current asyncio task works on, overriding the tree's currentNodeId
+_focus_node: ContextVar[Optional[str]] = ContextVar("focus_node", default=None)
+
+
+class _TreeEdit:
+    """
+    Working copy of the query tree.
+    
+    The tree is a small root index ({rootId, currentNodeId, nodes}) over
+    per-node records. Records are shared with the stored tree and are only
+    copied when a node is modified, so a write costs one pointer per node
+    plus the nodes that actually changed.
+    
+    The stored item the copy was taken from is kept, so that a write can be
+    rebased when another writer stored a newer tree in the meantime.
+    
+    Once a reader has seen the records (see publish()), the next write to a
+    node copies its record again instead of changing the one the reader
+    holds, so readers comparing records by identity see every change.
+    """
+    
+    def __init__(self, tree: Dict[str, Any], item: Any = None):
+        self.base = tree
+        self.item = item
+        self.tree = thaw(tree, deep=False)
+        self.tree["nodes"] = thaw(tree.get("nodes", {}), deep=False)
+        self._owned = set()  # nodes modified, added or replaced by this edit
+        self._writable = set()  # owned nodes whose records no reader has seen yet
+        self._removed = set()
+    
+    @property
+    def nodes(self) -> Dict[str, Any]:
+        return self.tree["nodes"]
+    
+    def node(self, node_id: str) -> Dict[str, Any]:
+        """Get a node record that may be modified."""
+        if node_id not in self._writable:
+            self.nodes[node_id] = thaw(self.nodes[node_id])
+            self._owned.add(node_id)
+            self._writable.add(node_id)
+        return self.nodes[node_id]
+    
+    def put_node(self, node_id: str, data: Dict[str, Any]) -> None:
+        self.nodes[node_id] = data
+        self._owned.add(node_id)
+        self._writable.add(node_id)
+        self._removed.discard(node_id)
+    
+    def remove_node(self, node_id: str) -> None:
+        self.nodes.pop(node_id, None)
+        self._owned.discard(node_id)
+        self._writable.discard(node_id)
+        self._removed.add(node_id)
+    
+    def publish(self) -> None:
+        """Mark the current records as seen by a reader: later writes copy them first."""
+        self._writable.clear()
+    
+    def rebase(self, tree: Dict[str, Any], item: Any) -> "_TreeEdit":
+        """
+        Apply the changes of this edit on top of a newer stored tree.
+        
+        Changes are merged per node: nodes this edit did not touch keep the
+        newer version, nodes it modified, added or removed take this edit's
+        version. Root fields (e.g. currentNodeId) are taken from this edit
+        only if it changed them.
+        """
+        merged = _TreeEdit(tree, item)
+        for key, value in self.tree.items():
+            if key != "nodes" and (key not in self.base or self.base[key] != value):
+                merged.tree[key] = value
+        for node_id in self._owned:
+            merged.put_node(node_id, self.nodes[node_id])
+        for node_id in self._removed:
+            merged.remove_node(node_id)
+        return merged
+
+
+class NodeChangeTracker:
+    """
+    Detects which nodes of the stored query tree changed between two polls.
+    
+    Unchanged node records are shared between tree versions (see _TreeEdit),
+    so in native memory mode changed nodes are found by identity, and nothing
+    is rescanned at all while the stored tree stays the same.
+    """
+    
+    def __init__(self, tree_manager: "QueryTreeManager"):
+        self.tree_manager = tree_manager
+        self.version = 0  # incremented whenever a change is detected
+        self.records: Dict[str, Dict[str, Any]] = {}  # nodeId -> node record, tree order; read-only
+        self.order: Dict[str, int] = {}  # nodeId -> position in the tree
+        self._item = None
+        self._tree = None
+    
+    async def poll(self) -> Tuple[Optional[Dict[str, Any]], List[str], List[str]]:
+        """
+        Compare the stored tree with the one seen by the previous poll.
+        
+        Returns:
+            Tuple of (read-only tree or None, changed or added node IDs, removed node IDs)
+        """
+        manager = self.tree_manager
+        item = None
+        if manager._edit is None:
+            item = await manager.memory.get_with_details("queryTree")
+            if item is not None and item is self._item:
+                return self._tree, [], []
+        else:
+            # Records of an open batch are only changed in place until they are seen
+            manager._edit.publish()
+        tree = await manager.get_tree_view()
+        nodes = thaw(tree["nodes"], deep=False) if tree and "nodes" in tree else {}
+        
+        changed = []
+        for node_id, record in nodes.items():
+            previous = self.records.get(node_id)
+            if previous is not record and previous != record:
+                changed.append(node_id)
+        removed = [node_id for node_id in self.records if node_id not in nodes]
+        
+        if removed or len(nodes) != len(self.order) or any(node_id not in self.order for node_id in changed):
+            self.order = {node_id: i for i, node_id in enumerate(nodes)}
+        self.records = nodes
+        self._item = item
+        self._tree = tree
+        if changed or removed:
+            self.version += 1
+        return tree, changed, removed
+
+
 class QueryTreeManager:
     """Manages query tree data in memory."""
     
@@ -24,6 +157,122 @@ class QueryTreeManager:
         """
         self.memory = memory
         self.logger = logging.getLogger(self.__class__.__name__)
+        self._edit: Optional[_TreeEdit] = None  # open batch, if any
+        # Nodes by their "status" field and leaf nodes, updated from changed nodes only
+        self._tracker = NodeChangeTracker(self)
+        self._by_status: Dict[str, Set[str]] = {}
+        self._node_status: Dict[str, Optional[str]] = {}
+        self._leaves: Set[str] = set()
+    
+    @asynccontextmanager
+    async def batch(self):
+        """
+        Group tree mutations into a single write.
+        
+        Mutations inside the block are applied to a working copy, which all
+        reads of this manager see, and the tree is written once when the
+        outermost block exits. If the outermost block raises, its changes
+        are discarded. Nested blocks join the enclosing batch.
+        
+        Example:
+            async with tree_manager.batch():
+                await tree_manager.add_node(node, parent_id)
+                await tree_manager.update_node(node.nodeId, {...})
+        """
+        if self._edit is not None:
+            yield self
+            return
+        edit = await self._load_edit()
+        if not edit:
+            raise ValueError("Query tree not initialized")
+        self._edit = edit
+        try:
+            yield self
+        except BaseException:
+            self._edit = None
+            raise
+        edit, self._edit = self._edit, None
+        await self._write(edit)
+    
+    @staticmethod
+    @contextmanager
+    def focus(node_id: str):
+        """
+        Make node_id the current node of the running asyncio task.
+        
+        Inside the block get_current_node_id() returns node_id (or whatever
+        set_current_node_id() moved it to) for every QueryTreeManager, while
+        the currentNodeId stored in the tree is left alone. Tasks started with
+        asyncio.gather() inside the block inherit the focus, and each task
+        can focus on its own node, so agents that work on "the current node"
+        can process several nodes concurrently.
+        
+        Example:
+            async def process(node_id):
+                with QueryTreeManager.focus(node_id):
+                    await sql_generator.get_tool().run(args, token)
+            
+            await asyncio.gather(*(process(n) for n in sibling_ids))
+        """
+        token = _focus_node.set(node_id)
+        try:
+            yield
+        finally:
+            _focus_node.reset(token)
+    
+    async def _read_tree(self) -> Optional[Dict[str, Any]]:
+        """The tree for read-only use: the open batch or a view of the stored tree."""
+        if self._edit is not None:
+            return self._edit.tree
+        return await self.memory.get_view("queryTree")
+    
+    async def _refresh_buckets(self) -> None:
+        _, changed, removed = await self._tracker.poll()
+        for node_id in removed:
+            self._by_status.get(self._node_status.pop(node_id, None), set()).discard(node_id)
+            self._leaves.discard(node_id)
+        for node_id in changed:
+            record = self._tracker.records[node_id]
+            status = record.get("status")
+            old_status = self._node_status.get(node_id)
+            if node_id not in self._node_status or old_status != status:
+                self._by_status.get(old_status, set()).discard(node_id)
+                self._by_status.setdefault(status, set()).add(node_id)
+                self._node_status[node_id] = status
+            if record.get("childIds", []):
+                self._leaves.discard(node_id)
+            else:
+                self._leaves.add(node_id)
+    
+    def _nodes_in(self, node_ids: Set[str], predicate=None) -> List[QueryNode]:
+        """QueryNodes for a bucket of node IDs, in tree order."""
+        records = self._tracker.records
+        ordered = sorted(node_ids, key=self._tracker.order.__getitem__)
+        return [QueryNode.from_dict(thaw(records[node_id])) for node_id in ordered
+                if predicate is None or predicate(records[node_id])]
+    
+    async def _load_edit(self) -> Optional[_TreeEdit]:
+        item = await self.memory.get_with_details("queryTree")
+        tree = await self.memory.get_view("queryTree")
+        return _TreeEdit(tree, item) if tree else None
+    
+    async def _begin_edit(self) -> Optional[_TreeEdit]:
+        if self._edit is not None:
+            return self._edit
+        return await self._load_edit()
+    
+    async def _write(self, edit: _TreeEdit) -> None:
+        # Another writer stored the tree after this edit was started (e.g. a
+        # concurrent batch): merge per node instead of overwriting its changes
+        item = await self.memory.get_with_details("queryTree")
+        if item is not None and edit.item is not None and item is not edit.item:
+            edit = edit.rebase(await self.memory.get_view("queryTree"), item)
+        await self.memory.set("queryTree", edit.tree, copy=False)
+    
+    async def _commit(self, edit: _TreeEdit) -> None:
+        # Inside a batch the write happens when the batch ends
+        if edit is not self._edit:
+            await self._write(edit)
     
     async def initialize(self, root_intent: str, evidence: Optional[str] = None) -> str:
         """
@@ -49,7 +298,10 @@ class QueryTreeManager:
             "nodes": {root_id: root_node.to_dict()}
         }
         
-        await self.memory.set("queryTree", query_tree)
+        if self._edit is not None:
+            self._edit = _TreeEdit(query_tree)
+        else:
+            await self.memory.set("queryTree", query_tree, copy=False)
         self.logger.info(f"Initialized query tree with root node {root_id}")
         if evidence:
             self.logger.info(f"Root node includes evidence: {evidence}")
@@ -58,11 +310,21 @@ class QueryTreeManager:
     
     async def get_tree(self) -> Optional[Dict[str, Any]]:
         """Get the complete query tree."""
+        if self._edit is not None:
+            return thaw(self._edit.tree)
         return await self.memory.get("queryTree")
     
+    async def get_tree_view(self) -> Optional[Dict[str, Any]]:
+        """
+        Get a read-only view of the query tree, without copying it.
+        
+        Use get_tree() to get a tree that may be modified.
+        """
+        return await self._read_tree()
+    
     async def get_root_id(self) -> Optional[str]:
         """Get the root node ID."""
-        tree = await self.get_tree()
+        tree = await self._read_tree()
         return tree.get("rootId") if tree else None
     
     async def get_root_node(self) -> Optional[QueryNode]:
@@ -73,16 +335,22 @@ class QueryTreeManager:
         return None
     
     async def get_current_node_id(self) -> Optional[str]:
-        """Get the current node ID."""
-        tree = await self.get_tree()
+        """Get the current node ID (the focused node inside focus())."""
+        focused = _focus_node.get()
+        if focused is not None:
+            return focused
+        tree = await self._read_tree()
         return tree.get("currentNodeId") if tree else None
     
     async def set_current_node_id(self, node_id: str) -> None:
-        """Set the current node ID."""
-        tree = await self.get_tree()
-        if tree:
-            tree["currentNodeId"] = node_id
-            await self.memory.set("queryTree", tree)
+        """Set the current node ID (only for the running task inside focus())."""
+        if _focus_node.get() is not None:
+            _focus_node.set(node_id)
+            return
+        edit = await self._begin_edit()
+        if edit:
+            edit.tree["currentNodeId"] = node_id
+            await self._commit(edit)
             self.logger.info(f"Set current node to {node_id}")
     
     async def add_node(self, node: QueryNode, parent_id: Optional[str] = None) -> None:
@@ -93,26 +361,25 @@ class QueryTreeManager:
             node: The node to add
             parent_id: Optional parent node ID
         """
-        tree = await self.get_tree()
-        if not tree:
+        edit = await self._begin_edit()
+        if not edit:
             raise ValueError("Query tree not initialized")
+        if parent_id and parent_id not in edit.nodes:
+            raise ValueError(f"Parent node {parent_id} not found")
         
         # Add the node
-        tree["nodes"][node.nodeId] = node.to_dict()
+        edit.put_node(node.nodeId, thaw(node.to_dict()))
         
         # Update parent-child relationships
         if parent_id:
-            if parent_id in tree["nodes"]:
-                parent_node_data = tree["nodes"][parent_id]
-                if "childIds" not in parent_node_data:
-                    parent_node_data["childIds"] = []
-                parent_node_data["childIds"].append(node.nodeId)
-                node.parentId = parent_id
-                tree["nodes"][node.nodeId]["parentId"] = parent_id
-            else:
-                raise ValueError(f"Parent node {parent_id} not found")
-        
-        await self.memory.set("queryTree", tree)
+            parent_node_data = edit.node(parent_id)
+            if "childIds" not in parent_node_data:
+                parent_node_data["childIds"] = []
+            parent_node_data["childIds"].append(node.nodeId)
+            node.parentId = parent_id
+            edit.nodes[node.nodeId]["parentId"] = parent_id
+        
+        await self._commit(edit)
         self.logger.info(f"Added node {node.nodeId} to tree")
     
     async def get_node(self, node_id: str) -> Optional[QueryNode]:
@@ -125,9 +392,10 @@ class QueryTreeManager:
         Returns:
             QueryNode if found, None otherwise
         """
-        tree = await self.get_tree()
+        # Read through a view and copy only the requested node
+        tree = await self._read_tree()
         if tree and "nodes" in tree and node_id in tree["nodes"]:
-            return QueryNode.from_dict(tree["nodes"][node_id])
+            return QueryNode.from_dict(thaw(tree["nodes"][node_id]))
         return None
     
     async def update_node(self, node_id: str, updates: Any) -> None:
@@ -138,20 +406,20 @@ class QueryTreeManager:
             node_id: The node ID to update
             updates: Dictionary of updates to apply or a QueryNode object
         """
-        tree = await self.get_tree()
-        if not tree or "nodes" not in tree or node_id not in tree["nodes"]:
+        edit = await self._begin_edit()
+        if not edit or node_id not in edit.nodes:
             raise ValueError(f"Node {node_id} not found")
         
-        # Handle QueryNode object
+        # Handle dictionary updates
         if isinstance(updates, dict):
-            tree["nodes"][node_id].update(updates)
+            edit.node(node_id).update(thaw(updates))
+        # Handle QueryNode object
         elif isinstance(updates, QueryNode):
-            tree["nodes"][node_id] = updates.to_dict()
-        # Handle dictionary updates
+            edit.put_node(node_id, thaw(updates.to_dict()))
         else:
             raise TypeError(f"Updates must be a dictionary or QueryNode, got {type(updates)}")
             
-        await self.memory.set("queryTree", tree)
+        await self._commit(edit)
         self.logger.info(f"Updated node {node_id}")
     
     async def update_node_sql(self, node_id: str, sql: str) -> None:
@@ -203,8 +471,8 @@ class QueryTreeManager:
         Args:
             node_id: The node ID to delete
         """
-        tree = await self.get_tree()
-        if not tree or "nodes" not in tree:
+        edit = await self._begin_edit()
+        if not edit:
             return
         
         # Get all nodes to delete (node and descendants)
@@ -212,17 +480,15 @@ class QueryTreeManager:
         
         # Remove from parent's child list
         node = await self.get_node(node_id)
-        if node and node.parentId and node.parentId in tree["nodes"]:
-            parent_data = tree["nodes"][node.parentId]
-            if "childIds" in parent_data and node_id in parent_data["childIds"]:
-                parent_data["childIds"].remove(node_id)
+        if node and node.parentId and node.parentId in edit.nodes:
+            if node_id in edit.nodes[node.parentId].get("childIds", []):
+                edit.node(node.parentId)["childIds"].remove(node_id)
         
         # Delete all nodes
         for nid in nodes_to_delete:
-            if nid in tree["nodes"]:
-                del tree["nodes"][nid]
+            edit.remove_node(nid)
         
-        await self.memory.set("queryTree", tree)
+        await self._commit(edit)
         self.logger.info(f"Deleted node {node_id} and {len(nodes_to_delete)-1} descendants")
     
     async def get_children(self, node_id: str) -> List[QueryNode]:
@@ -307,63 +573,28 @@ class QueryTreeManager:
     
     async def get_executable_nodes(self) -> List[QueryNode]:
         """Get all nodes that have SQL but haven't been executed."""
-        tree = await self.get_tree()
-        if not tree or "nodes" not in tree:
-            return []
-        
-        executable = []
-        for node_data in tree["nodes"].values():
-            if node_data.get("sql") and node_data.get("status") == NodeStatus.SQL_GENERATED.value:
-                node = QueryNode.from_dict(node_data)
-                executable.append(node)
-        
-        return executable
+        await self._refresh_buckets()
+        return self._nodes_in(self._by_status.get(NodeStatus.SQL_GENERATED.value, set()),
+                              lambda node_data: node_data.get("sql"))
     
     async def get_failed_nodes(self) -> List[QueryNode]:
         """Get all nodes that failed execution."""
-        tree = await self.get_tree()
-        if not tree or "nodes" not in tree:
-            return []
-        
-        failed = []
-        for node_data in tree["nodes"].values():
-            if node_data.get("status") == NodeStatus.EXECUTED_FAILED.value:
-                node = QueryNode.from_dict(node_data)
-                failed.append(node)
-        
-        return failed
+        await self._refresh_buckets()
+        return self._nodes_in(self._by_status.get(NodeStatus.EXECUTED_FAILED.value, set()))
     
     async def get_successful_nodes(self) -> List[QueryNode]:
         """Get all nodes that executed successfully."""
-        tree = await self.get_tree()
-        if not tree or "nodes" not in tree:
-            return []
-        
-        successful = []
-        for node_data in tree["nodes"].values():
-            if node_data.get("status") == NodeStatus.EXECUTED_SUCCESS.value:
-                node = QueryNode.from_dict(node_data)
-                successful.append(node)
-        
-        return successful
+        await self._refresh_buckets()
+        return self._nodes_in(self._by_status.get(NodeStatus.EXECUTED_SUCCESS.value, set()))
     
     async def get_leaf_nodes(self) -> List[QueryNode]:
         """Get all leaf nodes (nodes with no children)."""
-        tree = await self.get_tree()
-        if not tree or "nodes" not in tree:
-            return []
-        
-        leaves = []
-        for node_data in tree["nodes"].values():
-            if not node_data.get("childIds", []):
-                node = QueryNode.from_dict(node_data)
-                leaves.append(node)
-        
-        return leaves
+        await self._refresh_buckets()
+        return self._nodes_in(self._leaves)
     
     async def find_nodes_by_intent(self, intent_pattern: str) -> List[QueryNode]:
         """Find nodes whose intent contains the given pattern."""
-        tree = await self.get_tree()
+        tree = await self._read_tree()
         if not tree or "nodes" not in tree:
             return []
         
@@ -372,14 +603,14 @@ class QueryTreeManager:
         
         for node_data in tree["nodes"].values():
             if pattern_lower in node_data.get("intent", "").lower():
-                node = QueryNode.from_dict(node_data)
+                node = QueryNode.from_dict(thaw(node_data))
                 matching.append(node)
         
         return matching
     
     async def get_tree_stats(self) -> Dict[str, Any]:
         """Get statistics about the query tree."""
-        tree = await self.get_tree()
+        tree = await self._read_tree()
         if not tree or "nodes" not in tree:
             return {
                 "total_nodes": 0,
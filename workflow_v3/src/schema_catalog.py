@@ -0,0 +1,369 @@
+"""
+Materialized database schema catalogs for text-to-SQL tree orchestration.
+
+A SchemaCatalog holds the schema of one database, built in a single pass from
+a SchemaReader: TableSchema objects, case-insensitive name indexes, foreign
+keys and typed column statistics. Catalogs are cached per SchemaReader, so all
+tasks on a database share one catalog, and the catalog's "databaseSchema"
+value is stored in each task's memory without being rebuilt.
+"""
+
+import ast
+import json
+import os
+import logging
+import threading
+import weakref
+from typing import Dict, List, Optional, Any, Tuple
+
+from memory_content_types import TableSchema, ColumnInfo
+from db_info_cache import DBInfoCache
+from schema_reader import SchemaReader
+
+
+# Database-specific descriptions, used when the file exists
+DESCRIPTION_FILES = {
+    "california_schools": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/california_schools_schema_summary.md",
+    "financial": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/financial_schema_summary.md",
+    "european_football_2": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/european_football_2_schema_summary.md",
+    "superhero": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/superhero_schema_summary.md",
+    "student_club": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/student_club_schema_summary.md",
+    "card_games": "/home/norman/work/text-to-sql/MAC-SQL/data/bird/card_games_schema_summary.md"
+}
+
+
+def load_database_description(db_id: str) -> str:
+    """
+    Load the description of a database from its description file.
+
+    Args:
+        db_id: Database ID to load the description for
+
+    Returns:
+        The file content, or a generic description if there is no file
+    """
+    logger = logging.getLogger(__name__)
+    description_path = DESCRIPTION_FILES.get(db_id)
+    if description_path:
+        if os.path.exists(description_path):
+            try:
+                with open(description_path, 'r', encoding='utf-8') as f:
+                    description = f.read()
+                logger.info(f"Loaded description for database '{db_id}' from {description_path}")
+                return description
+            except Exception as e:
+                logger.warning(f"Failed to load description for database '{db_id}': {e}")
+        else:
+            logger.warning(f"Description file not found for database '{db_id}': {description_path}")
+
+    return f"Database '{db_id}' with tables for various data analysis tasks"
+
+
+def parse_value_examples(values_str: str) -> Optional[List[Any]]:
+    """
+    Parse the value examples string of a SchemaReader column.
+
+    Args:
+        values_str: String such as "[None, 'a', 'b']", or '' when there are no examples
+
+    Returns:
+        The example values, or None if there are none
+    """
+    if not values_str or values_str == '[]':
+        return None
+    try:
+        values = ast.literal_eval(values_str)
+    except (ValueError, SyntaxError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def compute_column_stats(data_type: str, values: Optional[List[Any]]) -> Dict[str, Any]:
+    """
+    Compute typed statistics of a column from its example values.
+
+    Args:
+        data_type: Declared column type
+        values: Example values of the column (None: no examples)
+
+    Returns:
+        Dictionary with dataType, valueType ('integer', 'real', 'text',
+        'mixed' or None without examples), exampleCount, distinctCount and
+        hasNull, plus min/max for numeric and minLength/maxLength for text values
+    """
+    values = list(values or [])
+    non_null = [v for v in values if v is not None]
+    numbers = [v for v in non_null if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    texts = [v for v in non_null if isinstance(v, str)]
+
+    if not non_null:
+        value_type = None
+    elif len(numbers) == len(non_null):
+        value_type = "integer" if all(isinstance(v, int) for v in numbers) else "real"
+    elif len(texts) == len(non_null):
+        value_type = "text"
+    else:
+        value_type = "mixed"
+
+    stats = {
+        "dataType": data_type,
+        "valueType": value_type,
+        "exampleCount": len(non_null),
+        "distinctCount": len({repr(v) for v in non_null}),
+        "hasNull": len(non_null) < len(values)
+    }
+    if numbers:
+        stats["min"] = min(numbers)
+        stats["max"] = max(numbers)
+    if texts:
+        lengths = [len(v) for v in texts]
+        stats["minLength"] = min(lengths)
+        stats["maxLength"] = max(lengths)
+    return stats
+
+
+# Stored "databaseSchema" value (by id) -> the catalog it belongs to
+_catalogs_by_value: "weakref.WeakValueDictionary[int, SchemaCatalog]" = weakref.WeakValueDictionary()
+
+
+class SchemaCatalog:
+    """
+    Read-only schema of one database with O(1) table and column lookups.
+
+    The catalog is shared by every task on the database: the TableSchema and
+    ColumnInfo objects it returns must not be modified.
+    """
+
+    def __init__(self, db_id: str, tables: Dict[str, TableSchema],
+                 metadata: Optional[Dict[str, Any]] = None,
+                 description: Optional[str] = None,
+                 table_full_names: Optional[Dict[str, str]] = None,
+                 column_descriptions: Optional[Dict[str, Dict[str, Tuple[str, str]]]] = None):
+        """
+        Build the catalog from complete table schemas.
+
+        Args:
+            db_id: The database ID
+            tables: Table name -> TableSchema, in database order
+            metadata: Schema metadata (data_path, dataset_name, database_id)
+            description: Optional high-level description of the database
+            table_full_names: Table name -> expanded name from tables.json
+            column_descriptions: Table -> column -> (expanded name, description)
+        """
+        self.db_id = db_id
+        self.tables = tables
+        self.metadata = metadata or {}
+        self.description = description
+        self.table_full_names = table_full_names or {}
+        self.column_descriptions = column_descriptions or {}
+
+        self._table_index = {}
+        self._column_index = {}
+        self.column_stats = {}
+        self.foreign_keys = {}
+        for table_name, table in tables.items():
+            self._table_index.setdefault(table_name.lower(), table_name)
+            columns = {}
+            for column_name in table.columns:
+                columns.setdefault(column_name.lower(), column_name)
+            self._column_index[table_name] = columns
+            self.column_stats[table_name] = {
+                column_name: compute_column_stats(col.dataType, col.typicalValues)
+                for column_name, col in table.columns.items()
+            }
+            self.foreign_keys[table_name] = [
+                {
+                    'column': column_name,
+                    'references_table': col.references['table'],
+                    'references_column': col.references['column']
+                }
+                for column_name, col in table.columns.items()
+                if col.isForeignKey and col.references
+            ]
+
+        # The value agents read from memory under "databaseSchema"
+        self.schema = {
+            "tables": {name: table.to_dict() for name, table in tables.items()},
+            "metadata": self.metadata
+        }
+        if description is not None:
+            self.schema["description"] = description
+        self._schema_json = None
+        _catalogs_by_value[id(self.schema)] = self
+
+    @classmethod
+    def from_schema_reader(cls, schema_reader: SchemaReader, db_id: str) -> 'SchemaCatalog':
+        """
+        Build the catalog of a database from a SchemaReader.
+
+        Args:
+            schema_reader: The SchemaReader with the dataset's tables.json
+            db_id: The database ID to load
+
+        Returns:
+            The SchemaCatalog of the database
+        """
+        db_info = schema_reader.get_db_info(db_id)
+        db_json = schema_reader.db2dbjsons.get(db_id, {})
+
+        desc_dict = db_info['desc_dict']    # table -> [(column_name, full_column_name, extra_desc)]
+        value_dict = db_info['value_dict']  # table -> [(column_name, value_examples_str)]
+        pk_dict = db_info['pk_dict']        # table -> [primary_key_column_names]
+        fk_dict = db_info['fk_dict']        # table -> [(from_col, to_table, to_col)]
+
+        # Column types from the JSON data: {(table_idx, col_name): type}
+        column_types = {}
+        column_names_original = db_json.get('column_names_original', [])
+        for col_idx, col_type in enumerate(db_json.get('column_types', [])):
+            if col_idx < len(column_names_original):
+                table_idx, col_name = column_names_original[col_idx]
+                if table_idx >= 0:  # -1 means special columns like *
+                    column_types[(table_idx, col_name)] = col_type
+
+        tables = {}
+        table_full_names = {}
+        column_descriptions = {}
+        expanded_table_names = db_json.get('table_names', [])
+        for table_idx, table_name in enumerate(db_json.get('table_names_original', [])):
+            if table_name not in desc_dict:
+                continue
+            if table_idx < len(expanded_table_names):
+                table_full_names[table_name] = expanded_table_names[table_idx]
+            column_descriptions[table_name] = {
+                col_name: (full_col_name, extra_desc)
+                for col_name, full_col_name, extra_desc in desc_dict[table_name]
+            }
+
+            primary_keys = set(pk_dict.get(table_name, []))
+            references = {}
+            for fk_col, to_table, to_col in fk_dict.get(table_name, []):
+                references.setdefault(fk_col, {"table": to_table, "column": to_col})
+            typical_values = {
+                col_name: parse_value_examples(values_str)
+                for col_name, values_str in value_dict.get(table_name, [])
+            }
+
+            columns = {}
+            for col_name, _, _ in desc_dict[table_name]:
+                columns[col_name] = ColumnInfo(
+                    dataType=column_types.get((table_idx, col_name), "TEXT"),
+                    nullable=True,  # Default to nullable, can be refined later
+                    isPrimaryKey=col_name in primary_keys,
+                    isForeignKey=col_name in references,
+                    references=references.get(col_name),
+                    typicalValues=typical_values.get(col_name)
+                )
+
+            # No sample data, typicalValues in the columns are used instead
+            tables[table_name] = TableSchema(
+                name=table_name,
+                columns=columns,
+                sampleData=None,
+                metadata={
+                    "description": f"Table {table_name} from {db_id} database",
+                    "column_count": len(columns)
+                }
+            )
+
+        metadata = {
+            "data_path": schema_reader.data_path,
+            "dataset_name": schema_reader.dataset_name,
+            "database_id": db_id
+        }
+        return cls(db_id, tables, metadata, load_database_description(db_id),
+                   table_full_names, column_descriptions)
+
+    def memory_value(self, native: bool) -> Any:
+        """
+        Get the "databaseSchema" value to store in a memory.
+
+        Args:
+            native: Whether the memory stores Python objects (KeyValueMemory native mode)
+
+        Returns:
+            The shared schema dict in native mode, else its shared JSON string
+        """
+        if native:
+            return self.schema
+        if self._schema_json is None:
+            self._schema_json = json.dumps(self.schema)
+            _catalogs_by_value[id(self._schema_json)] = self
+        return self._schema_json
+
+    def resolve_table(self, table_name: str) -> Optional[str]:
+        """Get the stored name of a table, matching case-insensitively."""
+        if table_name in self.tables:
+            return table_name
+        return self._table_index.get(table_name.lower())
+
+    def resolve_column(self, table_name: str, column_name: str) -> Optional[Tuple[str, str]]:
+        """Get the stored (table, column) names of a column, matching case-insensitively."""
+        table_name = self.resolve_table(table_name)
+        if table_name is None:
+            return None
+        if column_name in self.tables[table_name].columns:
+            return table_name, column_name
+        column_name = self._column_index[table_name].get(column_name.lower())
+        return (table_name, column_name) if column_name is not None else None
+
+    def get_table(self, table_name: str) -> Optional[TableSchema]:
+        """Get the schema of a table."""
+        table_name = self.resolve_table(table_name)
+        return self.tables[table_name] if table_name is not None else None
+
+    def get_column(self, table_name: str, column_name: str) -> Optional[ColumnInfo]:
+        """Get the information of a column."""
+        names = self.resolve_column(table_name, column_name)
+        return self.tables[names[0]].columns[names[1]] if names is not None else None
+
+    def get_column_stats(self, table_name: str, column_name: str) -> Optional[Dict[str, Any]]:
+        """Get the typed statistics of a column."""
+        names = self.resolve_column(table_name, column_name)
+        return self.column_stats[names[0]][names[1]] if names is not None else None
+
+
+def find_catalog(value: Any) -> Optional[SchemaCatalog]:
+    """
+    Get the catalog a stored "databaseSchema" value came from.
+
+    Args:
+        value: The content of the memory item
+
+    Returns:
+        The SchemaCatalog if the value is (still) the catalog's own value, else None
+    """
+    catalog = _catalogs_by_value.get(id(value))
+    if catalog is not None and (value is catalog.schema or value is catalog._schema_json):
+        return catalog
+    return None
+
+
+# SchemaReader -> its catalogs, db_id -> SchemaCatalog
+_catalogs: "weakref.WeakKeyDictionary[SchemaReader, DBInfoCache]" = weakref.WeakKeyDictionary()
+_catalogs_lock = threading.Lock()
+
+
+def get_schema_catalog(schema_reader: SchemaReader, db_id: str) -> SchemaCatalog:
+    """
+    Get the shared catalog of a database, building it on first use.
+
+    A reader keeps as many catalogs as it keeps database infos, evicting the
+    least recently used ones.
+
+    Args:
+        schema_reader: The SchemaReader of the dataset
+        db_id: The database ID
+
+    Returns:
+        The SchemaCatalog of the database
+    """
+    with _catalogs_lock:
+        catalogs = _catalogs.get(schema_reader)
+        if catalogs is None:
+            catalogs = DBInfoCache(getattr(schema_reader.db2infos, "max_size", None))
+            _catalogs[schema_reader] = catalogs
+        catalog = catalogs.get(db_id)
+        if catalog is None:
+            catalog = SchemaCatalog.from_schema_reader(schema_reader, db_id)
+            catalogs[db_id] = catalog
+        return catalog
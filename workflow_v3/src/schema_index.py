@@ -0,0 +1,513 @@
+"""
+Lexical (and optional vector) index of a database schema.
+
+Every table and column becomes a small document: its name, the expanded name
+from tables.json, the column description and its typical text values. BM25
+over these documents ranks the tables and columns a question mentions, so a
+shortlist can be computed before any prompt is built. An optional CPU
+embedding model (sentence-transformers, named by the schema_embedding_model
+llm_config key) adds semantic matching.
+
+Indexes can be prebuilt offline. The BM25 statistics are saved as JSON and the
+document vectors as a NumPy .npy file, in $SCHEMA_INDEX_DIR or
+~/.cache/text2sql/schema_index (see set_index_dir()). Files are named after the
+database and a hash of its documents, so a changed schema never reads stale
+files.
+
+TableSchema and SchemaCatalog are only needed for type hints, so MAC-SQL's
+Selector (core/agents.py) uses this module on its own.
+
+Usage (prebuild the indexes of a dataset):
+    python schema_index.py --dataset_name bird --db_path data/bird --tables_json_path data/bird/dev_tables.json
+        [--embedding_model all-MiniLM-L6-v2] [--index_dir DIR]
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import hashlib
+import logging
+import argparse
+import threading
+import weakref
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from memory_content_types import TableSchema
+    from schema_catalog import SchemaCatalog
+
+
+logger = logging.getLogger(__name__)
+
+# Directory of the prebuilt index files
+_index_dir = os.environ.get("SCHEMA_INDEX_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "text2sql", "schema_index")
+
+
+def set_index_dir(index_dir: str) -> None:
+    """Read and write the index files from now on in index_dir."""
+    global _index_dir
+    _index_dir = index_dir
+
+
+def get_index_path(db_id: str, entries: List[Tuple[str, Optional[str], str]]) -> str:
+    """
+    Path (without extension) of the index files of a database's documents.
+
+    Returns:
+        <index dir>/<db_id>-<hash of the documents>
+    """
+    digest = hashlib.sha1(json.dumps(entries).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(_index_dir, f"{db_id}-{digest}")
+
+
+STOPWORDS = {
+    "the", "of", "and", "or", "in", "on", "for", "to", "by", "with", "is", "are", "was",
+    "what", "which", "who", "how", "many", "much", "list", "give", "show", "find", "all",
+    "that", "this", "from", "as", "at", "an", "be", "do", "does", "their", "its", "each",
+    "please", "there", "those", "these", "has", "have", "had", "were", "it", "if", "not"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into index terms.
+
+    Every word is kept whole and lower-cased, and identifiers are also split
+    on '_' and camelCase ("AvgScrMath" -> avgscrmath, avg, scr, math). Plural
+    words also yield their singular.
+    """
+    terms = []
+    for word in re.findall(r"\w+", text):
+        parts = re.findall(r"[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+", word)
+        lower_parts = [part.lower() for part in parts]
+        words = [word.lower()] + [part for part in lower_parts if part != word.lower()]
+        for term in words:
+            if len(term) < 2 or term in STOPWORDS:
+                continue
+            terms.append(term)
+            if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+                terms.append(term[:-1])
+    return terms
+
+
+@dataclass
+class SchemaCandidates:
+    """Tables and columns ranked for a question, best first."""
+    tables: List[Tuple[str, float]] = field(default_factory=list)
+    columns: List[Tuple[str, str, float]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, List]:
+        """Group the columns under their tables, for prompts."""
+        columns = {}
+        for table, column, _ in self.columns:
+            columns.setdefault(table, []).append(column)
+        return {
+            "tables": [{"name": table, "score": round(score, 3), "columns": columns.get(table, [])}
+                       for table, score in self.tables]
+        }
+
+
+class SchemaIndex:
+    """
+    BM25 index over the tables and columns of one database.
+    """
+
+    def __init__(self, entries: List[Tuple[str, Optional[str], str]], k1: float = 1.2, b: float = 0.75,
+                 stats: Optional[Dict] = None):
+        """
+        Index schema documents.
+
+        Args:
+            entries: (table, column, text) per document; column is None for a table's own document
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+            stats: BM25 statistics of the same entries, as saved by save(), used instead of indexing
+        """
+        self.entries = entries
+        self.k1 = k1
+        self.b = b
+        self.path = None  # Index files path without extension, see get_index_path
+        self.vectors = None  # NumPy array, one normalized row per entry
+        self.embedding_model = None
+        self._embed = None
+        self._embed_lock = threading.Lock()
+
+        if stats is not None:
+            self._lengths = stats["lengths"]
+            self._postings = {term: [tuple(posting) for posting in postings]
+                              for term, postings in stats["postings"].items()}
+            self._avg_length = stats["avg_length"]
+            self._idf = stats["idf"]
+            return
+
+        self._lengths = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_idx, (_, _, text) in enumerate(entries):
+            counts = Counter(tokenize(text))
+            self._lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings.setdefault(term, []).append((doc_idx, tf))
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        n_docs = len(entries)
+        self._idf = {
+            term: math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    @classmethod
+    def from_tables(cls, tables: Dict[str, 'TableSchema'],
+                    table_full_names: Optional[Dict[str, str]] = None,
+                    column_descriptions: Optional[Dict[str, Dict[str, Tuple[str, str]]]] = None) -> 'SchemaIndex':
+        """
+        Index the tables and columns of a schema.
+
+        Args:
+            tables: Table name -> TableSchema
+            table_full_names: Table name -> expanded name from tables.json
+            column_descriptions: Table -> column -> (expanded name, description)
+
+        Returns:
+            The SchemaIndex
+        """
+        return cls(schema_entries(tables, table_full_names, column_descriptions))
+
+    @classmethod
+    def from_catalog(cls, catalog: 'SchemaCatalog') -> 'SchemaIndex':
+        """Index the schema of a catalog."""
+        return cls.from_tables(catalog.tables, catalog.table_full_names, catalog.column_descriptions)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['SchemaIndex']:
+        """
+        Read an index saved by save().
+
+        Args:
+            path: Index files path without extension
+
+        Returns:
+            The SchemaIndex, or None if no readable statistics are saved there
+        """
+        try:
+            with open(f"{path}.bm25.json", encoding="utf-8") as f:
+                data = json.load(f)
+            entries = [tuple(entry) for entry in data["entries"]]
+            index = cls(entries, data["k1"], data["b"], stats=data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable schema index {path}.bm25.json: {e}")
+            return None
+        index.path = path
+        return index
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        Save the documents and BM25 statistics as <path>.bm25.json.
+
+        Args:
+            path: Index files path without extension (default: self.path)
+        """
+        path = path or self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "entries": self.entries,
+            "lengths": self._lengths,
+            "avg_length": self._avg_length,
+            "postings": self._postings,
+            "idf": self._idf,
+        }
+        tmp_path = f"{path}.bm25.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, f"{path}.bm25.json")
+        self.path = path
+
+    def bm25_scores(self, query: str) -> Dict[int, float]:
+        """
+        Score the documents matching a query.
+
+        Args:
+            query: The question (and evidence)
+
+        Returns:
+            Document index -> BM25 score, for documents with at least one query term
+        """
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for doc_idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_idx] / self._avg_length)
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def load_embeddings(self, embed: Callable[[List[str]], "numpy.ndarray"],
+                        path: Optional[str] = None) -> None:
+        """
+        Add vector matching with an embedding function.
+
+        The document vectors are read from path when it holds vectors for the
+        same number of documents; otherwise they are computed and saved there.
+
+        Args:
+            embed: Maps a list of texts to a (len(texts), dim) array
+            path: Optional .npy file to read the document vectors from or save them to
+        """
+        import numpy as np
+
+        vectors = None
+        if path and os.path.exists(path):
+            vectors = np.load(path)
+            if vectors.shape[0] != len(self.entries):
+                logger.info(f"Schema vectors in {path} do not match the schema, recomputing")
+                vectors = None
+        if vectors is None:
+            vectors = np.asarray(embed([text for _, _, text in self.entries]), dtype=np.float32)
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                np.save(path, vectors)
+        self._embed = embed
+        self.vectors = vectors
+
+    def use_embedding_model(self, model_name: str) -> None:
+        """
+        Add vector matching with a sentence-transformers model.
+
+        The vectors are kept next to the BM25 statistics as
+        <path>.<model>.npy, so they are computed once per schema and model.
+
+        Args:
+            model_name: The model name, see get_embedding_function
+        """
+        with self._embed_lock:
+            if self.embedding_model == model_name:
+                return
+            path = None
+            if self.path:
+                model_slug = re.sub(r"[^\w.-]+", "_", model_name)
+                path = f"{self.path}.{model_slug}.npy"
+            self.load_embeddings(get_embedding_function(model_name), path)
+            self.embedding_model = model_name
+
+    def scores(self, query: str, vector_weight: float = 0.5) -> List[float]:
+        """
+        Score every document for a query.
+
+        BM25 scores are scaled to [0, 1] by the best match; with embeddings
+        loaded, vector_weight times the (positive) cosine similarity is added.
+
+        Returns:
+            One score per entry
+        """
+        scores = [0.0] * len(self.entries)
+        bm25 = self.bm25_scores(query) if query else {}
+        best = max(bm25.values(), default=0.0)
+        for doc_idx, score in bm25.items():
+            scores[doc_idx] = score / best
+        vectors = self.vectors
+        if query and vectors is not None:
+            import numpy as np
+
+            query_vector = np.asarray(self._embed([query]), dtype=np.float32)[0]
+            query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+            similarities = vectors @ query_vector
+            for doc_idx, similarity in enumerate(similarities.tolist()):
+                scores[doc_idx] += vector_weight * max(similarity, 0.0)
+        return scores
+
+    def column_scores(self, query: str) -> Dict[Tuple[str, str], float]:
+        """
+        Score how relevant every column is to a query.
+
+        A column's score is its own document's score plus its table's.
+
+        Returns:
+            (table, column) -> score
+        """
+        scores = self.scores(query)
+        table_scores = {table: scores[idx] for idx, (table, column, _) in enumerate(self.entries)
+                        if column is None}
+        return {(table, column): scores[idx] + table_scores.get(table, 0.0)
+                for idx, (table, column, _) in enumerate(self.entries) if column is not None}
+
+    def search(self, query: str, top_tables: int = 5, top_columns: int = 15,
+               tables: Optional[Iterable[str]] = None) -> SchemaCandidates:
+        """
+        Shortlist the tables and columns for a query.
+
+        A table ranks by its own score plus its best column's.
+
+        Args:
+            query: The question (and evidence)
+            top_tables: Number of tables to return
+            top_columns: Number of columns to return, from the returned tables
+            tables: Optional tables to restrict the search to
+
+        Returns:
+            The ranked candidates; only tables and columns that match the query
+        """
+        allowed = set(tables) if tables is not None else None
+        column_scores = self.column_scores(query)
+        table_scores: Dict[str, float] = {}
+        for (table, _), score in column_scores.items():
+            if allowed is None or table in allowed:
+                table_scores[table] = max(table_scores.get(table, 0.0), score)
+        ranked_tables = [(table, score) for table, score in
+                         sorted(table_scores.items(), key=lambda item: -item[1]) if score > 0][:top_tables]
+        chosen = {table for table, _ in ranked_tables}
+        ranked_columns = sorted(
+            ((table, column, score) for (table, column), score in column_scores.items()
+             if table in chosen and score > 0),
+            key=lambda item: -item[2]
+        )[:top_columns]
+        return SchemaCandidates(tables=ranked_tables, columns=ranked_columns)
+
+
+def schema_entries(tables: Dict[str, 'TableSchema'],
+                   table_full_names: Optional[Dict[str, str]] = None,
+                   column_descriptions: Optional[Dict[str, Dict[str, Tuple[str, str]]]] = None
+                   ) -> List[Tuple[str, Optional[str], str]]:
+    """
+    Build the documents of a schema's tables and columns.
+
+    Args:
+        tables: Table name -> TableSchema
+        table_full_names: Table name -> expanded name from tables.json
+        column_descriptions: Table -> column -> (expanded name, description)
+
+    Returns:
+        (table, column, text) per document, see SchemaIndex
+    """
+    table_full_names = table_full_names or {}
+    column_descriptions = column_descriptions or {}
+    entries = []
+    for table_name, table in tables.items():
+        entries.append((table_name, None, f"{table_name} {table_full_names.get(table_name, '')}"))
+        descriptions = column_descriptions.get(table_name, {})
+        for col_name, col_info in table.columns.items():
+            parts = [col_name]
+            full_name, extra_desc = descriptions.get(col_name, ("", ""))
+            for text in (full_name, extra_desc):
+                if text and str(text) != 'nan':
+                    parts.append(str(text))
+            for value in col_info.typicalValues or []:
+                if isinstance(value, str):
+                    parts.append(value)
+            entries.append((table_name, col_name, " ".join(parts)))
+    return entries
+
+
+def load_schema_index(db_id: str, entries: List[Tuple[str, Optional[str], str]]) -> SchemaIndex:
+    """
+    Get the index of a database's documents, prebuilt if saved in the index directory.
+
+    Args:
+        db_id: The database ID
+        entries: The documents, see SchemaIndex
+
+    Returns:
+        The SchemaIndex; its path is set so embeddings are saved with it
+    """
+    path = get_index_path(db_id, entries)
+    index = SchemaIndex.load(path)
+    if index is None:
+        index = SchemaIndex(entries)
+        index.path = path
+    return index
+
+
+# Model name -> embedding function
+_embedders: Dict[str, Callable[[List[str]], "numpy.ndarray"]] = {}
+_embedders_lock = threading.Lock()
+
+
+def get_embedding_function(model_name: str) -> Callable[[List[str]], "numpy.ndarray"]:
+    """
+    Get the process-wide embedding function of a sentence-transformers model.
+
+    The model runs on the CPU. sentence-transformers is an optional
+    dependency, only imported when a model is configured.
+
+    Args:
+        model_name: A sentence-transformers model name or path (e.g. "all-MiniLM-L6-v2")
+
+    Returns:
+        Maps a list of texts to a (len(texts), dim) array
+    """
+    with _embedders_lock:
+        embed = _embedders.get(model_name)
+        if embed is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name, device="cpu")
+            embed = lambda texts: model.encode(texts, convert_to_numpy=True)
+            _embedders[model_name] = embed
+        return embed
+
+
+# SchemaCatalog -> its index
+_indexes: "weakref.WeakKeyDictionary[SchemaCatalog, SchemaIndex]" = weakref.WeakKeyDictionary()
+
+
+def get_schema_index(catalog: 'SchemaCatalog', embedding_model: Optional[str] = None) -> SchemaIndex:
+    """
+    Get the shared index of a catalog, reading or building it on first use.
+
+    Args:
+        catalog: The SchemaCatalog
+        embedding_model: Optional sentence-transformers model adding vector matching
+
+    Returns:
+        The SchemaIndex
+    """
+    index = _indexes.get(catalog)
+    if index is None:
+        entries = schema_entries(catalog.tables, catalog.table_full_names, catalog.column_descriptions)
+        index = load_schema_index(catalog.db_id, entries)
+        _indexes[catalog] = index
+    if embedding_model:
+        index.use_embedding_model(embedding_model)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the schema indexes of a dataset's databases")
+    parser.add_argument('--dataset_name', type=str, default='bird', choices=['spider', 'bird'], help='dataset name')
+    parser.add_argument('--db_path', type=str, required=True, help='path to databases in dataset')
+    parser.add_argument('--tables_json_path', type=str, required=True, help='path to tables.json')
+    parser.add_argument('--db_ids', type=str, nargs='*', default=None, help='databases to index (default: all)')
+    parser.add_argument('--embedding_model', type=str, default=None, help='sentence-transformers model of the vectors (default: BM25 only)')
+    parser.add_argument('--index_dir', type=str, default=None, help='directory of the index files (default: $SCHEMA_INDEX_DIR or ~/.cache/text2sql/schema_index)')
+    args = parser.parse_args()
+    if args.index_dir:
+        set_index_dir(args.index_dir)
+
+    from schema_reader import get_schema_reader
+    from schema_catalog import get_schema_catalog
+
+    logging.basicConfig(level=logging.INFO, format='%(name)s - %(levelname)s - %(message)s')
+    reader = get_schema_reader(args.db_path, args.tables_json_path, args.dataset_name, max_cached_dbs=1)
+    for db_id in args.db_ids or list(reader.db2dbjsons):
+        start = time.time()
+        try:
+            catalog = get_schema_catalog(reader, db_id)
+        except Exception as e:
+            print(f"{db_id}: cannot read schema: {e}", file=sys.stderr)
+            continue
+        index = get_schema_index(catalog, args.embedding_model)
+        index.save()
+        print(f"{db_id}: {len(index.entries)} documents indexed in {time.time() - start:.1f}s", flush=True)
+
+
+if __name__ == "__main__":
+    main()
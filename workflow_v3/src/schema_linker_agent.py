@@ -6,6 +6,7 @@ It analyzes the intent of a node and finds all relevant tables, columns,
 and relationships needed to generate SQL for that node.
 """
 
+import asyncio
 import logging
 import re
 import xml.etree.ElementTree as ET
@@ -23,6 +24,9 @@ from memory_content_types import (
     QueryNode, TableSchema, ColumnInfo, NodeStatus, NodeOperationType
 )
 from prompts import SQL_CONSTRAINTS
+from schema_xml import get_schema_renderer, render_schema_xml
+from value_index import extract_value_mentions, get_schema_value_index
+from join_graph import get_join_graph
 from utils import parse_xml_hybrid, strip_quotes, ensure_list
 
 
@@ -160,8 +164,21 @@ class SchemaLinkerAgent(BaseMemoryAgent):
             existing_schema_info = parent_node.schema_linking
             self.logger.info("Found existing schema information in parent node")
         
-        # SchemaLinker can always read directly from database
-        full_schema = await self._get_full_schema_xml()
+        # SchemaLinker can always read directly from database. The schema index
+        # shortlists candidate tables and columns before the prompt is built
+        search_text = "\n".join(filter(None, [query, evidence]))
+        schema_candidates = None
+        candidate_tables = None
+        renderer = await get_schema_renderer(self.schema_manager)
+        if renderer is not None and search_text:
+            embedding_model = self.llm_config.get("schema_embedding_model")
+            if embedding_model:
+                await asyncio.to_thread(renderer.index.use_embedding_model, embedding_model)
+            schema_candidates = renderer.index.search(search_text)
+            top_tables = self.llm_config.get("schema_top_tables")
+            if top_tables and schema_candidates.tables:
+                candidate_tables = [table for table, _ in schema_candidates.tables[:top_tables]]
+        full_schema = await self._get_full_schema_xml(search_text, candidate_tables)
         
         # 5. GET QUERY ANALYSIS INFORMATION - from current node or parent
         query_analysis_context = None
@@ -231,6 +248,17 @@ class SchemaLinkerAgent(BaseMemoryAgent):
             "full_schema": full_schema,
             "current_node": json.dumps(current_node.to_dict(), indent=2)
         }
+        if schema_candidates and schema_candidates.tables:
+            context["schema_candidates"] = json.dumps(schema_candidates.to_dict(), indent=2)
+            # Precomputed foreign key joins between the top candidate tables
+            join_tables = candidate_tables or [table for table, _ in schema_candidates.tables[:3]]
+            if len(join_tables) > 1:
+                join_plan = (await get_join_graph(self.schema_manager)).connect(join_tables)
+                if join_plan.joins:
+                    context["join_paths"] = json.dumps(join_plan.to_dict(), indent=2)
+        value_matches = await self._find_value_mentions(search_text)
+        if value_matches:
+            context["value_matches"] = json.dumps(value_matches, indent=2)
         
         # Add optional context
         if existing_schema_info:
@@ -353,73 +381,43 @@ class SchemaLinkerAgent(BaseMemoryAgent):
         except Exception as e:
             self.logger.error(f"Error parsing schema linking results: {str(e)}", exc_info=True)
     
-    async def _get_full_schema_xml(self) -> str:
-        """Get full database schema with sample data in XML format"""
-        import html
-        
-        tables = await self.schema_manager.get_all_tables()
-        
-        if not tables:
+    async def _get_full_schema_xml(self, query: Optional[str] = None,
+                                   tables: Optional[List[str]] = None) -> str:
+        """
+        Get full database schema with typical values in XML format.
+        
+        With llm_config["schema_token_budget"] set, the values and columns
+        least relevant to the query are left out to fit the budget. With
+        tables given, only those tables are included.
+        """
+        rendered = await render_schema_xml(self.schema_manager, query,
+                                           max_tokens=self.llm_config.get("schema_token_budget"),
+                                           tables=tables)
+        if rendered is None:
             return "<database_schema>No schema loaded</database_schema>"
         
-        # Log available tables for debugging
-        self.logger.info(f"Available tables in schema: {list(tables.keys())}")
-        
-        xml_parts = ["<database_schema>"]
-        
-        # Include database description if available
-        description = await self.schema_manager.get_database_description()
-        if description:
-            xml_parts.append(f"  <description>{description}</description>")
-        
-        xml_parts.append(f"  <total_tables>{len(tables)}</total_tables>")
-        xml_parts.append("  <tables>")
-        
-        for table_name, table in tables.items():
-            xml_parts.append(f'    <table name="{html.escape(table_name)}">')
-            xml_parts.append(f'      <column_count>{len(table.columns)}</column_count>')
-            xml_parts.append('      <columns>')
-            
-            # Add columns
-            for col_name, col_info in table.columns.items():
-                # Escape special characters in column names
-                escaped_col_name = html.escape(col_name)
-                xml_parts.append(f'        <column name="{escaped_col_name}">')
-                xml_parts.append(f'          <type>{col_info.dataType}</type>')
-                xml_parts.append(f'          <nullable>{col_info.nullable}</nullable>')
-                
-                if col_info.isPrimaryKey:
-                    xml_parts.append('          <primary_key>true</primary_key>')
-                
-                if col_info.isForeignKey and col_info.references:
-                    xml_parts.append(f'          <foreign_key>')
-                    xml_parts.append(f'            <references_table>{html.escape(col_info.references["table"])}</references_table>')
-                    xml_parts.append(f'            <references_column>{html.escape(col_info.references["column"])}</references_column>')
-                    xml_parts.append(f'          </foreign_key>')
-                
-                # Add typical values if available
-                if col_info.typicalValues:
-                    xml_parts.append('          <typical_values>')
-                    # Limit to first 10 values for readability
-                    for value in col_info.typicalValues[:10]:
-                        if value is not None:
-                            # Use XML entity escaping for special characters in values
-                            xml_parts.append(f'            <value>{html.escape(str(value))}</value>')
-                        else:
-                            xml_parts.append('            <value null="true"/>')
-                    if len(col_info.typicalValues) > 10:
-                        xml_parts.append(f'            <!-- {len(col_info.typicalValues) - 10} more values -->')
-                    xml_parts.append('          </typical_values>')
-                
-                xml_parts.append('        </column>')
-            
-            xml_parts.append('      </columns>')
-            xml_parts.append('    </table>')
-        
-        xml_parts.append("  </tables>")
-        xml_parts.append('</database_schema>')
-        
-        return '\n'.join(xml_parts)
+        self.logger.info(f"Schema XML: {rendered.tokens} tokens, {rendered.omitted_columns} columns "
+                         f"and {rendered.omitted_values} value lists omitted")
+        return rendered.xml
+    
+    async def _find_value_mentions(self, text: str) -> Dict[str, List[Dict[str, str]]]:
+        """Look up the quoted literals of the question and evidence in the value index."""
+        mentions = extract_value_mentions(text)
+        if not mentions:
+            return {}
+        try:
+            index = await get_schema_value_index(self.schema_manager)
+            if index is None:
+                return {}
+            found = {}
+            for mention in mentions:
+                matches = await asyncio.to_thread(index.search, mention, 5)
+                if matches:
+                    found[mention] = matches
+            return found
+        except Exception as e:
+            self.logger.debug(f"Could not look up value mentions: {e}")
+            return {}
     
     def _parse_linking_xml(self, output: str) -> Optional[Dict[str, Any]]:
         """Parse the schema linking XML output using hybrid approach with robust fallback"""
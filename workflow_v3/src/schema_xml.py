@@ -0,0 +1,320 @@
+"""
+Schema XML rendering for agent prompts.
+
+The XML fragments of a database (one per table and column) are built once per
+SchemaCatalog and assembled for each prompt. Under a token budget the columns
+the schema index ranks least relevant to the query lose their typical values
+first, then non-key columns are left out, so wide schemas still fit the prompt.
+"""
+
+import html
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from memory_content_types import TableSchema, ColumnInfo
+from schema_catalog import SchemaCatalog
+from schema_index import SchemaIndex, get_schema_index
+
+
+logger = logging.getLogger(__name__)
+
+# Typical values shown per column
+MAX_VALUES = 10
+
+_encoding = None
+_encoding_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text.
+
+    Uses the tiktoken o200k_base encoding (GPT-4o/GPT-4.1) when it is
+    available, else estimates four characters per token.
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:  # not installed, or the encoding cannot be downloaded
+            logger.info(f"tiktoken encoding not available, estimating token counts: {e}")
+    if _encoding is None:
+        return (len(text) + 3) // 4
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+@dataclass
+class RenderedSchema:
+    """A rendered schema XML document with its size."""
+    xml: str
+    tokens: int
+    omitted_columns: int = 0  # Columns left out to fit the token budget
+    omitted_values: int = 0  # Columns whose typical values were left out
+
+
+@dataclass
+class _ColumnFragment:
+    table: str
+    name: str
+    position: int
+    is_key: bool
+    head: str
+    values: str
+    head_tokens: int
+    values_tokens: int
+
+
+class SchemaXMLRenderer:
+    """
+    Renders the <database_schema> XML of one database from cached fragments.
+    """
+
+    def __init__(self, tables: Dict[str, TableSchema], description: Optional[str] = None,
+                 index: Optional[SchemaIndex] = None):
+        """
+        Build the XML fragments of a schema.
+
+        Args:
+            tables: Table name -> TableSchema
+            description: Optional high-level description of the database
+            index: SchemaIndex of the schema, built from the tables on first use if not given
+        """
+        self.tables = tables
+        self.description = description
+        self._index = index
+        self.columns: List[_ColumnFragment] = []
+        self.table_columns: Dict[str, List[_ColumnFragment]] = {}
+        self.table_heads: Dict[str, Tuple[str, int]] = {}
+        for table_name, table in tables.items():
+            head = (f'    <table name="{html.escape(table_name)}">\n'
+                    f'      <column_count>{len(table.columns)}</column_count>\n'
+                    f'      <columns>')
+            self.table_heads[table_name] = (head, count_tokens(head))
+            self.table_columns[table_name] = []
+            for col_name, col_info in table.columns.items():
+                col = self._column_fragment(table_name, col_name, col_info, len(self.columns))
+                self.columns.append(col)
+                self.table_columns[table_name].append(col)
+        self._tail_tokens = count_tokens('      </columns>\n    </table>')
+        self._omitted_tokens = count_tokens(self._table_tail(100)) - count_tokens(self._table_tail(0))
+
+    @staticmethod
+    def _column_fragment(table_name: str, col_name: str, col_info: ColumnInfo, position: int) -> _ColumnFragment:
+        """Render the XML of one column, without and with its typical values."""
+        lines = [f'        <column name="{html.escape(col_name)}">',
+                 f'          <type>{col_info.dataType}</type>',
+                 f'          <nullable>{col_info.nullable}</nullable>']
+        if col_info.isPrimaryKey:
+            lines.append('          <primary_key>true</primary_key>')
+        if col_info.isForeignKey and col_info.references:
+            lines.append('          <foreign_key>')
+            lines.append(f'            <references_table>{html.escape(col_info.references["table"])}</references_table>')
+            lines.append(f'            <references_column>{html.escape(col_info.references["column"])}</references_column>')
+            lines.append('          </foreign_key>')
+        head = "\n".join(lines)
+
+        values = ""
+        if col_info.typicalValues:
+            lines = ['          <typical_values>']
+            for value in col_info.typicalValues[:MAX_VALUES]:
+                if value is not None:
+                    lines.append(f'            <value>{html.escape(str(value))}</value>')
+                else:
+                    lines.append('            <value null="true"/>')
+            if len(col_info.typicalValues) > MAX_VALUES:
+                lines.append(f'            <!-- {len(col_info.typicalValues) - MAX_VALUES} more values -->')
+            lines.append('          </typical_values>')
+            values = "\n".join(lines)
+
+        return _ColumnFragment(
+            table=table_name,
+            name=col_name,
+            position=position,
+            is_key=col_info.isPrimaryKey or col_info.isForeignKey,
+            head=head,
+            values=values,
+            head_tokens=count_tokens(head) + count_tokens('        </column>'),
+            values_tokens=count_tokens(values) if values else 0
+        )
+
+    @property
+    def index(self) -> SchemaIndex:
+        """The SchemaIndex used to rank columns."""
+        if self._index is None:
+            self._index = SchemaIndex.from_tables(self.tables)
+        return self._index
+
+    def relevance(self, query: Optional[str]) -> Dict[Tuple[str, str], float]:
+        """
+        Score how relevant each column is to a query, with the schema index.
+
+        Args:
+            query: The query text (question and evidence); None scores all columns 0
+
+        Returns:
+            (table, column) -> score
+        """
+        if not query:
+            return {(col.table, col.name): 0.0 for col in self.columns}
+        return self.index.column_scores(query)
+
+    def render(self, query: Optional[str] = None, max_tokens: Optional[int] = None,
+               include_values: bool = True, include_description: bool = True,
+               tables: Optional[Iterable[str]] = None) -> RenderedSchema:
+        """
+        Render the schema XML.
+
+        Args:
+            query: Query text used to rank columns when the budget is exceeded
+            max_tokens: Token budget of the document (None: no limit). Typical
+                values, then non-key columns are dropped, least relevant first;
+                table names and key columns are always kept.
+            include_values: Whether to include typical values
+            include_description: Whether to include the database description
+            tables: Only render these tables (None: all tables)
+
+        Returns:
+            The rendered schema and its token count
+        """
+        if tables is None:
+            shown = list(self.tables)
+        else:
+            selected = set(tables)
+            shown = [name for name in self.tables if name in selected]
+        columns = [col for name in shown for col in self.table_columns[name]]
+
+        header = ["<database_schema>"]
+        if include_description and self.description:
+            header.append(f"  <description>{self.description}</description>")
+        header.append(f"  <total_tables>{len(self.tables)}</total_tables>")
+        header.append("  <tables>")
+        if len(shown) < len(self.tables):
+            header.append(f"    <!-- {len(self.tables) - len(shown)} less relevant tables omitted -->")
+        header = "\n".join(header)
+        footer = "  </tables>\n</database_schema>"
+
+        keep_values = {col.position for col in columns if include_values and col.values}
+        keep_columns = {col.position for col in columns}
+
+        total = (count_tokens(header) + count_tokens(footer) + self._tail_tokens * len(shown)
+                 + sum(self.table_heads[name][1] for name in shown)
+                 + sum(col.head_tokens for col in columns)
+                 + sum(col.values_tokens for col in columns if col.position in keep_values))
+
+        if max_tokens is not None and total > max_tokens:
+            scores = self.relevance(query)
+            # Least relevant first; later columns of a table go before earlier ones
+            ranked = sorted(columns, key=lambda c: (scores[(c.table, c.name)], -c.position))
+            for col in ranked:
+                if total <= max_tokens:
+                    break
+                if col.position in keep_values:
+                    keep_values.discard(col.position)
+                    total -= col.values_tokens
+            pruned_tables = set()
+            for col in ranked:
+                if total <= max_tokens:
+                    break
+                if not col.is_key:
+                    keep_columns.discard(col.position)
+                    total -= col.head_tokens
+                    if col.table not in pruned_tables:
+                        pruned_tables.add(col.table)
+                        total += self._omitted_tokens
+
+        parts = [header]
+        for table_name in shown:
+            parts.append(self.table_heads[table_name][0])
+            omitted = 0
+            for col in self.table_columns[table_name]:
+                if col.position not in keep_columns:
+                    omitted += 1
+                    continue
+                parts.append(col.head)
+                if col.position in keep_values:
+                    parts.append(col.values)
+                parts.append('        </column>')
+            parts.append(self._table_tail(omitted))
+        parts.append(footer)
+
+        xml = "\n".join(parts)
+        include_count = sum(1 for col in columns if include_values and col.values)
+        return RenderedSchema(
+            xml=xml,
+            tokens=count_tokens(xml),
+            omitted_columns=len(columns) - len(keep_columns),
+            omitted_values=include_count - len(keep_values)
+        )
+
+    @staticmethod
+    def _table_tail(omitted: int) -> str:
+        lines = []
+        if omitted:
+            lines.append(f'        <!-- {omitted} less relevant columns omitted -->')
+        lines.append('      </columns>')
+        lines.append('    </table>')
+        return "\n".join(lines)
+
+
+# SchemaCatalog -> its renderer
+_renderers: "weakref.WeakKeyDictionary[SchemaCatalog, SchemaXMLRenderer]" = weakref.WeakKeyDictionary()
+
+
+def get_catalog_renderer(catalog: SchemaCatalog) -> SchemaXMLRenderer:
+    """Get the shared renderer of a catalog, building its fragments on first use."""
+    renderer = _renderers.get(catalog)
+    if renderer is None:
+        renderer = SchemaXMLRenderer(catalog.tables, catalog.description, get_schema_index(catalog))
+        _renderers[catalog] = renderer
+    return renderer
+
+
+async def get_schema_renderer(schema_manager) -> Optional[SchemaXMLRenderer]:
+    """
+    Get a renderer for the schema held by a DatabaseSchemaManager.
+
+    A schema loaded from a SchemaReader uses its catalog's shared renderer;
+    for any other schema a new renderer is built.
+
+    Args:
+        schema_manager: The DatabaseSchemaManager of the task
+
+    Returns:
+        The renderer, or None if no tables are loaded
+    """
+    catalog = await schema_manager.get_catalog()
+    if catalog is not None:
+        return get_catalog_renderer(catalog) if catalog.tables else None
+    tables = await schema_manager.get_all_tables()
+    if not tables:
+        return None
+    return SchemaXMLRenderer(tables, await schema_manager.get_database_description())
+
+
+async def render_schema_xml(schema_manager, query: Optional[str] = None,
+                            max_tokens: Optional[int] = None,
+                            include_values: bool = True,
+                            include_description: bool = True,
+                            tables: Optional[Iterable[str]] = None) -> Optional[RenderedSchema]:
+    """
+    Render the schema held by a DatabaseSchemaManager.
+
+    Args:
+        schema_manager: The DatabaseSchemaManager of the task
+        query: Query text used to rank columns when the budget is exceeded
+        max_tokens: Token budget of the document (None: no limit)
+        include_values: Whether to include typical values
+        include_description: Whether to include the database description
+        tables: Only render these tables (None: all tables)
+
+    Returns:
+        The rendered schema, or None if no tables are loaded
+    """
+    renderer = await get_schema_renderer(schema_manager)
+    if renderer is None:
+        return None
+    return renderer.render(query, max_tokens, include_values, include_description, tables)
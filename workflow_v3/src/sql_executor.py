@@ -1,9 +1,32 @@
 # -*- coding: utf-8 -*-
 """SQL execution utilities for text-to-SQL tasks."""
 
+import asyncio
+import functools
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Tuple
-from func_timeout import func_set_timeout, FunctionTimedOut
+
+from autogen_core import CancellationToken
+
+from sqlite_exec import SQLCancelledError, SQLTimeoutError, run_sql
+from sql_sandbox import SQLSandbox
+
+
+# Threads running SQL for async callers, shared by all executors
+SQL_EXECUTOR_THREADS = 8
+_sql_pool: Optional[ThreadPoolExecutor] = None
+_sql_pool_lock = threading.Lock()
+
+
+def get_sql_thread_pool() -> ThreadPoolExecutor:
+    """Get the thread pool that runs SQL off the event loop."""
+    global _sql_pool
+    with _sql_pool_lock:
+        if _sql_pool is None:
+            _sql_pool = ThreadPoolExecutor(max_workers=SQL_EXECUTOR_THREADS, thread_name_prefix="sql")
+        return _sql_pool
 
 
 class SQLExecutor:
@@ -11,30 +34,48 @@ class SQLExecutor:
     A utility class for executing SQL queries against SQLite databases.
     
     This class handles SQL execution, error handling, and timeout management.
+    Timeouts interrupt the query inside SQLite (see sqlite_exec), so a
+    runaway query stops instead of running on in a background thread.
+    With a SQLSandbox, queries run in isolated worker processes instead.
+    
+    Async callers use execute_sql_async / safe_execute_async, which run the
+    query in a shared thread pool so the event loop is never blocked, and
+    stop it when the caller is cancelled.
     """
     
-    def __init__(self, data_path: str, dataset_name: str):
+    def __init__(self, data_path: str, dataset_name: str, timeout: float = 300,
+                 sandbox: Optional[SQLSandbox] = None):
         """
         Initialize the SQL executor.
         
         Args:
             data_path: Path to the database files
             dataset_name: Name of the dataset (e.g., 'bird', 'spider')
+            timeout: Per-query deadline in seconds
+            sandbox: Optional worker pool to execute queries out of process
         """
         self.data_path = data_path
         self.dataset_name = dataset_name
+        self.timeout = timeout
+        self.sandbox = sandbox
     
-    @func_set_timeout(300)  # 5-minute timeout
-    def execute_sql(self, sql: str, db_id: str) -> Dict[str, Any]:
+    def execute_sql(self, sql: str, db_id: str,
+                    cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
         """
         Execute a SQL query against the database.
         
         Args:
             sql: The SQL query to execute
             db_id: Database identifier
+            cancel_event: Optional event that stops the query when set
+                (in a sandbox the query runs on until its deadline)
             
         Returns:
             Dictionary with execution results or error information
+            
+        Raises:
+            SQLTimeoutError: If the query exceeded self.timeout
+            SQLCancelledError: If cancel_event was set during the query
         """
         # Get database connection with proper path based on dataset
         if self.dataset_name == "bird":
@@ -46,26 +87,25 @@ class SQLExecutor:
             
         print(f"[SQLExecutor] Connecting to database: {db_path}")
         
-        conn = sqlite3.connect(db_path)
-        conn.text_factory = lambda b: b.decode(errors="ignore")
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute(sql)
-            result = cursor.fetchall()
-            column_names = [desc[0] for desc in cursor.description] if cursor.description else []
-            conn.close()
+            if self.sandbox is not None:
+                run = self.sandbox.execute(db_path, sql, self.timeout)
+            else:
+                run = run_sql(db_path, sql, self.timeout, cancel_event=cancel_event)
             return {
                 "sql": str(sql),
-                "data": result[:5],  # Return at most 5 rows
-                "column_names": column_names,
-                "row_count": len(result),
+                "data": run.rows[:5],  # Return at most 5 rows
+                "column_names": run.column_names,
+                "row_count": len(run.rows),
+                "execution_time": run.elapsed,
+                "vm_steps": run.vm_steps,
                 "sqlite_error": "",
                 "exception_class": "",
                 "success": True
             }
+        except (SQLTimeoutError, SQLCancelledError):
+            raise
         except sqlite3.Error as er:
-            conn.close()
             return {
                 "sql": str(sql),
                 "sqlite_error": str(' '.join(er.args)),
@@ -73,7 +113,6 @@ class SQLExecutor:
                 "success": False
             }
         except Exception as e:
-            conn.close()
             return {
                 "sql": str(sql),
                 "sqlite_error": str(e.args),
@@ -114,33 +153,41 @@ class SQLExecutor:
         
         return True, ""
     
-    def safe_execute(self, sql: str, db_id: str) -> Dict[str, Any]:
+    def safe_execute(self, sql: str, db_id: str,
+                     cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
         """
         Safely execute SQL with timeout handling.
         
         Args:
             sql: The SQL query to execute
             db_id: Database identifier
+            cancel_event: Optional event that stops the query when set
             
         Returns:
             Execution result with additional timeout information
+            
+        Raises:
+            SQLCancelledError: If cancel_event was set during the query
         """
         try:
-            result = self.execute_sql(sql, db_id)
+            result = self.execute_sql(sql, db_id, cancel_event)
             result['timeout'] = False
             result['is_valid_result'] = True  # Add this for consistent response format
             result['validation_message'] = ""
             return result
-        except FunctionTimedOut:
+        except SQLTimeoutError as te:
             return {
                 "sql": str(sql),
-                "sqlite_error": "Execution timed out (>300 seconds)",
-                "exception_class": "FunctionTimedOut", 
+                "sqlite_error": str(te),
+                "exception_class": "SQLTimeoutError",
+                "vm_steps": te.vm_steps,
                 "timeout": True,
                 "success": False,
                 "is_valid_result": False,
                 "validation_message": "Query execution timed out"
             }
+        except SQLCancelledError:
+            raise
         except Exception as e:
             return {
                 "sql": str(sql),
@@ -150,4 +197,52 @@ class SQLExecutor:
                 "success": False,
                 "is_valid_result": False,
                 "validation_message": f"Unexpected error: {str(e)}"
-            }
\ No newline at end of file
+            }
+    
+    async def _run_in_pool(self, method, sql: str, db_id: str,
+                           cancellation_token: Optional[CancellationToken]) -> Dict[str, Any]:
+        """Run a blocking execute method in the SQL thread pool, stopping it on cancellation."""
+        cancel_event = threading.Event()
+        future = asyncio.get_running_loop().run_in_executor(
+            get_sql_thread_pool(), functools.partial(method, sql, db_id, cancel_event)
+        )
+        if cancellation_token is not None:
+            cancellation_token.add_callback(cancel_event.set)
+            cancellation_token.link_future(future)
+        try:
+            return await future
+        except SQLCancelledError:
+            raise asyncio.CancelledError() from None
+        except asyncio.CancelledError:
+            # The caller gave up: interrupt the query still running in its thread
+            cancel_event.set()
+            raise
+    
+    async def execute_sql_async(self, sql: str, db_id: str,
+                                cancellation_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        Execute a SQL query without blocking the event loop.
+        
+        Args:
+            sql: The SQL query to execute
+            db_id: Database identifier
+            cancellation_token: Optional token; cancelling it stops the query
+            
+        Returns:
+            Dictionary with execution results or error information (see execute_sql)
+            
+        Raises:
+            SQLTimeoutError: If the query exceeded self.timeout
+            asyncio.CancelledError: If the call was cancelled
+        """
+        return await self._run_in_pool(self.execute_sql, sql, db_id, cancellation_token)
+    
+    async def safe_execute_async(self, sql: str, db_id: str,
+                                 cancellation_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        Safely execute SQL without blocking the event loop (see safe_execute).
+        
+        Raises:
+            asyncio.CancelledError: If the call was cancelled
+        """
+        return await self._run_in_pool(self.safe_execute, sql, db_id, cancellation_token)
@@ -4,21 +4,62 @@ SQL Generator Tools for use with AutoGen agents.
 This module provides various tools that the SQL Generator LLM can call:
 1. Schema inspection tools - check table/column information
 2. SQL execution tool - execute SQL and get actual results for iterative improvement
+3. Value lookup tool - find the columns holding a literal value
+4. Join path tool - find the foreign key joins connecting tables
 """
 
+import asyncio
+import functools
 import logging
-from typing import Dict, Any, Optional, List
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Union
+
+from autogen_core import CancellationToken
+
 from database_schema_manager import DatabaseSchemaManager
 from keyvalue_memory import KeyValueMemory
 from sql_executor import SQLExecutor
 from memory_content_types import ExecutionResult
 from query_tree_manager import QueryTreeManager
 from task_context_manager import TaskContextManager
+from value_index import get_schema_value_index
+from join_graph import get_join_graph
+from name_index import get_name_index
+
+
+@dataclass
+class _TaskBinding:
+    """The database and executor of one task, with its executed SQL results."""
+    task_id: str
+    db_id: str
+    executor: SQLExecutor
+    results: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+def _timed_tool(method):
+    """Record the latency of every call of a tool in self.call_stats."""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            stats = self.call_stats.setdefault(method.__name__, {"calls": 0, "total_time": 0.0, "max_time": 0.0})
+            elapsed = time.monotonic() - start
+            stats["calls"] += 1
+            stats["total_time"] += elapsed
+            stats["max_time"] = max(stats["max_time"], elapsed)
+    return wrapper
 
 
 class SQLGeneratorTools:
     """
     Collection of tools for SQL generation that can be used by AutoGen agents.
+    
+    The tools bind to the database of the current task on first use and reuse
+    its SQLExecutor, and execution results, for every call within the task.
+    The latency of each tool is recorded in call_stats.
     """
     
     def __init__(self, memory: KeyValueMemory, logger: Optional[logging.Logger] = None):
@@ -27,7 +68,39 @@ class SQLGeneratorTools:
         self.schema_manager = DatabaseSchemaManager(memory)
         self.tree_manager = QueryTreeManager(memory)
         self.task_manager = TaskContextManager(memory)
+        self.call_stats: Dict[str, Dict[str, float]] = {}  # tool -> calls, total_time, max_time
+        self._binding: Optional[_TaskBinding] = None
+    
+    async def _bind_task(self) -> Union[_TaskBinding, str]:
+        """
+        Get the database and executor of the current task, resolving them once per task.
+        
+        Returns:
+            The task binding, or an error message
+        """
+        task_context = await self.memory.get_view("taskContext")
+        if not task_context:
+            return "No task context found"
+        db_name = task_context["databaseName"]
+        if (self._binding is not None and self._binding.task_id == task_context["taskId"]
+                and self._binding.db_id == db_name):
+            return self._binding
+        
+        if not db_name:
+            return "No database name in task context"
+        
+        metadata = await self.schema_manager.get_metadata()
+        data_path = metadata.get("data_path")
+        if not data_path:
+            return "No data_path in database schema metadata"
+        dataset_name = metadata.get("dataset_name", "bird")
+        
+        self.logger.debug(f"Binding tools to database {db_name} (data_path: {data_path}, "
+                          f"dataset_name: {dataset_name})")
+        self._binding = _TaskBinding(task_context["taskId"], db_name, SQLExecutor(data_path, dataset_name))
+        return self._binding
     
+    @_timed_tool
     async def check_table_columns(self, table_name: str) -> Dict[str, Any]:
         """
         Check table and column information from the schema.
@@ -41,7 +114,7 @@ class SQLGeneratorTools:
             Dictionary containing:
             - exists: boolean indicating if table exists
             - columns: list of column details if table exists
-            - similar_tables: list of similar table names if table not found
+            - similar_tables: list of similar table names if table not found, best first
             - error: error message if any
         """
         try:
@@ -104,23 +177,15 @@ class SQLGeneratorTools:
                     "foreign_keys": [c["name"] for c in columns if c["is_foreign"]]
                 }
             else:
-                # Table not found - find similar tables
-                similar_tables = []
-                table_lower = table_name.lower()
-                
-                for tbl_name in all_tables.keys():
-                    tbl_lower = tbl_name.lower()
-                    # Check for substring match or similar names
-                    if (table_lower in tbl_lower or 
-                        tbl_lower in table_lower or
-                        self._calculate_similarity(table_lower, tbl_lower) > 0.7):
-                        similar_tables.append(tbl_name)
+                # Table not found - find similar tables, best first
+                name_index = await get_name_index(self.schema_manager)
+                similar_tables = name_index.similar_tables(table_name, 5)
                 
                 return {
                     "exists": False,
                     "error": f"Table '{table_name}' not found in schema",
                     "columns": [],
-                    "similar_tables": similar_tables[:5],  # Return top 5 similar
+                    "similar_tables": similar_tables,
                     "available_tables": list(all_tables.keys()) if len(all_tables) < 20 else f"{len(all_tables)} tables available"
                 }
                 
@@ -133,6 +198,7 @@ class SQLGeneratorTools:
                 "similar_tables": []
             }
     
+    @_timed_tool
     async def check_column_exists(self, table_name: str, column_name: str) -> Dict[str, Any]:
         """
         Check if a specific column exists in a table.
@@ -145,7 +211,8 @@ class SQLGeneratorTools:
             Dictionary containing:
             - exists: boolean indicating if column exists
             - column_info: details about the column if it exists
-            - similar_columns: list of similar column names if not found
+            - similar_columns: list of similar column names if not found, best first
+            - similar_columns_in_other_tables: closest {table, column, score} elsewhere if not found
             - table_exists: boolean indicating if the table exists
         """
         try:
@@ -185,23 +252,16 @@ class SQLGeneratorTools:
                     "column_info": column_info
                 }
             else:
-                # Column not found - find similar columns
-                similar_columns = []
-                col_lower = column_name.lower()
-                
-                for col in columns:
-                    col_name_lower = col["name"].lower()
-                    if (col_lower in col_name_lower or 
-                        col_name_lower in col_lower or
-                        self._calculate_similarity(col_lower, col_name_lower) > 0.7):
-                        similar_columns.append(col["name"])
+                # Column not found - find similar columns, here and in other tables
+                name_index = await get_name_index(self.schema_manager)
                 
                 return {
                     "table_exists": True,
                     "exists": False,
                     "exact_table_name": exact_name,
                     "error": f"Column '{column_name}' not found in table '{exact_name}'",
-                    "similar_columns": similar_columns[:5],
+                    "similar_columns": name_index.similar_columns(exact_name, column_name, 5),
+                    "similar_columns_in_other_tables": name_index.similar_columns_elsewhere(exact_name, column_name, 3),
                     "available_columns": [col["name"] for col in columns]
                 }
                 
@@ -213,15 +273,19 @@ class SQLGeneratorTools:
                 "error": f"Error checking column: {str(e)}"
             }
     
-    async def execute_sql(self, sql: str) -> Dict[str, Any]:
+    @_timed_tool
+    async def execute_sql(self, sql: str,
+                          cancellation_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
         Execute SQL query and return results.
         
         This tool allows the SQL Generator to test SQL queries and see actual results,
-        enabling iterative improvement during generation.
+        enabling iterative improvement during generation. The query runs in the
+        SQL thread pool, off the event loop.
         
         Args:
             sql: The SQL query to execute
+            cancellation_token: Passed by AutoGen; cancelling it stops the query
             
         Returns:
             Dictionary containing:
@@ -235,53 +299,29 @@ class SQLGeneratorTools:
         try:
             self.logger.info(f"Executing SQL: {sql}")
             
-            # Get task context to get database name
-            task_context = await self.task_manager.get()
-            if not task_context:
+            binding = await self._bind_task()
+            if isinstance(binding, str):
                 return {
                     "status": "error",
-                    "error": "No task context found",
+                    "error": binding,
                     "row_count": 0,
                     "columns": [],
                     "data": []
                 }
             
-            db_name = task_context.databaseName
-            if not db_name:
-                return {
-                    "status": "error",
-                    "error": "No database name in task context",
-                    "row_count": 0,
-                    "columns": [],
-                    "data": []
-                }
-            
-            # Get data path and dataset name from database schema
-            schema_summary = await self.schema_manager.get_schema_summary()
-            data_path = None
-            dataset_name = "bird"  # Default to bird
-            
-            if schema_summary and "metadata" in schema_summary:
-                metadata = schema_summary["metadata"]
-                data_path = metadata.get("data_path")
-                dataset_name = metadata.get("dataset_name", "bird")
-            
-            if not data_path:
-                # Try to infer from common patterns
-                self.logger.warning("No data_path in database schema metadata, using default")
-                data_path = "/home/norman/work/text-to-sql/MAC-SQL/data/bird"
-            
-            self.logger.debug(f"Executing SQL on database {db_name}")
-            self.logger.debug(f"Using data_path: {data_path}, dataset_name: {dataset_name}")
-            
-            executor = SQLExecutor(data_path, dataset_name)
-            
-            result_dict = executor.execute_sql(sql, db_name)
+            cache_key = sql.strip()
+            cached = binding.results.get(cache_key)
+            if cached is not None:
+                self.logger.debug("Using cached execution result")
+                result_dict = cached
+            else:
+                result_dict = await binding.executor.execute_sql_async(sql, binding.db_id, cancellation_token)
+                binding.results[cache_key] = result_dict
             
-            if result_dict.get("error"):
+            if not result_dict.get("success"):
                 execution_result = {
                     "status": "error",
-                    "error": result_dict["error"],
+                    "error": result_dict.get("sqlite_error") or "Unknown error",
                     "row_count": 0,
                     "columns": [],
                     "data": []
@@ -294,6 +334,8 @@ class SQLGeneratorTools:
                     "row_count": len(result_dict.get("data", [])),
                     "execution_time": result_dict.get("execution_time")
                 }
+                if cached is not None:
+                    execution_result["cached"] = True
                 
                 # Save successful SQL execution to shared memory
                 try:
@@ -332,6 +374,97 @@ class SQLGeneratorTools:
                 "data": []
             }
     
+    @_timed_tool
+    async def find_values(self, value: str) -> Dict[str, Any]:
+        """
+        Find the columns whose stored values contain a literal.
+        
+        This tool lets the LLM map a value mentioned in the question to the
+        exact stored value and its column, without exploratory queries.
+        
+        Args:
+            value: The literal to look for (e.g. "Alameda")
+            
+        Returns:
+            Dictionary containing:
+            - matches: list of {table, column, value, match} with match 'exact' or 'contains'
+            - count: number of matches
+            - error: error message if any
+        """
+        try:
+            self.logger.info(f"Finding values matching: {value}")
+            
+            index = await get_schema_value_index(self.schema_manager)
+            if index is None:
+                return {
+                    "matches": [],
+                    "count": 0,
+                    "error": "No database available for value lookup"
+                }
+            
+            matches = await asyncio.to_thread(index.search, value)
+            return {
+                "matches": matches,
+                "count": len(matches)
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error finding values: {str(e)}", exc_info=True)
+            return {
+                "matches": [],
+                "count": 0,
+                "error": f"Error finding values: {str(e)}"
+            }
+    
+    @_timed_tool
+    async def find_join_path(self, tables: List[str]) -> Dict[str, Any]:
+        """
+        Find how to join a set of tables along their foreign keys.
+        
+        This tool gives the LLM the join conditions, including the tables
+        in between, instead of guessing multi-hop joins.
+        
+        Args:
+            tables: The tables to join (e.g. ["schools", "satscores"])
+            
+        Returns:
+            Dictionary containing:
+            - tables: all tables to join, the given ones first
+            - joins: list of {from_table, from_column, to_table, to_column}
+            - sql: the FROM clause joining them
+            - unreachable: given tables with no foreign key path, if any
+            - alternatives: other join paths for exactly two tables, if any
+            - error: error message if any
+        """
+        try:
+            self.logger.info(f"Finding join path for tables: {tables}")
+            
+            graph = await get_join_graph(self.schema_manager)
+            unknown = [table for table in tables if graph.resolve_table(table) is None]
+            if unknown:
+                return {
+                    "tables": [],
+                    "joins": [],
+                    "error": f"Unknown tables: {', '.join(unknown)}"
+                }
+            
+            result = graph.connect(tables).to_dict()
+            if len(tables) == 2:
+                paths = graph.k_shortest_paths(tables[0], tables[1], 3)
+                result["alternatives"] = [
+                    [edge.to_dict() for edge in path] for path in paths[1:]
+                ]
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"Error finding join path: {str(e)}", exc_info=True)
+            return {
+                "tables": [],
+                "joins": [],
+                "error": f"Error finding join path: {str(e)}"
+            }
+    
+    @_timed_tool
     async def list_all_tables(self) -> Dict[str, Any]:
         """
         List all available tables in the schema.
@@ -387,26 +520,6 @@ class SQLGeneratorTools:
                 "count": 0,
                 "error": f"Error listing tables: {str(e)}"
             }
-    
-    def _calculate_similarity(self, str1: str, str2: str) -> float:
-        """
-        Calculate simple string similarity ratio.
-        
-        Returns a value between 0 and 1, where 1 is identical.
-        """
-        if str1 == str2:
-            return 1.0
-        
-        # Simple character overlap ratio
-        set1 = set(str1)
-        set2 = set(str2)
-        intersection = len(set1 & set2)
-        union = len(set1 | set2)
-        
-        if union == 0:
-            return 0.0
-            
-        return intersection / union
 
 
 def create_sql_generator_tools(memory: KeyValueMemory, logger: Optional[logging.Logger] = None) -> List[Dict[str, Any]]:
@@ -433,6 +546,16 @@ def create_sql_generator_tools(memory: KeyValueMemory, logger: Optional[logging.
             "name": "execute_sql",
             "description": "Execute SQL query and return actual results for verification and iterative improvement"
         },
+        {
+            "function": tools_instance.find_values,
+            "name": "find_values",
+            "description": "Find which table columns store values containing a literal from the question, and the exact stored values"
+        },
+        {
+            "function": tools_instance.find_join_path,
+            "name": "find_join_path",
+            "description": "Find the foreign key joins (and tables in between) connecting a list of tables, as a FROM clause"
+        },
         {
             "function": tools_instance.list_all_tables,
             "name": "list_all_tables",
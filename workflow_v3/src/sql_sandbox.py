@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Out-of-process SQL execution sandbox.
+
+A pool of long-lived worker processes executes SQL on behalf of the caller.
+Each worker runs under an address-space limit (RLIMIT_AS) and a per-query
+CPU limit, keeps warm connections to the databases it has seen, and talks
+to the parent over a pipe with small tuples:
+
+    request:  (db_path, sql, timeout, max_rows)
+    response: ("ok", rows, column_names, elapsed, vm_steps, evicted)
+              ("timeout", elapsed, vm_steps, evicted)
+              ("error", exception, evicted)
+              ("memory", message)        # worker exits after replying
+
+evicted lists the db paths whose connections the worker closed to stay
+within max_connections, so the parent knows which databases are warm.
+
+Deadlines are enforced twice: inside SQLite by the worker (see sqlite_exec),
+and by the parent, which kills and replaces any worker that does not answer
+within the deadline plus a grace period. A worker that runs out of memory
+or dies is replaced as well, so a pathological query can never take down
+the calling process.
+"""
+
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, workers still isolate crashes
+    resource = None
+
+from sqlite_exec import SQLRunResult, SQLTimeoutError, connect, execute_with_deadline
+
+
+class SandboxWorkerError(Exception):
+    """Raised when a worker dies or exceeds its memory/CPU limits."""
+
+
+def _set_limits(memory_limit_mb: Optional[int]):
+    if resource is None or not memory_limit_mb:
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass
+
+
+def _set_cpu_budget(cpu_limit_s: Optional[float]):
+    """Allow the next query cpu_limit_s more seconds of CPU (SIGXCPU after)."""
+    if resource is None or not cpu_limit_s:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + cpu_limit_s) + 1
+    try:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, resource.RLIM_INFINITY))
+    except (ValueError, OSError):
+        pass
+
+
+def _worker_main(pipe, memory_limit_mb, cpu_limit_s, max_connections):
+    _set_limits(memory_limit_mb)
+    connections = OrderedDict()  # db_path -> warm connection, LRU order
+    while True:
+        try:
+            request = pipe.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        db_path, sql, timeout, max_rows = request
+        evicted = []
+        try:
+            conn = connections.pop(db_path, None) or connect(db_path)
+            connections[db_path] = conn
+            while len(connections) > max_connections:
+                evicted_path, evicted_conn = connections.popitem(last=False)
+                evicted_conn.close()
+                evicted.append(evicted_path)
+            _set_cpu_budget(cpu_limit_s)
+            run = execute_with_deadline(conn, sql, timeout, max_rows=max_rows)
+            reply = ("ok", run.rows, run.column_names, run.elapsed, run.vm_steps, evicted)
+        except SQLTimeoutError as te:
+            reply = ("timeout", te.elapsed, te.vm_steps, evicted)
+        except MemoryError as me:
+            pipe.send(("memory", str(me) or "out of memory"))
+            break
+        except Exception as e:
+            reply = ("error", e, evicted)
+        try:
+            pipe.send(reply)
+        except MemoryError:
+            pipe.send(("memory", "result too large for memory limit"))
+            break
+        except Exception as e:  # unpicklable rows or exception
+            pipe.send(("error", RuntimeError(f"{type(e).__name__}: {e}"), evicted))
+    for conn in connections.values():
+        conn.close()
+
+
+class _Worker:
+    def __init__(self, ctx, memory_limit_mb, cpu_limit_s, max_connections):
+        self.pipe, child_pipe = ctx.Pipe(duplex=True)
+        self.process = ctx.Process(target=_worker_main,
+                                   args=(child_pipe, memory_limit_mb, cpu_limit_s, max_connections),
+                                   daemon=True)
+        self.process.start()
+        child_pipe.close()
+        self.warm = set()  # db paths with an open connection in the worker
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(1)
+        finally:
+            self.pipe.close()
+
+    def stop(self):
+        try:
+            self.pipe.send(None)
+            self.process.join(1)
+        except (OSError, BrokenPipeError):
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+        self.pipe.close()
+
+
+class SQLSandbox:
+    """
+    Pool of sandboxed SQL worker processes.
+
+    execute() is thread-safe; concurrent callers are spread over the idle
+    workers, preferring one that already holds a connection to the database.
+    """
+
+    def __init__(self,
+                 num_workers: int = 2,
+                 memory_limit_mb: Optional[int] = 4096,
+                 cpu_limit_s: Optional[float] = None,
+                 grace_period: float = 2.0,
+                 max_connections: int = 8,
+                 start_method: Optional[str] = None):
+        """
+        Args:
+            num_workers: Number of worker processes
+            memory_limit_mb: RLIMIT_AS of each worker (None disables)
+            cpu_limit_s: CPU seconds allowed per query (None disables)
+            grace_period: Extra seconds to wait before killing a worker
+            max_connections: Warm connections kept per worker
+            start_method: multiprocessing start method, defaults to
+                "forkserver" where available so workers never inherit the
+                parent's threads
+        """
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        self._ctx = mp.get_context(start_method)
+        self._worker_args = (memory_limit_mb, cpu_limit_s, max_connections)
+        self.grace_period = grace_period
+        self._cond = threading.Condition()
+        self._idle: List[_Worker] = [self._spawn() for _ in range(num_workers)]
+        self._all = list(self._idle)
+        self._closed = False
+        self.replaced_workers = 0
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, *self._worker_args)
+
+    def _acquire(self, db_path: str) -> _Worker:
+        with self._cond:
+            while not self._idle:
+                if self._closed:
+                    raise RuntimeError("SQLSandbox is closed")
+                self._cond.wait()
+            if self._closed:
+                raise RuntimeError("SQLSandbox is closed")
+            for i, worker in enumerate(self._idle):
+                if db_path in worker.warm:
+                    return self._idle.pop(i)
+            return self._idle.pop()
+
+    def _release(self, worker: _Worker):
+        with self._cond:
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        with self._cond:
+            if self._closed:
+                return
+            replacement = self._spawn()
+            self._all = [replacement if w is worker else w for w in self._all]
+            self.replaced_workers += 1
+            self._idle.append(replacement)
+            self._cond.notify()
+
+    def execute(self,
+                db_path: str,
+                sql: str,
+                timeout: Optional[float],
+                max_rows: Optional[int] = None) -> SQLRunResult:
+        """
+        Execute one statement in a worker process.
+
+        Args:
+            db_path: Path to the .sqlite file, ":memory:" or a "file:" URI
+            sql: The statement to execute
+            timeout: Seconds allowed for the statement, None for no limit
+            max_rows: Fetch at most this many rows (None fetches all)
+
+        Returns:
+            SQLRunResult, as returned by sqlite_exec.execute_with_deadline
+
+        Raises:
+            SQLTimeoutError: The deadline passed (the worker may be replaced)
+            SandboxWorkerError: The worker crashed or hit its memory limit
+            sqlite3.Error: Any database error raised by the statement
+        """
+        if db_path != ":memory:" and not db_path.startswith("file:"):
+            db_path = os.path.abspath(db_path)
+        worker = self._acquire(db_path)
+        start = time.monotonic()
+        try:
+            worker.pipe.send((db_path, sql, timeout, max_rows))
+            wait = None if timeout is None else timeout + self.grace_period
+            if not worker.pipe.poll(wait):
+                self._replace(worker)
+                raise SQLTimeoutError(timeout, time.monotonic() - start, 0)
+            reply = worker.pipe.recv()
+        except (EOFError, OSError):
+            self._replace(worker)
+            raise SandboxWorkerError(f"SQL worker died (exit code {worker.process.exitcode})") from None
+
+        status = reply[0]
+        if status == "memory":
+            self._replace(worker)
+            raise SandboxWorkerError(f"SQL worker exceeded its memory limit: {reply[1]}")
+        worker.warm.difference_update(reply[-1])
+        if status == "ok":
+            worker.warm.add(db_path)
+        self._release(worker)
+        if status == "ok":
+            return SQLRunResult(*reply[1:-1])
+        if status == "timeout":
+            raise SQLTimeoutError(timeout, reply[1], reply[2])
+        raise reply[1]
+
+    def close(self):
+        """Stop all workers."""
+        with self._cond:
+            self._closed = True
+            workers, self._all, self._idle = self._all, [], []
+            self._cond.notify_all()
+        for worker in workers:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Deadline-bounded SQLite execution.
+
+Timeouts are enforced from inside SQLite with a progress handler instead of
+a watchdog thread, so a query that overruns its deadline is actually
+interrupted and its connection is released, rather than left running in a
+thread that can no longer be joined. The handler also counts VM steps, which
+gives a cheap, deterministic measure of how much work a query did. The
+same handler stops a statement early when its caller cancels it.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+# Number of SQLite VM instructions between two progress handler calls.
+# Small enough to react within a few milliseconds, large enough that the
+# Python callback is negligible.
+DEFAULT_STEP_INTERVAL = 1000
+
+
+class SQLTimeoutError(Exception):
+    """Raised when a statement is interrupted because its deadline passed."""
+
+    def __init__(self, timeout: float, elapsed: float, vm_steps: int):
+        self.timeout = timeout
+        self.elapsed = elapsed
+        self.vm_steps = vm_steps
+        super().__init__(
+            f"Execution timed out (>{timeout:g} seconds, {vm_steps} VM steps)"
+        )
+
+
+class SQLCancelledError(Exception):
+    """Raised when a statement is interrupted because its caller cancelled it."""
+
+    def __init__(self, elapsed: float, vm_steps: int):
+        self.elapsed = elapsed
+        self.vm_steps = vm_steps
+        super().__init__(f"Execution cancelled ({vm_steps} VM steps)")
+
+
+class SQLRunResult(NamedTuple):
+    """Rows and execution statistics of one statement."""
+    rows: List[tuple]
+    column_names: List[str]
+    elapsed: float
+    vm_steps: int
+
+
+def connect(db_path: str, decode_errors: bool = True) -> sqlite3.Connection:
+    """
+    Open a connection to a SQLite database.
+
+    Args:
+        db_path: Path to the .sqlite file, ":memory:" or a "file:" URI
+        decode_errors: Decode TEXT with errors="ignore" like the agents do
+
+    Returns:
+        An open connection (usable from any thread)
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=False, uri=str(db_path).startswith("file:"))
+    if decode_errors:
+        conn.text_factory = lambda b: b.decode(errors="ignore")
+    return conn
+
+
+def execute_with_deadline(conn: sqlite3.Connection,
+                          sql: str,
+                          timeout: Optional[float],
+                          step_interval: int = DEFAULT_STEP_INTERVAL,
+                          max_rows: Optional[int] = None,
+                          cancel_event: Optional[threading.Event] = None) -> SQLRunResult:
+    """
+    Execute one statement on an open connection within a deadline.
+
+    Args:
+        conn: Open SQLite connection
+        sql: The statement to execute
+        timeout: Seconds allowed for execute + fetch, None for no limit
+        step_interval: VM instructions between deadline checks
+        max_rows: Fetch at most this many rows (None fetches all, 0 none)
+        cancel_event: Optional event; setting it (from any thread) stops the statement
+
+    Returns:
+        SQLRunResult with rows, column names, elapsed seconds and VM steps
+
+    Raises:
+        SQLTimeoutError: If the deadline passed before the statement finished
+        SQLCancelledError: If cancel_event was set before the statement finished
+        sqlite3.Error: For any other database error
+    """
+    start = time.monotonic()
+    deadline = start + timeout if timeout is not None else None
+    state = {"ticks": 0, "timed_out": False, "cancelled": False}
+
+    def _progress() -> int:
+        state["ticks"] += 1
+        if deadline is not None and time.monotonic() > deadline:
+            state["timed_out"] = True
+            return 1  # non-zero aborts the statement with OperationalError
+        if cancel_event is not None and cancel_event.is_set():
+            state["cancelled"] = True
+            return 1
+        return 0
+
+    if cancel_event is not None and cancel_event.is_set():
+        raise SQLCancelledError(0.0, 0)
+
+    conn.set_progress_handler(_progress, step_interval)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql)
+        if max_rows is None:
+            rows = cursor.fetchall()
+        elif max_rows > 0:
+            rows = cursor.fetchmany(max_rows)
+        else:
+            rows = []  # execute only, e.g. to time the statement
+        column_names = [desc[0] for desc in cursor.description] if cursor.description else []
+    except sqlite3.OperationalError:
+        if state["timed_out"]:
+            raise SQLTimeoutError(timeout, time.monotonic() - start,
+                                  state["ticks"] * step_interval) from None
+        if state["cancelled"]:
+            raise SQLCancelledError(time.monotonic() - start,
+                                    state["ticks"] * step_interval) from None
+        raise
+    finally:
+        cursor.close()
+        conn.set_progress_handler(None, 0)
+
+    return SQLRunResult(rows, column_names, time.monotonic() - start,
+                        state["ticks"] * step_interval)
+
+
+def run_sql(db_path: str,
+            sql: str,
+            timeout: Optional[float],
+            step_interval: int = DEFAULT_STEP_INTERVAL,
+            max_rows: Optional[int] = None,
+            decode_errors: bool = True,
+            cancel_event: Optional[threading.Event] = None) -> SQLRunResult:
+    """
+    Open a database, execute one statement within a deadline and close it.
+
+    See connect and execute_with_deadline for arguments and exceptions.
+    """
+    conn = connect(db_path, decode_errors)
+    try:
+        return execute_with_deadline(conn, sql, timeout, step_interval, max_rows, cancel_event)
+    finally:
+        conn.close()
@@ -3,11 +3,11 @@ Simple Task Status Checker - just check state and recommend next action
 """
 
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Optional, Set
 from autogen_core.tools import BaseTool
 from pydantic import BaseModel, Field
-from keyvalue_memory import KeyValueMemory
-from query_tree_manager import QueryTreeManager
+from keyvalue_memory import KeyValueMemory, thaw
+from query_tree_manager import QueryTreeManager, NodeChangeTracker
 
 
 class TaskStatusCheckerArgs(BaseModel):
@@ -18,6 +18,11 @@ class TaskStatusCheckerArgs(BaseModel):
 class TaskStatusChecker(BaseTool):
     """
     Simple status checker - just determine current state and recommend next action.
+    
+    Node statuses are kept between runs: only nodes that changed since the
+    previous run, and their parents, are re-analyzed, nodes are kept in
+    per-status buckets, and the report is only rebuilt when a node or the
+    current node changed.
     """
     
     def __init__(self, memory: KeyValueMemory):
@@ -31,6 +36,13 @@ class TaskStatusChecker(BaseTool):
         self.memory = memory
         self.tree_manager = QueryTreeManager(memory)
         self.logger = logging.getLogger(self.__class__.__name__)
+        self._tracker = NodeChangeTracker(self.tree_manager)
+        self._statuses: Dict[str, Dict[str, Any]] = {}  # nodeId -> status info
+        self._base_status: Dict[str, str] = {}  # nodeId -> status before the parent pass
+        self._buckets: Dict[str, Set[str]] = {}  # status -> nodeIds
+        self._bucket_of: Dict[str, str] = {}  # nodeId -> status bucket it is in
+        self._report_key = None
+        self._report: Optional[str] = None
     
     async def run(self, args: TaskStatusCheckerArgs, cancellation_token=None) -> str:
         """Navigate node tree, check all nodes, and report comprehensive status."""
@@ -39,43 +51,110 @@ class TaskStatusChecker(BaseTool):
         self.logger.info("TASK STATUS CHECKER - Starting Analysis")
         self.logger.info("="*60)
         
+        error, tree, node_statuses, current_node_id = await self._check()
+        if error:
+            return error
+        
+        # 4. Generate comprehensive status report, unless nothing changed since the last one
+        report_key = (self._tracker.version, current_node_id)
+        if report_key != self._report_key:
+            self._report = self._generate_tree_status_report(tree, node_statuses, current_node_id)
+            self._report_key = report_key
+        status_report = self._report
+        
+        self.logger.info("TASK STATUS REPORT:")
+        self.logger.info(status_report)
+        self.logger.info("="*60)
+        
+        return status_report
+    
+    async def next_step(self) -> Optional[Dict[str, Any]]:
+        """
+        Check the tree like run(), but return the current node's status as data.
+        
+        Used to schedule agents without a coordinator; the text report is not built.
+        
+        Returns:
+            None if there is no tree, else the status info of the current node
+            (see _analyze_all_nodes) plus "node_id", "is_root", "all_complete"
+            and "version", which changes whenever a node of the tree changed
+        """
+        error, tree, node_statuses, current_node_id = await self._check()
+        if error:
+            return None
+        step = dict(node_statuses[current_node_id])
+        step.update({
+            "node_id": current_node_id,
+            "is_root": current_node_id == tree.get("rootId"),
+            "all_complete": len(self._buckets.get("complete", ())) == len(node_statuses),
+            "version": self._tracker.version
+        })
+        return step
+    
+    async def _check(self):
+        """
+        Analyze the tree and choose the current node.
+        
+        Returns:
+            Tuple of (error status or None, tree, node statuses, current node ID)
+        """
         # 1. Check query tree  
-        tree = await self.tree_manager.get_tree()
+        tree, changed, removed = await self._tracker.poll()
         if not tree or "nodes" not in tree or len(tree["nodes"]) == 0:
             status = "STATUS: No query tree found"
             self.logger.warning(status)
-            return status
+            return status, None, None, None
         
         # 2. Analyze all nodes in the tree
         root_id = tree.get("rootId")
         if not root_id:
             status = "STATUS: No root node in tree"
             self.logger.warning(status)
-            return status
+            return status, None, None, None
         
         self.logger.info(f"Analyzing tree with {len(tree['nodes'])} nodes")
         
         # Get comprehensive status of all nodes
-        node_statuses = await self._analyze_all_nodes(tree)
+        node_statuses = await self._analyze_all_nodes(tree, changed, removed)
         
         # 3. Navigate tree and set current node
         current_node_id = await self._navigate_tree(tree, node_statuses, root_id)
+        return None, tree, node_statuses, current_node_id
+    
+    async def _analyze_all_nodes(self, tree, changed: Optional[Iterable[str]] = None,
+                                 removed: Iterable[str] = ()):
+        """
+        Analyze the status of the nodes in the tree.
         
-        # 4. Generate comprehensive status report
-        status_report = self._generate_tree_status_report(tree, node_statuses, current_node_id)
-        
-        self.logger.info("TASK STATUS REPORT:")
-        self.logger.info(status_report)
-        self.logger.info("="*60)
+        Args:
+            tree: The query tree
+            changed: Nodes changed since the previous call; None analyzes every node
+            removed: Nodes removed since the previous call
+            
+        Returns:
+            Dictionary of status info by node ID
+        """
+        nodes = thaw(tree["nodes"], deep=False)
+        node_statuses = self._statuses
+        if changed is None:
+            node_statuses.clear()
+            self._base_status.clear()
+            self._buckets.clear()
+            self._bucket_of.clear()
+            changed = list(nodes)
         
-        return status_report
-    
-    async def _analyze_all_nodes(self, tree):
-        """Analyze the status of all nodes in the tree."""
-        node_statuses = {}
+        # Parents must be re-checked when one of their children changed
+        dirty = set()
+        for node_id in removed:
+            info = node_statuses.pop(node_id, None)
+            self._base_status.pop(node_id, None)
+            self._set_bucket(node_id, None)
+            if info and info["parent"]:
+                dirty.add(info["parent"])
         
         # First pass: analyze individual node status
-        for node_id, node_data in tree["nodes"].items():
+        for node_id in changed:
+            node_data = nodes[node_id]
             # Check schema linking
             has_schema_linking = bool(node_data.get("schema_linking"))
             
@@ -118,15 +197,24 @@ class TaskStatusChecker(BaseTool):
                 "has_sql": has_sql,
                 "has_execution": has_execution,
                 "quality": quality,
+                "has_analysis": bool(node_data.get("queryAnalysis")),
                 "intent": node_data.get("intent", ""),
-                "children": node_data.get("childIds", []),
+                "children": list(node_data.get("childIds", [])),
                 "parent": node_data.get("parentId"),
                 "attempt_count": attempt_count,
                 "max_attempts_reached": max_attempts_reached
             }
+            self._base_status[node_id] = status
+            dirty.add(node_id)
+            if node_data.get("parentId"):
+                dirty.add(node_data["parentId"])
         
         # Second pass: update parent node status based on children completion
-        for node_id, node_status in node_statuses.items():
+        for node_id in dirty:
+            node_status = node_statuses.get(node_id)
+            if node_status is None:
+                continue
+            node_status["status"] = self._base_status[node_id]
             children = node_status["children"]
             if children and len(children) > 0:
                 # This is a parent node with children
@@ -154,9 +242,19 @@ class TaskStatusChecker(BaseTool):
                         # Do NOT mark as complete yet - let SQLGeneratorAgent handle SQL combination
                         node_statuses[node_id]["status"] = "needs_sql"
                         self.logger.info(f"Parent node {node_id} ready for SQL generation (all children finished)")
+            self._set_bucket(node_id, node_status["status"])
         
         return node_statuses
     
+    def _set_bucket(self, node_id: str, status: Optional[str]) -> None:
+        """Move a node to the bucket of its status (None removes it)."""
+        old_status = self._bucket_of.pop(node_id, None)
+        if old_status is not None:
+            self._buckets[old_status].discard(node_id)
+        if status is not None:
+            self._buckets.setdefault(status, set()).add(node_id)
+            self._bucket_of[node_id] = status
+    
     async def _navigate_tree(self, tree, node_statuses, root_id):
         """Navigate tree according to processing rules and set current node."""
         current_node_id = await self.tree_manager.get_current_node_id()
@@ -228,14 +326,11 @@ class TaskStatusChecker(BaseTool):
     def _generate_tree_status_report(self, tree, node_statuses, current_node_id):
         """Generate comprehensive tree status report including current node content."""
         total_nodes = len(node_statuses)
-        complete_nodes = sum(1 for s in node_statuses.values() if s["status"] == "complete")
         
         # Count nodes by status
-        status_counts = {"complete": 0, "needs_sql": 0, "needs_eval": 0, "bad_sql": 0}
-        for status_info in node_statuses.values():
-            status = status_info["status"]
-            if status in status_counts:
-                status_counts[status] += 1
+        status_counts = {status: len(self._buckets.get(status, ()))
+                         for status in ("complete", "needs_sql", "needs_eval", "bad_sql")}
+        complete_nodes = status_counts["complete"]
         
         # Build report
         report_lines = [
@@ -246,7 +341,7 @@ class TaskStatusChecker(BaseTool):
         
         # Add detailed current node content
         current_status = node_statuses.get(current_node_id, {})
-        current_node_data = tree["nodes"].get(current_node_id, {})
+        current_node_data = thaw(tree["nodes"].get(current_node_id, {}), deep=False)
         
         if current_status and current_node_data:
             # Show full intent without truncation
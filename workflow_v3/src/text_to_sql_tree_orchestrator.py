@@ -21,6 +21,23 @@ There are 4 tools in total:
 
 There is no order of these tools, just call them when necessary, until TaskStatusChecker report 
 all nodes are successfully processed (with good SQLs).
+
+With parallel_siblings=True the tree is first processed directly: after the root is analyzed,
+sibling nodes without data dependencies between them are linked, generated and evaluated
+concurrently (each in its own lane of agents), parents are generated from their children, and
+the coordinator then only handles what is left (e.g. retries of bad SQL).
+
+With scheduler="rules" the routine transitions are made without the coordinator: the
+TaskStatusChecker's current node and status decide which agent runs next (the same rules
+the coordinator prompt spells out), and the coordinator LLM is only started for what the
+rules cannot decide, e.g. bad SQL without usable evaluator feedback, or a step that
+changed nothing.
+
+All task state (query tree, node history, task context, schema in memory) lives in the
+orchestrator's own KeyValueMemory. To serve several questions at once, call process_query()
+concurrently: calls that overlap a running one are handed to a per-task orchestrator from
+for_task(), which has its own memory, managers and agents but shares the SchemaReader and
+the model clients.
 """
 
 import os
@@ -34,12 +51,13 @@ from datetime import datetime
 from dotenv import load_dotenv
 
 # Import all required components
-from keyvalue_memory import KeyValueMemory
+from keyvalue_memory import KeyValueMemory, thaw
 from task_context_manager import TaskContextManager
 from query_tree_manager import QueryTreeManager
+from memory_agent_tool import MemoryAgentToolArgs
 from database_schema_manager import DatabaseSchemaManager
 from node_history_manager import NodeHistoryManager
-from schema_reader import SchemaReader
+from schema_reader import SchemaReader, get_schema_reader
 
 # All 4 agents + task status checker
 from query_analyzer_agent import QueryAnalyzerAgent
@@ -47,6 +65,7 @@ from schema_linker_agent import SchemaLinkerAgent
 from sql_generator_agent import SQLGeneratorAgent
 from sql_evaluator_agent import SQLEvaluatorAgent
 from task_status_checker import TaskStatusChecker
+from model_client_pool import get_model_client_pool
 from utils import clean_sql_content
 
 # Memory types - updated imports based on actual content
@@ -56,10 +75,26 @@ from memory_content_types import (
 )
 
 # AutoGen components
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, RequestUsage
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.conditions import TextMentionTermination
 from autogen_agentchat.teams import RoundRobinGroupChat
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+# Schedulers: the coordinator LLM decides every step, or rules decide the routine ones
+SCHEDULERS = ("coordinator", "rules")
+
+# Seconds allowed per question, shared by the rule scheduler and the coordinator
+TIME_LIMIT = 600
+
+# Times the rules retry a node with bad SQL before the coordinator takes over
+RULE_MAX_RETRIES = 3
+
+# Evaluator feedback that points at the schema linking rather than the SQL
+SCHEMA_ISSUE_PATTERN = re.compile(
+    r"no such (table|column)|(wrong|missing|incorrect|unknown|non-?existent) (table|column)|schema link",
+    re.IGNORECASE
+)
 
 
 class TextToSQLTreeOrchestrator:
@@ -75,7 +110,12 @@ class TextToSQLTreeOrchestrator:
                  tables_json_path: str,
                  dataset_name: str = "bird",
                  llm_config: Optional[Dict[str, Any]] = None,
-                 max_steps: int = 100):
+                 max_steps: int = 100,
+                 parallel_siblings: bool = False,
+                 max_concurrency: int = 4,
+                 scheduler: str = "coordinator",
+                 schema_reader: Optional[SchemaReader] = None,
+                 model_clients: Optional[Dict[str, ChatCompletionClient]] = None):
         """
         Initialize the text-to-SQL tree orchestrator.
         
@@ -85,11 +125,27 @@ class TextToSQLTreeOrchestrator:
             dataset_name: Name of the dataset (bird, spider, etc.)
             llm_config: Configuration for the LLM
             max_steps: Maximum number of coordinator steps before stopping (default: 100)
+            parallel_siblings: Process independent sibling nodes concurrently before
+                handing over to the coordinator (default: False)
+            max_concurrency: Maximum number of nodes processed at the same time
+                in parallel mode (default: 4)
+            scheduler: "coordinator" to let the coordinator LLM choose every step, or
+                "rules" to choose routine steps from the node status and only consult
+                the coordinator when the rules cannot decide (default: "coordinator")
+            schema_reader: SchemaReader to use instead of the process-wide one
+            model_clients: Model clients to share, by agent name ("query_analyzer",
+                "schema_linker", "sql_generator", "sql_evaluator", "orchestrator");
+                missing ones come from the process-wide ModelClientPool
         """
         self.data_path = data_path
         self.tables_json_path = tables_json_path
         self.dataset_name = dataset_name
         self.max_steps = max_steps
+        self.parallel_siblings = parallel_siblings
+        self.max_concurrency = max(1, max_concurrency)
+        if scheduler not in SCHEDULERS:
+            raise ValueError(f"Unknown scheduler: {scheduler} (expected one of {', '.join(SCHEDULERS)})")
+        self.scheduler = scheduler
         
         # Default LLM configuration
         self.llm_config = llm_config or {
@@ -99,35 +155,85 @@ class TextToSQLTreeOrchestrator:
         }
         
         # Initialize memory and managers
-        self.memory = KeyValueMemory()
+        # Keep values as Python objects; memory contents are only serialized on export
+        self.memory = KeyValueMemory(native=True)
         self.task_manager = TaskContextManager(self.memory)
         self.tree_manager = QueryTreeManager(self.memory)
         self.schema_manager = DatabaseSchemaManager(self.memory)
         self.history_manager = NodeHistoryManager(self.memory)
         
-        # Initialize schema reader
-        self.schema_reader = SchemaReader(
+        # Process-wide schema reader, loading each database on first use
+        self.schema_reader = schema_reader or get_schema_reader(
             data_path=self.data_path,
             tables_json_path=self.tables_json_path,
-            dataset_name=self.dataset_name,
-            lazy=False
+            dataset_name=self.dataset_name
         )
         
         # Initialize agents
-        self.query_analyzer = QueryAnalyzerAgent(self.memory, self.llm_config)
-        self.schema_linker = SchemaLinkerAgent(self.memory, self.llm_config)
-        self.sql_generator = SQLGeneratorAgent(self.memory, self.llm_config)
-        self.sql_evaluator = SQLEvaluatorAgent(self.memory, self.llm_config)
+        clients = model_clients or {}
+        self.query_analyzer = QueryAnalyzerAgent(self.memory, self.llm_config,
+                                                 model_client=clients.get("query_analyzer"))
+        self.schema_linker = SchemaLinkerAgent(self.memory, self.llm_config,
+                                               model_client=clients.get("schema_linker"))
+        self.sql_generator = SQLGeneratorAgent(self.memory, self.llm_config,
+                                               model_client=clients.get("sql_generator"))
+        self.sql_evaluator = SQLEvaluatorAgent(self.memory, self.llm_config,
+                                               model_client=clients.get("sql_evaluator"))
         
         # Initialize TaskStatusChecker (no LLM config needed)
         self.task_status_checker = TaskStatusChecker(self.memory)
         
         # Initialize coordinator
         self.coordinator = None
+        self._coordinator_client = clients.get("orchestrator")
+        self._running = False  # a process_query() call is in progress
+        
+        # Agent lanes for parallel mode, created on first use. An AssistantAgent keeps
+        # its conversation state, so nodes processed at the same time need their own agents
+        self._lanes: Optional[asyncio.Queue] = None
+        self._lane_agents: List[Tuple[SchemaLinkerAgent, SQLGeneratorAgent, SQLEvaluatorAgent]] = []
+        
+        # Run statistics of the last process_query() call
+        self.step_count = 0
+        self.rule_steps = 0
+        self._deadline: Optional[float] = None  # loop time at which the current question stops
+        self._coordinator_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
         
         # Set up logging
         self.logger = logging.getLogger(self.__class__.__name__)
     
+    def for_task(self) -> "TextToSQLTreeOrchestrator":
+        """
+        Create an orchestrator for another task running at the same time.
+        
+        The new orchestrator has its own memory, managers, agents and coordinator,
+        and shares the SchemaReader (with its loaded database infos) and the model
+        clients with this one.
+        
+        Returns:
+            A TextToSQLTreeOrchestrator with the same configuration
+        """
+        if self._coordinator_client is None:
+            self._coordinator_client = self._create_coordinator_client()
+        return TextToSQLTreeOrchestrator(
+            data_path=self.data_path,
+            tables_json_path=self.tables_json_path,
+            dataset_name=self.dataset_name,
+            llm_config=self.llm_config,
+            max_steps=self.max_steps,
+            parallel_siblings=self.parallel_siblings,
+            max_concurrency=self.max_concurrency,
+            scheduler=self.scheduler,
+            schema_reader=self.schema_reader,
+            model_clients={
+                "query_analyzer": self.query_analyzer.model_client,
+                "schema_linker": self.schema_linker.model_client,
+                "sql_generator": self.sql_generator.model_client,
+                "sql_evaluator": self.sql_evaluator.model_client,
+                "orchestrator": self._coordinator_client
+            }
+        )
+    
     async def initialize_database(self, db_name: str) -> None:
         """
         Initialize the database schema in memory.
@@ -145,14 +251,18 @@ class TextToSQLTreeOrchestrator:
         self.logger.info(f"  Foreign keys: {summary['total_foreign_keys']}")
         
     
+    def _create_coordinator_client(self) -> ChatCompletionClient:
+        return get_model_client_pool().get_client("orchestrator", {
+            "model": "gpt-4o",
+            "temperature": 0.1,
+            "timeout": 300
+        })
+    
     def _create_coordinator(self) -> AssistantAgent:
         """Create the coordinator agent with intelligent context playbook."""
-        coordinator_client = OpenAIChatCompletionClient(
-            model="gpt-4o",
-            temperature=0.1,
-            timeout=300,
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        if self._coordinator_client is None:
+            self._coordinator_client = self._create_coordinator_client()
+        coordinator_client = self._coordinator_client
         
         # Build dynamic system message with intelligent context playbook
         base_system_message = self._build_intelligent_system_message()
@@ -193,6 +303,10 @@ class TextToSQLTreeOrchestrator:
         3. SQL generation for each node
         4. SQL evaluation and iteration until good results
         
+        Calls made while another one is in progress on this orchestrator run in
+        a separate orchestrator from for_task(), so concurrent tasks never see
+        each other's tree, history or context.
+        
         Args:
             query: The natural language query
             db_name: Name of the database to query
@@ -202,6 +316,19 @@ class TextToSQLTreeOrchestrator:
         Returns:
             Dictionary containing tree processing results
         """
+        if self._running:
+            return await self.for_task().process_query(query, db_name, task_id, evidence)
+        self._running = True
+        try:
+            return await self._process_query(query, db_name, task_id, evidence)
+        finally:
+            self._running = False
+    
+    async def _process_query(self,
+                             query: str,
+                             db_name: str,
+                             task_id: Optional[str],
+                             evidence: Optional[str]) -> Dict[str, Any]:
         # Generate task ID if not provided
         if not task_id:
             import time
@@ -224,8 +351,294 @@ class TextToSQLTreeOrchestrator:
         if evidence:
             self.logger.info(f"Evidence: {evidence}")
         
+        if self.parallel_siblings:
+            await self._process_tree_parallel(root_id)
+            await self.tree_manager.set_current_node_id(root_id)
+        
+        self.rule_steps = 0
+        self._deadline = asyncio.get_event_loop().time() + TIME_LIMIT
+        if self.scheduler == "rules" and (await self._process_with_rules() or self.rule_steps >= self.max_steps
+                                          or self._time_left() <= 0):
+            self.step_count = self.rule_steps
+            results = await self._get_tree_results()
+            results["steps"] = self.rule_steps
+            results["rule_steps"] = self.rule_steps
+            return results
+        
         # Use orchestrator agent to build feedback loops
-        return await self._process_with_orchestrator_agent()
+        results = await self._process_with_orchestrator_agent()
+        if self.scheduler == "rules":
+            self.step_count += self.rule_steps
+            results["steps"] = self.step_count
+            results["rule_steps"] = self.rule_steps
+        return results
+    
+    def _get_lanes(self) -> asyncio.Queue:
+        """Pool of (schema_linker, sql_generator, sql_evaluator) agent sets, one per concurrent node."""
+        if self._lanes is None:
+            self._lanes = asyncio.Queue()
+            self._lanes.put_nowait((self.schema_linker, self.sql_generator, self.sql_evaluator))
+            for _ in range(self.max_concurrency - 1):
+                lane = (
+                    SchemaLinkerAgent(self.memory, self.llm_config,
+                                      model_client=self.schema_linker.model_client),
+                    SQLGeneratorAgent(self.memory, self.llm_config,
+                                      model_client=self.sql_generator.model_client),
+                    SQLEvaluatorAgent(self.memory, self.llm_config,
+                                      model_client=self.sql_evaluator.model_client)
+                )
+                self._lane_agents.append(lane)
+                self._lanes.put_nowait(lane)
+        return self._lanes
+    
+    def get_usage(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the tokens used by this orchestrator's agents and coordinator.
+        
+        Model clients may be shared between tasks (see for_task()), so usage is
+        counted from the messages of this orchestrator's own agents.
+        
+        Returns:
+            Dictionary mapping agent name, "orchestrator" and "total" to
+            {"prompt_tokens": ..., "completion_tokens": ...}
+        """
+        agents = [self.query_analyzer, self.schema_linker, self.sql_generator, self.sql_evaluator]
+        for lane in self._lane_agents:
+            agents.extend(lane)
+        
+        usage = {"orchestrator": {"prompt_tokens": self._coordinator_usage.prompt_tokens,
+                                  "completion_tokens": self._coordinator_usage.completion_tokens}}
+        for agent in agents:
+            agent_usage = usage.setdefault(agent.agent_name, {"prompt_tokens": 0, "completion_tokens": 0})
+            agent_usage["prompt_tokens"] += agent.get_tool().usage.prompt_tokens
+            agent_usage["completion_tokens"] += agent.get_tool().usage.completion_tokens
+        usage["total"] = {
+            "prompt_tokens": sum(u["prompt_tokens"] for u in usage.values()),
+            "completion_tokens": sum(u["completion_tokens"] for u in usage.values())
+        }
+        return usage
+    
+    @staticmethod
+    def _dependency_waves(children: List[Tuple[str, Dict[str, Any]]]) -> List[List[str]]:
+        """
+        Group sibling nodes into waves that can run concurrently.
+        
+        A node depends on a sibling when its subqueryInfo "dependencies" names
+        the sibling's step (e.g. "step_1_results"); a node runs in the first wave
+        after all of its dependencies. Nodes in a dependency cycle run one by one.
+        
+        Args:
+            children: (node ID, subqueryInfo) of each sibling, in tree order
+            
+        Returns:
+            List of waves, each a list of node IDs
+        """
+        by_step = {str(info.get("id")): node_id for node_id, info in children if info.get("id") is not None}
+        pending = {}
+        for node_id, info in children:
+            steps = re.findall(r"step[_\s]*(\d+)", str(info.get("dependencies") or ""), re.IGNORECASE)
+            pending[node_id] = {by_step[step] for step in steps if by_step.get(step) not in (None, node_id)}
+        
+        waves = []
+        done = set()
+        while pending:
+            wave = [node_id for node_id, deps in pending.items() if deps <= done]
+            if not wave:
+                wave = [next(iter(pending))]
+            for node_id in wave:
+                del pending[node_id]
+            done.update(wave)
+            waves.append(wave)
+        return waves
+    
+    async def _run_tool(self, agent, node_id: str, goal: str) -> None:
+        with QueryTreeManager.focus(node_id):
+            await agent.get_tool().run(MemoryAgentToolArgs(goal=goal), CancellationToken())
+    
+    async def _process_node_parallel(self, node_id: str) -> None:
+        """Process a node: its children first (independent siblings concurrently), then the node."""
+        children = await self.tree_manager.get_children(node_id)
+        if children:
+            tree = await self.tree_manager.get_tree_view()
+            infos = [(child.nodeId, thaw(tree["nodes"][child.nodeId].get("subqueryInfo") or {}))
+                     for child in children]
+            for wave in self._dependency_waves(infos):
+                if len(wave) > 1:
+                    self.logger.info(f"Processing {len(wave)} independent sibling nodes concurrently")
+                await asyncio.gather(*(self._process_node_parallel(child_id) for child_id in wave))
+        
+        lanes = self._get_lanes()
+        lane = await lanes.get()
+        try:
+            schema_linker, sql_generator, sql_evaluator = lane
+            # The root is linked before it is analyzed; parents combine their children's SQL
+            if not children and node_id != await self.tree_manager.get_root_id():
+                await self._run_tool(schema_linker, node_id, "Link the schema for the current node")
+            await self._run_tool(sql_generator, node_id, "Generate SQL for the current node")
+            await self._run_tool(sql_evaluator, node_id, "Evaluate the SQL of the current node")
+        except Exception as e:
+            self.logger.error(f"Error processing node {node_id}: {str(e)}")
+        finally:
+            lanes.put_nowait(lane)
+    
+    async def _process_tree_parallel(self, root_id: str) -> None:
+        """
+        Process the tree without the coordinator, running independent siblings concurrently.
+        
+        The root is linked and analyzed first (which may decompose it), then every
+        node is linked, generated and evaluated bottom-up. Tree and history writes
+        are merged per node, so concurrent nodes never overwrite each other.
+        """
+        start_time = asyncio.get_event_loop().time()
+        try:
+            await self._run_tool(self.schema_linker, root_id, "Link the schema for the user query")
+            await self._run_tool(self.query_analyzer, root_id, "Analyze the user query")
+            await self._process_node_parallel(root_id)
+        except Exception as e:
+            # The coordinator picks up from whatever state the tree is in
+            self.logger.error(f"Error during parallel tree processing: {str(e)}")
+        total_time = asyncio.get_event_loop().time() - start_time
+        self.logger.info(f"Parallel tree processing finished in {total_time:.1f}s")
+    
+    @staticmethod
+    def _feedback_text(node: Dict[str, Any]) -> Optional[str]:
+        """The evaluator's issues and the execution error of a node as text, or None if there are none."""
+        parts = []
+        issues = (node.get("evaluation") or {}).get("issues") or {}
+        issue_list = issues.get("issue", []) if isinstance(issues, dict) else issues
+        for issue in issue_list if isinstance(issue_list, list) else [issue_list]:
+            if isinstance(issue, dict):
+                parts.extend(str(issue.get(key) or "") for key in ("description", "suggested_action"))
+            elif issue:
+                parts.append(str(issue))
+        for field in ("generation", "evaluation"):
+            execution_result = (node.get(field) or {}).get("execution_result") or {}
+            if execution_result.get("error"):
+                parts.append(str(execution_result["error"]))
+        text = " ".join(part for part in parts if part.strip())
+        return text or None
+    
+    @classmethod
+    def _rule_action(cls, step: Dict[str, Any], node: Dict[str, Any],
+                     last_agent: Optional[str] = None) -> Optional[str]:
+        """
+        Choose the agent for the current node from its status.
+        
+        These are the coordinator prompt's rules: a node needing SQL is schema
+        linked, the root is analyzed (its sub-queries use its analysis), then
+        SQL is generated; generated SQL is evaluated; bad SQL is re-linked when
+        the feedback points at the schema and regenerated otherwise, and the
+        new SQL is then evaluated.
+        
+        Args:
+            step: The current node's status from TaskStatusChecker.next_step()
+            node: The current node's data
+            last_agent: The agent the rules last ran on this node
+            
+        Returns:
+            "schema_linker", "query_analyzer", "sql_generator" or "sql_evaluator",
+            or None when the coordinator should decide
+        """
+        status = step["status"]
+        if status == "needs_eval":
+            return "sql_evaluator"
+        if status == "needs_sql":
+            if not step["has_schema_linking"]:
+                return "schema_linker"
+            if step["is_root"] and not step["has_analysis"]:
+                return "query_analyzer"
+            # Parents whose children are finished stay "needs_sql" after their SQL is generated
+            if last_agent == "sql_generator" and step["has_sql"]:
+                return "sql_evaluator"
+            return "sql_generator"
+        if status == "bad_sql":
+            # The old evaluation is kept until the new SQL is evaluated
+            if last_agent == "sql_generator":
+                return "sql_evaluator"
+            if last_agent == "schema_linker":
+                return "sql_generator"
+            feedback = cls._feedback_text(node)
+            if feedback is None:
+                return None
+            return "schema_linker" if SCHEMA_ISSUE_PATTERN.search(feedback) else "sql_generator"
+        return None
+    
+    def _time_left(self) -> float:
+        """Seconds left of the current question's time budget."""
+        if self._deadline is None:
+            self._deadline = asyncio.get_event_loop().time() + TIME_LIMIT
+        return self._deadline - asyncio.get_event_loop().time()
+    
+    async def _process_with_rules(self) -> bool:
+        """
+        Process the tree by rules, without the coordinator.
+        
+        Each step asks the TaskStatusChecker for the current node and runs the
+        agent _rule_action() chooses for it. Stops when all nodes are complete,
+        when the rules cannot decide, when a step changed nothing (the same
+        action on an unchanged tree), when a node still has bad SQL after
+        RULE_MAX_RETRIES retries, or at the step or time limit; the
+        coordinator then continues from the current node.
+        
+        Returns:
+            True if all nodes are complete
+        """
+        agents = {
+            "schema_linker": self.schema_linker,
+            "query_analyzer": self.query_analyzer,
+            "sql_generator": self.sql_generator,
+            "sql_evaluator": self.sql_evaluator
+        }
+        goals = {
+            "schema_linker": "Link the schema for the current node",
+            "query_analyzer": "Analyze the user query",
+            "sql_generator": "Generate SQL for the current node",
+            "sql_evaluator": "Evaluate the SQL of the current node"
+        }
+        last_agents: Dict[str, str] = {}
+        retries: Dict[str, int] = {}  # node id -> bad SQL retries started
+        last_key = None
+        
+        while self.rule_steps < self.max_steps:
+            if self._time_left() <= 0:
+                self.logger.warning(f"Reached time limit ({TIME_LIMIT}s) in rule scheduling")
+                return False
+            step = await self.task_status_checker.next_step()
+            if step is None:
+                return False
+            if step["all_complete"]:
+                self.logger.info(f"All nodes complete after {self.rule_steps} rule steps")
+                return True
+            
+            node_id = step["node_id"]
+            tree = await self.tree_manager.get_tree_view()
+            node = thaw(tree["nodes"][node_id])
+            agent_name = self._rule_action(step, node, last_agents.get(node_id))
+            key = (node_id, step["status"], step["version"], agent_name)
+            if agent_name is None or key == last_key:
+                self.logger.info(f"Handing node {node_id} ({step['status']}) over to the coordinator")
+                return False
+            # A retry starts with re-linking or regenerating; regenerating after re-linking is the same retry
+            if step["status"] == "bad_sql" and agent_name != "sql_evaluator" \
+                    and last_agents.get(node_id) != "schema_linker":
+                retries[node_id] = retries.get(node_id, 0) + 1
+                if retries[node_id] > RULE_MAX_RETRIES:
+                    self.logger.info(f"Node {node_id} still has bad SQL after {RULE_MAX_RETRIES} retries, "
+                                     f"handing it over to the coordinator")
+                    return False
+            last_key = key
+            last_agents[node_id] = agent_name
+            
+            self.rule_steps += 1
+            self.logger.info(f"[Rule step {self.rule_steps}] {agent_name} on node {node_id} ({step['status']})")
+            try:
+                await self._run_tool(agents[agent_name], node_id, goals[agent_name])
+            except Exception as e:
+                self.logger.error(f"Error running {agent_name} on node {node_id}: {str(e)}")
+                return False
+        
+        self.logger.warning(f"Reached maximum steps ({self.max_steps}) in rule scheduling")
+        return False
     
     async def _process_with_orchestrator_agent(self) -> Dict[str, Any]:
         """
@@ -250,9 +663,9 @@ class TextToSQLTreeOrchestrator:
         
         # Simple message processing - just log tool calls and count steps
         step_count = 0
-        max_steps = self.max_steps
+        max_steps = self.max_steps - self.rule_steps  # steps left after the rule scheduler's
         start_time = asyncio.get_event_loop().time()
-        time_limit = 600  # 10 minutes
+        deadline = start_time + self._time_left()  # time left after the rule scheduler's
         workflow_complete = False
         terminate_count = 0  # Track how many times TERMINATE has been said
         
@@ -262,6 +675,13 @@ class TextToSQLTreeOrchestrator:
             async for message in stream:
                 current_time = asyncio.get_event_loop().time()
                 
+                usage = getattr(message, 'models_usage', None)
+                if usage:
+                    self._coordinator_usage = RequestUsage(
+                        prompt_tokens=self._coordinator_usage.prompt_tokens + usage.prompt_tokens,
+                        completion_tokens=self._coordinator_usage.completion_tokens + usage.completion_tokens
+                    )
+                
                 # Process orchestrator messages
                 if hasattr(message, 'source') and message.source == 'orchestrator':
                     step_count += 1
@@ -271,8 +691,8 @@ class TextToSQLTreeOrchestrator:
                         self.logger.warning(f"Reached maximum steps ({max_steps}). Stopping.")
                         break
                     
-                    if current_time - start_time >= time_limit:
-                        self.logger.warning(f"Reached time limit ({time_limit}s). Stopping.")
+                    if current_time >= deadline:
+                        self.logger.warning(f"Reached time limit ({TIME_LIMIT}s). Stopping.")
                         break
                     
                     if hasattr(message, 'content'):
@@ -308,9 +728,12 @@ class TextToSQLTreeOrchestrator:
             self.logger.warning("WORKFLOW STOPPED (may not have completed)")
         
         self.logger.info(f"Total execution time: {total_time:.1f}s, Steps: {step_count}")
+        self.step_count = step_count
         
         # Get final results
-        return await self._get_tree_results()
+        results = await self._get_tree_results()
+        results["steps"] = step_count
+        return results
     
     
     async def _get_tree_results(self) -> Dict[str, Any]:
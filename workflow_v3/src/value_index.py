@@ -0,0 +1,330 @@
+"""
+Cell value index for entity/value lookup.
+
+Questions often mention literal values ("Alameda County", "Cumulative Total")
+that have to be matched to a column. A ValueIndex keeps the distinct values of
+every text column of a database in a side SQLite file, in an FTS5 trigram
+table, so any substring of a value is found in milliseconds without running
+exploratory SQL.
+
+Index files live in a cache directory, not in the dataset: evaluation scripts
+run queries on every .sqlite file of a database's directory, and dataset trees
+may be read-only. The directory is $VALUE_INDEX_DIR, or
+~/.cache/text2sql/value_index, and can be changed with set_index_dir(); each
+file is named <db_id>-<hash of the database path>.values.idx.
+
+The index is built incrementally: every column is committed on its own and
+recorded with the database file's size and modification time, so an
+interrupted build resumes where it stopped and a changed database is
+re-indexed. Without FTS5 trigram support a plain table with LIKE is used.
+
+Usage (prebuild the indexes of a dataset):
+    python value_index.py --dataset_name bird --db_path data/bird [--index_dir DIR]
+"""
+
+import os
+import re
+import sys
+import time
+import asyncio
+import sqlite3
+import logging
+import hashlib
+import argparse
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Values longer than this are free text, not entities
+MAX_VALUE_LENGTH = 200
+# Distinct values indexed per column
+MAX_VALUES_PER_COLUMN = 100000
+
+# Directory of the index files
+_index_dir = os.environ.get("VALUE_INDEX_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "text2sql", "value_index")
+
+
+def set_index_dir(index_dir: str) -> None:
+    """Store the index files opened from now on in index_dir."""
+    global _index_dir
+    _index_dir = index_dir
+
+
+def get_index_path(db_path: str) -> str:
+    """Path of a database's index file in the index directory."""
+    db_path = os.path.abspath(db_path)
+    db_id = os.path.splitext(os.path.basename(db_path))[0]
+    digest = hashlib.sha1(db_path.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(_index_dir, f"{db_id}-{digest}.values.idx")
+
+
+def get_db_path(data_path: str, dataset_name: str, db_id: str) -> str:
+    """Path of a database's SQLite file, laid out as in SchemaReader and SQLExecutor."""
+    if dataset_name == "bird":
+        return f"{data_path}/dev_databases/{db_id}/{db_id}.sqlite"
+    elif dataset_name == "spider":
+        return f"{data_path}/database/{db_id}/{db_id}.sqlite"
+    return f"{data_path}/{db_id}/{db_id}.sqlite"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _is_text_type(declared_type: str) -> bool:
+    """Whether a declared column type has TEXT affinity (or none at all)."""
+    declared_type = (declared_type or "").upper()
+    return not declared_type or any(t in declared_type for t in ("CHAR", "CLOB", "TEXT"))
+
+
+class ValueIndex:
+    """
+    Index of the distinct text values of one SQLite database.
+    """
+
+    def __init__(self, db_path: str, index_path: Optional[str] = None):
+        """
+        Open (or prepare) the value index of a database.
+
+        Args:
+            db_path: Path of the database's SQLite file
+            index_path: Path of the index file (default: get_index_path(db_path))
+        """
+        self.db_path = db_path
+        self.index_path = index_path or get_index_path(db_path)
+        self._build_lock = threading.Lock()
+        self._built_signature = None  # Database file signature of the last complete build
+        self.fts = None  # Whether the values table is an FTS5 trigram table
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.execute("CREATE TABLE IF NOT EXISTS indexed_columns ("
+                     "table_name TEXT, column_name TEXT, signature TEXT, value_count INTEGER, "
+                     "PRIMARY KEY (table_name, column_name))")
+        if self.fts is None:
+            try:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS cell_values USING fts5("
+                             "value, table_name UNINDEXED, column_name UNINDEXED, tokenize='trigram')")
+                self.fts = True
+            except sqlite3.OperationalError:
+                conn.execute("CREATE TABLE IF NOT EXISTS cell_values (value TEXT, table_name TEXT, column_name TEXT)")
+                conn.execute("CREATE INDEX IF NOT EXISTS cell_values_value ON cell_values (value COLLATE NOCASE)")
+                self.fts = False
+            conn.commit()
+        return conn
+
+    def _signature(self) -> str:
+        stat = os.stat(self.db_path)
+        return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+    def _text_columns(self, source: sqlite3.Connection) -> List[Tuple[str, str]]:
+        columns = []
+        tables = source.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                "AND name NOT LIKE 'sqlite_%'").fetchall()
+        for (table,) in tables:
+            for row in source.execute(f"PRAGMA table_info({_quote(table)})"):
+                if _is_text_type(row[2]):
+                    columns.append((table, row[1]))
+        return columns
+
+    def build(self, tables: Optional[Iterable[str]] = None) -> int:
+        """
+        Index the text columns that are not indexed for the current database file yet.
+
+        Args:
+            tables: Optional tables to index (default: all tables)
+
+        Returns:
+            Number of columns indexed by this call
+        """
+        with self._build_lock:
+            signature = self._signature()
+            source = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            source.text_factory = lambda b: b.decode(errors="ignore")
+            conn = self._connect()
+            try:
+                done = {(t, c) for t, c, s in conn.execute(
+                    "SELECT table_name, column_name, signature FROM indexed_columns") if s == signature}
+                selected = set(tables) if tables is not None else None
+                text_columns = self._text_columns(source)
+                built = 0
+                for table, column in text_columns:
+                    if (table, column) in done or (selected is not None and table not in selected):
+                        continue
+                    values = source.execute(
+                        f"SELECT DISTINCT {_quote(column)} FROM {_quote(table)} "
+                        f"WHERE typeof({_quote(column)}) = 'text' AND length({_quote(column)}) BETWEEN 1 AND ? "
+                        f"LIMIT ?", (MAX_VALUE_LENGTH, MAX_VALUES_PER_COLUMN)).fetchall()
+                    conn.execute("DELETE FROM cell_values WHERE table_name = ? AND column_name = ?", (table, column))
+                    conn.executemany("INSERT INTO cell_values (value, table_name, column_name) VALUES (?, ?, ?)",
+                                     [(value, table, column) for (value,) in values if value.strip()])
+                    conn.execute("INSERT OR REPLACE INTO indexed_columns VALUES (?, ?, ?, ?)",
+                                 (table, column, signature, len(values)))
+                    conn.commit()
+                    built += 1
+                if built:
+                    logger.info(f"Indexed values of {built} columns of {self.db_path}")
+                if selected is None:
+                    # Forget columns that are no longer in the database
+                    stale = done - set(text_columns)
+                    stale |= {(t, c) for t, c, s in conn.execute(
+                        "SELECT table_name, column_name, signature FROM indexed_columns")
+                        if s != signature}
+                    for table, column in stale:
+                        conn.execute("DELETE FROM cell_values WHERE table_name = ? AND column_name = ?", (table, column))
+                        conn.execute("DELETE FROM indexed_columns WHERE table_name = ? AND column_name = ?",
+                                     (table, column))
+                    conn.commit()
+                    self._built_signature = signature
+                return built
+            finally:
+                source.close()
+                conn.close()
+
+    def search(self, text: str, limit: int = 20,
+               tables: Optional[Iterable[str]] = None) -> List[Dict[str, str]]:
+        """
+        Find the stored values that contain a text, case-insensitively.
+
+        Exact matches come first, then the shortest values containing the text.
+
+        Args:
+            text: The literal to look for (e.g. "Alameda")
+            limit: Maximum number of matches
+            tables: Optional tables to search (default: all tables)
+
+        Returns:
+            Matches as {"table", "column", "value", "match"} with match 'exact' or 'contains'
+        """
+        text = text.strip()
+        if not text:
+            return []
+        conn = self._connect()
+        try:
+            selected = list(tables) if tables is not None else None
+            table_filter = ""
+            params: List = []
+            if selected is not None:
+                table_filter = f" AND table_name IN ({','.join('?' * len(selected))})"
+                params = selected
+            if self.fts and len(text) >= 3:
+                # A quoted phrase matches any substring with the trigram tokenizer
+                query = ("SELECT table_name, column_name, value FROM cell_values WHERE cell_values MATCH ?"
+                         + table_filter + " ORDER BY length(value), value LIMIT ?")
+                rows = conn.execute(query, ['"' + text.replace('"', '""') + '"'] + params + [limit]).fetchall()
+            else:
+                pattern = re.sub(r"([%_\\])", r"\\\1", text)
+                query = ("SELECT table_name, column_name, value FROM cell_values "
+                         "WHERE value LIKE ? ESCAPE '\\'" + table_filter + " ORDER BY length(value), value LIMIT ?")
+                rows = conn.execute(query, [f"%{pattern}%"] + params + [limit]).fetchall()
+        finally:
+            conn.close()
+        lower_text = text.lower()
+        matches = [{"table": table, "column": column, "value": value,
+                    "match": "exact" if value.lower() == lower_text else "contains"}
+                   for table, column, value in rows]
+        matches.sort(key=lambda m: m["match"] != "exact")
+        return matches
+
+    def ensure_built(self) -> None:
+        """Build the index unless it was completed for the current database file."""
+        if self._built_signature != self._signature():
+            self.build()
+
+
+def extract_value_mentions(text: str) -> List[str]:
+    """
+    Extract quoted literals from a question or evidence.
+
+    BIRD evidence names values as in "refers to `County Name` = 'Alameda'";
+    backquoted names are column names and are skipped.
+    """
+    mentions = []
+    for match in re.finditer(r"'([^']{2,})'|\"([^\"]{2,})\"", text or ""):
+        value = (match.group(1) or match.group(2)).strip()
+        if value and value not in mentions:
+            mentions.append(value)
+    return mentions
+
+
+# Process-wide indexes, one per database file
+_registry: Dict[str, ValueIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_value_index(data_path: str, dataset_name: str, db_id: str) -> Optional[ValueIndex]:
+    """
+    Get the shared value index of a database.
+
+    The index is not built here; call ensure_built() (off the event loop) first.
+
+    Args:
+        data_path: Path to the database files
+        dataset_name: Name of the dataset (e.g., 'bird', 'spider')
+        db_id: Database identifier
+
+    Returns:
+        The ValueIndex, or None if the database file does not exist
+    """
+    db_path = os.path.abspath(get_db_path(data_path, dataset_name, db_id))
+    if not os.path.exists(db_path):
+        return None
+    with _registry_lock:
+        index = _registry.get(db_path)
+        if index is None:
+            index = ValueIndex(db_path)
+            _registry[db_path] = index
+        return index
+
+
+async def get_schema_value_index(schema_manager) -> Optional[ValueIndex]:
+    """
+    Get the value index of the database loaded in a DatabaseSchemaManager.
+
+    The index is built (or completed) in a worker thread on first use.
+
+    Args:
+        schema_manager: The DatabaseSchemaManager of the task
+
+    Returns:
+        The built ValueIndex, or None if the database is unknown or missing
+    """
+    metadata = await schema_manager.get_metadata()
+    data_path = metadata.get("data_path")
+    db_id = metadata.get("database_id")
+    if not data_path or not db_id:
+        return None
+    index = get_value_index(data_path, metadata.get("dataset_name", "bird"), db_id)
+    if index is not None:
+        await asyncio.to_thread(index.ensure_built)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the cell value indexes of a dataset's databases")
+    parser.add_argument('--dataset_name', type=str, default='bird', choices=['spider', 'bird'], help='dataset name')
+    parser.add_argument('--db_path', type=str, required=True, help='path to databases in dataset')
+    parser.add_argument('--db_ids', type=str, nargs='*', default=None, help='databases to index (default: all)')
+    parser.add_argument('--index_dir', type=str, default=None, help='directory of the index files (default: $VALUE_INDEX_DIR or ~/.cache/text2sql/value_index)')
+    args = parser.parse_args()
+    if args.index_dir:
+        set_index_dir(args.index_dir)
+
+    logging.basicConfig(level=logging.INFO, format='%(name)s - %(levelname)s - %(message)s')
+    root = os.path.join(args.db_path, "dev_databases" if args.dataset_name == "bird" else "database")
+    db_ids = args.db_ids or sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+    for db_id in db_ids:
+        index = get_value_index(args.db_path, args.dataset_name, db_id)
+        if index is None:
+            print(f"{db_id}: database not found", file=sys.stderr)
+            continue
+        start = time.time()
+        built = index.build()
+        print(f"{db_id}: {built} columns indexed in {time.time() - start:.1f}s", flush=True)
+
+
+if __name__ == "__main__":
+    main()
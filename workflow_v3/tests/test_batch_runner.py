@@ -0,0 +1,124 @@
+"""
+Tests for the dataset batch runner (batch_runner).
+
+A stub orchestrator stands in for TextToSQLTreeOrchestrator, so no LLM is used.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from batch_runner import iter_json_array, load_finished_ids, run_batch
+
+
+class StubOrchestrator:
+    """Answers every question with a fixed SQL after a short delay."""
+
+    def __init__(self, shared=None):
+        self.shared = shared or {"running": 0, "max_running": 0, "queries": []}
+        self.step_count = 0
+
+    def for_task(self):
+        return StubOrchestrator(self.shared)
+
+    async def process_query(self, query, db_name, task_id=None, evidence=None):
+        self.shared["running"] += 1
+        self.shared["max_running"] = max(self.shared["max_running"], self.shared["running"])
+        self.shared["queries"].append(query)
+        await asyncio.sleep(0.01)
+        self.shared["running"] -= 1
+        if query == "fail":
+            raise RuntimeError("model error")
+        return {"final_result": f"SELECT  '{query}'", "tree_complete": True, "steps": 3}
+
+    def get_usage(self):
+        return {"total": {"prompt_tokens": 10, "completion_tokens": 2}}
+
+
+def write_dataset(path, questions):
+    items = [{"question_id": i, "db_id": "db", "question": q, "evidence": "", "SQL": "SELECT 1"}
+             for i, q in enumerate(questions)]
+    path.write_text(json.dumps(items, indent=2))
+    return items
+
+
+def test_iter_json_array(tmp_path):
+    items = [{"id": i, "text": "x" * (i * 7)} for i in range(50)] + [12345, "end"]
+    path = tmp_path / "items.json"
+    path.write_text(json.dumps(items, indent=1))
+    # A tiny chunk size splits items (and the trailing number) across reads
+    assert list(iter_json_array(str(path), chunk_size=16)) == items
+
+    (tmp_path / "empty.json").write_text(" [ ] ")
+    assert list(iter_json_array(str(tmp_path / "empty.json"))) == []
+
+    (tmp_path / "cut.json").write_text('[{"a": 1}, {"b":')
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(tmp_path / "cut.json")))
+
+
+async def test_run_batch_and_resume(tmp_path):
+    input_file = tmp_path / "dev.json"
+    write_dataset(input_file, [f"q{i}" for i in range(10)] + ["fail"])
+    output_file = tmp_path / "out" / "output.jsonl"
+    orchestrator = StubOrchestrator()
+
+    prediction_file = await run_batch("bird", str(input_file), str(output_file), str(tmp_path), "",
+                                      max_concurrency=3, orchestrator=orchestrator)
+
+    assert orchestrator.shared["max_running"] == 3
+    records = [json.loads(line) for line in output_file.read_text().splitlines()]
+    assert sorted(r["idx"] for r in records) == list(range(11))
+    done = [r for r in records if not r.get("failed")]
+    assert len(done) == 10
+    assert all(r["steps"] == 3 and r["usage"]["total"]["prompt_tokens"] == 10 for r in done)
+    assert all(r["wall_time"] >= 0 for r in records)
+
+    predictions = json.loads(Path(prediction_file).read_text())
+    assert Path(prediction_file).name == "predict_dev.json"
+    assert predictions[0] == ["q0", "SELECT 'q0'\t----- bird -----\tdb"]
+    assert len(predictions) == 11
+
+    # Resume after a crash while writing q9: the cut-off line is ignored, and
+    # only unfinished and failed questions run again
+    lines = [line for line in output_file.read_text().splitlines() if json.loads(line)["idx"] != 9]
+    output_file.write_text("\n".join(lines) + '\n{"idx": 9, "db_')
+    assert load_finished_ids(str(output_file)) == set(range(9))
+    orchestrator.shared["queries"].clear()
+    await run_batch("spider", str(input_file), str(output_file), str(tmp_path), "",
+                    max_concurrency=2, orchestrator=orchestrator)
+    assert sorted(orchestrator.shared["queries"]) == ["fail", "q9"]
+    assert load_finished_ids(str(output_file)) == set(range(10))
+    spider_predictions = (tmp_path / "out" / "pred_dev.sql").read_text().splitlines()
+    assert spider_predictions[:2] == ["SELECT 'q0'", "SELECT 'q1'"]
+
+
+async def test_failed_task_keeps_predictions_aligned(tmp_path):
+    input_file = tmp_path / "dev.json"
+    write_dataset(input_file, ["q0", "fail", "q2"])
+    output_file = tmp_path / "output.jsonl"
+
+    prediction_file = await run_batch("bird", str(input_file), str(output_file), str(tmp_path), "",
+                                      max_concurrency=2, orchestrator=StubOrchestrator())
+
+    failed = [json.loads(line) for line in output_file.read_text().splitlines() if "fail" in line]
+    assert failed[0]["idx"] == 1 and failed[0]["pred"] == ""
+    assert failed[0]["error"] == "RuntimeError: model error"
+    assert load_finished_ids(str(output_file)) == {0, 2}
+
+    # One entry per question, in dataset order
+    predictions = json.loads(Path(prediction_file).read_text())
+    assert [p[0] for p in predictions] == ["q0", "fail", "q2"]
+    assert predictions[1] == ["fail", "\t----- bird -----\tdb"]
+
+    # Questions without any result (before start_pos) are filled in as well
+    output_file.write_text("")
+    await run_batch("spider", str(input_file), str(output_file), str(tmp_path), "",
+                    start_pos=2, orchestrator=StubOrchestrator())
+    assert (tmp_path / "pred_dev.sql").read_text().splitlines() == ["", "", "SELECT 'q2'"]
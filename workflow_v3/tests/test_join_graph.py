@@ -0,0 +1,90 @@
+"""
+Tests for the foreign-key join graph (join_graph).
+"""
+
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from keyvalue_memory import KeyValueMemory
+from database_schema_manager import DatabaseSchemaManager
+from memory_content_types import TableSchema, ColumnInfo
+from schema_catalog import SchemaCatalog
+from join_graph import JoinGraph, JoinEdge, get_catalog_join_graph
+from sql_generator_tools import SQLGeneratorTools
+
+
+def key(references=None, pk=False):
+    return ColumnInfo(dataType="INTEGER", nullable=False, isPrimaryKey=pk, isForeignKey=references is not None,
+                      references=dict(zip(("table", "column"), references)) if references else None)
+
+
+def make_tables():
+    """Matches between teams, players in teams, and a lookup table nobody references."""
+    return {
+        "team": TableSchema(name="team", columns={"id": key(pk=True), "league_id": key(("league", "id"))}),
+        "league": TableSchema(name="league", columns={"id": key(pk=True)}),
+        "match": TableSchema(name="match", columns={
+            "id": key(pk=True),
+            "home_team_id": key(("team", "id")),
+            "away_team_id": key(("team", "id")),
+            "league_id": key(("league", "id")),
+        }),
+        "player": TableSchema(name="player", columns={"id": key(pk=True), "team_id": key(("team", "id"))}),
+        "Country Codes": TableSchema(name="Country Codes", columns={"code": key(pk=True)}),
+    }
+
+
+def test_shortest_and_k_shortest_paths():
+    graph = JoinGraph.from_tables(make_tables())
+
+    assert graph.shortest_path("player", "team") == [JoinEdge("player", "team_id", "team", "id")]
+    assert graph.shortest_path("player", "PLAYER") == []
+    assert graph.shortest_path("player", "Country Codes") is None
+
+    # Parallel foreign keys are separate paths, longer detours come last
+    paths = graph.k_shortest_paths("player", "match", 4)
+    assert [len(path) for path in paths] == [2, 2, 3]
+    assert {path[1].from_column for path in paths[:2]} == {"home_team_id", "away_team_id"}
+    assert all(path[0].from_table == "player" for path in paths)
+    assert [len(path) for path in graph.k_shortest_paths("player", "match", 10)] == [2, 2, 3]
+
+    # Paths are cached
+    assert graph.k_shortest_paths("player", "match", 4) == paths
+
+
+def test_connect_tables():
+    graph = JoinGraph.from_tables(make_tables())
+
+    plan = graph.connect(["player", "league"])
+    assert plan.tables == ["player", "league", "team"]
+    assert plan.to_sql() == ("player JOIN team ON player.team_id = team.id "
+                             "JOIN league ON team.league_id = league.id")
+
+    # Intermediate tables are shared, unreachable tables are reported
+    plan = graph.connect(["player", "match", "league", "country codes"])
+    assert len(plan.joins) == 3
+    assert plan.tables == ["player", "match", "league", "team"]
+    assert plan.to_dict()["unreachable"] == ["Country Codes"]
+    assert graph.connect(["team"]).to_dict() == {"tables": ["team"], "joins": [], "sql": "team"}
+
+
+async def test_manager_and_tool_use_the_graph():
+    catalog = SchemaCatalog("soccer", make_tables(), {"database_id": "soccer"})
+    assert get_catalog_join_graph(catalog) is get_catalog_join_graph(catalog)
+
+    memory = KeyValueMemory(native=True)
+    await memory.set("databaseSchema", catalog.memory_value(True), copy=False)
+    manager = DatabaseSchemaManager(memory)
+    relationships = await manager.find_relationships("TEAM", "match")
+    assert {r["from_column"] for r in relationships} == {"home_team_id", "away_team_id"}
+    assert await manager.find_relationships("player", "league") == []
+    assert (await manager.find_join_path(["player", "league"]))["tables"] == ["player", "league", "team"]
+
+    tools = SQLGeneratorTools(memory)
+    result = await tools.find_join_path(["player", "match"])
+    assert result["sql"].startswith("player JOIN team ON player.team_id = team.id JOIN match ON ")
+    assert len(result["alternatives"]) == 2
+    assert "error" in await tools.find_join_path(["player", "coach"])
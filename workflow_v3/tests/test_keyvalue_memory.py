@@ -29,7 +29,7 @@ except ImportError:
     sys.exit(1)
 
 # Import our KeyValueMemory class
-from keyvalue_memory import KeyValueMemory
+from keyvalue_memory import KeyValueMemory, thaw
 
 
 class TestKeyValueMemory:
@@ -347,6 +347,130 @@ ORDER BY products.price DESC
         assert sql_gen_count >= 1, "Should find at least one SQLGenerator log"
         
         print("\n✅ All advanced tests passed!")
+    
+    async def test_version_compaction(self):
+        """Test the latest-value index and retention of older versions."""
+        print("\n" + "="*60)
+        print("Testing Version Index and Compaction")
+        print("="*60)
+        
+        memory = KeyValueMemory(name="test_memory_versions", max_versions=3)
+        
+        # Simulate a 100-step orchestration rewriting the same few variables
+        keys = ["current_sql", "execution_result", "node_status", "tree_state"]
+        for step in range(100):
+            for key in keys:
+                await memory.set(key, {"step": step, "key": key})
+            await memory.add(MemoryContent(content=f"log {step}", mime_type=MemoryMimeType.TEXT))
+        
+        for key in keys:
+            assert await memory.get(key) == {"step": 99, "key": key}
+            versions = await memory.get_versions(key)
+            assert [json.loads(v.content)["step"] for v in versions] == [97, 98, 99]
+        assert await memory.get_keys() == keys
+        
+        # Superseded entries are dropped, untracked entries are kept
+        untracked = [item for item in memory._store if "variable_name" not in (item.metadata or {})]
+        assert len(untracked) == 100
+        # compaction runs once half of the store is superseded
+        assert len(memory._store) <= 2 * (100 + len(keys) * 3)
+        
+        # Rewriting a key moves it to the end of the key order
+        await memory.set("node_status", "done")
+        assert (await memory.get_keys())[-1] == "node_status"
+        
+        # Unbounded retention keeps every version
+        full = KeyValueMemory(name="test_memory_full", max_versions=None)
+        for step in range(20):
+            await full.set("current_sql", f"SELECT {step}")
+        assert len(await full.get_versions("current_sql")) == 20
+        assert full.compact() == 0
+        
+        await memory.clear()
+        assert await memory.get("current_sql") is None
+        assert await memory.get_keys() == []
+        
+        print("\n✅ All version tests passed!")
+    
+    async def test_native_storage(self):
+        """Test native storage of structured values and read-only views."""
+        print("\n" + "="*60)
+        print("Testing Native Storage")
+        print("="*60)
+        
+        memory = KeyValueMemory(name="test_memory_native", native=True)
+        tree = {"rootId": "root", "nodes": {"root": {"intent": "q", "childIds": ["a"]}}}
+        await memory.set("queryTree", tree)
+        await memory.set("counter", 3)
+        await memory.set("items", [1, 2, 3])
+        
+        # The stored value is a snapshot, not the caller's object
+        tree["nodes"]["root"]["intent"] = "changed"
+        assert (await memory.get("queryTree"))["nodes"]["root"]["intent"] == "q"
+        assert await memory.get("counter") == 3
+        assert await memory.get("items") == [1, 2, 3]
+        
+        # get() hands out private copies
+        copy1 = await memory.get("queryTree")
+        copy1["nodes"]["root"]["childIds"].append("b")
+        assert (await memory.get("queryTree"))["nodes"]["root"]["childIds"] == ["a"]
+        
+        # Views are read-only and thaw() gives a mutable copy
+        view = await memory.get_view("queryTree")
+        assert view["nodes"]["root"]["childIds"] == ["a"]
+        try:
+            view["nodes"]["root"]["childIds"].append("b")
+            assert False, "Views should be read-only"
+        except AttributeError:
+            pass
+        node = thaw(view["nodes"]["root"])
+        node["intent"] = "edited"
+        assert (await memory.get("queryTree"))["nodes"]["root"]["intent"] == "q"
+        assert await memory.get_view("missing", "default") == "default"
+        
+        # Values are serialized only on export
+        exported = json.loads(await memory.export_json())
+        assert exported["queryTree"]["rootId"] == "root"
+        assert exported["items"] == [1, 2, 3]
+        
+        print("\n✅ All native storage tests passed!")
+    
+    async def test_append(self):
+        """Test appending to list variables in both storage modes."""
+        native = KeyValueMemory(name="test_memory_append", native=True)
+        await native.append("log", {"step": 0})
+        await native.set("log", [])
+        item = await native.get_with_details("log")
+        view = await native.get_view("log")
+        for step in range(3):
+            await native.append("log", {"step": step})
+        
+        # Every append stores a new list sharing the old entries; what was read
+        # before is not modified
+        latest = await native.get_with_details("log")
+        assert latest is not item
+        assert item.content == [] and len(view) == 0
+        assert await native.get("log") == [{"step": 0}, {"step": 1}, {"step": 2}]
+        versions = await native.get_versions("log")
+        assert versions[-2].content[0] is latest.content[0]
+        
+        json_memory = KeyValueMemory(name="test_memory_append_json")
+        await json_memory.append("log", {"step": 0})
+        await json_memory.append("log", {"step": 1})
+        assert await json_memory.get("log") == [{"step": 0}, {"step": 1}]
+        
+        # Only lists can be appended to
+        await json_memory.set("config", {"a": 1})
+        await json_memory.set("name", "test")
+        await native.set("config", {"a": 1})
+        for memory, key in ((json_memory, "config"), (json_memory, "name"), (native, "config")):
+            try:
+                await memory.append(key, 1)
+                assert False, "Appending to a non-list should fail"
+            except TypeError as e:
+                assert "not a list" in str(e)
+        
+        print("\n✅ All append tests passed!")
 
 
 async def main():
@@ -359,6 +483,15 @@ async def main():
     # Run advanced tests
     await tester.test_advanced_use_cases()
     
+    # Run version tests
+    await tester.test_version_compaction()
+    
+    # Run native storage tests
+    await tester.test_native_storage()
+    
+    # Run append tests
+    await tester.test_append()
+    
     print("\n" + "="*60)
     print("✅ ALL TESTS PASSED!")
     print("="*60)
@@ -0,0 +1,108 @@
+"""
+Tests for the process-wide model client pool (model_client_pool).
+
+A replay client stands in for the model, so no LLM is used.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from autogen_core.models import UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from model_client_pool import ModelClientPool, TokenRateLimiter
+
+
+class SlowReplayClient(ReplayChatCompletionClient):
+    """Replay client that takes a while per request and tracks the requests in flight."""
+
+    def __init__(self, responses):
+        super().__init__(responses)
+        self.running = 0
+        self.max_running = 0
+
+    async def create(self, messages, **kwargs):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            return await super().create(messages, **kwargs)
+        finally:
+            self.running -= 1
+
+
+def test_clients_are_shared(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    pool = ModelClientPool()
+    config = {"model": "gpt-4o", "temperature": 0.1, "timeout": 300}
+
+    linker = pool.get_client("schema_linker", config)
+    assert pool.get_client("schema_linker", dict(config)) is linker
+    generator = pool.get_client("sql_generator", config)
+    other = pool.get_client("sql_generator", {**config, "temperature": 0.0})
+    assert generator is not linker
+
+    async def underlying_clients():
+        clients = (linker._client, generator._client, other._client)
+        await pool.close()
+        return clients
+
+    # Agents share the model client, other settings share the HTTP connections
+    first = asyncio.run(underlying_clients())
+    assert first[0] is first[1] and first[2] is not first[0]
+    assert first[2]._client._client is first[0]._client._client
+
+    # Connections belong to their event loop: a new loop gets new clients
+    second = asyncio.run(underlying_clients())
+    assert second[0] is second[1] and second[0] is not first[0]
+    assert second[0]._client._client is not first[0]._client._client
+
+    assert linker.model_info["family"] == "gpt-4o"
+
+
+async def test_requests_are_limited_and_usage_recorded(monkeypatch):
+    pool = ModelClientPool(max_concurrency=2)
+    replay = SlowReplayClient(["SELECT 1"] * 6)
+    monkeypatch.setattr(pool, "shared_client", lambda config: replay)
+    clients = [pool.get_client(name, {"model": "gpt-4o"}) for name in ("schema_linker", "sql_generator")]
+    messages = [UserMessage(content="count the schools", source="user")]
+
+    results = await asyncio.gather(*(clients[i % 2].create(messages) for i in range(6)))
+    assert [result.content for result in results] == ["SELECT 1"] * 6
+    assert replay.max_running == 2
+
+    usage = pool.get_usage()
+    assert usage["schema_linker"] == {"prompt_tokens": 9, "completion_tokens": 6}
+    assert usage["total"] == {"prompt_tokens": 18, "completion_tokens": 12}
+    assert clients[1].total_usage().prompt_tokens == 9
+
+
+async def test_token_rate_limit():
+    limiter = TokenRateLimiter(tokens_per_minute=100)
+    first = await limiter.acquire(80)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(limiter.acquire(50), timeout=0.1)
+
+    # The request used fewer tokens than estimated, which frees the rest
+    limiter.settle(first, 30)
+    assert await asyncio.wait_for(limiter.acquire(50), timeout=0.1) is not None
+    assert await TokenRateLimiter().acquire(10 ** 9) is None
+
+
+async def test_token_wait_does_not_hold_a_slot(monkeypatch):
+    pool = ModelClientPool(max_concurrency=1, tokens_per_minute=100)
+    replay = SlowReplayClient(["SELECT 1"])
+    monkeypatch.setattr(pool, "shared_client", lambda config: replay)
+    await pool.rate_limiter.acquire(100)
+
+    request = asyncio.ensure_future(pool.get_client("sql_generator", {"model": "gpt-4o"})
+                                    .create([UserMessage(content="count the schools", source="user")]))
+    await asyncio.sleep(0.1)
+    assert not request.done() and not pool.request_slot().locked()
+    request.cancel()
@@ -0,0 +1,77 @@
+"""
+Tests for the fuzzy schema name index (name_index).
+"""
+
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from keyvalue_memory import KeyValueMemory
+from memory_content_types import TableSchema, ColumnInfo
+from schema_catalog import SchemaCatalog
+from name_index import NameIndex, SchemaNameIndex, get_catalog_name_index, normalize_name
+from sql_generator_tools import SQLGeneratorTools
+
+
+def make_catalog():
+    def columns(*names):
+        return {name: ColumnInfo(dataType="TEXT", nullable=True, isPrimaryKey=False, isForeignKey=False)
+                for name in names}
+
+    tables = {
+        "frpm": TableSchema(name="frpm", columns=columns("CDSCode", "County Name", "Free Meal Count (K-12)")),
+        "satscores": TableSchema(name="satscores", columns=columns("cds", "AvgScrMath", "NumTstTakr")),
+        "schools": TableSchema(name="schools", columns=columns("CDSCode", "County", "Phone")),
+    }
+    column_descriptions = {"satscores": {"AvgScrMath": ("average scores in Math", ""),
+                                         "NumTstTakr": ("Number of Test Takers", "")}}
+    table_full_names = {"frpm": "free and reduced price meals", "satscores": "sat scores", "schools": "schools"}
+    return SchemaCatalog("california_schools", tables, {}, None, table_full_names, column_descriptions)
+
+
+def test_name_index_ranks_corrections():
+    assert normalize_name("Free Meal_Count (K-12)") == "freemealcountk12"
+
+    index = NameIndex([("users", ["users"]), ("user_roles", ["user_roles"]), ("orders", ["orders"])])
+    assert index.search("USERS")[0] == ("users", 1.0)
+    assert [key for key, _ in index.search("user")] == ["users", "user_roles"]
+    assert index.search("usres")[0][0] == "users"
+    assert index.search("xyz") == []
+    assert [key for key, _ in index.search("user", accept=lambda key: key != "users")] == ["user_roles"]
+
+
+def test_schema_name_index_uses_expanded_names():
+    index = SchemaNameIndex.from_catalog(make_catalog())
+
+    assert index.similar_tables("satscore")[0] == "satscores"
+    assert index.similar_tables("sat_scores")[0] == "satscores"
+    assert index.similar_tables("free_reduced_price_meals")[0] == "frpm"
+
+    assert index.similar_columns("satscores", "number_of_test_takers")[0] == "NumTstTakr"
+    assert index.similar_columns("frpm", "FreeMealCount")[0] == "Free Meal Count (K-12)"
+    assert index.similar_columns("missing", "cds") == []
+
+    elsewhere = index.similar_columns_elsewhere("frpm", "Phone")
+    assert elsewhere[0] == {"table": "schools", "column": "Phone", "score": 1.0}
+    assert all(match["table"] != "frpm" for match in index.similar_columns_elsewhere("frpm", "CDSCode"))
+
+
+async def test_tools_suggest_corrections():
+    catalog = make_catalog()
+    assert get_catalog_name_index(catalog) is get_catalog_name_index(catalog)
+
+    memory = KeyValueMemory(native=True)
+    await memory.set("databaseSchema", catalog.memory_value(True), copy=False)
+    tools = SQLGeneratorTools(memory)
+
+    result = await tools.check_table_columns("school")
+    assert not result["exists"]
+    assert result["similar_tables"][0] == "schools"
+
+    result = await tools.check_column_exists("schools", "county_name")
+    assert not result["exists"]
+    assert result["similar_columns"][0] == "County"
+    assert result["similar_columns_in_other_tables"][0]["table"] == "frpm"
+    assert result["similar_columns_in_other_tables"][0]["column"] == "County Name"
@@ -633,6 +633,93 @@ class TestNodeHistoryManager:
         assert sql_evolution[1]["confidence"] > sql_evolution[0]["confidence"]
         
         print("✅ Complete node lifecycle tracking tests passed")
+    
+    @pytest.mark.asyncio
+    async def test_shared_history_and_indexes(self, memory, manager, sample_node):
+        """Test indexes and node state across managers sharing one memory."""
+        other = NodeHistoryManager(memory)
+        
+        await manager.record_create(sample_node)
+        sample_node.generation["sql"] = "SELECT 1"
+        await other.record_generate_sql(sample_node)
+        
+        second = QueryNode(nodeId="second_node", intent="Count schools", status=NodeStatus.CREATED)
+        await manager.record_create(second)
+        await manager.record_execute(second, error="no such table")
+        
+        # Both managers see all operations in order
+        for mgr in (manager, other):
+            all_ops = await mgr.get_all_operations()
+            assert [op.nodeId for op in all_ops] == ["test_node_001", "test_node_001", "second_node", "second_node"]
+            assert len(await mgr.get_node_operations("test_node_001")) == 2
+            assert len(await mgr.get_operations_by_type(NodeOperationType.CREATE)) == 2
+        
+        state = await other.get_current_node_state("test_node_001")
+        assert state.status == NodeStatus.SQL_GENERATED
+        assert state.generation["sql"] == "SELECT 1"
+        failed = await other.get_current_node_state("second_node")
+        assert failed.status == NodeStatus.EXECUTED_FAILED
+        assert failed.evaluation["error"] == "no such table"
+        
+        # Returned operations are copies
+        ops = await manager.get_node_operations("test_node_001")
+        ops[0].data["intent"] = "modified"
+        assert (await manager.get_node_operations("test_node_001"))[0].data["intent"] == sample_node.intent
+        
+        # A reinitialized history is picked up by every manager
+        await other.initialize()
+        assert await manager.get_all_operations() == []
+        assert await manager.get_current_node_state("test_node_001") is None
+        
+        print("✅ Shared history and index tests passed")
+    
+    @pytest.mark.asyncio
+    async def test_unchanged_payloads_are_shared(self, sample_node):
+        """Test that repeated payloads are stored once in native memory."""
+        memory = KeyValueMemory(native=True)
+        manager = NodeHistoryManager(memory)
+        await manager.initialize()
+        
+        await manager.record_create(sample_node)
+        sample_node.generation["sql"] = "SELECT sname FROM schools"
+        await manager.record_generate_sql(sample_node)
+        
+        view = await memory.get_view("nodeHistory")
+        first, second = view[0]["data"], view[1]["data"]
+        assert first["schema_linking"]._data is second["schema_linking"]._data
+        assert first["generation"]["sql"] != second["generation"]["sql"]
+        
+        # Changing the node afterwards does not change the log
+        sample_node.schema_linking["selected_tables"].append("frpm")
+        raw_data = await memory.get("nodeHistory")
+        assert raw_data[1]["data"]["schema_linking"]["selected_tables"] == ["schools"]
+        
+        print("✅ Shared payload tests passed")
+    
+    @pytest.mark.asyncio
+    async def test_history_appends_share_operations(self, sample_node):
+        """Test that recording appends to the stored history without copying or modifying it."""
+        memory = KeyValueMemory(native=True)
+        manager = NodeHistoryManager(memory)
+        other = NodeHistoryManager(memory)
+        await manager.initialize()
+        item = await memory.get_with_details("nodeHistory")
+        
+        await manager.record_create(sample_node)
+        first = (await memory.get_with_details("nodeHistory")).content[0]
+        for i in range(5):
+            sample_node.generation["sql"] = f"SELECT {i}"
+            await (manager if i % 2 else other).record_generate_sql(sample_node)
+        
+        # Each append stores a new list of the same operation objects; older items are unchanged
+        latest = await memory.get_with_details("nodeHistory")
+        assert item.content == []
+        assert len(latest.content) == 6 and latest.content[0] is first
+        for mgr in (manager, other):
+            assert len(await mgr.get_node_operations("test_node_001")) == 6
+            assert (await mgr.get_current_node_state("test_node_001")).generation["sql"] == "SELECT 4"
+        
+        print("✅ Shared history tests passed")
 
 
 if __name__ == "__main__":
@@ -423,6 +423,129 @@ class TestQueryTreeManager:
         assert len(tree["nodes"]) == 4  # root + 3 children
         
         print("✅ Concurrent operations tests passed")
+    
+    @pytest.mark.asyncio
+    async def test_batch_operations(self, memory, manager):
+        """Test that a batch of mutations is written to memory once."""
+        root_id = await manager.initialize("Query with several parts")
+        writes_before = len(await memory.get_versions("queryTree"))
+        
+        async with manager.batch():
+            for i in range(3):
+                child = QueryNode(nodeId=f"child{i}", intent=f"Part {i}", parentId=root_id)
+                await manager.add_node(child, root_id)
+                await manager.update_node(f"child{i}", {"subqueryInfo": {"id": i}})
+                await manager.update_node_sql(f"child{i}", f"SELECT {i}")
+            await manager.set_current_node_id("child0")
+            
+            # Reads inside the batch see the pending changes
+            assert len(await manager.get_children(root_id)) == 3
+            assert await manager.get_current_node_id() == "child0"
+            
+            # Nothing is written until the batch ends
+            assert len(await memory.get_versions("queryTree")) == writes_before
+        
+        assert len(await memory.get_versions("queryTree")) == writes_before + 1
+        raw_data = await memory.get("queryTree")
+        assert raw_data["nodes"][root_id]["childIds"] == ["child0", "child1", "child2"]
+        assert raw_data["nodes"]["child1"]["subqueryInfo"] == {"id": 1}
+        assert raw_data["nodes"]["child2"]["sql"] == "SELECT 2"
+        assert raw_data["currentNodeId"] == "child0"
+        
+        # A failing batch leaves the stored tree untouched
+        with pytest.raises(ValueError):
+            async with manager.batch():
+                await manager.delete_node("child1")
+                await manager.add_node(QueryNode(nodeId="orphan", intent="x"), "missing_parent")
+        assert await manager.get_node("child1") is not None
+        assert len(await memory.get_versions("queryTree")) == writes_before + 1
+        
+        print("✅ Batch operations tests passed")
+
+    @pytest.mark.asyncio
+    async def test_buckets_follow_writes_inside_batch(self):
+        """Test that bucket reads inside a batch see later writes to the same node."""
+        from task_status_checker import TaskStatusChecker
+
+        memory = KeyValueMemory(native=True)
+        checker = TaskStatusChecker(memory)
+        manager = checker.tree_manager
+        root_id = await manager.initialize("Count schools")
+        await manager.add_node(QueryNode(nodeId="child", intent="Part"), root_id)
+
+        async with manager.batch():
+            await manager.update_node("child", {"status": NodeStatus.EXECUTED_SUCCESS.value})
+            assert [n.nodeId for n in await manager.get_successful_nodes()] == ["child"]
+            assert await checker.next_step() is not None
+
+            # The same node changes twice more after the buckets were read
+            await manager.update_node("child", {"status": NodeStatus.EXECUTED_FAILED.value})
+            await manager.update_node("child", {"evaluation": {"result_quality": "good"}})
+            assert await manager.get_successful_nodes() == []
+            assert [n.nodeId for n in await manager.get_failed_nodes()] == ["child"]
+
+        assert [n.nodeId for n in await manager.get_failed_nodes()] == ["child"]
+        assert checker._statuses["child"]["status"] == "needs_sql"
+        await checker.next_step()
+        assert checker._statuses["child"]["status"] == "complete"
+
+        print("✅ Buckets inside batch tests passed")
+
+    @pytest.mark.asyncio
+    async def test_native_memory_isolation(self):
+        """Test that stored tree versions are never modified in native mode."""
+        memory = KeyValueMemory(native=True, max_versions=None)
+        manager = QueryTreeManager(memory)
+        root_id = await manager.initialize("Native storage query")
+        await manager.add_node(QueryNode(nodeId="child", intent="Part"), root_id)
+        before = await memory.get("queryTree")
+        
+        node = await manager.get_node("child")
+        node.childIds.append("not_stored")
+        await manager.update_node_sql("child", "SELECT 1")
+        await manager.update_node("child", {"schema_linking": {"tables": ["t"]}})
+        
+        versions = await memory.get_versions("queryTree")
+        assert versions[-3].content == before
+        assert versions[-3].content["nodes"]["child"].get("sql") is None
+        assert (await manager.get_node("child")).childIds == []
+        # Untouched nodes are shared between versions
+        assert versions[-1].content["nodes"][root_id] is versions[-3].content["nodes"][root_id]
+        
+        print("✅ Native memory isolation tests passed")
+
+    async def test_focused_concurrent_updates(self):
+        """Test per-task current nodes and that concurrent batches do not lose updates."""
+        memory = KeyValueMemory(native=True)
+        manager = QueryTreeManager(memory)
+        root_id = await manager.initialize("Concurrent query")
+        child_ids = [f"child_{i}" for i in range(4)]
+        async with manager.batch():
+            for child_id in child_ids:
+                await manager.add_node(QueryNode(nodeId=child_id, intent=child_id), root_id)
+
+        async def process(child_id):
+            # Each agent creates its own manager over the shared memory
+            agent_manager = QueryTreeManager(memory)
+            with QueryTreeManager.focus(child_id):
+                node_id = await agent_manager.get_current_node_id()
+                async with agent_manager.batch():
+                    await agent_manager.update_node(node_id, {"status": NodeStatus.SQL_GENERATED.value})
+                    await asyncio.sleep(0.01)  # other tasks write in the meantime
+                    await agent_manager.update_node_sql(node_id, f"SELECT '{node_id}'")
+                return node_id
+
+        assert await asyncio.gather(*(process(c) for c in child_ids)) == child_ids
+
+        # The stored current node was not moved by the focused tasks
+        assert await manager.get_current_node_id() == root_id
+        tree = await manager.get_tree()
+        for child_id in child_ids:
+            assert tree["nodes"][child_id]["sql"] == f"SELECT '{child_id}'"
+            assert tree["nodes"][child_id]["status"] == NodeStatus.SQL_GENERATED.value
+        assert (await manager.get_node(root_id)).childIds == child_ids
+
+        print("✅ Focused concurrent update tests passed")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+"""
+Tests for the rule scheduler of TextToSQLTreeOrchestrator (scheduler="rules").
+
+Scripted stand-ins replace the agents, so no LLM is used.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from query_tree_manager import QueryTreeManager
+from memory_content_types import QueryNode
+from text_to_sql_tree_orchestrator import RULE_MAX_RETRIES, TextToSQLTreeOrchestrator
+
+
+class ScriptedAgent:
+    """Agent whose tool applies a node update to the current node and records the call."""
+
+    def __init__(self, name, memory, calls, update):
+        self.agent_name = name
+        self.tree_manager = QueryTreeManager(memory)
+        self.calls = calls
+        self.update = update
+
+    def get_tool(self):
+        return self
+
+    async def run(self, args, cancellation_token):
+        node_id = await self.tree_manager.get_current_node_id()
+        self.calls.append((self.agent_name, node_id))
+        await self.update(self.tree_manager, node_id)
+
+
+def _grade(qualities):
+    """Evaluator update grading a node's SQL with the next of its qualities; "poor" comes with logic issues."""
+    async def evaluate(manager, node_id):
+        quality = qualities[node_id].pop(0)
+        evaluation = {"result_quality": quality, "execution_result": {"status": "success", "row_count": 1}}
+        if quality == "poor":
+            evaluation["issues"] = {"issue": [{"type": "logic", "severity": "high",
+                                               "description": "Counts the wrong rows",
+                                               "suggested_action": "Filter on the year"}]}
+        await manager.update_node(node_id, {"evaluation": evaluation})
+    return evaluate
+
+
+def make_orchestrator(monkeypatch, qualities):
+    """Orchestrator with scripted agents, grading SQL with _grade(qualities)."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    orchestrator = TextToSQLTreeOrchestrator(data_path="unused", tables_json_path="unused",
+                                             scheduler="rules", schema_reader=object())
+    calls = []
+
+    async def link(manager, node_id):
+        await manager.update_node(node_id, {"schema_linking": {"selected_tables": {"table": []}}})
+
+    async def analyze(manager, node_id):
+        await manager.update_node(node_id, {"queryAnalysis": {"complexity": "simple"}})
+
+    async def generate(manager, node_id):
+        node = await manager.get_node(node_id)
+        await manager.update_node(node_id, {"generation": {"sql": f"SELECT {node.generation_attempts + 1}"},
+                                            "generation_attempts": node.generation_attempts + 1})
+
+    for name, update in (("schema_linker", link), ("query_analyzer", analyze),
+                         ("sql_generator", generate), ("sql_evaluator", _grade(qualities))):
+        setattr(orchestrator, name, ScriptedAgent(name, orchestrator.memory, calls, update))
+    return orchestrator, calls
+
+
+async def test_rules_process_tree_without_coordinator(monkeypatch):
+    qualities = {"node_a": ["good"], "node_b": ["poor", "excellent"]}
+    orchestrator, calls = make_orchestrator(monkeypatch, qualities)
+    root_id = await orchestrator.tree_manager.initialize("Compare two counts")
+    qualities[root_id] = ["good"]
+    for node_id in ("node_a", "node_b"):
+        await orchestrator.tree_manager.add_node(QueryNode(nodeId=node_id, intent=node_id), root_id)
+
+    assert await orchestrator._process_with_rules()
+    assert calls == [
+        ("schema_linker", "node_a"), ("sql_generator", "node_a"), ("sql_evaluator", "node_a"),
+        ("schema_linker", "node_b"), ("sql_generator", "node_b"), ("sql_evaluator", "node_b"),
+        # Bad SQL with feedback about the logic is regenerated and evaluated again
+        ("sql_generator", "node_b"), ("sql_evaluator", "node_b"),
+        # The parent is linked, analyzed, then combines its children
+        ("schema_linker", root_id), ("query_analyzer", root_id),
+        ("sql_generator", root_id), ("sql_evaluator", root_id),
+    ]
+    assert orchestrator.rule_steps == len(calls)
+
+
+async def test_rules_hand_over_ambiguous_nodes(monkeypatch):
+    qualities = {}
+    orchestrator, calls = make_orchestrator(monkeypatch, qualities)
+    root_id = await orchestrator.tree_manager.initialize("Count schools")
+    qualities[root_id] = [""]
+    await orchestrator.tree_manager.update_node(root_id, {
+        "schema_linking": {"selected_tables": {"table": []}},
+        "queryAnalysis": {"complexity": "simple"},
+        "generation": {"sql": "SELECT scores FROM satscores",
+                       "execution_result": {"status": "error", "error": "no such column: scores"}},
+        "evaluation": {"result_quality": "poor"}
+    })
+
+    # Execution errors about the schema are re-linked, then regenerated and evaluated
+    assert not await orchestrator._process_with_rules()
+    assert calls == [("schema_linker", root_id), ("sql_generator", root_id), ("sql_evaluator", root_id)]
+
+    # Bad SQL without feedback goes to the coordinator
+    step = await orchestrator.task_status_checker.next_step()
+    assert step["status"] == "bad_sql"
+    node = {"evaluation": {"result_quality": "poor", "execution_result": {"status": "success"}}}
+    assert TextToSQLTreeOrchestrator._rule_action(step, node) is None
+
+
+async def test_rules_cap_retries_per_node(monkeypatch):
+    qualities = {}
+    orchestrator, calls = make_orchestrator(monkeypatch, qualities)
+    root_id = await orchestrator.tree_manager.initialize("Count schools")
+    qualities[root_id] = ["poor"] * 10
+
+    async def regenerate(manager, node_id):
+        # Attempts are not counted (the generator failed before counting), so the checker never gives up
+        await manager.update_node(node_id, {"generation": {"sql": f"SELECT {len(calls)}"}})
+    orchestrator.sql_generator.update = regenerate
+
+    # SQL that stays bad is retried RULE_MAX_RETRIES times, then handed over
+    assert not await orchestrator._process_with_rules()
+    assert calls == [("schema_linker", root_id), ("query_analyzer", root_id),
+                     ("sql_generator", root_id), ("sql_evaluator", root_id)] + \
+        [("sql_generator", root_id), ("sql_evaluator", root_id)] * RULE_MAX_RETRIES
+
+
+async def test_rules_share_time_budget(monkeypatch):
+    orchestrator, calls = make_orchestrator(monkeypatch, {})
+    await orchestrator.tree_manager.initialize("Count schools")
+    orchestrator._deadline = asyncio.get_event_loop().time()
+
+    # The coordinator gets what the rules leave of the budget, here nothing
+    assert not await orchestrator._process_with_rules()
+    assert calls == [] and orchestrator._time_left() <= 0
+
+
+def test_unknown_scheduler(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    with pytest.raises(ValueError):
+        TextToSQLTreeOrchestrator(data_path="unused", tables_json_path="unused",
+                                  scheduler="llm", schema_reader=object())
@@ -0,0 +1,108 @@
+"""
+Tests for the shared database schema catalog (schema_catalog).
+"""
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from schema_reader import SchemaReader
+from schema_catalog import compute_column_stats, get_schema_catalog, parse_value_examples
+from keyvalue_memory import KeyValueMemory
+from database_schema_manager import DatabaseSchemaManager
+
+
+@pytest.fixture
+def reader(tmp_path):
+    """A reader over one database with a Singer -> Concert foreign key."""
+    db_dir = tmp_path / "concerts"
+    db_dir.mkdir()
+    conn = sqlite3.connect(db_dir / "concerts.sqlite")
+    conn.execute("CREATE TABLE Concert (concert_id INTEGER PRIMARY KEY, Theme TEXT, Year INTEGER)")
+    conn.execute("CREATE TABLE singer (singer_id INTEGER PRIMARY KEY, Name TEXT, concert_id INTEGER)")
+    conn.executemany("INSERT INTO Concert (Theme, Year) VALUES (?, ?)",
+                     [("Free choice", 2014), ("Party", 2015), (None, 2014)])
+    conn.executemany("INSERT INTO singer (Name, concert_id) VALUES (?, ?)", [("Joe", 1), ("Tribal King", 2)])
+    conn.commit()
+    conn.close()
+    tables = [{
+        "db_id": "concerts",
+        "table_names_original": ["Concert", "singer"],
+        "table_names": ["concert", "singer"],
+        "column_names_original": [[-1, "*"], [0, "concert_id"], [0, "Theme"], [0, "Year"],
+                                  [1, "singer_id"], [1, "Name"], [1, "concert_id"]],
+        "column_names": [[-1, "*"], [0, "concert id"], [0, "theme"], [0, "year"],
+                         [1, "singer id"], [1, "name"], [1, "concert id"]],
+        "column_types": ["text", "number", "text", "number", "number", "text", "number"],
+        "primary_keys": [1, 4],
+        "foreign_keys": [[6, 1]]
+    }]
+    tables_json = tmp_path / "tables.json"
+    tables_json.write_text(json.dumps(tables))
+    return SchemaReader(str(tmp_path), str(tables_json), "custom", lazy=True)
+
+
+def test_value_parsing_and_stats():
+    assert parse_value_examples("[None, 'a', 2]") == [None, 'a', 2]
+    assert parse_value_examples("") is None
+    assert parse_value_examples("not a list") is None
+
+    stats = compute_column_stats("number", [None, 2015, 2014.5])
+    assert stats["valueType"] == "real" and stats["hasNull"]
+    assert (stats["min"], stats["max"], stats["exampleCount"]) == (2014.5, 2015, 2)
+    stats = compute_column_stats("text", ["ab", "abcd", "ab"])
+    assert stats["valueType"] == "text" and stats["distinctCount"] == 2
+    assert (stats["minLength"], stats["maxLength"]) == (2, 4)
+    assert compute_column_stats("text", None)["valueType"] is None
+
+
+def test_catalog_lookups(reader):
+    catalog = get_schema_catalog(reader, "concerts")
+    assert get_schema_catalog(reader, "concerts") is catalog
+    assert list(catalog.tables) == ["Concert", "singer"]
+
+    assert catalog.get_table("concert") is catalog.tables["Concert"]
+    assert catalog.resolve_column("SINGER", "name") == ("singer", "Name")
+    assert catalog.get_column("Concert", "nope") is None
+    assert catalog.get_table("nope") is None
+
+    theme = catalog.get_column("concert", "theme")
+    assert theme.typicalValues[0] is None
+    assert sorted(theme.typicalValues[1:]) == ["Free choice", "Party"]
+    assert catalog.get_column_stats("Concert", "Year")["valueType"] == "integer"
+    assert catalog.foreign_keys["singer"] == [
+        {"column": "concert_id", "references_table": "Concert", "references_column": "concert_id"}
+    ]
+
+
+@pytest.mark.parametrize("native", [True, False])
+async def test_managers_share_the_catalog(reader, native):
+    catalog = get_schema_catalog(reader, "concerts")
+    managers = [DatabaseSchemaManager(KeyValueMemory(native=native)) for _ in range(2)]
+    for manager in managers:
+        await manager.load_from_schema_reader(reader, "concerts")
+
+    # Both tasks are served the same objects, and agents still see the schema in memory
+    tables = [await manager.get_table("concert") for manager in managers]
+    assert tables[0] is tables[1] is catalog.tables["Concert"]
+    stored = await managers[0].memory.get("databaseSchema")
+    assert stored["tables"]["singer"]["columns"]["concert_id"]["references"]["table"] == "Concert"
+    assert stored["metadata"]["database_id"] == "concerts"
+    assert "description" in stored
+
+    assert await managers[0].get_foreign_keys("Singer") == catalog.foreign_keys["singer"]
+    assert (await managers[0].get_schema_summary())["total_foreign_keys"] == 1
+    assert (await managers[0].get_column_stats("concert", "year"))["max"] == 2015
+
+    # A task that changes its schema reads its own copy from then on
+    await managers[0].set_sample_data("Concert", [{"Theme": "Party"}])
+    assert await managers[0].get_sample_data("concert") == [{"Theme": "Party"}]
+    assert await managers[1].get_sample_data("concert") is None
+    assert catalog.tables["Concert"].sampleData is None
+    assert (await managers[0].get_column_stats("Concert", "Year"))["max"] == 2015
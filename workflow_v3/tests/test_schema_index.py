@@ -0,0 +1,139 @@
+"""
+Tests for the BM25/vector schema index (schema_index).
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import schema_index
+from memory_content_types import TableSchema, ColumnInfo
+from schema_catalog import SchemaCatalog
+from schema_index import SchemaIndex, get_schema_index, tokenize
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    """Keep prebuilt index files out of the user's cache."""
+    index_dir = str(tmp_path / "index")
+    monkeypatch.setattr(schema_index, "_index_dir", index_dir)
+    return index_dir
+
+
+def column(typical_values=None, **flags):
+    return ColumnInfo(dataType="TEXT", nullable=True, isPrimaryKey=flags.get("pk", False),
+                      isForeignKey=False, typicalValues=typical_values)
+
+
+def make_catalog():
+    tables = {
+        "frpm": TableSchema(name="frpm", columns={
+            "CDSCode": column(pk=True),
+            "County Name": column(["Alameda", "Los Angeles"]),
+            "Free Meal Count (K-12)": column(),
+        }),
+        "satscores": TableSchema(name="satscores", columns={
+            "cds": column(pk=True),
+            "AvgScrMath": column(),
+            "NumTstTakr": column(),
+        }),
+        "schools": TableSchema(name="schools", columns={
+            "CDSCode": column(pk=True),
+            "Phone": column(),
+            "Virtual": column(["F", "N", "P"]),
+        }),
+    }
+    column_descriptions = {
+        "satscores": {"AvgScrMath": ("average scores in Math", ""),
+                      "NumTstTakr": ("Number of Test Takers", "number of test takers in this school")},
+        "schools": {"Virtual": ("virtual", "F: exclusively virtual; P: partially virtual; N: not virtual")},
+    }
+    table_full_names = {"frpm": "free and reduced price meals", "satscores": "sat scores", "schools": "schools"}
+    return SchemaCatalog("california_schools", tables, {}, None, table_full_names, column_descriptions)
+
+
+def test_tokenize():
+    assert tokenize("AvgScrMath") == ["avgscrmath", "avg", "scr", "math"]
+    assert "meal" in tokenize("Free Meal Count (K-12)")
+    assert tokenize("What are the schools' phones?") == ["schools", "school", "phones", "phone"]
+
+
+def test_search_uses_descriptions_and_values():
+    index = get_schema_index(make_catalog())
+
+    candidates = index.search("What is the average math score of schools with the most test takers?")
+    assert candidates.tables[0][0] == "satscores"
+    assert {c[:2] for c in candidates.columns[:2]} == {("satscores", "AvgScrMath"), ("satscores", "NumTstTakr")}
+
+    # Values and table full names also match
+    candidates = index.search("How many free meals are there in Alameda?")
+    assert candidates.tables[0][0] == "frpm"
+    assert {c[:2] for c in candidates.columns[:2]} == {("frpm", "County Name"), ("frpm", "Free Meal Count (K-12)")}
+    assert set(candidates.to_dict()["tables"][0]["columns"][:2]) == {"County Name", "Free Meal Count (K-12)"}
+
+    # Restricted to some tables, and nothing matches nothing
+    assert [t for t, _ in index.search("schools phone", tables=["schools"]).tables] == ["schools"]
+    assert index.search("xyzzy").tables == []
+
+
+def test_embeddings_are_saved_and_reloaded(tmp_path):
+    index = SchemaIndex.from_tables(make_catalog().tables)
+    # A lexical miss
+    assert max(index.column_scores("arithmetic").values()) == 0.0
+    vocabulary = ["math", "meal", "phone"]
+    calls = []
+
+    def embed(texts):
+        calls.append(len(texts))
+        return np.array([[text.lower().count(word) + 0.01 for word in vocabulary] for text in texts])
+
+    path = str(tmp_path / "vectors" / "california_schools.npy")
+    index.load_embeddings(embed, path)
+    assert calls == [len(index.entries)]
+    assert np.allclose(np.linalg.norm(index.vectors, axis=1), 1.0)
+
+    # Vectors are read back instead of recomputed, and find what BM25 missed
+    reloaded = SchemaIndex.from_tables(make_catalog().tables)
+    reloaded.load_embeddings(lambda texts: np.array([[1.0, 0.0, 0.0]] * len(texts)), path)
+    assert np.array_equal(reloaded.vectors, index.vectors)
+    scores = reloaded.column_scores("arithmetic")
+    assert max(scores, key=scores.get) == ("satscores", "AvgScrMath")
+
+
+def test_prebuilt_index_is_read_back(monkeypatch):
+    vocabulary = [("math", "arithmetic"), ("meal",), ("phone",)]
+    calls = []
+
+    def embed(texts):
+        calls.append(len(texts))
+        return np.array([[sum(text.lower().count(word) for word in words) + 0.01 for words in vocabulary]
+                         for text in texts])
+
+    monkeypatch.setitem(schema_index._embedders, "test/model", embed)
+    index = get_schema_index(make_catalog(), "test/model")
+    index.save()
+    assert os.path.exists(f"{index.path}.bm25.json")
+    assert os.path.exists(f"{index.path}.test_model.npy")
+    assert calls == [len(index.entries)]
+
+    # Another catalog of the same schema reads the statistics and vectors back
+    catalog = make_catalog()
+    reloaded = get_schema_index(catalog, "test/model")
+    assert reloaded is not index and reloaded.path == index.path
+    assert reloaded._postings == index._postings and reloaded._idf == index._idf
+    assert calls == [len(index.entries)]  # vectors are not recomputed
+    scores = reloaded.column_scores("arithmetic")
+    assert max(scores, key=scores.get) == ("satscores", "AvgScrMath")
+    question = "What is the average math score of schools with the most test takers?"
+    assert reloaded.search(question).tables == index.search(question).tables
+
+    # A changed schema gets its own files
+    catalog.column_descriptions["schools"]["Phone"] = ("telephone", "")
+    assert SchemaIndex.from_catalog(catalog).entries != index.entries
+    assert schema_index.get_index_path(catalog.db_id, SchemaIndex.from_catalog(catalog).entries) != index.path
@@ -0,0 +1,129 @@
+"""
+Tests for the shared, lazily loaded schema reader (schema_reader).
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from db_info_cache import DBInfoCache
+from schema_reader import SchemaReader, get_schema_reader
+from keyvalue_memory import KeyValueMemory
+from database_schema_manager import DatabaseSchemaManager
+
+
+DB_IDS = ["db_a", "db_b", "db_c"]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Create <root>/<db_id>/<db_id>.sqlite databases and their tables.json."""
+    tables = []
+    for db_id in DB_IDS:
+        db_dir = tmp_path / db_id
+        db_dir.mkdir()
+        conn = sqlite3.connect(db_dir / f"{db_id}.sqlite")
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO items (name) VALUES (?)", [(f"{db_id}_item{i}",) for i in range(5)])
+        conn.commit()
+        conn.close()
+        tables.append({
+            "db_id": db_id,
+            "table_names_original": ["items"],
+            "table_names": ["items"],
+            "column_names_original": [[-1, "*"], [0, "id"], [0, "name"]],
+            "column_names": [[-1, "*"], [0, "id"], [0, "name"]],
+            "column_types": ["text", "number", "text"],
+            "primary_keys": [1],
+            "foreign_keys": []
+        })
+    tables_json = tmp_path / "tables.json"
+    tables_json.write_text(json.dumps(tables))
+    return tmp_path, tables_json
+
+
+class TestSchemaReader:
+    """Test lazy loading, LRU eviction and the process-wide registry."""
+
+    def test_lazy_loading_with_lru_eviction(self, dataset):
+        data_path, tables_json = dataset
+        reader = SchemaReader(str(data_path), str(tables_json), "custom", lazy=True, max_cached_dbs=2)
+        assert len(reader.db2infos) == 0
+
+        reader.get_db_info("db_a")
+        reader.get_db_info("db_b")
+        reader.get_db_info("db_a")  # db_b is now the least recently used
+        reader.get_db_info("db_c")
+        assert list(reader.db2infos) == ["db_a", "db_c"]
+
+        # An evicted database is loaded again on use
+        info = reader.get_db_info("db_b")
+        assert [name for name, _, _ in info["desc_dict"]["items"]] == ["id", "name"]
+        assert "db_b_item" in info["value_dict"]["items"][1][1]
+        assert list(reader.db2infos) == ["db_c", "db_b"]
+
+    def test_cache_is_thread_safe(self):
+        cache = DBInfoCache(max_size=2)
+        errors = []
+
+        def use(offset):
+            try:
+                for i in range(2000):
+                    key = f"db_{(i + offset) % 5}"
+                    if cache.get(key) is None:
+                        cache[key] = {"db_id": key}
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=use, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert len(cache) <= 2 and all(cache[key]["db_id"] == key for key in list(cache))
+
+    def test_databases_load_independently(self, dataset, monkeypatch):
+        data_path, tables_json = dataset
+        reader = SchemaReader(str(data_path), str(tables_json), "custom", lazy=True)
+        load = reader._load_single_db_info
+        loading_a, release_a = threading.Event(), threading.Event()
+
+        def slow_load(db_id):
+            if db_id == "db_a":
+                loading_a.set()
+                release_a.wait(5)
+            return load(db_id)
+
+        monkeypatch.setattr(reader, "_load_single_db_info", slow_load)
+        thread = threading.Thread(target=reader.get_db_info, args=("db_a",))
+        thread.start()
+        assert loading_a.wait(5)
+        # db_b does not wait for the slow load of db_a
+        assert reader.get_db_info("db_b")["desc_dict"]
+        assert "db_a" not in reader.db2infos
+        release_a.set()
+        thread.join()
+        assert set(reader.db2infos) == {"db_a", "db_b"}
+
+    def test_registry_shares_one_reader(self, dataset):
+        data_path, tables_json = dataset
+        reader = get_schema_reader(str(data_path), str(tables_json), "custom")
+        assert get_schema_reader(str(data_path) + "/", str(tables_json), "custom") is reader
+        assert len(reader.db2infos) == 0
+        assert set(reader.db2dbjsons) == set(DB_IDS)
+
+    async def test_schema_manager_loads_from_shared_reader(self, dataset):
+        data_path, tables_json = dataset
+        reader = get_schema_reader(str(data_path), str(tables_json), "custom")
+        manager = DatabaseSchemaManager(KeyValueMemory())
+        await manager.load_from_schema_reader(reader, "db_c")
+        assert await manager.get_table_names() == ["items"]
+        assert list(reader.db2infos) == ["db_c"]
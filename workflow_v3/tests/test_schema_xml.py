@@ -0,0 +1,114 @@
+"""
+Tests for the cached, budgeted schema XML renderer (schema_xml).
+"""
+
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from keyvalue_memory import KeyValueMemory
+from database_schema_manager import DatabaseSchemaManager
+from memory_content_types import TableSchema, ColumnInfo
+from schema_catalog import SchemaCatalog
+from schema_xml import SchemaXMLRenderer, count_tokens, get_catalog_renderer, render_schema_xml
+
+
+def make_tables():
+    """A narrow schools table and a wide scores table with many value lists."""
+    schools = TableSchema(name="schools", columns={
+        "CDSCode": ColumnInfo(dataType="TEXT", nullable=False, isPrimaryKey=True, isForeignKey=False),
+        "County": ColumnInfo(dataType="TEXT", nullable=True, isPrimaryKey=False, isForeignKey=False,
+                             typicalValues=["Alameda", "Fresno", None]),
+        "School": ColumnInfo(dataType="TEXT", nullable=True, isPrimaryKey=False, isForeignKey=False,
+                             typicalValues=["A & B <High>"]),
+    })
+    columns = {"cds": ColumnInfo(dataType="TEXT", nullable=False, isPrimaryKey=False, isForeignKey=True,
+                                 references={"table": "schools", "column": "CDSCode"})}
+    for i in range(30):
+        columns[f"metric_{i}"] = ColumnInfo(dataType="REAL", nullable=True, isPrimaryKey=False,
+                                            isForeignKey=False, typicalValues=[i * 1.5 + k for k in range(12)])
+    columns["AvgScrMath"] = ColumnInfo(dataType="INTEGER", nullable=True, isPrimaryKey=False, isForeignKey=False,
+                                       typicalValues=[418, 546])
+    scores = TableSchema(name="satscores", columns=columns)
+    return {"schools": schools, "satscores": scores}
+
+
+def column_names(xml):
+    root = ET.fromstring(xml)
+    return {(table.get("name"), column.get("name"))
+            for table in root.iter("table") for column in table.iter("column")}
+
+
+def test_full_render_is_valid_xml():
+    renderer = SchemaXMLRenderer(make_tables(), "School data and scores")
+    rendered = renderer.render()
+
+    assert len(column_names(rendered.xml)) == 35
+    assert "<value>A &amp; B &lt;High&gt;</value>" in rendered.xml
+    assert '<value null="true"/>' in rendered.xml
+    assert "<!-- 2 more values -->" in rendered.xml
+    assert rendered.tokens == count_tokens(rendered.xml)
+    assert (rendered.omitted_columns, rendered.omitted_values) == (0, 0)
+
+    compact = renderer.render(include_values=False, include_description=False)
+    assert "<typical_values>" not in compact.xml and "<description>" not in compact.xml
+    assert compact.tokens < rendered.tokens
+
+
+def test_budget_drops_least_relevant_first():
+    renderer = SchemaXMLRenderer(make_tables())
+    full = renderer.render().tokens
+    query = "What is the average math score (AvgScrMath) of schools in Alameda county?"
+
+    # A moderate budget only drops value lists, irrelevant ones first
+    rendered = renderer.render(query, max_tokens=full - 200)
+    assert rendered.tokens <= full - 200
+    assert rendered.omitted_columns == 0 and rendered.omitted_values > 0
+    assert "<value>Alameda</value>" in rendered.xml and "<value>546</value>" in rendered.xml
+
+    # A tight budget also drops irrelevant non-key columns but keeps keys
+    budget = full // 4
+    rendered = renderer.render(query, max_tokens=budget)
+    names = column_names(rendered.xml)
+    assert rendered.tokens <= budget
+    assert rendered.omitted_columns > 0
+    assert {("schools", "CDSCode"), ("satscores", "cds"), ("satscores", "AvgScrMath"),
+            ("schools", "County")} <= names
+    assert ("satscores", "metric_29") not in names
+    assert "less relevant columns omitted" in rendered.xml
+
+    # Only some tables
+    rendered = renderer.render(query, tables=["schools"])
+    assert {table for table, _ in column_names(rendered.xml)} == {"schools"}
+    assert "1 less relevant tables omitted" in rendered.xml
+    # Any iterable of tables, read once
+    rendered = renderer.render(query, tables=iter(["satscores", "schools"]))
+    assert {table for table, _ in column_names(rendered.xml)} == {"schools", "satscores"}
+    assert "less relevant tables omitted" not in rendered.xml
+
+    # An impossible budget keeps table names and keys
+    names = column_names(renderer.render(query, max_tokens=1).xml)
+    assert names == {("schools", "CDSCode"), ("satscores", "cds")}
+
+
+async def test_catalog_renderer_is_shared():
+    catalog = SchemaCatalog("school", make_tables(), {"database_id": "school"}, "School data")
+    assert get_catalog_renderer(catalog) is get_catalog_renderer(catalog)
+
+    memory = KeyValueMemory(native=True)
+    manager = DatabaseSchemaManager(memory)
+    await memory.set("databaseSchema", catalog.memory_value(True), copy=False)
+    rendered = await render_schema_xml(manager, max_tokens=None)
+    assert rendered.xml == get_catalog_renderer(catalog).render().xml
+
+    # A schema built in memory is rendered the same way
+    other = DatabaseSchemaManager(KeyValueMemory())
+    await other.initialize()
+    assert await render_schema_xml(other) is None
+    for table in make_tables().values():
+        await other.add_table(table)
+    await other.set_database_description("School data")
+    assert (await render_schema_xml(other)).xml == rendered.xml
@@ -7,6 +7,7 @@ and validate SQL queries.
 
 import asyncio
 import pytest
+import sqlite3
 import sys
 from pathlib import Path
 from typing import Dict, Any
@@ -18,6 +19,7 @@ from keyvalue_memory import KeyValueMemory
 from memory_content_types import TableSchema, ColumnInfo
 from database_schema_manager import DatabaseSchemaManager
 from sql_generator_tools import SQLGeneratorTools, create_sql_generator_tools
+from task_context_manager import TaskContextManager
 
 
 class TestSQLGeneratorTools:
@@ -250,11 +252,11 @@ class TestSQLGeneratorTools:
         # Test factory function
         tool_configs = create_sql_generator_tools(memory)
         
-        assert len(tool_configs) == 4
+        assert len(tool_configs) == 6
         
         # Check tool names
         tool_names = [config["name"] for config in tool_configs]
-        expected_tools = ["check_table_columns", "check_column_exists", "validate_sql", "list_all_tables"]
+        expected_tools = ["check_table_columns", "check_column_exists", "validate_sql", "find_values", "find_join_path", "list_all_tables"]
         
         for expected_tool in expected_tools:
             assert expected_tool in tool_names
@@ -289,6 +291,55 @@ class TestSQLGeneratorTools:
         
         print("✓ Error handling for missing schema works")
 
+    
+    @pytest.mark.asyncio
+    async def test_execute_sql_binds_task_and_caches(self, tmp_path):
+        """Test that execute_sql reuses its executor and results within a task"""
+        db_dir = tmp_path / "shop"
+        db_dir.mkdir()
+        conn = sqlite3.connect(db_dir / "shop.sqlite")
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO users (name) VALUES (?)", [("Ann",), ("Bob",)])
+        conn.commit()
+        conn.close()
+        
+        memory = KeyValueMemory()
+        tools = SQLGeneratorTools(memory)
+        result = await tools.execute_sql("SELECT * FROM users")
+        assert result["status"] == "error" and "task context" in result["error"]
+        
+        task_manager = TaskContextManager(memory)
+        await task_manager.initialize("task_1", "List users", "shop")
+        result = await tools.execute_sql("SELECT * FROM users")
+        assert result["status"] == "error" and "data_path" in result["error"]
+        
+        await DatabaseSchemaManager(memory).initialize({"data_path": str(tmp_path), "dataset_name": "custom"})
+        result = await tools.execute_sql("SELECT name FROM users ORDER BY id")
+        assert result["status"] == "success"
+        assert result["data"] == [("Ann",), ("Bob",)]
+        assert "cached" not in result
+        binding = tools._binding
+        
+        # Same SQL in the same task comes from the cache
+        result = await tools.execute_sql("SELECT name FROM users ORDER BY id ")
+        assert result["cached"] and result["data"] == [("Ann",), ("Bob",)]
+        assert tools._binding is binding
+        
+        # SQL errors are reported as errors
+        result = await tools.execute_sql("SELECT missing FROM users")
+        assert result["status"] == "error"
+        assert "missing" in result["error"]
+        
+        # A new task binds again
+        await task_manager.initialize("task_2", "List users", "shop")
+        result = await tools.execute_sql("SELECT name FROM users ORDER BY id")
+        assert "cached" not in result
+        assert tools._binding is not binding
+        
+        stats = tools.call_stats["execute_sql"]
+        assert stats["calls"] == 6
+        assert stats["max_time"] >= stats["total_time"] / stats["calls"]
+
 
 if __name__ == "__main__":
     print("\n" + "="*60)
@@ -0,0 +1,132 @@
+"""
+Tests for the process-pool SQL sandbox (sql_sandbox).
+"""
+
+import os
+import signal
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import sql_sandbox
+from sql_sandbox import SQLSandbox, SandboxWorkerError
+from sqlite_exec import SQLTimeoutError
+from sql_executor import SQLExecutor
+
+
+RUNAWAY_SQL = (
+    "WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r) "
+    "SELECT count(*) FROM r"
+)
+
+
+@pytest.fixture
+def db_root(tmp_path):
+    """Create <root>/test_db/test_db.sqlite with a small table."""
+    db_dir = tmp_path / "test_db"
+    db_dir.mkdir()
+    conn = sqlite3.connect(db_dir / "test_db.sqlite")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO items (name) VALUES (?)", [(f"item{i}",) for i in range(20)])
+    conn.commit()
+    conn.close()
+    return tmp_path
+
+
+@pytest.fixture
+def sandbox():
+    sb = SQLSandbox(num_workers=2, memory_limit_mb=None)
+    yield sb
+    sb.close()
+
+
+class TestSQLSandbox:
+    """Test execution in worker processes."""
+
+    def test_execute(self, sandbox, db_root):
+        run = sandbox.execute(str(db_root / "test_db" / "test_db.sqlite"), "SELECT * FROM items", timeout=5)
+        assert len(run.rows) == 20
+        assert run.column_names == ["id", "name"]
+
+    def test_sql_error_is_reraised(self, sandbox, db_root):
+        with pytest.raises(sqlite3.OperationalError, match="no such table"):
+            sandbox.execute(str(db_root / "test_db" / "test_db.sqlite"), "SELECT * FROM missing", timeout=5)
+
+    def test_timeout_in_worker(self, sandbox, db_root):
+        db_path = str(db_root / "test_db" / "test_db.sqlite")
+        with pytest.raises(SQLTimeoutError):
+            sandbox.execute(db_path, RUNAWAY_SQL, timeout=0.2)
+        # The worker survives an in-sqlite timeout
+        assert sandbox.replaced_workers == 0
+        assert sandbox.execute(db_path, "SELECT 1", timeout=5).rows == [(1,)]
+
+    def test_crashed_worker_is_replaced(self, sandbox, db_root):
+        db_path = str(db_root / "test_db" / "test_db.sqlite")
+        worker = sandbox._idle[-1]
+        worker.process.kill()
+        worker.process.join()
+        with pytest.raises(SandboxWorkerError):
+            sandbox.execute(db_path, "SELECT 1", timeout=5)
+        assert sandbox.replaced_workers == 1
+        run = sandbox.execute(db_path, "SELECT count(*) FROM items", timeout=5)
+        assert run.rows == [(20,)]
+
+    @pytest.mark.skipif(not hasattr(signal, "SIGSTOP"), reason="needs SIGSTOP")
+    def test_unresponsive_worker_is_killed_at_deadline(self, db_root):
+        with SQLSandbox(num_workers=1, memory_limit_mb=None, grace_period=0.1) as sb:
+            worker = sb._idle[0]
+            os.kill(worker.process.pid, signal.SIGSTOP)
+            with pytest.raises(SQLTimeoutError):
+                sb.execute(str(db_root / "test_db" / "test_db.sqlite"), "SELECT 1", timeout=0.2)
+            assert sb.replaced_workers == 1
+            assert not worker.process.is_alive()
+            assert sb.execute(str(db_root / "test_db" / "test_db.sqlite"), "SELECT 1", timeout=5).rows == [(1,)]
+
+    @pytest.mark.skipif(sql_sandbox.resource is None, reason="needs rlimits")
+    def test_memory_limit_replaces_worker(self, db_root):
+        with SQLSandbox(num_workers=1, memory_limit_mb=256) as sb:
+            with pytest.raises(SandboxWorkerError, match="memory limit"):
+                sb.execute(str(db_root / "test_db" / "test_db.sqlite"),
+                           "SELECT length(randomblob(400000000))", timeout=30)
+            assert sb.replaced_workers == 1
+            run = sb.execute(str(db_root / "test_db" / "test_db.sqlite"), "SELECT count(*) FROM items", timeout=5)
+            assert run.rows == [(20,)]
+
+    def test_warm_databases(self, db_root):
+        db_path = str(db_root / "test_db" / "test_db.sqlite")
+        with SQLSandbox(num_workers=1, memory_limit_mb=None) as sb:
+            worker = sb._idle[0]
+            with pytest.raises(sqlite3.OperationalError):
+                sb.execute(str(db_root / "missing" / "missing.sqlite"), "SELECT 1", timeout=5)
+            assert worker.warm == set()
+            sb.execute(db_path, "SELECT 1", timeout=5)
+            # In-memory databases are not turned into a file path
+            sb.execute(":memory:", "SELECT 1", timeout=5)
+            assert worker.warm == {db_path, ":memory:"}
+
+    def test_evicted_connections_are_not_warm(self, db_root):
+        db_path = str(db_root / "test_db" / "test_db.sqlite")
+        with SQLSandbox(num_workers=1, memory_limit_mb=None, max_connections=1) as sb:
+            worker = sb._idle[0]
+            sb.execute(db_path, "SELECT 1", timeout=5)
+            sb.execute(":memory:", "SELECT 1", timeout=5)
+            # The worker closed the first connection to open the second
+            assert worker.warm == {":memory:"}
+
+    def test_core_shares_this_implementation(self, monkeypatch):
+        repo_root = Path(__file__).parent.parent.parent
+        monkeypatch.syspath_prepend(str(repo_root))
+        import core.sql_sandbox
+
+        assert core.sql_sandbox.SQLSandbox is SQLSandbox
+
+    def test_sql_executor_with_sandbox(self, sandbox, db_root):
+        executor = SQLExecutor(str(db_root), "custom", sandbox=sandbox)
+        result = executor.execute_sql("SELECT * FROM items", "test_db")
+        assert result["success"]
+        assert result["row_count"] == 20
@@ -0,0 +1,167 @@
+"""
+Tests for deadline-bounded SQLite execution (sqlite_exec) and the SQLExecutor
+timeout and async paths built on it.
+"""
+
+import asyncio
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from autogen_core import CancellationToken
+
+from sqlite_exec import SQLCancelledError, SQLTimeoutError, connect, execute_with_deadline, run_sql
+from sql_executor import SQLExecutor
+
+
+RUNAWAY_SQL = (
+    "WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r) "
+    "SELECT count(*) FROM r"
+)
+
+
+@pytest.fixture
+def db_root(tmp_path):
+    """Create <root>/test_db/test_db.sqlite with a small table."""
+    db_dir = tmp_path / "test_db"
+    db_dir.mkdir()
+    conn = sqlite3.connect(db_dir / "test_db.sqlite")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO items (name) VALUES (?)", [(f"item{i}",) for i in range(20)])
+    conn.commit()
+    conn.close()
+    return tmp_path
+
+
+class TestExecuteWithDeadline:
+    """Test the execution primitive."""
+
+    def test_returns_rows_and_stats(self, db_root):
+        run = run_sql(str(db_root / "test_db" / "test_db.sqlite"), "SELECT id, name FROM items", timeout=5)
+        assert len(run.rows) == 20
+        assert run.column_names == ["id", "name"]
+        assert run.elapsed >= 0
+        assert run.vm_steps >= 0
+
+    def test_max_rows(self, db_root):
+        db_path = str(db_root / "test_db" / "test_db.sqlite")
+        assert len(run_sql(db_path, "SELECT * FROM items", timeout=5, max_rows=5).rows) == 5
+        assert run_sql(db_path, "SELECT * FROM items", timeout=5, max_rows=0).rows == []
+
+    def test_runaway_query_is_interrupted(self):
+        conn = connect(":memory:")
+        start = time.monotonic()
+        with pytest.raises(SQLTimeoutError) as exc_info:
+            execute_with_deadline(conn, RUNAWAY_SQL, timeout=0.2)
+        assert time.monotonic() - start < 2
+        assert exc_info.value.vm_steps > 0
+
+        # The connection is released and usable right away
+        assert execute_with_deadline(conn, "SELECT 1", timeout=1).rows == [(1,)]
+        conn.close()
+
+    def test_cancel_event_interrupts(self):
+        conn = connect(":memory:")
+        cancel_event = threading.Event()
+        threading.Timer(0.1, cancel_event.set).start()
+        with pytest.raises(SQLCancelledError):
+            execute_with_deadline(conn, RUNAWAY_SQL, timeout=10, cancel_event=cancel_event)
+        with pytest.raises(SQLCancelledError):
+            execute_with_deadline(conn, "SELECT 1", timeout=1, cancel_event=cancel_event)
+        assert execute_with_deadline(conn, "SELECT 1", timeout=1).rows == [(1,)]
+        conn.close()
+
+    def test_sql_errors_propagate(self):
+        conn = connect(":memory:")
+        with pytest.raises(sqlite3.OperationalError):
+            execute_with_deadline(conn, "SELECT * FROM missing_table", timeout=1)
+        conn.close()
+
+
+class TestSQLExecutorTimeout:
+    """Test SQLExecutor on top of the primitive."""
+
+    def test_execute_sql(self, db_root):
+        executor = SQLExecutor(str(db_root), "custom")
+        result = executor.execute_sql("SELECT * FROM items", "test_db")
+        assert result["success"]
+        assert result["row_count"] == 20
+        assert len(result["data"]) == 5
+        assert "vm_steps" in result
+
+    def test_safe_execute_timeout(self, db_root):
+        executor = SQLExecutor(str(db_root), "custom", timeout=0.2)
+        result = executor.safe_execute(RUNAWAY_SQL, "test_db")
+        assert result["timeout"]
+        assert not result["success"]
+        assert result["exception_class"] == "SQLTimeoutError"
+
+
+class TestSQLExecutorAsync:
+    """Test that async execution leaves the event loop free and can be cancelled."""
+
+    async def test_event_loop_is_not_blocked(self, db_root):
+        executor = SQLExecutor(str(db_root), "custom", timeout=0.5)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await executor.safe_execute_async(RUNAWAY_SQL, "test_db")
+        task.cancel()
+        assert result["timeout"]
+        assert ticks > 10
+
+        result = await executor.execute_sql_async("SELECT * FROM items", "test_db")
+        assert result["row_count"] == 20
+
+    async def test_cancellation_token_stops_query(self, db_root):
+        executor = SQLExecutor(str(db_root), "custom", timeout=30)
+        token = CancellationToken()
+        asyncio.get_running_loop().call_later(0.1, token.cancel)
+        start = time.monotonic()
+        with pytest.raises(asyncio.CancelledError):
+            await executor.execute_sql_async(RUNAWAY_SQL, "test_db", token)
+        assert time.monotonic() - start < 2
+
+    async def test_task_cancellation_stops_query(self, db_root):
+        executor = SQLExecutor(str(db_root), "custom", timeout=30)
+        executed = threading.Event()
+        original = executor.execute_sql
+
+        def execute_sql(sql, db_id, cancel_event=None):
+            try:
+                return original(sql, db_id, cancel_event)
+            finally:
+                executed.set()
+
+        executor.execute_sql = execute_sql
+        task = asyncio.create_task(executor.execute_sql_async(RUNAWAY_SQL, "test_db"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The query in the worker thread stops too
+        assert await asyncio.to_thread(executed.wait, 2)
+
+
+def test_other_trees_share_this_implementation(monkeypatch):
+    repo_root = Path(__file__).parent.parent.parent
+    monkeypatch.syspath_prepend(str(repo_root))
+    import core.sqlite_exec
+
+    assert core.sqlite_exec.run_sql is run_sql
+    assert core.sqlite_exec.SQLCancelledError is SQLCancelledError
+    # The evaluation scripts import it from workflow_v3/src too
+    assert not (repo_root / "evaluation" / "sqlite_exec.py").exists()
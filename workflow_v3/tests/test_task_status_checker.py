@@ -181,10 +181,90 @@ async def test_tool_interface():
     print("\n✅ Tool interface test passed!")
 
 
+async def test_incremental_status_tracking():
+    """Test that statuses follow node updates made through another manager"""
+    print("\n\nTesting Incremental Status Tracking...")
+    print("=" * 60)
+    
+    memory = KeyValueMemory(native=True)
+    tree_manager = QueryTreeManager(memory)
+    checker = TaskStatusChecker(memory)
+    
+    root_id = await tree_manager.initialize("Compare two counts")
+    for node_id in ("node_001", "node_002"):
+        await tree_manager.add_node(QueryNode(nodeId=node_id, intent=f"Count for {node_id}"), root_id)
+    
+    args = TaskStatusCheckerArgs()
+    result = await checker.run(args)
+    assert "TREE OVERVIEW: 0/3 nodes complete" in result
+    assert "CURRENT_NODE: node_001" in result
+    
+    # Nothing changed: the cached report is returned
+    assert await checker.run(args) is result
+    
+    # Finishing both children makes the parent ready for SQL generation
+    for node_id in ("node_001", "node_002"):
+        await tree_manager.update_node(node_id, {"evaluation": {"result_quality": "good"}})
+    result = await checker.run(args)
+    assert "TREE OVERVIEW: 2/3 nodes complete" in result
+    assert checker._statuses[root_id]["status"] == "needs_sql"
+    assert checker._buckets["complete"] == {"node_001", "node_002"}
+    
+    # A regressed child sends the parent back to its own status
+    await tree_manager.update_node("node_002", {"evaluation": {"result_quality": "poor"},
+                                                "generation": {"execution_result": {"row_count": 0}}})
+    result = await checker.run(args)
+    assert "PENDING: 1 need SQL, 0 need eval, 1 bad SQL" in result
+    
+    # Removed nodes leave their buckets
+    await tree_manager.delete_node("node_002")
+    result = await checker.run(args)
+    assert "TREE OVERVIEW: 1/2 nodes complete" in result
+    assert "node_002" not in checker._bucket_of
+    
+    print("\n✅ Incremental status tracking test passed!")
+
+
+async def test_next_step():
+    """Test the structured status used by the rule scheduler"""
+    print("\n\nTesting Next Step...")
+    print("=" * 60)
+    
+    memory = KeyValueMemory(native=True)
+    tree_manager = QueryTreeManager(memory)
+    checker = TaskStatusChecker(memory)
+    assert await checker.next_step() is None
+    
+    root_id = await tree_manager.initialize("Count schools")
+    step = await checker.next_step()
+    assert step["node_id"] == root_id and step["is_root"]
+    assert step["status"] == "needs_sql"
+    assert not step["has_schema_linking"] and not step["has_analysis"]
+    assert not step["all_complete"]
+    
+    # Unchanged tree, unchanged version
+    version = step["version"]
+    assert (await checker.next_step())["version"] == version
+    
+    await tree_manager.update_node(root_id, {"schema_linking": {"selected_tables": {}},
+                                             "queryAnalysis": {"complexity": "simple"},
+                                             "generation": {"sql": "SELECT COUNT(*) FROM schools"}})
+    step = await checker.next_step()
+    assert step["status"] == "needs_eval" and step["has_analysis"]
+    assert step["version"] > version
+    
+    await tree_manager.update_node(root_id, {"evaluation": {"result_quality": "excellent"}})
+    assert (await checker.next_step())["all_complete"]
+    
+    print("\n✅ Next step test passed!")
+
+
 async def main():
     """Run all tests"""
     await test_task_status_checker()
     await test_tool_interface()
+    await test_incremental_status_tracking()
+    await test_next_step()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+"""
+Tests for the cell value index (value_index).
+"""
+
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+# The evaluation scripts, after src so their sqlite_exec copy is not picked up first
+sys.path.append(str(Path(__file__).parent.parent.parent / "evaluation"))
+
+from keyvalue_memory import KeyValueMemory
+from database_schema_manager import DatabaseSchemaManager
+from sql_generator_tools import SQLGeneratorTools
+import value_index
+from value_index import ValueIndex, extract_value_mentions, set_index_dir
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    """Keep the index files of each test in its own directory."""
+    monkeypatch.setattr(value_index, "_index_dir", str(tmp_path / "index"))
+    return tmp_path / "index"
+
+
+def make_database(path):
+    """A small schools database with text and numeric columns."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE schools (CDSCode TEXT PRIMARY KEY, "County Name" TEXT, Enrollment INTEGER)')
+    conn.executemany("INSERT INTO schools VALUES (?, ?, ?)", [
+        ("01", "Alameda", 120), ("02", "Alameda", 80), ("03", "Los Angeles", 300), ("04", "San Mateo", 45),
+    ])
+    conn.execute("CREATE TABLE frpm (CDSCode TEXT, \"Educational Option Type\" TEXT)")
+    conn.executemany("INSERT INTO frpm VALUES (?, ?)", [
+        ("01", "Traditional"), ("03", "Continuation School"), ("04", "Alternative School of Choice"),
+    ])
+    conn.commit()
+    conn.close()
+
+
+def test_build_is_incremental(tmp_path, index_dir):
+    db_path = str(tmp_path / "school" / "school.sqlite")
+    make_database(db_path)
+    index = ValueIndex(db_path)
+
+    # Only text columns are indexed, once per database file
+    assert index.build(tables=["frpm"]) == 2
+    assert index.build() == 2
+    assert index.build() == 0
+    # The index is kept out of the database's directory
+    assert os.path.dirname(index.index_path) == str(index_dir)
+    assert os.listdir(tmp_path / "school") == ["school.sqlite"]
+
+    # A changed database is re-indexed
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO schools VALUES ('05', 'Fresno', 10)")
+    conn.commit()
+    conn.close()
+    os.utime(db_path, (1, 1))
+    index.ensure_built()
+    assert [m["value"] for m in index.search("fresno")] == ["Fresno"]
+
+
+def test_search(tmp_path):
+    db_path = str(tmp_path / "school.sqlite")
+    make_database(db_path)
+    index = ValueIndex(db_path)
+    index.build()
+
+    matches = index.search("alameda")
+    assert matches == [{"table": "schools", "column": "County Name", "value": "Alameda", "match": "exact"}]
+
+    # Exact matches first, then the shortest values containing the text
+    values = [(m["value"], m["match"]) for m in index.search("school")]
+    assert values == [("Continuation School", "contains"), ("Alternative School of Choice", "contains")]
+    assert [m["value"] for m in index.search("school", limit=1)] == ["Continuation School"]
+
+    # Short texts and table restrictions
+    assert {m["value"] for m in index.search("an")} == {"Los Angeles", "San Mateo"}
+    assert index.search("school", tables=["schools"]) == []
+    assert index.search("  ") == []
+
+
+def test_extract_value_mentions():
+    evidence = "Alameda refers to `County Name` = 'Alameda'; \"Continuation School\" is a type; 'Alameda'"
+    assert extract_value_mentions(evidence) == ["Alameda", "Continuation School"]
+    assert extract_value_mentions(None) == []
+
+
+async def test_find_values_tool(tmp_path):
+    make_database(str(tmp_path / "school" / "school.sqlite"))
+    memory = KeyValueMemory()
+    manager = DatabaseSchemaManager(memory)
+    await manager.initialize({"data_path": str(tmp_path), "dataset_name": "custom", "database_id": "school"})
+    tools = SQLGeneratorTools(memory)
+
+    result = await tools.find_values("Los Angeles")
+    assert result["count"] == 1
+    assert result["matches"][0]["column"] == "County Name"
+
+    await manager.initialize({"data_path": str(tmp_path), "dataset_name": "custom", "database_id": "missing"})
+    result = await tools.find_values("Los Angeles")
+    assert result["count"] == 0 and "error" in result
+
+
+def test_index_next_to_database_does_not_break_evaluation(tmp_path):
+    from exec_eval import eval_exec_match
+
+    db_path = str(tmp_path / "database" / "school" / "school.sqlite")
+    make_database(db_path)
+    # Even an index directory inside the database's directory adds no .sqlite file there
+    set_index_dir(os.path.dirname(db_path))
+    ValueIndex(db_path).build()
+    assert len(os.listdir(os.path.dirname(db_path))) == 2
+
+    sql = "SELECT \"County Name\" FROM schools WHERE Enrollment > 100"
+    assert eval_exec_match(db_path, sql, sql, plug_value=False, keep_distinct=False,
+                           progress_bar_for_each_datapoint=False) == 1